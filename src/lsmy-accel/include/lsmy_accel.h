@@ -0,0 +1,26 @@
+#ifndef LSMY_ACCEL_H
+#define LSMY_ACCEL_H
+
+#include <stddef.h>
+#include <stdint.h>
+
+/* Modbus RTU CRC16 (poly 0xA001, init 0xFFFF) */
+uint16_t lsmy_crc16_modbus(const uint8_t *data, size_t len);
+
+/*
+ * Decode a block of big-endian Modbus registers into float32 values.
+ * Every 4 bytes (two registers) form one float. With word_swap set the
+ * low register comes first (CDAB order).
+ * Returns the number of floats written to out (len / 4).
+ */
+size_t lsmy_decode_float_block(const uint8_t *data, size_t len, int word_swap, float *out);
+
+/*
+ * Rolling-window mean/min/max over values[0..n).
+ * Each output array holds n - window + 1 entries.
+ * Returns the number of windows, 0 if window is 0 or larger than n.
+ */
+size_t lsmy_rolling_stats(const double *values, size_t n, size_t window,
+                          double *mean, double *min, double *max);
+
+#endif
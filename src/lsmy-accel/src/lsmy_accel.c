@@ -0,0 +1,79 @@
+#include <string.h>
+#include "lsmy_accel.h"
+
+static uint16_t crc16_table[256];
+static int crc16_table_ready = 0;
+
+static void crc16_init_table(void)
+{
+    for (unsigned int i = 0; i < 256; i++) {
+        uint16_t crc = (uint16_t)i;
+        for (int bit = 0; bit < 8; bit++) {
+            crc = (crc & 1) ? (uint16_t)((crc >> 1) ^ 0xA001) : (uint16_t)(crc >> 1);
+        }
+        crc16_table[i] = crc;
+    }
+    crc16_table_ready = 1;
+}
+
+uint16_t lsmy_crc16_modbus(const uint8_t *data, size_t len)
+{
+    uint16_t crc = 0xFFFF;
+
+    if (!crc16_table_ready) {
+        /* Idempotent, a concurrent first call just fills the same values */
+        crc16_init_table();
+    }
+
+    for (size_t i = 0; i < len; i++) {
+        crc = (uint16_t)((crc >> 8) ^ crc16_table[(crc ^ data[i]) & 0xFF]);
+    }
+    return crc;
+}
+
+size_t lsmy_decode_float_block(const uint8_t *data, size_t len, int word_swap, float *out)
+{
+    size_t count = len / 4;
+
+    for (size_t i = 0; i < count; i++) {
+        const uint8_t *p = data + i * 4;
+        uint32_t hi = ((uint32_t)p[0] << 8) | p[1];
+        uint32_t lo = ((uint32_t)p[2] << 8) | p[3];
+        uint32_t bits = word_swap ? ((lo << 16) | hi) : ((hi << 16) | lo);
+        memcpy(&out[i], &bits, sizeof(bits));
+    }
+    return count;
+}
+
+size_t lsmy_rolling_stats(const double *values, size_t n, size_t window,
+                          double *mean, double *min, double *max)
+{
+    double sum = 0.0;
+
+    if (window == 0 || window > n) {
+        return 0;
+    }
+
+    for (size_t i = 0; i < window; i++) {
+        sum += values[i];
+    }
+
+    for (size_t start = 0; start + window <= n; start++) {
+        if (start > 0) {
+            /* Same operation order as the Python fallback */
+            sum += values[start + window - 1];
+            sum -= values[start - 1];
+        }
+        mean[start] = sum / (double)window;
+
+        double lo = values[start];
+        double hi = values[start];
+        for (size_t j = start + 1; j < start + window; j++) {
+            if (values[j] < lo) lo = values[j];
+            if (values[j] > hi) hi = values[j];
+        }
+        min[start] = lo;
+        max[start] = hi;
+    }
+    return n - window + 1;
+}
@@ -23,13 +23,14 @@
 #   - Keep clear separation between runtime logic and entrypoint
 # =============================================================================
 
+import os
 import asyncio
 import sys
-import threading
-import time
 import signal
-import ctypes
+import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum, auto
 
 
@@ -39,27 +40,77 @@ from enum import Enum, auto
 # - Another Library Example                #
 ############################################
 
+# Subsystem libraries are imported on first use (see lazy_loader) so the
+# device starts serving before heavy modules and native libraries load.
+
+# ====== LAZY LOADER LIBRARY ======
+from lsmy_python_lib.lazy_loader import LazyModule, NativeLibrary
+
+# ====== STARTUP TIMELINE LIBRARY ======
+from lsmy_python_lib.startup_timeline import STARTUP_TIMELINE
+
+# ====== METRICS LIBRARY ======
+from lsmy_python_lib.metrics import METRICS, metrics_http_server_task
+
+# ====== LOOP HEALTH LIBRARY ======
+from lsmy_python_lib.loop_health import HEALTH, monitor_event_loop, sd_notify
+
+# ====== CONFIG LIBRARY ======
+from lsmy_python_lib.config import CONFIG
+
+# ====== LOG CONTROL LIBRARY ======
+from lsmy_python_lib.log_control import stop_logging
+
 # ====== HELLO WORLD LIBRARY ======
-from lsmy_python_lib.hello import say_hello
+hello_lib = LazyModule("lsmy_python_lib.hello")
 
 # ====== WIFI MODE LIBRARY ======
-from lsmy_python_lib.wifi_mode_manager import WiFiModeManager
+wifi_mode_lib = LazyModule("lsmy_python_lib.wifi_mode_manager")
 
 # ====== WIFI CONFIG LIBRARY ======
-from lsmy_python_lib.wifi_config_manager import WiFiConfigManager
-from lsmy_python_lib.wifi_config_manager import update_wifi_connect_signal
+wifi_config_lib = LazyModule("lsmy_python_lib.wifi_config_manager")
+
+# ====== WIFI CONNECTION LIBRARY ======
+wifi_connection_lib = LazyModule("lsmy_python_lib.wifi_connection_manager")
+
+# ====== LINK MONITOR LIBRARY ======
+link_monitor_lib = LazyModule("lsmy_python_lib.link_monitor")
 
 # ====== WEBSERVER LIBRARY ======
-from lsmy_webserver.manager import ProvisionWebserverManager
+webserver_lib = LazyModule("lsmy_webserver.manager")
 
 # ====== IPC LIBRARY ======
-from lsmy_python_lib.ipc import ipc_server_task
+ipc_lib = LazyModule("lsmy_python_lib.ipc")
 
 # ====== BUTTON RESET LIBRARY ======
-from lsmy_python_lib.button_handler import monitor_button_reset
+button_lib = LazyModule("lsmy_python_lib.button_handler")
+
+# ====== OPERATION QUEUE LIBRARY ======
+operation_lib = LazyModule("lsmy_python_lib.operation_queue")
+
+# ====== RELAY RULES LIBRARY ======
+relay_rules_lib = LazyModule("lsmy_python_lib.relay_rules")
+
+# ====== DUTY CYCLE LIBRARY ======
+duty_cycle_lib = LazyModule("lsmy_python_lib.duty_cycle")
+
+# ====== TRACKER LIBRARY ======
+tracker_lib = LazyModule("lsmy_python_lib.tracker")
+
+# ====== FATIGUE LIBRARY ======
+fatigue_lib = LazyModule("lsmy_python_lib.fatigue")
+
+# ====== MODEL REGISTRY ======
+model_registry_lib = LazyModule("lsmy_app.model_registry")
+
+# ====== RECORDER LIBRARY ======
+recorder_lib = LazyModule("lsmy_python_lib.recorder")
+
+# ====== GATEWAY LIBRARY ======
+gateway_lib = LazyModule("lsmy_python_lib.gateway")
 
 # ====== GLOBAL STORE LIBRARY ======
-from lsmy_python_lib.global_store import Global_Store
+global_store_lib = LazyModule("lsmy_python_lib.global_store")
 
 # ====== ANOTHER LIBRARY ======
 # Additional Python library imports can go here
@@ -72,9 +123,10 @@ from lsmy_python_lib.global_store import Global_Store
 ############################################
 
 # ====== HELLO WORLD LIBRARY ======
-lib = ctypes.CDLL("/usr/lib/liblsmy_hello.so.1")
-lib.hello_print.restype = None
-lib.hello_print.argtypes = []
+# Opened with ctypes on the first call
+lib = NativeLibrary("/usr/lib/liblsmy_hello.so.1", {
+    "hello_print": (None, []),
+})
 
 # ====== ANOTHER LIBRARY ======
 # Additional C/C++ library imports can go here
@@ -86,6 +138,32 @@ lib.hello_print.argtypes = []
 log = logging.getLogger("lsmy-app")
 
 
+# -------------------------
+# Runtime Tunables
+# -------------------------
+# Loop intervals, worker threads and timeouts: [app] configuration section
+SUPERVISOR_MIN_BACKOFF = 1      # First restart delay of a crashed subsystem
+SUPERVISOR_MAX_BACKOFF = 30     # Restart delay cap
+EXIT_LOG_TIMEOUT = 2            # Seconds a forced exit waits for queued log records to be written
+METRICS_HTTP_PORT = CONFIG.app.metrics_port     # 0 disables /metrics
+GATEWAY_LISTEN = CONFIG.gateway.listen          # "host:port": act as the site gateway
+GATEWAY_UPSTREAM = CONFIG.gateway.upstream      # "host:port": forward telemetry to a gateway
+# Record / replay select a debugging session for one run, not device
+# configuration: they stay environment only
+RECORD_FILE = os.environ.get("LSMY_RECORD", "")                 # Record IPC / GPIO / mode / link events here
+REPLAY_FILE = os.environ.get("LSMY_REPLAY", "")                 # Feed this recording into the running app
+REPLAY_SPEED = float(os.environ.get("LSMY_REPLAY_SPEED", "1"))  # 1 = real time, 0 = as fast as possible
+
+
+# -------------------------
+# Metrics
+# -------------------------
+MAIN_LOOP_CYCLE = METRICS.histogram(
+    "lsmy_main_loop_cycle_seconds", "Main loop cycle time (excluding sleep)",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 20, 30, 60),
+)
+
+
 # -------------------------
 # Application State
 # -------------------------
@@ -108,36 +186,258 @@ class LsmyApplication:
     #-------- Constructor --------
     def __init__(self):
         self.state = AppState.INIT
-        # WifiModeManager
-        self.wifi_manager = WiFiModeManager()
-        self.wifi_config_manager = WiFiConfigManager()
-        self.provision_webserver_manager = ProvisionWebserverManager()
+        # Managers are constructed on first use (see properties below)
+        self._managers = {}
+        self._manager_locks = {
+            "wifi_manager": threading.Lock(),
+            "wifi_config_manager": threading.Lock(),
+            "wifi_connection_manager": threading.Lock(),
+            "provision_webserver_manager": threading.Lock(),
+        }
 
         self.print_wifi_info = False
+        self._sta_connected = False
         self.running = False
+        self._relay_scheduler = None
+        self._operations = None
+        # Held by the WiFi cycle and by device operations (reset, configure, ...)
+        self._device_lock = threading.Lock()
+
+        # Asyncio runtime
+        self._loop = None
+        self._executor = None
+        self._stop_event = None
+        self._wake = None
+        self._duty = None
+        self._duty_wake = None
+        self._models = None
+        self._people = None
+        self._fatigue = None
+        self._tasks = []
 
     # -------- Public lifecycle --------
     def start(self):
-        self._setup_signal_handlers()
-        self._startup_sequence()
-        self._main_loop()
+        """
+        Run the application until a termination signal or stop() request.
+        Blocks the calling thread; all subsystems run on one event loop.
+        """
+        asyncio.run(self._run())
 
     def stop(self):
-        self._shutdown_sequence()
+        """
+        Request shutdown. Safe to call from any thread.
+        """
+        if self._loop is not None and self._stop_event is not None:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+
+    # -------- Lazily constructed managers --------
+    def _get_manager(self, name, factory):
+        manager = self._managers.get(name)
+        if manager is None:
+            with self._manager_locks[name]:
+                manager = self._managers.get(name)
+                if manager is None:
+                    with STARTUP_TIMELINE.phase(name):
+                        manager = factory()
+                    self._managers[name] = manager
+        return manager
+
+    @property
+    def wifi_manager(self):
+        return self._get_manager("wifi_manager", lambda: wifi_mode_lib.WiFiModeManager())
+
+    @property
+    def wifi_config_manager(self):
+        return self._get_manager("wifi_config_manager", lambda: wifi_config_lib.WiFiConfigManager())
+
+    @property
+    def wifi_connection_manager(self):
+        return self._get_manager(
+            "wifi_connection_manager",
+            lambda: wifi_connection_lib.WiFiConnectionManager(self.wifi_config_manager),
+        )
+
+    @property
+    def provision_webserver_manager(self):
+        return self._get_manager("provision_webserver_manager", lambda: webserver_lib.ProvisionWebserverManager())
+
+    # -------- Asyncio runtime --------
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        self._wake = asyncio.Event()
+        self._duty_wake = asyncio.Event()
+        self._executor = ThreadPoolExecutor(
+            max_workers=CONFIG.app.executor_workers,
+            thread_name_prefix="lsmy-worker",
+        )
+        # to_thread / run_in_executor(None) share the bounded pool
+        self._loop.set_default_executor(self._executor)
+        self._setup_signal_handlers()
+        if RECORD_FILE:
+            recorder_lib.start_recording(RECORD_FILE)
+
+        try:
+            self._operations = self._create_operation_queue()
+            ipc_lib.set_operation_queue(self._operations)
+            # Rates follow telemetry / occupancy from the start
+            self._duty = duty_cycle_lib.DutyCycleScheduler(on_change=self._duty_wake.set)
+            ipc_lib.set_duty_cycle(self._duty)
+
+            self._tasks.append(self._spawn("loop-health", lambda: monitor_event_loop("app")))
+            # IPC first, so telemetry is accepted while the rest initializes
+            self._tasks.append(self._spawn("ipc-server", lambda: ipc_lib.ipc_server_task()))
+            self._tasks.append(self._spawn("operations", self._operations.run))
+            if METRICS_HTTP_PORT:
+                self._tasks.append(self._spawn("metrics-http", lambda: metrics_http_server_task(port=METRICS_HTTP_PORT)))
+            self._start_gateway()
+
+            await self._startup_sequence()
+
+            self._tasks += [
+                self._spawn("buttons", lambda: button_lib.monitor_buttons(self._operations)),
+                self._spawn("main-loop", self._main_loop),
+                self._spawn("sensing", self._sensing_loop),
+                self._spawn("wifi-scan", self._wifi_scan_loop),
+                self._spawn("model-watch", self._model_watch_loop),
+                self._spawn("config-watch", CONFIG.watch),
+                self._spawn("link-monitor", lambda: link_monitor_lib.LinkMonitor("wlan0", self._on_link_change).run()),
+            ]
+            if REPLAY_FILE:
+                self._tasks.append(self._spawn("replay", self._replay))
+
+            sd_notify("READY=1")
+            await self._stop_event.wait()
+        finally:
+            sd_notify("STOPPING=1")
+            await self._cancel_tasks()
+
+            # Daemon threads against one deadline: executor workers may still
+            # be stuck in a cancelled call, and both asyncio.run() and the
+            # interpreter join the pool without a timeout
+            deadline = time.monotonic() + CONFIG.app.shutdown_timeout
+            if not await self._join_thread("lsmy-shutdown", self._shutdown_sequence, deadline):
+                self._exit_now(f"Shutdown sequence exceeded {CONFIG.app.shutdown_timeout:.0f}s")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            if not await self._join_thread("lsmy-drain", self._executor.shutdown, deadline):
+                self._exit_now("Worker threads still busy at shutdown")
+            recorder_lib.stop_recording()
+
+    async def _join_thread(self, name, func, deadline) -> bool:
+        """
+        Run `func` on a daemon thread. Returns False if it is still
+        running at `deadline` (monotonic).
+        """
+        done = asyncio.Event()
+
+        def target():
+            try:
+                func()
+            except Exception:
+                log.exception("%s failed", name)
+            finally:
+                self._loop.call_soon_threadsafe(done.set)
+
+        threading.Thread(target=target, name=name, daemon=True).start()
+        try:
+            await asyncio.wait_for(done.wait(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def _exit_now(self, reason):
+        """
+        Leave without joining threads: the exit stays bounded even when
+        one of them never returns.
+        """
+        log.error("%s, exiting anyway", reason)
+        recorder_lib.stop_recording()
+        # Records sit in the listener's queue: drain it, logging.shutdown()
+        # only flushes the handlers
+        stop_logging(EXIT_LOG_TIMEOUT)
+        logging.shutdown()
+        os._exit(1)
+
+    def _start_gateway(self):
+        """
+        Gateway mode: serve peer nodes and batch the site's telemetry.
+        Node mode: forward this device's telemetry to the gateway.
+        """
+        if GATEWAY_LISTEN:
+            gateway = gateway_lib.Gateway()
+            host, port = gateway_lib.parse_address(GATEWAY_LISTEN)
+            ipc_lib.set_gateway(gateway)
+            self._tasks += [
+                self._spawn("gateway", lambda: gateway.serve(host, port)),
+                self._spawn("gateway-batcher", gateway.run_batcher),
+            ]
+
+        if GATEWAY_UPSTREAM:
+            forwarder = gateway_lib.NodeForwarder(*gateway_lib.parse_address(GATEWAY_UPSTREAM))
+            ipc_lib.set_forwarder(forwarder)
+            self._tasks.append(self._spawn("gateway-forwarder", forwarder.run))
+
+    async def _run_blocking(self, func, *args):
+        """
+        Run a blocking call on the bounded worker pool.
+        """
+        return await self._loop.run_in_executor(self._executor, func, *args)
+
+    async def _sleep(self, seconds) -> bool:
+        """
+        Sleep unless shutdown is requested first.
+        Returns True if the application should stop.
+        """
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+        return self._stop_event.is_set()
+
+    def _spawn(self, name, factory):
+        return asyncio.create_task(self._supervise(name, factory), name=name)
+
+    async def _supervise(self, name, factory):
+        """
+        Keep a subsystem coroutine alive, restarting it with exponential
+        backoff if it crashes. A clean return ends supervision.
+        """
+        backoff = SUPERVISOR_MIN_BACKOFF
+
+        while not self._stop_event.is_set():
+            try:
+                await factory()
+                log.info("Subsystem %s finished", name)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("Subsystem %s crashed, restarting in %ds", name, backoff)
+
+            if await self._sleep(backoff):
+                return
+            backoff = min(backoff * 2, SUPERVISOR_MAX_BACKOFF)
+
+    async def _cancel_tasks(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
 
     # -------- Startup / shutdown --------
-    def _startup_sequence(self):
+    async def _startup_sequence(self):
         log.info("############################################")
         log.info("#   LSMY SYSTEM - STARTUP                  #")
         log.info("############################################")
 
-        self._load_configuration()
-        self._initialize_services()
+        await self._run_blocking(self._timed, "load configuration", self._load_configuration)
+        await self._initialize_services()
 
         self.state = AppState.RUNNING
         self.running = True
 
         log.info("LSMY system startup completed")
+        STARTUP_TIMELINE.report(log)
 
     def _shutdown_sequence(self):
         log.info("############################################")
@@ -152,14 +452,33 @@ class LsmyApplication:
 
     # -------- Initialization --------
     def _load_configuration(self):
+        """
+        The configuration was compiled when its module was imported (IPC
+        already serves with it); here the running subsystems subscribe
+        to the sections they apply on reload.
+        """
         log.info("Loading system configuration")
-        pass
+        log.info("Configuration: %s (generation %d)", CONFIG.path, CONFIG.generation)
+
+        # Shorter main loop interval: start the next cycle now
+        CONFIG.subscribe("app", lambda old, new: self._wake.set(), loop=self._loop)
+        # New periods / budget: re-plan the sensing schedule
+        CONFIG.subscribe("duty_cycle", lambda old, new: self._duty.reconfigure(), loop=self._loop)
 
-    def _initialize_services(self):
+    async def _initialize_services(self):
         log.info("Initializing core services")
-        self._init_sensor_subsystem()
-        self._init_ai_subsystem()
-        self._init_communication_subsystem()
+
+        # Subsystems are independent, initialize them in parallel
+        await asyncio.gather(
+            self._run_blocking(self._timed, "sensor subsystem", self._init_sensor_subsystem),
+            self._run_blocking(self._timed, "AI subsystem", self._init_ai_subsystem),
+            self._run_blocking(self._timed, "communication subsystem", self._init_communication_subsystem),
+            self._run_blocking(self._timed, "relay subsystem", self._init_relay_subsystem),
+        )
+
+    def _timed(self, name, func):
+        with STARTUP_TIMELINE.phase(name):
+            return func()
 
     def _stop_services(self):
         log.info("Stopping core services")
@@ -167,119 +486,298 @@ class LsmyApplication:
         log.info("Stopping wifi mode services")
         self.wifi_manager.cleanup_wifi()
         self.provision_webserver_manager.stop()
-        pass
+
+        if self._relay_scheduler is not None:
+            log.info("Releasing relay lines")
+            self._relay_scheduler.close()
 
     # -------- Signals --------
     def _setup_signal_handlers(self):
-        signal.signal(signal.SIGTERM, self._handle_termination)
-        signal.signal(signal.SIGINT, self._handle_termination)
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            self._loop.add_signal_handler(signum, self._handle_termination, signum)
+        # Runs on the loop, like the reload listeners it triggers
+        self._loop.add_signal_handler(signal.SIGHUP, CONFIG.request_reload, "SIGHUP")
 
-    def _handle_termination(self, signum, frame):
+    def _handle_termination(self, signum):
         log.info(f"Received termination signal ({signum})")
-        self.stop()
+        self.running = False
+        self._stop_event.set()
 
     # -------- Main loop --------
-    def _main_loop(self):
+    async def _main_loop(self):
         log.info("========== ENTERING MAIN APPLICATION LOOP ==========")
 
-        # Monitor Reset Button Thread
-        monitor_button_reset_thread = threading.Thread(target=monitor_button_reset, args=(self.wifi_manager,), daemon=True)
-        monitor_button_reset_thread.start()
+        # A wedged WiFi cycle (e.g. a hung subprocess) stops the systemd watchdog
+        HEALTH.register("main-loop", CONFIG.app.main_loop_stall)
 
-        # IPC Server Thread
-        ipc_thread = threading.Thread(target=self.start_ipc_thread, daemon=True)
-        ipc_thread.start()
+        while self.running:
+            HEALTH.beat("main-loop")
+            with MAIN_LOOP_CYCLE.time():
+                # WiFi state machine is subprocess-heavy, keep it off the loop
+                await self._run_blocking(self._wifi_cycle_locked)
+            if await self._wait_next_cycle():
+                break
+
+    async def _wait_next_cycle(self) -> bool:
+        """
+        Sleep until the next main loop cycle; a link change starts it
+        early. Returns True if the application should stop.
+        """
+        return await self._wait_or_wake(self._wake, CONFIG.app.main_loop_interval)
 
+    async def _wait_or_wake(self, wake, timeout) -> bool:
+        """
+        Sleep for `timeout`, less if `wake` is set meanwhile.
+        Returns True if the application should stop.
+        """
+        waiters = {asyncio.ensure_future(self._stop_event.wait()), asyncio.ensure_future(wake.wait())}
+        try:
+            await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+        wake.clear()
+        return self._stop_event.is_set()
+
+    async def _sensing_loop(self):
+        """
+        Sensing, inference and publishing at the rates chosen by the
+        duty cycle scheduler; a rate change re-plans the next wake-up.
+        """
         while self.running:
-            # Main logic connections here
-            if self.wifi_manager.is_wifi_connected():
-                # Wifi connected, connect to CoreIoT
-
-                if self.print_wifi_info:
-                    self.print_wifi_info = False
-                    wifi_info = self.wifi_config_manager.get_wifi_status_iw("wlan0")
-        
-                    if wifi_info:
-                        log.info("========== WIFI CONNECTED ==========")
-                        log.info(f"SSID      : {wifi_info.get('ssid')}")
-                        log.info(f"IP Addr   : {wifi_info.get('ip')}")
-                        log.info(f"Signal    : {wifi_info.get('signal')}")
-                        log.info("====================================")
-                    else:
-                        log.info("WiFi connected, but could not retrieve detailed info.")
+            due = self._duty.due()
+            if due:
+                await self._run_cycle(due)
+            if await self._wait_or_wake(self._duty_wake, self._duty.next_due()):
+                break
+
+    def _on_link_change(self, carrier: bool):
+        recorder_lib.capture_link(carrier)
+        # Link up: configure IP now instead of at the next poll.
+        # Link down: notice the loss now.
+        self._wake.set()
+
+    async def _wifi_scan_loop(self):
+        """
+        Keep the scan table warm for the next connect and roam to a
+        clearly better AP. Only runs while connected in STA mode and the
+        device is otherwise idle, so it never competes with a connection
+        attempt or a device operation for the radio.
+        """
+        while not await self._sleep(CONFIG.app.wifi_scan_interval):
+            if not self._sta_connected or self._operations.busy:
+                continue
+            await self._run_blocking(self.wifi_connection_manager.refresh_if_idle, self._device_lock)
 
-                    Global_Store.set("wifi_status", "CONNECTED")
+    async def _model_watch_loop(self):
+        """
+        Hot-swap models whose file was replaced (or that appeared) in
+        the model directory; the old version serves until the new one
+        is loaded and warmed up.
+        """
+        while not await self._sleep(CONFIG.app.model_poll_interval):
+            if self._models is not None:
+                await self._run_blocking(self._models.refresh)
+
+    def _wifi_cycle_locked(self):
+        # Device operations take the same lock, a reset never races a mode switch
+        with self._device_lock:
+            self._wifi_cycle()
+
+    def _wifi_cycle(self):
+        """
+        One pass of the WiFi / provisioning state machine (blocking).
+        """
+        # Main logic connections here
+        self._sta_connected = self.wifi_manager.is_wifi_connected()
+        if self._sta_connected:
+            # Wifi connected, connect to CoreIoT
+
+            if self.print_wifi_info:
+                self.print_wifi_info = False
+                wifi_info = self.wifi_config_manager.get_wifi_status_iw("wlan0")
+    
+                if wifi_info:
+                    log.info("========== WIFI CONNECTED ==========")
+                    log.info(f"SSID      : {wifi_info.get('ssid')}")
+                    log.info(f"IP Addr   : {wifi_info.get('ip')}")
+                    log.info(f"Signal    : {wifi_info.get('signal')}")
+                    log.info("====================================")
                 else:
-                    log.info("WiFi connected, system operational")
+                    log.info("WiFi connected, but could not retrieve detailed info.")
+
+                global_store_lib.Global_Store.set("wifi_status", "CONNECTED")
             else:
-                # Wifi not connected
-                wifi_mode = self.wifi_manager.get_wifi_role()
-                log.info(f"Current WiFi mode: {wifi_mode}")
-
-                if wifi_mode == "STA":
-                    # In STA mode but not connected, first try to connection
-                    if self.wifi_config_manager.has_any_wifi_config():
-                        log.info("Attempting to connect to WiFi in STA mode")
-                        self.wifi_manager.switch_to_sta()
-                        self.wifi_manager.start_sta_services()
-
-                        log.info(f"Waiting for wlan0 to connect...")
-                        if self.wifi_config_manager.is_wait_for_wifi():
-                            self.wifi_config_manager.request_ip(interface="wlan0")
-                            self.print_wifi_info = True
-                        else:
-                            log.info("WiFi connection failed, switching to AP mode")
-                            self.wifi_manager.switch_to_ap()
-                            self.provision_webserver_manager.start() 
+                log.info("WiFi connected, system operational", extra={"rate_limit": 300})
+        else:
+            # Wifi not connected
+            wifi_mode = self.wifi_manager.get_wifi_role()
+            log.info(f"Current WiFi mode: {wifi_mode}")
+
+            if wifi_mode == "STA":
+                # Associated again on its own (link came back): only the address is missing
+                ssid = self.wifi_manager.associated_ssid()
+                if ssid is not None:
+                    log.info("wlan0 associated to '%s' without connectivity, requesting IP", ssid)
+                    if self.wifi_config_manager.request_ip(interface="wlan0", ssid=ssid):
+                        self.print_wifi_info = True
+                        return
+
+                # In STA mode but not connected, first try to connection
+                if self.wifi_config_manager.has_any_wifi_config():
+                    log.info("Attempting to connect to WiFi in STA mode")
+                    self.wifi_manager.switch_to_sta()
+                    self.wifi_manager.start_sta_services()
+
+                    log.info(f"Waiting for wlan0 to connect...")
+                    # Best known network first, short timeout per candidate
+                    ssid = self.wifi_connection_manager.connect()
+                    if ssid:
+                        self.wifi_config_manager.request_ip(interface="wlan0", ssid=ssid)
+                        self.print_wifi_info = True
                     else:
-                        log.info("No WiFi config found, switching to AP mode")
-                        self.wifi_manager.switch_to_ap()
-                        self.provision_webserver_manager.start()
-                elif wifi_mode == "AP":
-                    # Check if have any wifi config
-                    is_have_wifi_connect = self.wifi_config_manager.get_wifi_connect_signal()
-                    log.info(f"Is have WiFi connect: {is_have_wifi_connect}")
-
-                    # In AP mode, stay in AP mode
-                    if (not self.provision_webserver_manager.is_running()) and (not is_have_wifi_connect):
-                        log.info("Provisioning webserver not running, starting it")
+                        log.info("WiFi connection failed, switching to AP mode")
                         self.wifi_manager.switch_to_ap()
-                        self.provision_webserver_manager.start()
-                    else:
-                        log.info("Staying in AP mode, waiting for user configuration")
-
-                        # If have update wifi connect signal, switch to STA mode
-                        if is_have_wifi_connect:
-                            log.info("WiFi connect signal found, switching to STA mode")
-                            self.wifi_manager.switch_to_sta()
-                            self.provision_webserver_manager.stop()
-                            update_wifi_connect_signal(False)
+                        self.provision_webserver_manager.start() 
                 else:
-                    log.warning("Unknown WiFi mode, switching to STA mode")
-                    self.wifi_manager.cleanup_wifi()
-                    self.provision_webserver_manager.stop()
+                    log.info("No WiFi config found, switching to AP mode")
+                    self.wifi_manager.switch_to_ap()
+                    self.provision_webserver_manager.start()
+            elif wifi_mode == "AP":
+                # Check if have any wifi config
+                is_have_wifi_connect = self.wifi_config_manager.get_wifi_connect_signal()
+                log.info(f"Is have WiFi connect: {is_have_wifi_connect}")
+
+                # In AP mode, stay in AP mode
+                if (not self.provision_webserver_manager.is_running()) and (not is_have_wifi_connect):
+                    log.info("Provisioning webserver not running, starting it")
+                    self.wifi_manager.switch_to_ap()
+                    self.provision_webserver_manager.start()
+                else:
+                    log.info("Staying in AP mode, waiting for user configuration")
 
-            self._run_cycle()
-            time.sleep(5)
+                    # If have update wifi connect signal, switch to STA mode
+                    if is_have_wifi_connect:
+                        log.info("WiFi connect signal found, switching to STA mode")
+                        self.wifi_manager.switch_to_sta()
+                        self.provision_webserver_manager.stop()
+                        wifi_config_lib.update_wifi_connect_signal(False)
+            else:
+                log.warning("Unknown WiFi mode, switching to STA mode")
+                self.wifi_manager.cleanup_wifi()
+                self.provision_webserver_manager.stop()
 
-    def _run_cycle(self):
+    async def _run_cycle(self, due):
         """
-        Single application cycle.
+        Single application cycle: the tasks that are due
+        ("sensors", "inference", "publish").
         Placeholder for sensor polling, AI inference, and data publishing.
         """
-        # Call the function from the shared library
-        # lib.hello_print()
-
-        # Call the Python function
-        # say_hello()
+        for task in due:
+            if task == "inference":
+                # Capture and models on a worker (warm sessions), results
+                # applied here, on the loop thread
+                result = await self._run_blocking(self._run_inference)
+                if result is not None:
+                    count, camera_cost, inference_cost = result
+                    if count is not None:
+                        self._duty.observe_occupancy(count)
+                    self._duty.record_cost("camera", camera_cost)
+                    self._duty.record_cost("inference", inference_cost)
+
+            # Call the function from the shared library
+            # lib.hello_print()
+
+            # Call the Python function
+            # hello_lib.say_hello()
+
+            # Sensors / publish are placeholders: they record their cost
+            # (record_cost) once they do work
+
+    def _run_inference(self):
+        """
+        Worker thread: capture a frame, run the people counter and the
+        fatigue cascade on it. CPU time is measured here, on the thread
+        doing the work, and feeds the duty cycle budget.
 
-        pass
+        :return: (people count or None, camera CPU seconds, inference
+                 CPU seconds), None without a frame
+        """
+        start = time.thread_time()
+        frame = self._capture_frame()
+        if frame is None:
+            return None
+        captured = time.thread_time()
+        count = self._people.process(frame) if self._people is not None else None
+        if self._fatigue is not None:
+            self._fatigue.process(frame)
+        return count, captured - start, time.thread_time() - captured
+
+    # -------- Replay --------
+    async def _replay(self):
+        """
+        Feed a recording into this process: IPC requests go through the
+        IPC handler, link changes wake the main loop and GPIO edges reach
+        the buttons. Recorded mode switches are outcomes, only counted.
+        """
+        replayer = recorder_lib.Replayer(REPLAY_FILE, REPLAY_SPEED, {
+            recorder_lib.KIND_IPC: recorder_lib.IpcReplay(),
+            recorder_lib.KIND_LINK: lambda payload, _: self._on_link_change(payload == b"\x01"),
+            recorder_lib.KIND_GPIO: self._replay_gpio,
+        })
+        log.info("Replaying %s at speed %s", REPLAY_FILE, REPLAY_SPEED or "max")
+        result = await replayer.run()
+        log.info("Replay finished: %s", result)
+
+    def _replay_gpio(self, payload, offset_ns):
+        if button_lib.INPUTS is not None:
+            button_lib.INPUTS.inject_edge(*recorder_lib.decode_gpio(payload))
+
+    # -------- Device operations --------
+    def _create_operation_queue(self):
+        operations = operation_lib.OperationQueue(self._run_blocking, self._device_lock)
+        operations.register("factory_reset", self._op_factory_reset)
+        operations.register("restart_wifi", self._op_restart_wifi)
+        operations.register("configure_wifi", self._op_configure_wifi)
+        operations.register("switch_to_ap", self._op_switch_to_ap)
+        operations.register("switch_to_sta", self._op_switch_to_sta)
+        return operations
+
+    def _op_factory_reset(self, op):
+        log.warning("!!! STARTING FACTORY RESET !!!")
+        op.report(0.1, "Clearing WiFi configuration")
+        wifi_config_lib.reset_wifi_config()
+        op.check_cancelled()
+
+        op.report(0.3, "Stopping WiFi services")
+        self.wifi_manager.cleanup_wifi()
+        op.report(1.0, "Reset complete. WiFi disconnected and config cleared")
 
-    # -------- Application Thread --------
-    def start_ipc_thread(self):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(ipc_server_task())
+    def _op_restart_wifi(self, op):
+        op.report(0.1, "Restarting WiFi")
+        # Back to the STA baseline; the main loop reconnects or falls back to AP
+        self.wifi_manager.cleanup_wifi()
+        op.report(1.0, "WiFi restarted")
+
+    def _op_configure_wifi(self, op, ssid: str, password: str = ""):
+        op.report(0.2, f"Saving WiFi '{ssid}'")
+        wifi_config_lib.configure_wifi(ssid, password)
+        op.report(1.0, f"WiFi '{ssid}' saved")
+
+    def _op_switch_to_ap(self, op):
+        op.report(0.1, "Switching to AP mode")
+        self.wifi_manager.switch_to_ap()
+        op.check_cancelled()
+        op.report(0.8, "Starting provisioning webserver")
+        self.provision_webserver_manager.start()
+        op.report(1.0, "AP mode enabled")
+
+    def _op_switch_to_sta(self, op):
+        op.report(0.1, "Switching to STA mode")
+        self.provision_webserver_manager.stop()
+        op.check_cancelled()
+        self.wifi_manager.switch_to_sta()
+        op.report(1.0, "STA mode enabled")
 
     # -------- Subsystems --------
     def _init_sensor_subsystem(self):
@@ -288,8 +786,69 @@ class LsmyApplication:
 
     def _init_ai_subsystem(self):
         log.info("Initializing AI subsystem")
-        pass
+
+        try:
+            # One session per worker, each warmed up on that worker's first inference
+            self._models = model_registry_lib.ModelRegistry(
+                workers=CONFIG.app.executor_workers, run_blocking=self._run_blocking,
+            )
+            self._models.load_all()
+            ipc_lib.set_model_registry(self._models)
+
+            # Detector on every Nth frame, the tracker fills the frames in between
+            self._people = tracker_lib.PeopleCounter(self._detect_people)
+            # Cheap face detector + tracked ROIs, the landmark model only on changed faces
+            self._fatigue = fatigue_lib.FatigueMonitor(self._detect_faces, self._face_landmarks)
+        except ImportError as e:
+            log.warning("AI models, people counting and fatigue detection unavailable: %s", e)
+            return
+        ipc_lib.set_people_counter(self._people)
+        ipc_lib.set_fatigue_monitor(self._fatigue)
+
+    def _capture_frame(self):
+        """
+        Placeholder for camera capture: next frame, or None without a camera.
+        """
+        return None
+
+    def _detect_people(self, frame):
+        """
+        Placeholder for the person detector: (N, 4) boxes x1, y1, x2, y2
+        in frame fractions.
+        """
+        return tracker_lib.NO_DETECTIONS
+
+    def _detect_faces(self, small_frame):
+        """
+        Placeholder for the low-resolution face detector: (N, 4) boxes
+        x1, y1, x2, y2 in frame fractions.
+        """
+        return tracker_lib.NO_DETECTIONS
+
+    def _face_landmarks(self, crop):
+        """
+        Placeholder for the landmark / eye-state model on a face crop.
+        """
+        return {"eyes_closed": 0.0, "yaw": 0.0}
 
     def _init_communication_subsystem(self):
         log.info("Initializing communication subsystem")
-        pass
+
+        # Construct the network managers now rather than on the first main loop cycle
+        self.wifi_manager
+        self.wifi_config_manager
+        self.provision_webserver_manager
+
+    def _init_relay_subsystem(self):
+        log.info("Initializing relay subsystem")
+
+        # This process owns the relay lines: telemetry rules and manual
+        # commands (forwarded by the web backend over IPC) share one scheduler
+        try:
+            self._relay_scheduler = relay_rules_lib.load_relay_rules(run_blocking=self._run_blocking)
+        except Exception:
+            log.exception("Invalid relay rules, falling back to manual relay control")
+            self._relay_scheduler = relay_rules_lib.RelayScheduler(
+                relay_rules_lib.RelayController(), run_blocking=self._run_blocking)
+
+        ipc_lib.set_relay_scheduler(self._relay_scheduler)
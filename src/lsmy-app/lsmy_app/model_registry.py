@@ -0,0 +1,376 @@
+# =============================================================================
+#  LSMY Model Registry
+# -----------------------------------------------------------------------------
+#  Package     : lsmy_app
+#  Role        : AI model loading and runtime sessions
+#
+#  Responsibilities:
+#   - Read model files ahead into the page cache the runtimes map from
+#   - Create interpreter / session objects once per worker, sized threads
+#   - Warm up each worker's session as it is created, off real frames
+#   - Report load time, memory and first-inference latency per model
+#   - Swap a model for a new file without restarting the application
+# =============================================================================
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from pathlib import Path
+
+import numpy as np
+
+# ====== METRICS LIBRARY ======
+from lsmy_python_lib.metrics import METRICS
+
+# ====== CONFIG LIBRARY ======
+from lsmy_python_lib.config import CONFIG
+
+log = logging.getLogger("model-registry")
+
+MODEL_DIR = CONFIG.models.dir
+INFERENCE_THREADS = CONFIG.models.inference_threads     # Runtime threads per session, 0: cores / workers
+WARMUP_RUNS = 2                 # First run (allocation, kernel selection) + one steady-state run
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def _memory() -> tuple:
+    """
+    (resident bytes, file-backed resident bytes) of this process.
+    """
+    with open("/proc/self/statm") as f:
+        fields = f.read().split()
+    return int(fields[1]) * PAGE_SIZE, int(fields[2]) * PAGE_SIZE
+
+
+# -------------------------
+# Runtimes
+# -------------------------
+class TFLiteRuntime:
+    """
+    TensorFlow Lite interpreter (tflite_runtime, ai_edge_litert or
+    tensorflow). Opened by path, it maps the model file read-only, so
+    every interpreter (and process) reads the weights from the same page
+    cache pages; model_content would need a private bytes copy each.
+    Interpreters are not thread-safe: one per worker thread.
+    """
+
+    name = "tflite"
+    thread_safe = False
+
+    @staticmethod
+    def create(path: str, threads: int):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            try:
+                from ai_edge_litert.interpreter import Interpreter
+            except ImportError:
+                from tensorflow.lite import Interpreter
+        interpreter = Interpreter(model_path=path, num_threads=threads)
+        interpreter.allocate_tensors()
+        return interpreter
+
+    @staticmethod
+    def input_specs(session) -> list:
+        return [(tuple(d["shape"]), d["dtype"]) for d in session.get_input_details()]
+
+    @staticmethod
+    def run(session, inputs: list) -> list:
+        for detail, value in zip(session.get_input_details(), inputs):
+            session.set_tensor(detail["index"], value)
+        session.invoke()
+        return [session.get_tensor(d["index"]) for d in session.get_output_details()]
+
+
+class OnnxRuntime:
+    """
+    ONNX Runtime session on the CPU provider. Sessions are thread-safe:
+    one per process, shared by the workers. ONNX Runtime reads the file
+    by path and copies the weights into its own arena, so only the page
+    cache is shared between processes.
+    """
+
+    name = "onnx"
+    thread_safe = True
+
+    _DTYPES = {
+        "tensor(float)": np.float32,
+        "tensor(float16)": np.float16,
+        "tensor(double)": np.float64,
+        "tensor(uint8)": np.uint8,
+        "tensor(int8)": np.int8,
+        "tensor(int32)": np.int32,
+        "tensor(int64)": np.int64,
+        "tensor(bool)": np.bool_,
+    }
+
+    @staticmethod
+    def create(path: str, threads: int):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    @classmethod
+    def input_specs(cls, session) -> list:
+        # Dynamic dimensions (batch, ...) are warmed up with 1
+        return [
+            (tuple(d if isinstance(d, int) else 1 for d in i.shape), cls._DTYPES.get(i.type, np.float32))
+            for i in session.get_inputs()
+        ]
+
+    @staticmethod
+    def run(session, inputs: list) -> list:
+        names = [i.name for i in session.get_inputs()]
+        return session.run(None, dict(zip(names, inputs)))
+
+
+RUNTIMES = {
+    ".tflite": TFLiteRuntime,
+    ".onnx": OnnxRuntime,
+    ".ort": OnnxRuntime,
+}
+
+
+# -------------------------
+# Models
+# -------------------------
+class ModelFile:
+    """
+    Identity of a loaded model file (inode, size, mtime), which is how a
+    new file is told apart from the one loaded. The file is read ahead
+    into the page cache, so the runtime's own mapping of it does not
+    fault every page in from storage.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self.identity = (st.st_ino, st.st_size, st.st_mtime_ns)
+            self.size = st.st_size
+            if st.st_size and hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+
+    def changed(self) -> bool:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        return (st.st_ino, st.st_size, st.st_mtime_ns) != self.identity
+
+
+class Model:
+    """
+    One loaded version of a model. Sessions are created per worker (or
+    once, for thread-safe runtimes), warmed up as they are created, and
+    live as long as this version; a reload creates a new Model, in-flight
+    calls finish on the old one.
+    """
+
+    def __init__(self, name: str, path: str, runtime, threads: int, version: int):
+        self.name = name
+        self.path = path
+        self.runtime = runtime
+        self.threads = threads
+        self.version = version
+        self._local = threading.local()
+        self._shared = None
+        self._lock = threading.Lock()
+        self.sessions = 1
+
+        rss_before, shared_before = _memory()
+        start = time.perf_counter()
+        self.file = ModelFile(path)
+        session = runtime.create(path, threads)
+        self.input_specs = runtime.input_specs(session)
+        load_seconds = time.perf_counter() - start
+        rss_after, shared_after = _memory()
+        # The loading thread keeps the first session
+        if runtime.thread_safe:
+            self._shared = session
+        else:
+            self._local.session = session
+
+        self.stats = {
+            "runtime": runtime.name,
+            "path": path,
+            "version": version,
+            "file_bytes": self.file.size,
+            "threads": threads,
+            "load_seconds": round(load_seconds, 4),
+            # Approximate while other threads allocate (parallel init)
+            "rss_bytes": rss_after - rss_before,
+            "shared_bytes": shared_after - shared_before,
+            "loaded_at": round(time.time(), 3),
+        }
+        first, warm = self._warm_up(session)
+        self.stats["first_inference_seconds"] = first
+        self.stats["warm_inference_seconds"] = warm
+
+    def session(self):
+        """
+        Session of the calling thread (the shared one for thread-safe
+        runtimes), created and warmed up on first use.
+        """
+        if self.runtime.thread_safe:
+            return self._shared
+
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self.runtime.create(self.path, self.threads)
+            self._warm_up(session)
+            self._local.session = session
+            with self._lock:
+                self.sessions += 1
+        return session
+
+    def run(self, inputs: list) -> list:
+        return self.runtime.run(self.session(), inputs)
+
+    def _warm_up(self, session, runs: int = WARMUP_RUNS) -> tuple:
+        """
+        Run zero inputs through a new session so the first real inference
+        does not pay for allocation and kernel selection.
+
+        :return: (first, last) run time in seconds
+        """
+        inputs = [np.zeros(shape, dtype=dtype) for shape, dtype in self.input_specs]
+        seconds = []
+        for _ in range(max(1, runs)):
+            start = time.perf_counter()
+            self.runtime.run(session, inputs)
+            seconds.append(round(time.perf_counter() - start, 5))
+        return seconds[0], seconds[-1]
+
+
+class ModelRegistry:
+    """
+    Models by name (file stem of each .tflite / .onnx / .ort file in
+    `model_dir`), loaded once and shared by the workers. The loading
+    thread's session is warmed up with the model; every other worker
+    builds and warms its own on its first inference. Nothing is pushed
+    onto the worker pool ahead of time, so a (re)load never holds pool
+    threads that relay actuation and operations need.
+
+    :param model_dir: Directory scanned by load_all() / refresh()
+    :param workers: Threads that may run inference concurrently; runtime
+                    thread pools are sized so they do not oversubscribe
+                    the cores ([models] inference_threads overrides)
+    :param run_blocking: Coroutine function running a blocking call on
+                         the worker pool (IPC reloads)
+    """
+
+    def __init__(self, model_dir: str = MODEL_DIR, workers: int = 1, run_blocking=None):
+        self.model_dir = Path(model_dir)
+        self.workers = max(1, workers)
+        self.threads = INFERENCE_THREADS or max(1, (os.cpu_count() or 1) // self.workers)
+        self.run_blocking = run_blocking
+        self._models = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def discover(self) -> dict:
+        if not self.model_dir.is_dir():
+            return {}
+        return {
+            path.stem: str(path)
+            for path in sorted(self.model_dir.iterdir())
+            if path.suffix in RUNTIMES and path.is_file()
+        }
+
+    def load_all(self):
+        found = self.discover()
+        if not found:
+            log.info("No models in %s", self.model_dir)
+        for name, path in found.items():
+            try:
+                self.load(name, path)
+            except Exception:
+                log.exception("Failed to load model %s from %s", name, path)
+
+    def load(self, name: str, path: str = None) -> Model:
+        """
+        Load (or reload) a model and warm it up, then make it current.
+        The previous version keeps serving until the new one is ready.
+        """
+        with self._load_lock:
+            current = self._models.get(name)
+            path = path or (current.path if current else self.discover().get(name))
+            if path is None:
+                raise ValueError(f"Unknown model: {name}")
+            runtime = RUNTIMES.get(Path(path).suffix)
+            if runtime is None:
+                raise ValueError(f"Unsupported model format: {path}")
+
+            model = Model(name, path, runtime, self.threads, current.version + 1 if current else 1)
+            with self._lock:
+                self._models[name] = model
+
+        stats = model.stats
+        labels = {"model": name}
+        METRICS.gauge("lsmy_model_load_seconds", "Model load time", labels).set(stats["load_seconds"])
+        METRICS.gauge("lsmy_model_rss_bytes", "Resident memory added by loading the model", labels).set(stats["rss_bytes"])
+        METRICS.gauge("lsmy_model_first_inference_seconds", "Warm-up (first) inference latency", labels).set(
+            stats["first_inference_seconds"])
+        log.info("Model %s v%d (%s, %.1f MB) loaded in %.0f ms, first inference %.1f ms, warm %.1f ms",
+                 name, model.version, runtime.name, stats["file_bytes"] / 1e6, stats["load_seconds"] * 1000,
+                 stats["first_inference_seconds"] * 1000, stats["warm_inference_seconds"] * 1000)
+        return model
+
+    def get(self, name: str) -> Model:
+        with self._lock:
+            return self._models[name]
+
+    def run(self, name: str, inputs: list) -> list:
+        return self.get(name).run(inputs)
+
+    def refresh(self) -> list:
+        """
+        Load model files that appeared or were replaced (write the new
+        file next to the old one and rename it over it).
+
+        :return: Names of the models (re)loaded
+        """
+        with self._lock:
+            current = dict(self._models)
+        reloaded = []
+        for name, path in self.discover().items():
+            model = current.get(name)
+            if model is not None and model.path == path and not model.file.changed():
+                continue
+            try:
+                self.load(name, path)
+                reloaded.append(name)
+            except Exception:
+                log.exception("Failed to reload model %s from %s", name, path)
+        return reloaded
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: dict(model.stats, sessions=model.sessions) for name, model in self._models.items()}
+
+    async def handle(self, req: dict) -> dict:
+        """
+        IPC commands: get_models, reload_model {"name", "path"}.
+        """
+        if req.get("cmd") == "reload_model":
+            name = req.get("name")
+            if not name:
+                return {"status": "error", "error": "Missing model name"}
+            try:
+                if self.run_blocking is not None:
+                    model = await self.run_blocking(self.load, name, req.get("path"))
+                else:
+                    model = await asyncio.to_thread(self.load, name, req.get("path"))
+            except Exception as e:
+                return {"status": "error", "error": str(e)}
+            return {"status": "ok", "data": dict(model.stats, sessions=model.sessions)}
+        return {"status": "ok", "data": self.snapshot()}
@@ -0,0 +1,117 @@
+#!/usr/bin/python3
+"""
+Native vs Python benchmark for lsmy_python_lib.accel.
+
+Checks that liblsmy_accel and the Python fallback return identical
+results, then times both on typical Modbus / telemetry workloads.
+
+    LSMY_ACCEL_LIB=build/liblsmy_accel.so.1 python3 -m lsmy_bench.accel
+"""
+
+import sys
+import json
+import random
+import struct
+import timeit
+import logging
+import argparse
+from array import array
+
+from lsmy_bench.common import setup_source_paths, save_baseline, compare_to_baseline, log
+
+setup_source_paths()
+
+from lsmy_python_lib import accel
+
+BENCH_NAME = "accel"
+
+
+def _workloads(seed: int):
+    rng = random.Random(seed)
+    frame = bytes(rng.randrange(256) for _ in range(256))
+    registers = struct.pack(">250f", *[rng.uniform(-100.0, 100.0) for _ in range(250)])
+    series = array("d", (rng.gauss(25.0, 2.0) for _ in range(4096)))
+
+    return {
+        "crc16_256B": (lambda: accel.crc16_modbus(frame), lambda: accel.crc16_modbus_py(frame)),
+        "decode_250f": (
+            lambda: accel.decode_float_block_native(registers),
+            lambda: accel.decode_float_block(registers),
+        ),
+        "decode_250f_swap": (
+            lambda: accel.decode_float_block_native(registers, word_swap=True),
+            lambda: accel.decode_float_block(registers, word_swap=True),
+        ),
+        "rolling_4096x60": (lambda: accel.rolling_stats(series, 60), lambda: accel.rolling_stats_py(series, 60)),
+    }
+
+
+def _same(a, b) -> bool:
+    # Compare raw bytes so NaN payloads from swapped words count as equal
+    if isinstance(a, tuple):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    if isinstance(a, array):
+        return a.tobytes() == b.tobytes()
+    return a == b
+
+
+def _time(func, repeat: int) -> float:
+    number = max(1, int(0.05 / max(timeit.timeit(func, number=1), 1e-7)))
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="timeit repeats (best is kept)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs baseline")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero on regression vs baseline")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    if not accel.native_available():
+        log.error("Native library not found at %s (set LSMY_ACCEL_LIB)", accel.ACCEL_LIB_PATH)
+        return 1
+
+    results = {}
+    mismatches = []
+    for name, (native, python) in _workloads(args.seed).items():
+        if not _same(native(), python()):
+            mismatches.append(name)
+
+        native_s = _time(native, args.repeat)
+        python_s = _time(python, args.repeat)
+        results[name] = {
+            "native_us": native_s * 1e6,
+            "python_us": python_s * 1e6,
+            "speedup": python_s / native_s if native_s else 0.0,
+        }
+
+    result = {
+        "bench": BENCH_NAME,
+        "results": results,
+        "mismatches": mismatches,
+        "metrics": {f"{name}_native_us": r["native_us"] for name, r in results.items()},
+    }
+    print(json.dumps(result, indent=2))
+
+    if mismatches:
+        log.error("Native and Python results differ for: %s", ", ".join(mismatches))
+        return 1
+
+    if args.save_baseline:
+        save_baseline(BENCH_NAME, result)
+
+    if args.check:
+        regressions = compare_to_baseline(BENCH_NAME, result["metrics"], args.tolerance)
+        for line in regressions:
+            log.error("Regression: %s", line)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
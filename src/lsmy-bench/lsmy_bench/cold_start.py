@@ -0,0 +1,115 @@
+#!/usr/bin/python3
+"""
+Cold-start regression benchmark.
+
+Spawns the run-lsmy entrypoint as a fresh process inside a FakeSystem
+sandbox (fake nmcli / wpa / systemctl on PATH, fake GPIO, like the
+harness scenarios) and measures the time until the IPC server accepts
+the first send_telemetry request (time-to-first-telemetry), then the
+time until the process exits after SIGTERM.
+
+    python3 -m lsmy_bench.cold_start --runs 10 --save-baseline
+    python3 -m lsmy_bench.cold_start --runs 10 --check
+"""
+
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+
+from lsmy_bench.common import setup_source_paths, summarize, save_baseline, compare_to_baseline, log
+
+setup_source_paths()
+
+from lsmy_bench.fake_system import FakeSystem
+from lsmy_bench.harness import LsmyProcess
+
+BENCH_NAME = "cold_start"
+
+
+async def _try_send_telemetry(sock: str) -> bool:
+    try:
+        reader, writer = await asyncio.open_unix_connection(sock)
+    except (FileNotFoundError, ConnectionRefusedError):
+        return False
+
+    try:
+        writer.write(b'{"cmd": "send_telemetry", "temperature": 25.0}\n')
+        await writer.drain()
+        resp = await reader.readline()
+        return bool(resp) and json.loads(resp).get("status") == "ok"
+    finally:
+        writer.close()
+
+
+async def _measure_once(timeout: float, verbose: bool) -> dict:
+    fake = FakeSystem()
+    fake.write_wifi_config(fake.read_state()["ssid"], "password")
+    sock = str(fake.sock)
+    app = None
+    try:
+        start = time.perf_counter()
+        app = LsmyProcess("app", fake, verbose=verbose)
+
+        ttft = None
+        while time.perf_counter() - start < timeout:
+            if not app.alive():
+                raise RuntimeError(f"Entrypoint exited early with code {app.proc.returncode}")
+            if await _try_send_telemetry(sock):
+                ttft = time.perf_counter() - start
+                break
+            await asyncio.sleep(0.002)
+
+        if ttft is None:
+            raise RuntimeError(f"No telemetry accepted within {timeout}s")
+
+        shutdown = app.stop(timeout)
+    finally:
+        if app is not None:
+            app.stop()
+        fake.cleanup()
+
+    return {"ttft": ttft, "shutdown": shutdown}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Number of cold starts")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-run timeout (seconds)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero on regression vs baseline")
+    parser.add_argument("--verbose", action="store_true", help="Show entrypoint output")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    runs = [asyncio.run(_measure_once(args.timeout, args.verbose)) for _ in range(args.runs)]
+
+    ttft = summarize([r["ttft"] for r in runs])
+    shutdown = summarize([r["shutdown"] for r in runs])
+    result = {
+        "bench": BENCH_NAME,
+        "runs": args.runs,
+        "ttft": ttft,
+        "shutdown": shutdown,
+        "metrics": {"ttft_p50": ttft["p50"], "ttft_p90": ttft["p90"], "shutdown_p50": shutdown["p50"]},
+    }
+    print(json.dumps(result, indent=2))
+
+    if args.save_baseline:
+        save_baseline(BENCH_NAME, result)
+
+    if args.check:
+        regressions = compare_to_baseline(BENCH_NAME, result["metrics"], args.tolerance)
+        for line in regressions:
+            log.error("Regression: %s", line)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import os
+import sys
+import json
+import math
+import logging
+from pathlib import Path
+
+log = logging.getLogger("lsmy-bench")
+
+# src/ directory of the repository
+SRC_DIR = Path(__file__).resolve().parents[2]
+
+BASELINE_DIR = Path(os.environ.get("LSMY_BENCH_BASELINES", SRC_DIR / "lsmy-bench" / "baselines"))
+
+# Package roots used when running from a source checkout
+SOURCE_PATHS = [
+    SRC_DIR / "lsmy-python-lib",
+    SRC_DIR / "lsmy-app",
+    SRC_DIR / "lsmy-webserver",
+    SRC_DIR / "lsmy-bench",
+]
+
+
+def setup_source_paths():
+    """
+    Make the in-tree packages importable (no-op on an installed image).
+    """
+    for path in reversed(SOURCE_PATHS):
+        if path.is_dir() and str(path) not in sys.path:
+            sys.path.insert(0, str(path))
+
+
+def child_env(extra: dict = None) -> dict:
+    """
+    Environment for child processes that must import the in-tree packages.
+    """
+    env = dict(os.environ)
+    paths = [str(p) for p in SOURCE_PATHS if p.is_dir()]
+    if env.get("PYTHONPATH"):
+        paths.append(env["PYTHONPATH"])
+    env["PYTHONPATH"] = os.pathsep.join(paths)
+    if extra:
+        env.update(extra)
+    return env
+
+
+def percentile(values, pct: float) -> float:
+    """
+    Nearest-rank percentile, 0 for an empty list.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(values) -> dict:
+    return {
+        "count": len(values),
+        "min": min(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p99": percentile(values, 99),
+        "p999": percentile(values, 99.9),
+        "max": max(values) if values else 0.0,
+    }
+
+
+def save_baseline(name: str, result: dict) -> Path:
+    BASELINE_DIR.mkdir(parents=True, exist_ok=True)
+    path = BASELINE_DIR / f"{name}.json"
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+    log.info("Baseline saved to %s", path)
+    return path
+
+
+def load_baseline(name: str):
+    path = BASELINE_DIR / f"{name}.json"
+    if not path.exists():
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def compare_to_baseline(name: str, metrics: dict, tolerance: float) -> list:
+    """
+    Compare lower-is-better metrics against the saved baseline.
+
+    :param metrics: Metric name -> current value
+    :param tolerance: Allowed relative slowdown (0.2 = 20 %)
+    :return: List of regression descriptions (empty if none)
+    """
+    baseline = load_baseline(name)
+    if baseline is None:
+        log.warning("No baseline for %s, nothing to compare", name)
+        return []
+
+    regressions = []
+    for key, value in metrics.items():
+        reference = baseline.get("metrics", {}).get(key)
+        if reference is None or reference <= 0:
+            continue
+        if value > reference * (1.0 + tolerance):
+            regressions.append(
+                f"{key}: {value:.4g} vs baseline {reference:.4g} (+{(value / reference - 1) * 100:.0f}%)"
+            )
+    return regressions
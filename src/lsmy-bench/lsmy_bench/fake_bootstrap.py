@@ -0,0 +1,63 @@
+#!/usr/bin/python3
+"""
+Start an LSMY process inside a FakeSystem sandbox.
+
+    python3 -m lsmy_bench.fake_bootstrap app       # run-lsmy
+    python3 -m lsmy_bench.fake_bootstrap backend   # provision-web-backend
+
+Replaces periphery with lsmy_bench.fake_periphery and counts every
+process spawn in the lsmy_process_spawns_total metric (readable through
+the get_metrics IPC command). Everything else is the production code.
+"""
+
+import os
+import sys
+import runpy
+import subprocess
+
+from lsmy_bench.common import SRC_DIR, setup_source_paths
+
+ENTRYPOINTS = {
+    "app": SRC_DIR / "run-lsmy" / "run-lsmy.py",
+    "backend": SRC_DIR / "lsmy-webserver-service" / "provision-web-backend.py",
+}
+
+
+def install_fakes():
+    setup_source_paths()
+
+    from lsmy_bench import fake_periphery
+    sys.modules["periphery"] = fake_periphery
+
+    from lsmy_python_lib.metrics import METRICS
+    spawns = METRICS.counter("lsmy_process_spawns_total", "Child processes started")
+
+    original = subprocess.Popen._execute_child
+
+    def counting_execute_child(self, *args, **kwargs):
+        spawns.inc()
+        return original(self, *args, **kwargs)
+
+    subprocess.Popen._execute_child = counting_execute_child
+
+
+def main() -> int:
+    if len(sys.argv) < 2 or sys.argv[1] not in ENTRYPOINTS:
+        sys.stderr.write(f"usage: fake_bootstrap {{{'|'.join(ENTRYPOINTS)}}}\n")
+        return 2
+
+    target = sys.argv[1]
+    install_fakes()
+
+    interval = os.environ.get("LSMY_FAKE_LOOP_INTERVAL")
+    if target == "app" and interval:
+        # Read when the configuration module is imported
+        os.environ["LSMY_MAIN_LOOP_INTERVAL"] = interval
+
+    sys.argv = [str(ENTRYPOINTS[target])]
+    runpy.run_path(str(ENTRYPOINTS[target]), run_name="__main__")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+"""
+Scriptable stand-ins for the system tools LSMY calls (iw, ip, wpa_cli,
+systemctl, udhcpc, arping).
+
+FakeSystem installs one copy of this file as bin/fakecmd plus a symlink
+per tool name; the tool name is taken from argv[0]. Every fake reads and
+updates a shared JSON state file (LSMY_FAKE_STATE) under flock and
+appends its argv to LSMY_FAKE_LOG, so scenarios can drive the radio /
+service state and count process spawns.
+
+Stdlib only: the script runs with `python3 -S` for fast start-up.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import fcntl
+
+TOOLS = ("iw", "ip", "wpa_cli", "systemctl", "udhcpc", "arping")
+
+DEFAULT_STATE = {
+    "iface": "wlan0",
+    "services": {"systemd-networkd": True},
+    "ap_available": True,       # a known network is in range
+    "assoc_delay": 0.5,         # seconds from wpa_supplicant start to COMPLETED
+    "dhcp_delay": 0.05,         # seconds udhcpc takes to get a lease
+    "dhcp_reboot_delay": 0.02,  # same when re-requesting the current lease address (-r)
+    "wpa_started_at": None,
+    "ip": None,
+    "lease_ip": "192.168.50.20",
+    "gateway": "192.168.50.1",
+    "ssid": "lab-ap",
+    "bssid": "02:00:00:00:01:00",
+    "signal": -52,
+    "aps": [],                  # multi-AP lab: [{"ssid", "bssid", "signal", "assoc_delay"}], overrides the above
+    "selected": None,           # SSID forced with wpa_cli select_network
+    "latency": {},              # tool -> extra seconds per call
+    "fail": {},                 # tool -> number of upcoming calls that fail
+}
+
+
+class State:
+    def __init__(self, path):
+        self.path = path
+        self.data = None
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        raw = os.read(self._fd, 1 << 20)
+        self.data = json.loads(raw) if raw else dict(DEFAULT_STATE)
+        return self.data
+
+    def __exit__(self, *exc):
+        encoded = json.dumps(self.data).encode()
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.ftruncate(self._fd, 0)
+        os.write(self._fd, encoded)
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        return False
+
+
+def _known_ssids() -> list:
+    # Networks in the wpa_supplicant.conf the application writes, in order
+    path = os.environ.get("LSMY_WPA_CONF")
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        return re.findall(r'ssid\s*=\s*"([^"]*)"', f.read())
+
+
+def _visible_aps(state) -> list:
+    if not state["ap_available"]:
+        return []
+    if state["aps"]:
+        return state["aps"]
+    return [{"ssid": state["ssid"], "bssid": state["bssid"], "signal": state["signal"]}]
+
+
+def _target_ap(state):
+    """
+    AP wpa_supplicant is associating with: the selected network, else the
+    first known network in scan order (like a naive supplicant would).
+    """
+    visible = _visible_aps(state)
+    wanted = [state["selected"]] if state["selected"] else _known_ssids()
+    for ssid in wanted:
+        matches = [ap for ap in visible if ap["ssid"] == ssid]
+        if matches:
+            return max(matches, key=lambda ap: ap["signal"])
+    if not state["aps"] and not _known_ssids() and visible:
+        # Single-AP default state without a config file: always associate
+        return visible[0]
+    return None
+
+
+def _associated(state) -> bool:
+    services = state["services"]
+    if services.get("hostapd") or not services.get("wpa_supplicant"):
+        return False
+    if state["wpa_started_at"] is None:
+        return False
+    ap = _target_ap(state)
+    if ap is None:
+        return False
+    delay = ap.get("assoc_delay", state["assoc_delay"])
+    return time.time() - state["wpa_started_at"] >= delay
+
+
+def _refresh(state):
+    # A lost association drops the address
+    if not _associated(state):
+        state["ip"] = None
+
+
+def cmd_iw(state, args):
+    # iw dev <iface> info|link|scan
+    if len(args) < 3 or args[0] != "dev" or args[1] != state["iface"]:
+        return 1, "", "command failed: No such device (-19)\n"
+
+    if args[2] == "info":
+        kind = "AP" if state["services"].get("hostapd") else "managed"
+        return 0, f"Interface {state['iface']}\n\tifindex 3\n\ttype {kind}\n", ""
+    if args[2] == "link":
+        if not _associated(state):
+            return 0, "Not connected.\n", ""
+        ap = _target_ap(state)
+        return 0, (
+            f"Connected to {ap['bssid']} (on {state['iface']})\n"
+            f"\tSSID: {ap['ssid']}\n\tfreq: 2437\n\tsignal: {ap['signal']} dBm\n"
+        ), ""
+    if args[2] == "scan":
+        out = ""
+        for ap in _visible_aps(state):
+            out += (
+                f"BSS {ap['bssid']}(on {state['iface']})\n"
+                f"\tfreq: 2437\n\tsignal: {ap['signal']}.00 dBm\n\tSSID: {ap['ssid']}\n"
+            )
+        return 0, out, ""
+    return 1, "", "unknown iw command\n"
+
+
+def cmd_ip(state, args):
+    iface = state["iface"]
+    if args[:2] == ["link", "show"]:
+        return (0, f"3: {iface}: <BROADCAST,MULTICAST,UP> mtu 1500\n", "") if args[2:3] == [iface] else (1, "", "")
+    if args[:3] == ["-4", "addr", "show"]:
+        if state["ip"]:
+            return 0, f"3: {iface}: <UP>\n    inet {state['ip']}/24 brd 192.168.50.255 scope global {iface}\n", ""
+        return 0, f"3: {iface}: <UP>\n", ""
+    if args[:3] == ["route", "show", "default"]:
+        if state["ip"]:
+            return 0, f"default via {state['gateway']} dev {iface}\n", ""
+        return 0, "", ""
+    return 0, "", ""
+
+
+def cmd_wpa_cli(state, args):
+    # wpa_cli [-i <iface>] <command> [args]
+    if args[:1] == ["-i"]:
+        args = args[2:]
+    command, params = (args[0], args[1:]) if args else ("", [])
+    running = state["services"].get("wpa_supplicant")
+
+    if command == "status":
+        if _associated(state):
+            ap = _target_ap(state)
+            return 0, f"bssid={ap['bssid']}\nssid={ap['ssid']}\nwpa_state=COMPLETED\n", ""
+        if running:
+            return 0, "wpa_state=SCANNING\n", ""
+        return 1, "", "Failed to connect to non-global ctrl_ifname\n"
+
+    if not running:
+        return 1, "", "Failed to connect to non-global ctrl_ifname\n"
+
+    if command == "list_networks":
+        current = _target_ap(state) if _associated(state) else None
+        out = "network id / ssid / bssid / flags\n"
+        for i, ssid in enumerate(_known_ssids()):
+            flag = "[CURRENT]" if current and current["ssid"] == ssid else ""
+            out += f"{i}\t{ssid}\tany\t{flag}\n"
+        return 0, out, ""
+    if command == "select_network":
+        known = _known_ssids()
+        try:
+            state["selected"] = known[int(params[0])]
+        except (IndexError, ValueError):
+            return 0, "FAIL\n", ""
+        # Re-association starts now
+        state["wpa_started_at"] = time.time()
+        state["ip"] = None
+        return 0, "OK\n", ""
+    if command == "scan_results":
+        out = "bssid / frequency / signal level / flags / ssid\n"
+        for ap in _visible_aps(state):
+            out += f"{ap['bssid']}\t2437\t{ap['signal']}\t[WPA2-PSK-CCMP][ESS]\t{ap['ssid']}\n"
+        return 0, out, ""
+    return 0, "OK\n", ""
+
+
+def cmd_systemctl(state, args):
+    if len(args) < 2:
+        return 1, "", "usage\n"
+    action, unit = args[0], args[1].replace(".service", "")
+    services = state["services"]
+
+    if action == "is-active":
+        active = services.get(unit, False)
+        return (0 if active else 3), ("active\n" if active else "inactive\n"), ""
+    if action in ("start", "restart"):
+        services[unit] = True
+        if unit == "wpa_supplicant":
+            state["wpa_started_at"] = time.time()
+        if unit == "systemd-networkd":
+            state["ip"] = None
+        return 0, "", ""
+    if action == "stop":
+        services[unit] = False
+        if unit == "wpa_supplicant":
+            state["wpa_started_at"] = None
+            state["selected"] = None
+        return 0, "", ""
+    if action == "enable":
+        return 0, "", ""
+    return 1, "", f"Unknown command verb {action}.\n"
+
+
+def cmd_udhcpc(state, args):
+    requested = args[args.index("-r") + 1] if "-r" in args[:-1] else None
+    time.sleep(state["dhcp_reboot_delay"] if requested == state["lease_ip"] else state["dhcp_delay"])
+    if not _associated(state):
+        return 1, "", "udhcpc: no lease, failing\n"
+    state["ip"] = state["lease_ip"]
+    return 0, "", f"udhcpc: lease of {state['ip']} obtained from {state['gateway']}, lease time 3600\n"
+
+
+def cmd_arping(state, args):
+    # arping -q -c 1 -w <timeout> -I <iface> <address>: answered while
+    # associated with an address, like the real gateway
+    if not args or not _associated(state) or not state["ip"] or args[-1] != state["gateway"]:
+        return 1, "", ""
+    return 0, "", ""
+
+
+def _hex_addr(address: str) -> str:
+    # /proc/net/route stores IPv4 addresses as little-endian hex
+    return "".join(f"{int(part):02X}" for part in reversed(address.split(".")))
+
+
+def write_proc_net(state, directory):
+    """
+    Mirror the addressing state into route / arp files laid out like
+    /proc/net, for code that reads the kernel tables directly.
+    """
+    iface = state["iface"]
+    route = "Iface\tDestination\tGateway \tFlags\tRefCnt\tUse\tMetric\tMask\t\tMTU\tWindow\tIRTT\n"
+    arp = "IP address       HW type     Flags       HW address            Mask     Device\n"
+    if state["ip"]:
+        route += f"{iface}\t00000000\t{_hex_addr(state['gateway'])}\t0003\t0\t0\t600\t00000000\t0\t0\t0\n"
+        route += f"{iface}\t0032A8C0\t00000000\t0001\t0\t0\t600\t00FFFFFF\t0\t0\t0\n"
+        arp += f"{state['gateway']:<16} 0x1         0x2         02:00:00:00:01:ff     *        {iface}\n"
+    for name, content in (("route", route), ("arp", arp)):
+        tmp = os.path.join(directory, name + ".tmp")
+        with open(tmp, "w") as f:
+            f.write(content)
+        os.replace(tmp, os.path.join(directory, name))
+
+
+HANDLERS = {
+    "iw": cmd_iw,
+    "ip": cmd_ip,
+    "wpa_cli": cmd_wpa_cli,
+    "systemctl": cmd_systemctl,
+    "udhcpc": cmd_udhcpc,
+    "arping": cmd_arping,
+}
+
+
+def main() -> int:
+    tool = os.path.basename(sys.argv[0])
+    args = sys.argv[1:]
+
+    log_path = os.environ.get("LSMY_FAKE_LOG")
+    if log_path:
+        with open(log_path, "a") as f:
+            f.write(json.dumps({"t": time.time(), "argv": [tool] + args}) + "\n")
+
+    handler = HANDLERS.get(tool)
+    if handler is None:
+        sys.stderr.write(f"fakecmd: unknown tool {tool}\n")
+        return 127
+
+    with State(os.environ["LSMY_FAKE_STATE"]) as state:
+        delay = state["latency"].get(tool, 0)
+        if state["fail"].get(tool, 0) > 0:
+            state["fail"][tool] -= 1
+            code, out, err = 1, "", f"{tool}: injected failure\n"
+        else:
+            _refresh(state)
+            code, out, err = handler(state, args)
+        if os.environ.get("LSMY_PROC_NET"):
+            write_proc_net(state, os.environ["LSMY_PROC_NET"])
+
+    if delay:
+        time.sleep(delay)
+    sys.stdout.write(out)
+    sys.stderr.write(err)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
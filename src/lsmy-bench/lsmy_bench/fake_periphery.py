@@ -0,0 +1,116 @@
+"""
+In-process replacement for python-periphery's GPIO classes.
+
+Output pins write their value to <LSMY_FAKE_GPIO_DIR>/<pin>. Input pins
+read edges from a FIFO <LSMY_FAKE_GPIO_DIR>/<pin>.edges: writing "0" or
+"1" to it from a scenario produces an edge event the application sees
+through the fd, exactly like a sysfs value file.
+
+Installed by fake_bootstrap before any LSMY module is imported.
+"""
+
+import os
+import time
+import select
+from collections import namedtuple
+
+GPIO_DIR = os.environ.get("LSMY_FAKE_GPIO_DIR", "/tmp/lsmy-fake-gpio")
+
+EdgeEvent = namedtuple("EdgeEvent", ["edge", "timestamp"])
+
+
+class GPIOError(IOError):
+    pass
+
+
+class GPIO:
+    def __new__(cls, *args, **kwargs):
+        if cls is GPIO:
+            # Same dispatch as periphery: (path, line, direction) -> cdev
+            cls = CdevGPIO if len(args) == 3 else SysfsGPIO
+        return super().__new__(cls)
+
+    def __init__(self, *args):
+        if len(args) == 3:
+            self.devpath, line, direction = args
+        else:
+            line, direction = args
+            self.devpath = f"/sys/class/gpio/gpio{line}"
+
+        self.line = int(line)
+        self.direction = direction
+        self.edge = "none"
+        self._value = direction == "high"
+        self._path = os.path.join(GPIO_DIR, str(self.line))
+        self._fd = None
+
+        os.makedirs(GPIO_DIR, exist_ok=True)
+        if direction == "in":
+            fifo = self._path + ".edges"
+            if not os.path.exists(fifo):
+                os.mkfifo(fifo)
+            # O_RDWR keeps the FIFO open even with no writer
+            self._fd = os.open(fifo, os.O_RDWR | os.O_NONBLOCK)
+            self._value = True
+        else:
+            self._store()
+
+    @property
+    def fd(self):
+        return self._fd
+
+    def _store(self):
+        with open(self._path, "w") as f:
+            f.write("1" if self._value else "0")
+
+    def _drain(self):
+        edges = []
+        if self._fd is None:
+            return edges
+        try:
+            data = os.read(self._fd, 4096)
+        except BlockingIOError:
+            return edges
+        for ch in data.decode(errors="ignore"):
+            if ch in "01":
+                self._value = ch == "1"
+                edges.append(EdgeEvent("rising" if self._value else "falling", time.monotonic_ns()))
+        return edges
+
+    def read(self) -> bool:
+        self._drain()
+        return self._value
+
+    def write(self, value: bool):
+        self._value = bool(value)
+        self._store()
+
+    def poll(self, timeout=None) -> bool:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        return bool(ready)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class SysfsGPIO(GPIO):
+    pass
+
+
+class CdevGPIO(GPIO):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._pending = []
+
+    def poll(self, timeout=None) -> bool:
+        # Events already drained from the FIFO are still pending
+        return bool(self._pending) or super().poll(timeout)
+
+    def read_event(self):
+        if not self._pending:
+            self._pending = self._drain()
+        if not self._pending:
+            raise GPIOError("No event pending")
+        return self._pending.pop(0)
@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+from lsmy_bench import fake_commands
+from lsmy_bench.fake_commands import State, DEFAULT_STATE, TOOLS
+from lsmy_bench.common import child_env
+
+
+class FakeSystem:
+    """
+    Sandbox with fake system tools, fake GPIO, a private IPC socket and
+    private WiFi config paths. Processes started with env() see only the
+    sandbox; the harness drives it through update() / press_button().
+    """
+
+    def __init__(self, root: str = None, **state):
+        self.root = Path(root or tempfile.mkdtemp(prefix="lsmy-fake-"))
+        self.bin_dir = self.root / "bin"
+        self.gpio_dir = self.root / "gpio"
+        self.networkd_dir = self.root / "network"
+        self.proc_net = self.root / "proc_net"
+        self.state_path = self.root / "state.json"
+        self.log_path = self.root / "commands.log"
+        self.wpa_conf = self.root / "wpa_supplicant.conf"
+        self.sock = self.root / "provision.sock"
+
+        for path in (self.bin_dir, self.gpio_dir, self.networkd_dir, self.proc_net):
+            path.mkdir(parents=True, exist_ok=True)
+
+        self._install_tools()
+        self.reset(**state)
+
+    def _install_tools(self):
+        fakecmd = self.bin_dir / "fakecmd"
+        source = Path(fake_commands.__file__).read_text()
+        fakecmd.write_text(f"#!{sys.executable} -S\n" + source)
+        fakecmd.chmod(0o755)
+        for tool in TOOLS:
+            link = self.bin_dir / tool
+            if not link.exists():
+                link.symlink_to(fakecmd)
+
+    def reset(self, **state):
+        initial = json.loads(json.dumps(DEFAULT_STATE))
+        initial.update(state)
+        self.state_path.write_text(json.dumps(initial))
+        self.log_path.write_text("")
+        fake_commands.write_proc_net(initial, str(self.proc_net))
+
+    def update(self, **changes):
+        """
+        Atomically change the simulated world (e.g. ap_available=False).
+        """
+        with State(str(self.state_path)) as state:
+            for key, value in changes.items():
+                if isinstance(value, dict) and isinstance(state.get(key), dict):
+                    state[key].update(value)
+                else:
+                    state[key] = value
+            fake_commands.write_proc_net(state, str(self.proc_net))
+
+    def read_state(self) -> dict:
+        with State(str(self.state_path)) as state:
+            return json.loads(json.dumps(state))
+
+    def write_wifi_config(self, ssid: str, password: str = None):
+        self.write_wifi_networks([(ssid, password)])
+
+    def write_wifi_networks(self, networks):
+        """
+        :param networks: [(ssid, password or None)] in wpa_supplicant.conf order
+        """
+        lines = ["ctrl_interface=/var/run/wpa_supplicant", "update_config=1", ""]
+        for ssid, password in networks:
+            lines += ["network={", f'    ssid="{ssid}"']
+            lines += [f'    psk="{password}"'] if password else ["    key_mgmt=NONE"]
+            lines += ["}", ""]
+        self.wpa_conf.write_text("\n".join(lines))
+
+    def press_button(self, pin: int, pressed: bool):
+        """
+        Drive an input pin (active low, like the reset button).
+        """
+        fifo = self.gpio_dir / f"{pin}.edges"
+        fd = os.open(fifo, os.O_WRONLY | os.O_NONBLOCK)
+        try:
+            os.write(fd, b"0" if pressed else b"1")
+        finally:
+            os.close(fd)
+
+    def gpio_value(self, pin: int):
+        path = self.gpio_dir / str(pin)
+        return path.read_text() == "1" if path.exists() else None
+
+    def invocations(self, tool: str = None) -> list:
+        calls = []
+        with open(self.log_path, "r") as f:
+            for line in f:
+                entry = json.loads(line)
+                if tool is None or entry["argv"][0] == tool:
+                    calls.append(entry)
+        return calls
+
+    def env(self, extra: dict = None) -> dict:
+        env = child_env({
+            "PATH": f"{self.bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+            "LSMY_FAKE_STATE": str(self.state_path),
+            "LSMY_FAKE_LOG": str(self.log_path),
+            "LSMY_FAKE_GPIO_DIR": str(self.gpio_dir),
+            "LSMY_IPC_SOCK": str(self.sock),
+            "LSMY_WPA_CONF": str(self.wpa_conf),
+            "LSMY_NETWORKD_DIR": str(self.networkd_dir),
+            "LSMY_WIFI_HISTORY": str(self.root / "wifi_history.json"),
+            "LSMY_DHCP_LEASES": str(self.root / "dhcp_leases.json"),
+            "LSMY_PROC_NET": str(self.proc_net),
+            "LSMY_BACKEND_DEBUG_SOCK": str(self.root / "backend-debug.sock"),
+            "LSMY_PROFILE_DIR": str(self.root / "profiles"),
+            "LSMY_CONFIG": str(self.root / "lsmy.toml"),
+        })
+        if extra:
+            env.update(extra)
+        return env
+
+    def cleanup(self):
+        shutil.rmtree(self.root, ignore_errors=True)
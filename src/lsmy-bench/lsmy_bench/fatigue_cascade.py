@@ -0,0 +1,235 @@
+#!/usr/bin/python3
+"""
+Fatigue ROI cascade vs full-frame inference.
+
+Renders a synthetic camera scene (textured background, sensor noise,
+slowly drifting faces whose eye band goes bright when the eyes close or
+half-bright when the head turns away) and runs FatigueMonitor on it:
+
+- persons 0 and 3 only blink
+- person 1 closes their eyes for 3 s (fatigue expected)
+- person 2 looks away for 5 s (inattention expected)
+
+The face detector stand-in touches the downscaled frame but returns the
+scene's ground truth boxes (plus jitter); the landmark model stand-in
+does a few box-blur passes over its input, so its cost grows with
+pixels like a CNN. Reported: pixels and seconds against running the
+model on every full frame, the same with the ROI cache disabled, and
+which alerts were raised for whom.
+
+    python3 -m lsmy_bench.fatigue_cascade --seconds 60 --fps 15
+"""
+
+import sys
+import json
+import time
+import logging
+import argparse
+
+import numpy as np
+
+from lsmy_bench.common import setup_source_paths, save_baseline, compare_to_baseline, log
+
+setup_source_paths()
+
+from lsmy_python_lib import fatigue
+
+BENCH_NAME = "fatigue_cascade"
+
+WIDTH, HEIGHT = 640, 480
+FACE_W, FACE_H = 90, 110
+SKIN, EYE_OPEN = 180, 50
+MODEL_PASSES = 3
+
+# Person -> (closed from, closed until), (away from, away until) in seconds
+SCRIPTS = [
+    {"closed": None, "away": None},
+    {"closed": (20.0, 23.0), "away": None},
+    {"closed": None, "away": (30.0, 35.0)},
+    {"closed": None, "away": None},
+]
+EXPECTED = {"fatigue": [1], "inattention": [2]}
+BLINK_EVERY, BLINK_LENGTH = 4.0, 0.2
+
+
+class Scene:
+    def __init__(self, seed: int):
+        self.rng = np.random.default_rng(seed)
+        self.background = self.rng.integers(60, 100, (HEIGHT, WIDTH)).astype(np.int16)
+        # Each face drifts inside its own lane so faces never overlap
+        n = len(SCRIPTS)
+        lane = WIDTH / n
+        self.lane_min = np.arange(n) * lane + 5
+        self.lane_max = self.lane_min + lane - FACE_W - 10
+        self.pos = np.stack([(self.lane_min + self.lane_max) / 2, self.rng.uniform(60, HEIGHT - FACE_H - 60, n)], axis=1)
+        self.vel = self.rng.uniform(-0.3, 0.3, (n, 2))
+        self.blink_phase = self.rng.uniform(0, BLINK_EVERY, n)
+
+    def boxes(self) -> np.ndarray:
+        x, y = self.pos[:, 0], self.pos[:, 1]
+        return np.stack([x / WIDTH, y / HEIGHT, (x + FACE_W) / WIDTH, (y + FACE_H) / HEIGHT], axis=1)
+
+    def render(self, t: float) -> np.ndarray:
+        self.pos += self.vel
+        bounce = (self.pos[:, 0] < self.lane_min) | (self.pos[:, 0] > self.lane_max)
+        self.vel[bounce, 0] *= -1
+        bounce = (self.pos[:, 1] < 10) | (self.pos[:, 1] > HEIGHT - FACE_H - 10)
+        self.vel[bounce, 1] *= -1
+
+        frame = self.background + self.rng.integers(-2, 3, (HEIGHT, WIDTH), dtype=np.int16)
+        eye_top, eye_bottom = int(FACE_H * 0.30), int(FACE_H * 0.45)
+        for i, script in enumerate(SCRIPTS):
+            x, y = self.pos[i].astype(int)
+            face = frame[y:y + FACE_H, x:x + FACE_W]
+            face[:] = SKIN
+            closed = (t + self.blink_phase[i]) % BLINK_EVERY < BLINK_LENGTH
+            if script["closed"] and script["closed"][0] <= t < script["closed"][1]:
+                closed = True
+            away = bool(script["away"] and script["away"][0] <= t < script["away"][1])
+            if not closed:
+                face[eye_top:eye_bottom, int(FACE_W * 0.15):int(FACE_W * 0.45)] = EYE_OPEN
+                if not away:
+                    face[eye_top:eye_bottom, int(FACE_W * 0.55):int(FACE_W * 0.85)] = EYE_OPEN
+        return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def _face_detector(scene: Scene, rng):
+    def detect(small: np.ndarray) -> np.ndarray:
+        # Touch the input like a small detector would, boxes come from the scene
+        (small > 150).sum()
+        return scene.boxes() + rng.normal(0.0, 0.003, (len(SCRIPTS), 4))
+    return detect
+
+
+def _blur(image: np.ndarray) -> np.ndarray:
+    out = image
+    for axis in (0, 1):
+        c = np.cumsum(out, axis=axis)
+        out = (np.roll(c, -2, axis=axis) - np.roll(c, 2, axis=axis)) * 0.25
+    return out
+
+
+def _landmark_model(crop: np.ndarray) -> dict:
+    """
+    Stand-in for the landmark / eye-state model: cost grows with pixels.
+    """
+    image = crop.astype(np.float32)
+    for _ in range(MODEL_PASSES):
+        image = _blur(image)
+
+    # Face box inside the padded crop
+    pad = fatigue.ROI_PADDING / (1 + 2 * fatigue.ROI_PADDING)
+    h, w = crop.shape[:2]
+    fy = lambda v: int(h * (pad + v * (1 - 2 * pad)))
+    fx = lambda v: int(w * (pad + v * (1 - 2 * pad)))
+    band = crop[fy(0.25):fy(0.50)] < (SKIN + EYE_OPEN) / 2
+    left = band[:, fx(0.15):fx(0.45)].mean() > 0.25
+    right = band[:, fx(0.55):fx(0.85)].mean() > 0.25
+    return {
+        "eyes_closed": 1.0 if not left and not right else 0.0,
+        "yaw": 45.0 if left != right else 0.0,
+    }
+
+
+def _run(args, cache: bool) -> dict:
+    scene = Scene(args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    saved_reuse = fatigue.MAX_REUSE
+    if not cache:
+        fatigue.MAX_REUSE = 0
+    monitor = fatigue.FatigueMonitor(_face_detector(scene, rng), _landmark_model, detect_every=args.detect_every)
+
+    flagged = {"fatigue": set(), "inattention": set()}
+    seconds = 0.0
+    frames = int(args.seconds * args.fps)
+    try:
+        for index in range(frames):
+            t = index / args.fps
+            frame = scene.render(t)
+            start = time.perf_counter()
+            in_view = monitor.process(frame, ts=t)
+            seconds += time.perf_counter() - start
+
+            # Alerted tracks -> scene person with the closest box
+            truth = scene.boxes()
+            for track_id, box in zip(monitor.tracker.ids.tolist(), monitor.tracker.boxes):
+                person = in_view.get(track_id)
+                if person is None or not (person.fatigue or person.inattentive):
+                    continue
+                nearest = int(np.argmin(np.abs(truth - box).sum(axis=1)))
+                if person.fatigue:
+                    flagged["fatigue"].add(nearest)
+                if person.inattentive:
+                    flagged["inattention"].add(nearest)
+    finally:
+        fatigue.MAX_REUSE = saved_reuse
+
+    return {
+        "frames": frames,
+        "pipeline_seconds": round(seconds, 4),
+        "pipeline_ms_per_frame": round(seconds / frames * 1000, 3),
+        "stats": monitor.stats,
+        "compute": monitor.compute_saved(),
+        "flagged": {kind: sorted(people) for kind, people in flagged.items()},
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--fps", type=float, default=15.0)
+    parser.add_argument("--detect-every", type=int, default=fatigue.DETECT_EVERY)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed increase vs baseline")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero on regression vs baseline")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    # Full-frame inference: the model on every whole frame
+    frame = Scene(args.seed).render(0.0)
+    repeat = 10
+    start = time.perf_counter()
+    for _ in range(repeat):
+        _landmark_model(frame)
+    full_frame_seconds = (time.perf_counter() - start) / repeat * int(args.seconds * args.fps)
+
+    cascade = _run(args, cache=True)
+    no_cache = _run(args, cache=False)
+
+    result = {
+        "bench": BENCH_NAME,
+        "full_frame_seconds": round(full_frame_seconds, 4),
+        "cascade": cascade,
+        "cascade_without_cache": no_cache,
+        "time_saved": round(1.0 - cascade["pipeline_seconds"] / full_frame_seconds, 4),
+        "expected": EXPECTED,
+        "metrics": {
+            "pipeline_ms_per_frame": cascade["pipeline_ms_per_frame"],
+            "model_runs": cascade["stats"]["model_runs"],
+        },
+    }
+    print(json.dumps(result, indent=2))
+    log.info("Full-frame model: %.3fs, cascade: %.3fs (%.1f%% saved, %.1f%% of pixels), without ROI cache: %.3fs",
+             full_frame_seconds, cascade["pipeline_seconds"], result["time_saved"] * 100,
+             cascade["compute"]["pixels_saved"] * 100, no_cache["pipeline_seconds"])
+
+    if cascade["flagged"] != EXPECTED:
+        log.error("Alerts %s, expected %s", cascade["flagged"], EXPECTED)
+        return 1
+
+    if args.save_baseline:
+        save_baseline(BENCH_NAME, result)
+
+    if args.check:
+        regressions = compare_to_baseline(BENCH_NAME, result["metrics"], args.tolerance)
+        for line in regressions:
+            log.error("Regression: %s", line)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+#!/usr/bin/python3
+"""
+Gateway mode with simulated peer nodes.
+
+Starts run-lsmy as the site gateway inside a FakeSystem sandbox and N
+node processes (python3 -m lsmy_python_lib.gateway node) forwarding
+synthetic telemetry to it over TCP. Some nodes drop their connection
+halfway to exercise resend + dedupe. Uplink batches are drained over
+IPC like an uplink client would, and every node's samples must arrive
+exactly once.
+
+    python3 -m lsmy_bench.gateway_nodes --nodes 24 --rate 20 --count 200
+"""
+
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import subprocess
+
+from lsmy_bench.common import setup_source_paths, child_env, save_baseline, compare_to_baseline, log
+
+setup_source_paths()
+
+from lsmy_bench.fake_system import FakeSystem
+from lsmy_bench.harness import LsmyProcess, wait_for_ipc, ipc_request
+
+BENCH_NAME = "gateway_nodes"
+
+
+async def _drain_batches(sock: str, delivered: dict) -> int:
+    resp = await ipc_request(sock, {"cmd": "take_gateway_batches"})
+    for item in resp["data"]:
+        for node, samples in item["batch"]["nodes"].items():
+            delivered[node] = delivered.get(node, 0) + len(samples)
+    await ipc_request(sock, {"cmd": "ack_gateway_batches", "ids": [item["id"] for item in resp["data"]]})
+    return len(resp["data"])
+
+
+async def _run(args) -> dict:
+    fake = FakeSystem()
+    fake.write_wifi_config(fake.read_state()["ssid"], "password")
+    address = f"127.0.0.1:{args.port}"
+    app = LsmyProcess("app", fake, {
+        "LSMY_GATEWAY_LISTEN": address,
+        "LSMY_GATEWAY_BATCH_INTERVAL": str(args.batch_interval),
+    }, args.verbose)
+
+    try:
+        sock = str(fake.sock)
+        await wait_for_ipc(sock, args.timeout, process=app)
+        cpu_before = app.cpu_seconds()
+
+        start = time.perf_counter()
+        nodes = []
+        for i in range(args.nodes):
+            cmd = [
+                sys.executable, "-m", "lsmy_python_lib.gateway", "node",
+                "--gateway", address, "--node", f"node-{i:02d}",
+                "--rate", str(args.rate), "--count", str(args.count),
+            ]
+            if args.flap_every and i % args.flap_every == 0:
+                cmd += ["--flap-after", str(args.count // 2)]
+            nodes.append(subprocess.Popen(cmd, env=child_env(), stdout=subprocess.PIPE))
+
+        delivered, batches = {}, 0
+        while any(node.poll() is None for node in nodes):
+            batches += await _drain_batches(sock, delivered)
+            await asyncio.sleep(args.batch_interval)
+        elapsed = time.perf_counter() - start
+
+        # Last samples leave the gateway with the next batch
+        await asyncio.sleep(args.batch_interval * 2)
+        batches += await _drain_batches(sock, delivered)
+        state = (await ipc_request(sock, {"cmd": "get_gateway_state"}))["data"]["gateway"]
+        cpu = app.cpu_seconds() - cpu_before
+    finally:
+        app.stop()
+
+    sent = {}
+    ack_p99 = 0.0
+    for node in nodes:
+        stats = json.loads(node.stdout.read() or "{}")
+        if stats:
+            sent[stats["node"]] = stats["seq"]
+            ack_p99 = max(ack_p99, stats["ack_p99"])
+
+    per_node = {
+        name: {
+            "sent": sent.get(name, 0),
+            "delivered": delivered.get(name, 0),
+            "lost": info["lost"],
+            "duplicates": info["duplicates"],
+        }
+        for name, info in state["nodes"].items()
+    }
+    total_sent = sum(sent.values())
+    return {
+        "bench": BENCH_NAME,
+        "nodes": args.nodes,
+        "sent": total_sent,
+        "delivered": sum(delivered.values()),
+        "lost": sum(n["lost"] for n in per_node.values()),
+        "duplicates": sum(n["duplicates"] for n in per_node.values()),
+        "mismatched": sorted(name for name, n in per_node.items() if n["sent"] != n["delivered"])
+                      + sorted(set(sent) - set(per_node)),
+        "batches": batches,
+        "seconds": round(elapsed, 3),
+        "gateway_cpu_seconds": round(cpu, 3),
+        "metrics": {
+            "ack_p99": ack_p99,
+            "gateway_cpu_per_1k_samples": cpu / total_sent * 1000 if total_sent else 0.0,
+        },
+        "per_node": per_node,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=24)
+    parser.add_argument("--rate", type=float, default=20.0, help="Samples per second per node")
+    parser.add_argument("--count", type=int, default=200, help="Samples per node")
+    parser.add_argument("--flap-every", type=int, default=4, help="Every Nth node drops its connection once (0: none)")
+    parser.add_argument("--batch-interval", type=float, default=0.5)
+    parser.add_argument("--port", type=int, default=17600)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed increase vs baseline")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero on regression vs baseline")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    result = asyncio.run(_run(args))
+    print(json.dumps(result, indent=2))
+
+    if result["mismatched"] or result["lost"]:
+        log.error("Samples lost or duplicated for: %s", ", ".join(result["mismatched"]) or "-")
+        return 1
+
+    if args.save_baseline:
+        save_baseline(BENCH_NAME, result)
+
+    if args.check:
+        regressions = compare_to_baseline(BENCH_NAME, result["metrics"], args.tolerance)
+        for line in regressions:
+            log.error("Regression: %s", line)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
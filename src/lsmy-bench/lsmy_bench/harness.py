@@ -0,0 +1,433 @@
+#!/usr/bin/python3
+"""
+End-to-end benchmark / soak harness.
+
+Runs the real run-lsmy application (and the provisioning backend where a
+scenario needs it) inside a FakeSystem sandbox: system tools, GPIO, the
+IPC socket and the WiFi config paths are all local stand-ins, so the
+harness runs on a development machine without root or radio hardware.
+
+Scenarios:
+    cold_boot        known network in range, time until wlan0 has an IP
+    provisioning     no config -> AP + portal -> user config -> STA with IP
+    multi_ap_boot    two stored networks, the first one far and slow to join
+    reconnect_storm  repeated AP outages, time to re-acquire the IP
+    telemetry_burst  concurrent send_telemetry requests over IPC
+    ws_clients       N WebSocket clients on the backend (needs websockets)
+
+For every scenario the harness reports latency percentiles, CPU time and
+peak RSS of the LSMY processes and the number of process spawns.
+
+    python3 -m lsmy_bench.harness --scenario all --save-baseline
+    python3 -m lsmy_bench.harness --scenario cold_boot --repeat 5 --check
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import logging
+import argparse
+import subprocess
+
+from lsmy_bench.common import summarize, save_baseline, compare_to_baseline, log
+from lsmy_bench.fake_system import FakeSystem
+
+BENCH_NAME = "harness"
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+# The harness shortens the main loop interval so scenarios finish quickly;
+# latencies scale with it, so baselines are only comparable at equal values
+DEFAULT_LOOP_INTERVAL = 0.5
+DEFAULT_TIMEOUT = 60.0
+
+
+class LsmyProcess:
+    """
+    One LSMY process started through lsmy_bench.fake_bootstrap.
+    """
+
+    def __init__(self, target: str, fake: FakeSystem, extra_env: dict = None, verbose: bool = False):
+        self.target = target
+        output = None if verbose else subprocess.DEVNULL
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "lsmy_bench.fake_bootstrap", target],
+            env=fake.env(extra_env),
+            stdout=output,
+            stderr=output,
+        )
+
+    @property
+    def pid(self):
+        return self.proc.pid
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def cpu_seconds(self) -> float:
+        """
+        User + system time of the process and its reaped children.
+        """
+        with open(f"/proc/{self.pid}/stat", "r") as f:
+            # Skip "pid (comm)" - comm may contain spaces
+            fields = f.read().rsplit(")", 1)[1].split()
+        utime, stime, cutime, cstime = (int(v) for v in fields[11:15])
+        return (utime + stime + cutime + cstime) / CLOCK_TICKS
+
+    def memory_kb(self) -> dict:
+        result = {}
+        with open(f"/proc/{self.pid}/status", "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    result[key] = int(value.split()[0])
+        return result
+
+    def stop(self, timeout: float = 20.0) -> float:
+        """
+        SIGTERM the process and return the time it took to exit.
+        """
+        if not self.alive():
+            return 0.0
+        start = time.perf_counter()
+        self.proc.send_signal(signal.SIGTERM)
+        try:
+            self.proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            log.warning("%s did not exit within %ss, killing", self.target, timeout)
+            self.proc.kill()
+            self.proc.wait()
+        return time.perf_counter() - start
+
+
+async def ipc_request(sock: str, req: dict, timeout: float = 3.0) -> dict:
+    reader, writer = await asyncio.wait_for(asyncio.open_unix_connection(sock), timeout)
+    try:
+        writer.write((json.dumps(req) + "\n").encode())
+        await writer.drain()
+        resp = await asyncio.wait_for(reader.readline(), timeout)
+        return json.loads(resp)
+    finally:
+        writer.close()
+
+
+async def wait_for(predicate, timeout: float, interval: float = 0.02, process: LsmyProcess = None) -> float:
+    """
+    Poll `predicate` until it is true; return the elapsed time.
+    """
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process is not None and not process.alive():
+            raise RuntimeError(f"{process.target} exited with code {process.proc.returncode}")
+        if predicate():
+            return time.perf_counter() - start
+        await asyncio.sleep(interval)
+    raise TimeoutError(f"Condition not met within {timeout}s")
+
+
+async def wait_for_ipc(sock: str, timeout: float, process: LsmyProcess = None) -> float:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process is not None and not process.alive():
+            raise RuntimeError(f"{process.target} exited with code {process.proc.returncode}")
+        try:
+            await ipc_request(sock, {"cmd": "get_telemetry_stats"})
+            return time.perf_counter() - start
+        except (OSError, asyncio.TimeoutError, ValueError):
+            await asyncio.sleep(0.01)
+    raise TimeoutError(f"IPC server not up within {timeout}s")
+
+
+async def spawn_count(sock: str) -> int:
+    resp = await ipc_request(sock, {"cmd": "get_metrics"})
+    values = resp.get("data", {}).get("lsmy_process_spawns_total", {}).get("values", [])
+    return int(sum(v["value"] for v in values))
+
+
+# -------- Scenarios --------
+# Each scenario gets the running app, the sandbox and the CLI options and
+# returns {"latency": {name: [seconds, ...]}, ...extra fields}.
+
+async def scenario_cold_boot(app, fake, args):
+    has_ip = lambda: fake.read_state()["ip"] is not None
+    elapsed = await wait_for(has_ip, args.timeout, process=app)
+    return {"latency": {"time_to_ip": [elapsed]}}
+
+
+def setup_multi_ap(fake):
+    # The first stored network is a far AP that associates slowly; a naive
+    # supplicant that tries networks in config order pays for it on boot.
+    fake.write_wifi_networks([("lab-old", "password"), ("lab-ap", "password")])
+    fake.update(aps=[
+        {"ssid": "lab-old", "bssid": "02:00:00:00:02:00", "signal": -86, "assoc_delay": 60},
+        {"ssid": "lab-ap", "bssid": "02:00:00:00:01:00", "signal": -50},
+    ])
+
+
+async def scenario_provisioning(app, fake, args):
+    in_ap = lambda: fake.read_state()["services"].get("hostapd")
+    time_to_ap = await wait_for(in_ap, args.timeout, process=app)
+
+    # What the portal does on "save" + "connect"
+    fake.write_wifi_config(fake.read_state()["ssid"], "password")
+    start = time.perf_counter()
+    await ipc_request(str(fake.sock), {"cmd": "connect_wifi_signal", "role": "backend", "status": True})
+
+    has_ip = lambda: fake.read_state()["ip"] is not None
+    await wait_for(has_ip, args.timeout, process=app)
+    return {"latency": {"time_to_ap": [time_to_ap], "config_to_ip": [time.perf_counter() - start]}}
+
+
+async def scenario_reconnect_storm(app, fake, args):
+    has_ip = lambda: fake.read_state()["ip"] is not None
+    await wait_for(has_ip, args.timeout, process=app)
+
+    lost, reacquired = [], []
+    for _ in range(args.outages):
+        start = time.perf_counter()
+        fake.update(ap_available=False)
+        await wait_for(lambda: not has_ip(), args.timeout, process=app)
+        lost.append(time.perf_counter() - start)
+
+        await asyncio.sleep(args.outage_seconds)
+        start = time.perf_counter()
+        fake.update(ap_available=True)
+        reacquired.append(await wait_for(has_ip, args.timeout, process=app))
+
+    return {"latency": {"loss_detected": lost, "reconnect": reacquired}}
+
+
+async def scenario_telemetry_burst(app, fake, args):
+    sock = str(fake.sock)
+    await wait_for_ipc(sock, args.timeout, process=app)
+
+    latencies, errors = [], 0
+
+    async def one(i):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            resp = await ipc_request(sock, {"cmd": "send_telemetry", "temperature": 20.0 + i % 10})
+            if resp.get("status") != "ok":
+                errors += 1
+        except (OSError, asyncio.TimeoutError, ValueError):
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(i):
+        async with sem:
+            await one(i)
+
+    # Uplink consumer alongside the burst: take compressed batches, ack them
+    uplink = 0
+    done = asyncio.Event()
+
+    async def consume():
+        nonlocal uplink
+        while True:
+            finished = done.is_set()
+            resp = await ipc_request(sock, {"cmd": "take_telemetry_batches", "limit": 256})
+            if resp["data"]:
+                uplink += len(resp["data"])
+                await ipc_request(sock, {"cmd": "ack_telemetry_batches", "ids": [item["id"] for item in resp["data"]]})
+            elif finished:
+                return
+            else:
+                await asyncio.sleep(0.05)
+
+    consumer = asyncio.ensure_future(consume())
+    start = time.perf_counter()
+    await asyncio.gather(*(bounded(i) for i in range(args.requests)))
+    wall = time.perf_counter() - start
+    done.set()
+    await consumer
+    stats = await ipc_request(sock, {"cmd": "get_telemetry_stats"})
+    return {
+        "latency": {"send_telemetry": latencies},
+        "errors": errors,
+        "throughput": args.requests / wall if wall else 0.0,
+        "uplink_batches": uplink,
+        "uplink_dropped": stats["data"]["uplink"]["dropped"],
+    }
+
+
+async def scenario_ws_clients(app, fake, args):
+    try:
+        import websockets
+    except ImportError:
+        return {"skipped": "websockets is not installed"}
+
+    await wait_for_ipc(str(fake.sock), args.timeout, process=app)
+    backend = LsmyProcess("backend", fake, _process_env(args), args.verbose)
+    url = f"ws://127.0.0.1:{args.ws_port}"
+
+    connect, first_frame = [], []
+    clients = []
+    try:
+        for _ in range(50):
+            try:
+                async with websockets.connect(url):
+                    break
+            except OSError:
+                await asyncio.sleep(0.1)
+
+        async def client():
+            start = time.perf_counter()
+            ws = await websockets.connect(url)
+            connect.append(time.perf_counter() - start)
+            clients.append(ws)
+            await asyncio.wait_for(ws.recv(), args.timeout)
+            first_frame.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(client() for _ in range(args.clients)))
+        await asyncio.sleep(args.ws_soak)
+        backend_cpu = backend.cpu_seconds()
+        backend_mem = backend.memory_kb()
+    finally:
+        for ws in clients:
+            await ws.close()
+        backend.stop()
+
+    return {
+        "latency": {"ws_connect": connect, "ws_first_frame": first_frame},
+        "backend": {"cpu_seconds": backend_cpu, "memory_kb": backend_mem},
+    }
+
+
+SCENARIOS = {
+    "cold_boot": (scenario_cold_boot, {"config": True}),
+    "provisioning": (scenario_provisioning, {"config": False}),
+    "multi_ap_boot": (scenario_cold_boot, {"config": False, "setup": setup_multi_ap}),
+    "reconnect_storm": (scenario_reconnect_storm, {"config": True}),
+    "telemetry_burst": (scenario_telemetry_burst, {"config": True}),
+    "ws_clients": (scenario_ws_clients, {"config": True}),
+}
+
+
+def _process_env(args) -> dict:
+    return {
+        "LSMY_FAKE_LOOP_INTERVAL": str(args.loop_interval),
+        "LSMY_WS_PORT": str(args.ws_port),
+        "LSMY_TELEMETRY_INTERVAL": str(args.telemetry_interval),
+        "LSMY_LOG_LEVEL": "DEBUG" if args.verbose else "WARNING",
+    }
+
+
+async def run_scenario(name: str, args) -> dict:
+    func, options = SCENARIOS[name]
+    fake = FakeSystem()
+    if options["config"]:
+        fake.write_wifi_config(fake.read_state()["ssid"], "password")
+    if options.get("setup"):
+        options["setup"](fake)
+
+    app = LsmyProcess("app", fake, _process_env(args), args.verbose)
+    try:
+        result = await func(app, fake, args)
+        if "skipped" not in result:
+            result["spawns"] = await spawn_count(str(fake.sock))
+            result["tool_calls"] = len(fake.invocations())
+            result["cpu_seconds"] = app.cpu_seconds()
+            result["memory_kb"] = app.memory_kb()
+    finally:
+        shutdown = app.stop()
+        fake.cleanup()
+
+    result["shutdown"] = shutdown
+    return result
+
+
+def _merge(runs: list) -> dict:
+    """
+    Combine repeated runs of one scenario into percentiles / maxima.
+    """
+    latency = {}
+    for run in runs:
+        for key, values in run["latency"].items():
+            latency.setdefault(key, []).extend(values)
+
+    merged = {"runs": len(runs), "latency": {k: summarize(v) for k, v in latency.items()}}
+    merged["cpu_seconds"] = summarize([r["cpu_seconds"] for r in runs])
+    merged["peak_rss_kb"] = max(r["memory_kb"].get("VmHWM", 0) for r in runs)
+    merged["spawns"] = summarize([r["spawns"] for r in runs])
+    merged["tool_calls"] = summarize([r["tool_calls"] for r in runs])
+    for key in ("errors", "throughput", "backend", "uplink_batches", "uplink_dropped"):
+        if key in runs[-1]:
+            merged[key] = runs[-1][key]
+    return merged
+
+
+def _regression_metrics(results: dict) -> dict:
+    metrics = {}
+    for name, result in results.items():
+        if "skipped" in result:
+            continue
+        for key, summary in result["latency"].items():
+            metrics[f"{name}.{key}_p50"] = summary["p50"]
+            metrics[f"{name}.{key}_p99"] = summary["p99"]
+        metrics[f"{name}.cpu_seconds_p50"] = result["cpu_seconds"]["p50"]
+        metrics[f"{name}.peak_rss_kb"] = result["peak_rss_kb"]
+        metrics[f"{name}.spawns_p50"] = result["spawns"]["p50"]
+    return metrics
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", default="all", choices=["all"] + list(SCENARIOS), help="Scenario to run")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per scenario")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Per-step timeout (seconds)")
+    parser.add_argument("--loop-interval", type=float, default=DEFAULT_LOOP_INTERVAL, help="App main loop interval")
+    parser.add_argument("--outages", type=int, default=5, help="reconnect_storm: number of AP outages")
+    parser.add_argument("--outage-seconds", type=float, default=1.0, help="reconnect_storm: outage length")
+    parser.add_argument("--requests", type=int, default=2000, help="telemetry_burst: total requests")
+    parser.add_argument("--concurrency", type=int, default=50, help="telemetry_burst: requests in flight")
+    parser.add_argument("--clients", type=int, default=50, help="ws_clients: WebSocket clients")
+    parser.add_argument("--ws-port", type=int, default=18765, help="ws_clients: backend port")
+    parser.add_argument("--ws-soak", type=float, default=10.0, help="ws_clients: seconds to keep clients connected")
+    parser.add_argument("--telemetry-interval", type=float, default=1.0, help="ws_clients: backend push interval")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero on regression vs baseline")
+    parser.add_argument("--verbose", action="store_true", help="Show application output")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    results = {}
+    for name in names:
+        log.info("Running scenario %s (%d run(s))", name, args.repeat)
+        runs = [asyncio.run(run_scenario(name, args)) for _ in range(args.repeat)]
+        if "skipped" in runs[0]:
+            log.warning("Scenario %s skipped: %s", name, runs[0]["skipped"])
+            results[name] = {"skipped": runs[0]["skipped"]}
+        else:
+            results[name] = _merge(runs)
+
+    result = {
+        "bench": BENCH_NAME,
+        "loop_interval": args.loop_interval,
+        "scenarios": results,
+        "metrics": _regression_metrics(results),
+    }
+    print(json.dumps(result, indent=2))
+
+    if args.save_baseline:
+        save_baseline(BENCH_NAME, result)
+
+    if args.check:
+        regressions = compare_to_baseline(BENCH_NAME, result["metrics"], args.tolerance)
+        for line in regressions:
+            log.error("Regression: %s", line)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
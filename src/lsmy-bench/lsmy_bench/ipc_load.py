@@ -0,0 +1,333 @@
+#!/usr/bin/python3
+"""
+Load generator for the IPC Unix-socket server (ipc_server_task).
+
+Drives send_telemetry / request_get_data / connect_wifi_signal at a
+configurable mix, either open loop at a fixed request rate or as a sweep
+that raises the rate until the server saturates. Every request uses its
+own connection, like the real clients.
+
+    # 500 req/s for 10 s against a running application
+    python3 -m lsmy_bench.ipc_load --sock /run/lsmy/provision.sock --rate 500
+
+    # Start the app in a FakeSystem sandbox and find the saturation point
+    python3 -m lsmy_bench.ipc_load --spawn --sweep --output ipc-v1.json --label v1
+
+The JSON result (stdout or --output) carries the label, the mix and one
+entry per rate step, so runs against different protocol versions can be
+diffed directly.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import platform
+
+from lsmy_bench.common import summarize, save_baseline, compare_to_baseline, log
+
+BENCH_NAME = "ipc_load"
+
+DEFAULT_SOCK = os.environ.get("LSMY_IPC_SOCK", "/run/lsmy/provision.sock")
+DEFAULT_MIX = "send_telemetry=8,request_get_data=1,connect_wifi_signal=1"
+
+# A rate step counts as saturated when any of these is exceeded
+SATURATION_THROUGHPUT_RATIO = 0.95   # achieved / offered
+SATURATION_ERROR_RATE = 0.01
+SATURATION_P99 = 0.1                 # seconds
+
+
+def _telemetry_request(rng):
+    return {
+        "cmd": "send_telemetry",
+        "temperature": round(rng.uniform(20.0, 35.0), 2),
+        "humidity": round(rng.uniform(40.0, 80.0), 2),
+        "no2": round(rng.uniform(0.0, 0.5), 4),
+        "pm10": round(rng.uniform(10.0, 50.0), 1),
+        "pm25": round(rng.uniform(5.0, 25.0), 1),
+    }
+
+
+def _get_data_request(rng):
+    return {"cmd": "request_get_data"}
+
+
+def _connect_signal_request(rng):
+    # status False: exercise the command without making the app leave AP mode
+    return {"cmd": "connect_wifi_signal", "role": "bench", "status": False}
+
+
+REQUEST_BUILDERS = {
+    "send_telemetry": _telemetry_request,
+    "request_get_data": _get_data_request,
+    "connect_wifi_signal": _connect_signal_request,
+}
+
+
+def parse_mix(text: str) -> dict:
+    """
+    "send_telemetry=8,request_get_data=1" -> {command: weight}
+    """
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in REQUEST_BUILDERS:
+            raise ValueError(f"Unknown command in mix: {name}")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("Empty request mix")
+    return mix
+
+
+class StepResult:
+    """
+    Latencies and outcomes of one rate step.
+    """
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.sent = 0
+        self.completed = 0
+
+    def ok(self, cmd: str, latency: float):
+        self.completed += 1
+        self.latencies.setdefault(cmd, []).append(latency)
+
+    def fail(self, kind: str):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def to_dict(self, offered: float, wall: float) -> dict:
+        every = [v for values in self.latencies.values() for v in values]
+        total_errors = sum(self.errors.values())
+        return {
+            "offered_rate": offered,
+            "throughput": self.completed / wall if wall else 0.0,
+            "sent": self.sent,
+            "completed": self.completed,
+            "error_rate": total_errors / self.sent if self.sent else 0.0,
+            "errors": dict(self.errors),
+            "latency": summarize(every),
+            "latency_by_cmd": {cmd: summarize(values) for cmd, values in self.latencies.items()},
+        }
+
+
+async def _one_request(sock: str, cmd: str, req: dict, timeout: float, result: StepResult):
+    start = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_unix_connection(sock), timeout)
+    except asyncio.TimeoutError:
+        result.fail("connect_timeout")
+        return
+    except OSError:
+        result.fail("connect_error")
+        return
+
+    try:
+        writer.write((json.dumps(req) + "\n").encode())
+        await writer.drain()
+        line = await asyncio.wait_for(reader.readline(), timeout)
+        if not line:
+            result.fail("closed")
+        elif json.loads(line).get("status") != "ok":
+            result.fail("status_error")
+        else:
+            result.ok(cmd, time.perf_counter() - start)
+    except asyncio.TimeoutError:
+        result.fail("timeout")
+    except ValueError:
+        result.fail("bad_response")
+    except OSError:
+        result.fail("io_error")
+    finally:
+        writer.close()
+
+
+async def run_step(sock: str, mix: dict, rate: float, duration: float, clients: int,
+                   timeout: float, poisson: bool, rng) -> dict:
+    """
+    Open loop: issue requests at `rate` per second for `duration` seconds
+    with at most `clients` in flight. An arrival that finds every client
+    busy is counted as an "overload" error instead of queueing, so the
+    offered load is not silently reduced.
+    """
+    result = StepResult()
+    commands = list(mix)
+    weights = [mix[c] for c in commands]
+    in_flight = set()
+    interval = 1.0 / rate
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    next_at = start
+
+    while next_at - start < duration:
+        delay = next_at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        result.sent += 1
+        if len(in_flight) >= clients:
+            result.fail("overload")
+        else:
+            cmd = rng.choices(commands, weights)[0]
+            task = asyncio.ensure_future(
+                _one_request(sock, cmd, REQUEST_BUILDERS[cmd](rng), timeout, result)
+            )
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+        next_at += rng.expovariate(rate) if poisson else interval
+
+    if in_flight:
+        await asyncio.wait(in_flight)
+    wall = loop.time() - start
+    return result.to_dict(rate, wall)
+
+
+def is_saturated(step: dict, p99_limit: float, error_limit: float) -> bool:
+    return (
+        step["throughput"] < step["offered_rate"] * SATURATION_THROUGHPUT_RATIO
+        or step["error_rate"] > error_limit
+        or step["latency"]["p99"] > p99_limit
+    )
+
+
+async def run_sweep(sock: str, mix: dict, args, rng) -> dict:
+    """
+    Multiply the rate by --step-factor until a step saturates, then report
+    the last rate that did not.
+    """
+    steps = []
+    rate = args.start_rate
+    saturation = None
+    while rate <= args.max_rate:
+        step = await run_step(sock, mix, rate, args.duration, args.clients, args.timeout, args.poisson, rng)
+        step["saturated"] = is_saturated(step, args.p99_limit, args.error_limit)
+        steps.append(step)
+        log.info(
+            "rate=%.0f/s throughput=%.0f/s p99=%.2fms errors=%.2f%%%s",
+            rate, step["throughput"], step["latency"]["p99"] * 1000, step["error_rate"] * 100,
+            " SATURATED" if step["saturated"] else "",
+        )
+        if step["saturated"]:
+            saturation = rate
+            break
+        rate *= args.step_factor
+        await asyncio.sleep(args.cooldown)
+
+    sustained = [s for s in steps if not s["saturated"]]
+    return {
+        "steps": steps,
+        "saturation_rate": saturation,
+        "max_sustained_rate": sustained[-1]["offered_rate"] if sustained else 0.0,
+        "max_sustained_throughput": max((s["throughput"] for s in sustained), default=0.0),
+    }
+
+
+async def _run(args) -> dict:
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+
+    sock = args.sock
+    app = fake = None
+    if args.spawn:
+        # Imported lazily: only needed when the tool starts its own app
+        from lsmy_bench.fake_system import FakeSystem
+        from lsmy_bench.harness import LsmyProcess, wait_for_ipc
+
+        fake = FakeSystem()
+        fake.write_wifi_config(fake.read_state()["ssid"], "password")
+        app = LsmyProcess("app", fake, {"LSMY_LOG_LEVEL": "WARNING"}, args.verbose)
+        sock = str(fake.sock)
+        await wait_for_ipc(sock, 30.0, process=app)
+
+    try:
+        cpu_before = app.cpu_seconds() if app else None
+        if args.sweep:
+            result = await run_sweep(sock, mix, args, rng)
+        else:
+            result = {"steps": [await run_step(
+                sock, mix, args.rate, args.duration, args.clients, args.timeout, args.poisson, rng,
+            )]}
+        if app:
+            result["server"] = {"cpu_seconds": app.cpu_seconds() - cpu_before, "memory_kb": app.memory_kb()}
+    finally:
+        if app:
+            app.stop()
+            fake.cleanup()
+
+    result.update({
+        "bench": BENCH_NAME,
+        "label": args.label,
+        "mix": mix,
+        "clients": args.clients,
+        "arrivals": "poisson" if args.poisson else "constant",
+        "host": platform.node(),
+        "machine": platform.machine(),
+    })
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sock", default=DEFAULT_SOCK, help="IPC socket of a running application")
+    parser.add_argument("--spawn", action="store_true", help="Start run-lsmy in a FakeSystem sandbox")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted command mix")
+    parser.add_argument("--rate", type=float, default=200.0, help="Requests per second (fixed mode)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per rate step")
+    parser.add_argument("--clients", type=int, default=64, help="Maximum concurrent requests")
+    parser.add_argument("--timeout", type=float, default=3.0, help="Per-request timeout (seconds)")
+    parser.add_argument("--poisson", action="store_true", help="Poisson instead of evenly spaced arrivals")
+    parser.add_argument("--sweep", action="store_true", help="Ramp the rate until saturation")
+    parser.add_argument("--start-rate", type=float, default=50.0, help="Sweep: first rate")
+    parser.add_argument("--step-factor", type=float, default=1.5, help="Sweep: rate multiplier per step")
+    parser.add_argument("--max-rate", type=float, default=20000.0, help="Sweep: stop after this rate")
+    parser.add_argument("--cooldown", type=float, default=1.0, help="Sweep: pause between steps")
+    parser.add_argument("--p99-limit", type=float, default=SATURATION_P99, help="Saturation p99 latency (s)")
+    parser.add_argument("--error-limit", type=float, default=SATURATION_ERROR_RATE, help="Saturation error rate")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the mix and payloads")
+    parser.add_argument("--label", default="", help="Free-form tag (e.g. protocol version)")
+    parser.add_argument("--output", help="Write the JSON result to this file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero on regression vs baseline")
+    parser.add_argument("--verbose", action="store_true", help="Show application output (--spawn)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    result = asyncio.run(_run(args))
+
+    last = result["steps"][-1]
+    # Lower is better for every regression metric
+    result["metrics"] = {"p50": last["latency"]["p50"], "p99": last["latency"]["p99"]}
+    if "max_sustained_throughput" in result and result["max_sustained_throughput"]:
+        result["metrics"]["inverse_max_throughput"] = 1.0 / result["max_sustained_throughput"]
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        log.info("Result written to %s", args.output)
+    else:
+        print(text)
+
+    if args.save_baseline:
+        save_baseline(BENCH_NAME, result)
+
+    if args.check:
+        regressions = compare_to_baseline(BENCH_NAME, result["metrics"], args.tolerance)
+        for line in regressions:
+            log.error("Regression: %s", line)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/python3
+"""
+Memory and encoding cost of telemetry sample representations.
+
+Holds N samples as the dicts the IPC server and backend used to build,
+as TelemetrySample objects, in a SampleHistory ring and as packed binary
+records, and reports traced bytes per sample plus encode time per sample.
+
+    python3 -m lsmy_bench.sample_memory --samples 100000
+"""
+
+import sys
+import json
+import time
+import random
+import timeit
+import logging
+import argparse
+import tracemalloc
+
+from lsmy_bench.common import setup_source_paths, save_baseline, compare_to_baseline, log
+
+setup_source_paths()
+
+from lsmy_python_lib.telemetry_sample import TelemetrySample, SampleHistory
+
+BENCH_NAME = "sample_memory"
+
+
+def _readings(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    start = time.time()
+    return [
+        (
+            round(start + i, 3),
+            round(rng.uniform(20.0, 35.0), 2),
+            round(rng.uniform(40.0, 80.0), 2),
+            round(rng.uniform(0.0, 0.5), 4),
+            round(rng.uniform(10.0, 50.0), 1),
+            round(rng.uniform(5.0, 25.0), 1),
+        )
+        for i in range(count)
+    ]
+
+
+def _as_dict(ts, temperature, humidity, no2, pm10, pm25) -> dict:
+    return {"ts": ts, "temperature": temperature, "humidity": humidity, "no2": no2, "pm10": pm10, "pm25": pm25}
+
+
+def _traced(build) -> tuple:
+    """
+    :return: (object kept alive, bytes allocated by build())
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return kept, after - before
+
+
+def _packed(readings: list) -> bytearray:
+    fmt = TelemetrySample.SCHEMA.struct
+    out = bytearray(fmt.size * len(readings))
+    for i, reading in enumerate(readings):
+        fmt.pack_into(out, i * fmt.size, *reading)
+    return out
+
+
+def _history(readings: list) -> SampleHistory:
+    history = SampleHistory(TelemetrySample, len(readings))
+    for reading in readings:
+        history.append(TelemetrySample(*reading))
+    return history
+
+
+def _time(func, repeat: int) -> float:
+    number = max(1, int(0.05 / max(timeit.timeit(func, number=1), 1e-7)))
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5, help="timeit repeats (best is kept)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed increase vs baseline")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero on regression vs baseline")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    readings = _readings(args.samples, args.seed)
+    # Object layouts get fresh float objects per sample, like decoded IPC requests
+    layouts = {
+        "dict": lambda: [_as_dict(*[v + 0.0 for v in reading]) for reading in readings],
+        "sample": lambda: [TelemetrySample(*[v + 0.0 for v in reading]) for reading in readings],
+        "history": lambda: _history(readings),
+        "packed": lambda: _packed(readings),
+    }
+
+    memory = {}
+    for name, build in layouts.items():
+        kept, size = _traced(build)
+        memory[name] = size / args.samples
+        del kept
+
+    # Every layout must hold the same data
+    sample = TelemetrySample(*readings[-1])
+    if json.loads(sample.to_json()) != _as_dict(*readings[-1]):
+        log.error("TelemetrySample.to_json() does not match the dict encoding")
+        return 1
+
+    as_dict = _as_dict(*readings[-1])
+    packed = sample.pack()
+    encode = {
+        "dict_json_us": _time(lambda: json.dumps(as_dict), args.repeat) * 1e6,
+        "sample_json_us": _time(sample.to_json, args.repeat) * 1e6,
+        "sample_pack_us": _time(sample.pack, args.repeat) * 1e6,
+        "sample_unpack_us": _time(lambda: TelemetrySample.unpack(packed), args.repeat) * 1e6,
+    }
+
+    result = {
+        "bench": BENCH_NAME,
+        "samples": args.samples,
+        "bytes_per_sample": {name: round(value, 1) for name, value in memory.items()},
+        "reduction": {name: round(memory["dict"] / value, 1) for name, value in memory.items() if value},
+        "encode": encode,
+        "metrics": {
+            "sample_bytes": memory["sample"],
+            "history_bytes": memory["history"],
+            "sample_json_us": encode["sample_json_us"],
+            "sample_pack_us": encode["sample_pack_us"],
+        },
+    }
+    print(json.dumps(result, indent=2))
+
+    if args.save_baseline:
+        save_baseline(BENCH_NAME, result)
+
+    if args.check:
+        regressions = compare_to_baseline(BENCH_NAME, result["metrics"], args.tolerance)
+        for line in regressions:
+            log.error("Regression: %s", line)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+#!/usr/bin/python3
+"""
+People tracker cost against the number of tracked people.
+
+Runs lsmy_python_lib.tracker over detection streams (detector output for
+every frame: people walking across the counting line, with jitter,
+missed detections and false positives) for a range of crowd sizes. The
+detector is skipped on all but every Nth frame, as on the device, and
+per-frame tracker time is reported separately for detector frames and
+predicted frames, next to a per-detection Python loop doing the same
+association. Line-crossing counts are checked against ground truth.
+
+Streams are synthetic unless --streams points at recorded ones
+(.npz files as written by --record).
+
+    python3 -m lsmy_bench.tracker_scaling --people 1 5 10 20 50 --detect-every 3
+"""
+
+import sys
+import json
+import time
+import logging
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from lsmy_bench.common import setup_source_paths, summarize, save_baseline, compare_to_baseline, log
+
+setup_source_paths()
+
+from lsmy_python_lib.tracker import MultiObjectTracker, IOU_THRESHOLD
+
+BENCH_NAME = "tracker_scaling"
+
+BOX_W, BOX_H = 0.06, 0.15
+LINE = 0.5
+
+
+def _synthetic_stream(people: int, frames: int, seed: int) -> dict:
+    """
+    People walk up or down through the frame at their own speed and come
+    back from a random edge after leaving it.
+    """
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(0.05, 0.95 - BOX_W, people)
+    direction = rng.choice([-1.0, 1.0], people)
+    speed = rng.uniform(0.004, 0.012, people)
+    cy = np.where(direction > 0, rng.uniform(-0.1, 0.4, people), rng.uniform(0.6, 1.1, people))
+
+    boxes, offsets = [], [0]
+    truth_in = truth_out = 0
+    for _ in range(frames):
+        before = cy.copy()
+        cy = cy + direction * speed
+        truth_in += int(np.count_nonzero((before < LINE) & (cy >= LINE)))
+        truth_out += int(np.count_nonzero((before >= LINE) & (cy < LINE)))
+
+        # Left the frame: re-enter from a random edge
+        out = (cy < -BOX_H) | (cy > 1.0 + BOX_H)
+        if out.any():
+            n = int(np.count_nonzero(out))
+            direction[out] = rng.choice([-1.0, 1.0], n)
+            cy[out] = np.where(direction[out] > 0, -BOX_H / 2, 1.0 + BOX_H / 2)
+            x[out] = rng.uniform(0.05, 0.95 - BOX_W, n)
+
+        visible = (cy > 0.0) & (cy < 1.0) & (rng.random(people) > 0.08)
+        frame = np.stack([x, cy - BOX_H / 2, x + BOX_W, cy + BOX_H / 2], axis=1)[visible]
+        frame += rng.normal(0.0, 0.003, frame.shape)
+        false = rng.poisson(0.05)
+        if false:
+            fx, fy = rng.uniform(0.0, 0.9, false), rng.uniform(0.0, 0.8, false)
+            frame = np.concatenate([frame, np.stack([fx, fy, fx + BOX_W, fy + BOX_H], axis=1)])
+        boxes.append(frame)
+        offsets.append(offsets[-1] + len(frame))
+
+    return {
+        "boxes": np.concatenate(boxes),
+        "offsets": np.array(offsets),
+        "truth_in": truth_in,
+        "truth_out": truth_out,
+        "people": people,
+    }
+
+
+def _frames(stream: dict) -> list:
+    boxes, offsets = stream["boxes"], stream["offsets"]
+    return [boxes[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+def _python_associate(tracks: list, detections: list) -> list:
+    """
+    The per-detection loop the tracker replaces: IoU pair by pair, then
+    greedy matching.
+    """
+    pairs = []
+    for i, t in enumerate(tracks):
+        for j, d in enumerate(detections):
+            w = min(t[2], d[2]) - max(t[0], d[0])
+            h = min(t[3], d[3]) - max(t[1], d[1])
+            if w <= 0 or h <= 0:
+                continue
+            inter = w * h
+            iou = inter / ((t[2] - t[0]) * (t[3] - t[1]) + (d[2] - d[0]) * (d[3] - d[1]) - inter)
+            if iou >= IOU_THRESHOLD:
+                pairs.append((iou, i, j))
+    pairs.sort(reverse=True)
+    used_t, used_d, matches = set(), set(), []
+    for _, i, j in pairs:
+        if i not in used_t and j not in used_d:
+            used_t.add(i)
+            used_d.add(j)
+            matches.append((i, j))
+    return matches
+
+
+def _run_stream(stream: dict, detect_every: int) -> dict:
+    tracker = MultiObjectTracker(line=LINE)
+    detect_us, predict_us, python_us, tracked = [], [], [], []
+    for index, detections in enumerate(_frames(stream)):
+        if index % detect_every == 0:
+            tracks = tracker.boxes.tolist()
+            start = time.perf_counter_ns()
+            _python_associate(tracks, detections.tolist())
+            python_us.append((time.perf_counter_ns() - start) / 1000)
+
+            start = time.perf_counter_ns()
+            tracker.update(detections)
+            detect_us.append((time.perf_counter_ns() - start) / 1000)
+        else:
+            start = time.perf_counter_ns()
+            tracker.update(None)
+            predict_us.append((time.perf_counter_ns() - start) / 1000)
+        tracked.append(tracker.count)
+
+    truth = stream["truth_in"] + stream["truth_out"]
+    error = abs(tracker.entered - stream["truth_in"]) + abs(tracker.exited - stream["truth_out"])
+    return {
+        "people": int(stream["people"]),
+        "frames": len(tracked),
+        "tracked_mean": round(float(np.mean(tracked)), 1),
+        "detect_frame_us": summarize(detect_us),
+        "predict_frame_us": summarize(predict_us),
+        "frame_us_mean": round(float(np.mean(detect_us + predict_us)), 1),
+        "python_association_us_p50": summarize(python_us)["p50"],
+        "entered": tracker.entered,
+        "exited": tracker.exited,
+        "truth_in": int(stream["truth_in"]),
+        "truth_out": int(stream["truth_out"]),
+        "count_error": round(error / truth, 3) if truth else 0.0,
+    }
+
+
+def _load_streams(directory: Path) -> list:
+    streams = []
+    for path in sorted(directory.glob("*.npz")):
+        with np.load(path) as data:
+            streams.append({key: data[key] for key in data.files})
+    return sorted(streams, key=lambda s: int(s["people"]))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--people", type=int, nargs="+", default=[1, 2, 5, 10, 20, 50])
+    parser.add_argument("--frames", type=int, default=1200, help="Frames per stream")
+    parser.add_argument("--detect-every", type=int, default=3)
+    parser.add_argument("--streams", type=Path, help="Directory of recorded .npz streams (instead of synthetic)")
+    parser.add_argument("--record", type=Path, help="Save the synthetic streams to this directory")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--max-count-error", type=float, default=0.1, help="Allowed crossing count error (fraction)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed increase vs baseline")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero on regression vs baseline")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    if args.streams:
+        streams = _load_streams(args.streams)
+        if not streams:
+            log.error("No .npz streams in %s", args.streams)
+            return 1
+    else:
+        streams = [_synthetic_stream(n, args.frames, args.seed + n) for n in args.people]
+        if args.record:
+            args.record.mkdir(parents=True, exist_ok=True)
+            for stream in streams:
+                np.savez_compressed(args.record / f"people_{int(stream['people']):03d}.npz", **stream)
+
+    # Warm up NumPy dispatch before timing
+    _run_stream(streams[0], args.detect_every)
+    runs = [_run_stream(stream, args.detect_every) for stream in streams]
+    reference = [_run_stream(stream, 1) for stream in streams]
+
+    largest = runs[-1]
+    result = {
+        "bench": BENCH_NAME,
+        "detect_every": args.detect_every,
+        "runs": runs,
+        "count_error_detect_every_frame": {str(r["people"]): r["count_error"] for r in reference},
+        "metrics": {
+            "frame_us_mean_max_people": largest["frame_us_mean"],
+            "detect_frame_us_p99_max_people": largest["detect_frame_us"]["p99"],
+            "count_error_max": max(r["count_error"] for r in runs),
+        },
+    }
+    print(json.dumps(result, indent=2))
+
+    for run in runs:
+        log.info("%3d people: %6.1f us/frame (detector frames p50 %6.1f us, Python loop %7.1f us), count error %.1f%%",
+                 run["people"], run["frame_us_mean"], run["detect_frame_us"]["p50"],
+                 run["python_association_us_p50"], run["count_error"] * 100)
+
+    failed = [run["people"] for run in runs if run["count_error"] > args.max_count_error]
+    if failed:
+        log.error("Crossing counts off by more than %.0f%% for %s people", args.max_count_error * 100, failed)
+        return 1
+
+    if args.save_baseline:
+        save_baseline(BENCH_NAME, result)
+
+    if args.check:
+        regressions = compare_to_baseline(BENCH_NAME, result["metrics"], args.tolerance)
+        for line in regressions:
+            log.error("Regression: %s", line)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+#!/usr/bin/python3
+"""
+WebSocket backend scale test.
+
+Starts run-lsmy and provision-web-backend in a FakeSystem sandbox, then
+ramps up local WebSocket clients in steps and, at every step, measures
+the broadcast latency (telemetry "ts" to client receive), backend RSS and
+CPU, and how many connections admission control refused.
+
+    python3 -m lsmy_bench.ws_scale --levels 50,100,200,400 --max-clients 300
+    python3 -m lsmy_bench.ws_scale --compression none --levels 200
+
+Capacity settings are passed to the backend through the same LSMY_WS_*
+variables the service unit uses.
+"""
+
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+
+from lsmy_bench.common import summarize, save_baseline, compare_to_baseline, log
+from lsmy_bench.fake_system import FakeSystem
+from lsmy_bench.harness import LsmyProcess, wait_for_ipc
+
+BENCH_NAME = "ws_scale"
+
+CAPACITY_STATUS = 503          # Refused before the upgrade
+CAPACITY_CLOSE_CODE = 1013     # Admitted in a race, closed right after
+
+
+class Client:
+    def __init__(self):
+        self.ws = None
+        self.latencies = []
+        self.rejected = False
+        self.task = None
+
+
+def _close_code(exc):
+    # websockets >= 10 exposes the received close frame as `rcvd`
+    frame = getattr(exc, "rcvd", None)
+    return frame.code if frame is not None else getattr(exc, "code", None)
+
+
+async def _client_loop(websockets, url: str, compression, client: Client, ready: asyncio.Event):
+    try:
+        client.ws = await websockets.connect(url, compression=compression)
+        ready.set()
+        async for message in client.ws:
+            received = time.time()
+            payload = json.loads(message)
+            if "ts" in payload:
+                client.latencies.append(received - payload["ts"])
+    except websockets.exceptions.InvalidStatus as exc:
+        client.rejected = exc.response.status_code == CAPACITY_STATUS
+    except websockets.exceptions.ConnectionClosed as exc:
+        client.rejected = _close_code(exc) == CAPACITY_CLOSE_CODE
+    except OSError:
+        client.rejected = True
+    finally:
+        ready.set()
+
+
+async def _wait_for_backend(websockets, url: str, backend: LsmyProcess, timeout: float):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if not backend.alive():
+            raise RuntimeError(f"backend exited with code {backend.proc.returncode}")
+        try:
+            ws = await websockets.connect(url)
+            await ws.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise TimeoutError(f"backend not accepting connections within {timeout}s")
+
+
+async def _run(args) -> dict:
+    import websockets
+
+    compression = "deflate" if args.compression == "deflate" else None
+    levels = sorted(int(v) for v in args.levels.split(","))
+
+    fake = FakeSystem()
+    fake.write_wifi_config(fake.read_state()["ssid"], "password")
+    env = {
+        "LSMY_LOG_LEVEL": "WARNING",
+        "LSMY_WS_PORT": str(args.port),
+        "LSMY_TELEMETRY_INTERVAL": str(args.interval),
+        "LSMY_WS_MAX_CLIENTS": str(args.max_clients),
+        "LSMY_WS_COMPRESSION": args.compression,
+        "LSMY_WS_DEFLATE_WINDOW_BITS": str(args.window_bits),
+        "LSMY_WS_DEFLATE_MEM_LEVEL": str(args.mem_level),
+        "LSMY_WS_DEFLATE_NO_CONTEXT": "1" if args.no_context_takeover else "0",
+        "LSMY_WS_PING_INTERVAL": str(args.ping_interval),
+    }
+    url = f"ws://127.0.0.1:{args.port}"
+
+    app = LsmyProcess("app", fake, env, args.verbose)
+    backend = None
+    clients = []
+    steps = []
+    try:
+        await wait_for_ipc(str(fake.sock), args.timeout, process=app)
+        backend = LsmyProcess("backend", fake, env, args.verbose)
+        await _wait_for_backend(websockets, url, backend, args.timeout)
+        await asyncio.sleep(0.5)
+        rss_idle = backend.memory_kb()["VmRSS"]
+
+        for level in levels:
+            while len(clients) < level:
+                batch = []
+                for _ in range(min(args.ramp_batch, level - len(clients))):
+                    client, ready = Client(), asyncio.Event()
+                    client.task = asyncio.ensure_future(_client_loop(websockets, url, compression, client, ready))
+                    clients.append(client)
+                    batch.append(ready.wait())
+                await asyncio.gather(*batch)
+
+            for client in clients:
+                client.latencies.clear()
+            cpu_before = backend.cpu_seconds()
+            await asyncio.sleep(args.soak)
+
+            # A client only counts while its task is still receiving
+            connected = [c for c in clients if not c.rejected and not c.task.done()]
+            rss = backend.memory_kb()["VmRSS"]
+            latencies = [v for c in connected for v in c.latencies]
+            frames = [len(c.latencies) for c in connected]
+            step = {
+                "clients": level,
+                "connected": len(connected),
+                "rejected": sum(1 for c in clients if c.rejected),
+                "broadcast_latency": summarize(latencies),
+                "frames_per_client": summarize(frames),
+                "backend_rss_kb": rss,
+                "kb_per_connection": (rss - rss_idle) / len(connected) if connected else 0.0,
+                "backend_cpu_per_second": (backend.cpu_seconds() - cpu_before) / args.soak,
+            }
+            steps.append(step)
+            log.info(
+                "clients=%d connected=%d rejected=%d p99=%.1fms rss=%dkB (%.1f kB/conn)",
+                level, step["connected"], step["rejected"], step["broadcast_latency"]["p99"] * 1000,
+                rss, step["kb_per_connection"],
+            )
+    finally:
+        for client in clients:
+            if client.ws is not None:
+                await client.ws.close()
+            if client.task is not None:
+                client.task.cancel()
+        if backend is not None:
+            backend.stop()
+        app.stop()
+        fake.cleanup()
+
+    return {
+        "bench": BENCH_NAME,
+        "settings": {k: v for k, v in env.items() if k.startswith("LSMY_WS_")},
+        "backend_idle_rss_kb": rss_idle,
+        "steps": steps,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", default="25,50,100,200", help="Client counts to step through")
+    parser.add_argument("--ramp-batch", type=int, default=25, help="Clients opened concurrently")
+    parser.add_argument("--soak", type=float, default=5.0, help="Seconds measured at each level")
+    parser.add_argument("--interval", type=float, default=0.5, help="Backend telemetry interval")
+    parser.add_argument("--port", type=int, default=18766, help="Backend WebSocket port")
+    parser.add_argument("--max-clients", type=int, default=1000, help="Backend admission limit")
+    parser.add_argument("--compression", choices=["deflate", "none"], default="deflate")
+    parser.add_argument("--window-bits", type=int, default=12, help="permessage-deflate window bits")
+    parser.add_argument("--mem-level", type=int, default=5, help="permessage-deflate zlib memLevel")
+    parser.add_argument("--no-context-takeover", action="store_true", help="Reset compressor per message")
+    parser.add_argument("--ping-interval", type=float, default=20.0, help="Keepalive ping interval (0 = off)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Start-up timeout (seconds)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero on regression vs baseline")
+    parser.add_argument("--verbose", action="store_true", help="Show application output")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    try:
+        import websockets  # noqa: F401
+    except ImportError:
+        log.error("ws_scale needs the websockets package")
+        return 2
+
+    result = asyncio.run(_run(args))
+    last = result["steps"][-1]
+    result["metrics"] = {
+        "broadcast_p99": last["broadcast_latency"]["p99"],
+        "kb_per_connection": last["kb_per_connection"],
+        "cpu_per_second": last["backend_cpu_per_second"],
+    }
+    print(json.dumps(result, indent=2))
+
+    if args.save_baseline:
+        save_baseline(BENCH_NAME, result)
+
+    if args.check:
+        regressions = compare_to_baseline(BENCH_NAME, result["metrics"], args.tolerance)
+        for line in regressions:
+            log.error("Regression: %s", line)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
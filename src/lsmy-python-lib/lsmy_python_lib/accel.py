@@ -0,0 +1,252 @@
+import os
+import sys
+import ctypes
+import logging
+from array import array
+from collections import deque
+
+# ====== LAZY LOADER LIBRARY ======
+from lsmy_python_lib.lazy_loader import NativeLibrary
+
+log = logging.getLogger("accel")
+
+ACCEL_LIB_PATH = os.environ.get("LSMY_ACCEL_LIB", "/usr/lib/liblsmy_accel.so.1")
+
+# Set to False to force the pure Python implementations
+USE_NATIVE = True
+
+# Pointers are passed as plain addresses; ctypes.CDLL releases the GIL during each call
+_ptr = ctypes.c_void_p
+_size = ctypes.c_size_t
+
+lib = NativeLibrary(ACCEL_LIB_PATH, {
+    "lsmy_crc16_modbus": (ctypes.c_uint16, [_ptr, _size]),
+    "lsmy_decode_float_block": (_size, [_ptr, _size, ctypes.c_int, _ptr]),
+    "lsmy_rolling_stats": (_size, [_ptr, _size, _size, _ptr, _ptr, _ptr]),
+})
+
+_native_state = None
+
+
+def native_available() -> bool:
+    """
+    True if liblsmy_accel can be loaded. The result is cached.
+    """
+    global _native_state
+    if _native_state is None:
+        try:
+            lib.lsmy_crc16_modbus
+            _native_state = True
+        except OSError as e:
+            log.warning("Native accel library unavailable, using Python fallback: %s", e)
+            _native_state = False
+    return _native_state
+
+
+def _use_native() -> bool:
+    return USE_NATIVE and native_available()
+
+
+# -------------------------
+# Buffer helpers
+# -------------------------
+class _Buffer:
+    """
+    Borrow a C pointer to a contiguous buffer without copying.
+
+    array.array exposes its address directly, other writable buffers
+    (bytearray, NumPy) are mapped with from_buffer and bytes objects
+    expose their internal storage through c_char_p. Other read-only
+    buffers fall back to a single copy.
+    """
+
+    def __init__(self, obj):
+        self._keep = obj
+
+        if isinstance(obj, array):
+            self.address, length = obj.buffer_info()
+            self.nbytes = length * obj.itemsize
+            return
+
+        view = memoryview(obj)
+        if not view.contiguous:
+            raise ValueError("Buffer must be contiguous")
+        self.nbytes = view.nbytes
+
+        if isinstance(obj, bytes):
+            self.address = ctypes.cast(ctypes.c_char_p(obj), ctypes.c_void_p).value
+        elif not view.readonly:
+            self._keep = (ctypes.c_char * self.nbytes).from_buffer(view.cast("B"))
+            self.address = ctypes.addressof(self._keep)
+        else:
+            self._keep = (ctypes.c_char * self.nbytes).from_buffer_copy(view.cast("B"))
+            self.address = ctypes.addressof(self._keep)
+
+
+def _zeros(typecode, count):
+    return array(typecode, [0]) * count
+
+
+def _as_doubles(values):
+    """
+    Return values as a float64 buffer, reusing it if it already is one.
+    """
+    try:
+        view = memoryview(values)
+        if view.format == "d" and view.contiguous:
+            return values
+    except TypeError:
+        pass
+    return array("d", values)
+
+
+# -------------------------
+# Modbus CRC16
+# -------------------------
+def _crc16_table():
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+_CRC16_TABLE = _crc16_table()
+
+
+def crc16_modbus_py(data) -> int:
+    crc = 0xFFFF
+    for byte in memoryview(data).cast("B"):
+        crc = (crc >> 8) ^ _CRC16_TABLE[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def crc16_modbus(data) -> int:
+    """
+    Modbus RTU CRC16 of a bytes-like object.
+    """
+    if not _use_native():
+        return crc16_modbus_py(data)
+    buf = _Buffer(data)
+    return lib.lsmy_crc16_modbus(buf.address, buf.nbytes)
+
+
+# -------------------------
+# Register block decoding
+# -------------------------
+def decode_float_block(data, word_swap: bool = False) -> array:
+    """
+    Decode big-endian Modbus registers (two per value) into float32.
+
+    Pure array operations (memcpy + byteswap) already run at C speed and
+    beat the ctypes call overhead, so this is the default path;
+    decode_float_block_native is kept for parity checks and benchmarks.
+
+    :param data: Raw register bytes as received from the bus
+    :param word_swap: Low register first (CDAB order)
+    :return: array('f') of decoded values
+    """
+    raw = memoryview(data).cast("B")
+    raw = raw[:len(raw) // 4 * 4]
+    if word_swap:
+        # Swap register pairs without interpreting them
+        words = array("H")
+        words.frombytes(raw)
+        words[0::2], words[1::2] = words[1::2], words[0::2]
+        raw = words.tobytes()
+
+    # Reinterpret bits directly, a struct round trip through double would alter NaN payloads
+    out = array("f")
+    out.frombytes(raw)
+    if sys.byteorder == "little":
+        out.byteswap()
+    return out
+
+
+def decode_float_block_native(data, word_swap: bool = False) -> array:
+    """
+    liblsmy_accel implementation of decode_float_block.
+    """
+    buf = _Buffer(data)
+    out = _zeros("f", buf.nbytes // 4)
+    lib.lsmy_decode_float_block(buf.address, buf.nbytes, int(word_swap), out.buffer_info()[0])
+    return out
+
+
+# -------------------------
+# Rolling-window statistics
+# -------------------------
+def rolling_stats_py(values, window: int):
+    values = _as_doubles(values)
+    n = len(values)
+    if window <= 0 or window > n:
+        return array("d"), array("d"), array("d")
+
+    count = n - window + 1
+    means = _zeros("d", count)
+    mins = _zeros("d", count)
+    maxs = _zeros("d", count)
+
+    total = 0.0
+    for i in range(window):
+        total += values[i]
+
+    # Monotonic deques of indexes, O(n) whatever the window: the front is
+    # the earliest minimum (maximum) of the window, as in the C scan
+    lows, highs = deque(), deque()
+    for i in range(n):
+        value = values[i]
+        while lows and values[lows[-1]] > value:
+            lows.pop()
+        lows.append(i)
+        while highs and values[highs[-1]] < value:
+            highs.pop()
+        highs.append(i)
+
+        start = i - window + 1
+        if start < 0:
+            continue
+        if lows[0] < start:
+            lows.popleft()
+        if highs[0] < start:
+            highs.popleft()
+        if start > 0:
+            # Same operation order as the C implementation
+            total += value
+            total -= values[start - 1]
+        means[start] = total / window
+        mins[start] = values[lows[0]]
+        maxs[start] = values[highs[0]]
+
+    return means, mins, maxs
+
+
+def rolling_stats(values, window: int):
+    """
+    Rolling-window mean/min/max.
+
+    :param values: float64 buffer (array('d'), NumPy float64) or any iterable
+    :param window: Window length in samples
+    :return: (means, mins, maxs) as array('d'), each len(values) - window + 1 long
+    """
+    if not _use_native():
+        return rolling_stats_py(values, window)
+
+    values = _as_doubles(values)
+    n = len(values)
+    if window <= 0 or window > n:
+        return array("d"), array("d"), array("d")
+
+    count = n - window + 1
+    means = _zeros("d", count)
+    mins = _zeros("d", count)
+    maxs = _zeros("d", count)
+
+    src = _Buffer(values)
+    lib.lsmy_rolling_stats(
+        src.address, n, window,
+        means.buffer_info()[0], mins.buffer_info()[0], maxs.buffer_info()[0],
+    )
+    return means, mins, maxs
@@ -1,46 +1,70 @@
-from periphery import GPIO
-import time
+import os
+import json
 import logging
 
-# ====== WIFI MODE LIBRARY ======
-from lsmy_python_lib.wifi_mode_manager import WiFiModeManager
+# ====== INPUT EVENTS LIBRARY ======
+from lsmy_python_lib.input_events import InputEventManager, ButtonConfig, INPUT_CHIP
 
-# ====== WIFI CONFIG LIBRARY ======
-from lsmy_python_lib.wifi_config_manager import reset_wifi_config
+# ====== CONFIG LIBRARY ======
+from lsmy_python_lib.config import CONFIG
 
 log = logging.getLogger("button-handler")
 
-BUTTON_PIN = 17
-
-def execute_full_reset(wifi_manager: WiFiModeManager):
-    log.warning("!!! STARTING FACTORY RESET !!!")
-
-    # Clear WiFi configurations
-    reset_wifi_config()
-    # Disconnect WiFi
-    wifi_manager.cleanup_wifi()
-
-    log.info("Reset complete. WiFi disconnected and Config cleared.")
-
-def monitor_button_reset(wifi_manager: WiFiModeManager):
-    try:
-        button = GPIO(BUTTON_PIN, "in")
-        button.edge = "both"
-        
-        press_start = 0
-        log.info(f"Button monitor active on GPIO {BUTTON_PIN}")
-
-        while True:
-            if button.poll(timeout=None):
-                state = button.read()
-                
-                if state == False:
-                    press_start = time.time()
-                else:
-                    if press_start > 0:
-                        duration = time.time() - press_start
-                        if duration >= 3.0:
-                            execute_full_reset(wifi_manager)
-                        press_start = 0
-    except Exception as e:
-        log.error(f"GPIO Error: {e}")
\ No newline at end of file
+BUTTON_CHIP = INPUT_CHIP
+
+# Optional JSON list of buttons; actions name operation kinds, e.g.
+#   [{"line": 17, "name": "reset", "long_press": 3, "actions": {"long": "factory_reset"}},
+#    {"line": 27, "name": "service", "actions": {"double": "restart_wifi"}}]
+BUTTONS_FILE = CONFIG.buttons.file
+
+# Operations that take no parameters and can be bound to a gesture
+BUTTON_OPERATIONS = ("factory_reset", "restart_wifi", "switch_to_ap", "switch_to_sta")
+
+# InputEventManager of monitor_buttons, for injecting replayed edges
+INPUTS = None
+
+def _button_actions(operations) -> dict:
+    # Buttons only queue operations; the work runs on the operation queue
+    def _submit(kind):
+        async def action():
+            operations.submit(kind)
+        return action
+
+    return {name: _submit(name) for name in BUTTON_OPERATIONS if name in operations.kinds}
+
+def load_buttons(path: str = None) -> list:
+    path = path or BUTTONS_FILE
+    if not os.path.exists(path):
+        # Reset button from the [buttons] configuration section
+        buttons = CONFIG.buttons
+        return [
+            {"line": buttons.reset_pin, "name": "reset", "long_press": buttons.reset_hold_seconds,
+             "actions": {"long": "factory_reset"}},
+        ]
+    with open(path, "r") as f:
+        return json.load(f)
+
+async def monitor_buttons(operations):
+    """
+    Serve every configured button from one InputEventManager on the
+    running event loop. Reset is the long-press action of the configured
+    reset pin (GPIO 17) unless the buttons file says otherwise; any
+    registered operation kind can be bound to a gesture.
+
+    :param operations: OperationQueue the button actions submit to
+    """
+    global INPUTS
+    registry = _button_actions(operations)
+    inputs = INPUTS = InputEventManager(BUTTON_CHIP)
+
+    for entry in load_buttons():
+        entry = dict(entry)
+        actions = {}
+        for gesture, name in entry.pop("actions", {}).items():
+            if name not in registry:
+                log.error("Unknown button action %s, ignored", name)
+                continue
+            actions[gesture] = registry[name]
+        inputs.add_button(ButtonConfig(**entry), **actions)
+
+    await inputs.run()
@@ -2,8 +2,28 @@ import time
 import logging
 import subprocess
 
+# ====== METRICS LIBRARY ======
+from lsmy_python_lib.metrics import METRICS
+
+# ====== CONFIG LIBRARY ======
+from lsmy_python_lib.config import CONFIG
+
 log = logging.getLogger("command-runner")
 
+# Per-executable metrics, created on first use
+_CMD_METRICS = {}
+
+def _cmd_metrics(program: str):
+    metrics = _CMD_METRICS.get(program)
+    if metrics is None:
+        labels = {"program": program}
+        metrics = (
+            METRICS.histogram("lsmy_cmd_duration_seconds", "run_cmd wall time", labels),
+            METRICS.counter("lsmy_cmd_failures_total", "run_cmd non-zero exits and errors", labels),
+        )
+        _CMD_METRICS[program] = metrics
+    return metrics
+
 def run_cmd(cmd: list[str], check: bool = True):
     """
     Run a system command with logging.
@@ -13,9 +33,19 @@ def run_cmd(cmd: list[str], check: bool = True):
     :return: True if command succeeds, False otherwise
     """
     log.debug("Running command: %s", " ".join(cmd))
-    result = subprocess.run(cmd, check=check, capture_output=True, text=True,)
+    duration, failures = _cmd_metrics(cmd[0])
+
+    start = time.perf_counter()
+    try:
+        result = subprocess.run(cmd, check=check, capture_output=True, text=True,)
+    except Exception:
+        failures.inc()
+        raise
+    finally:
+        duration.observe(time.perf_counter() - start)
 
     if result.returncode != 0:
+        failures.inc()
         log.error(
             "Command failed (%d): %s | stderr=%s",
             result.returncode,
@@ -25,14 +55,17 @@ def run_cmd(cmd: list[str], check: bool = True):
 
     return result.returncode == 0
 
-def run_cmd_with_retry(cmd: list[str], retries: int = 3, delay: float = 2.0,):
+def run_cmd_with_retry(cmd: list[str], retries: int = None, delay: float = None,):
     """
     Run a command with retry mechanism.
 
     :param cmd: Command as list of strings
-    :param retries: Number of retry attempts
-    :param delay: Delay between retries (seconds)
+    :param retries: Number of retry attempts (default: commands.retries)
+    :param delay: Delay between retries in seconds (default: commands.retry_delay)
     """
+    settings = CONFIG.commands
+    retries = settings.retries if retries is None else retries
+    delay = settings.retry_delay if delay is None else delay
     for attempt in range(1, retries + 1):
         log.info(
             "Exec (attempt %d/%d): %s",
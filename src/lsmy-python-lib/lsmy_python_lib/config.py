@@ -0,0 +1,507 @@
+import os
+import asyncio
+import logging
+import threading
+import time
+from pathlib import Path
+
+try:
+    import tomllib
+except ImportError:     # Python < 3.11
+    tomllib = None
+
+# ====== METRICS LIBRARY ======
+from lsmy_python_lib.metrics import METRICS
+
+log = logging.getLogger("config")
+
+# TOML (or YAML with PyYAML installed), one table per section, e.g.
+#   [app]
+#   main_loop_interval = 2.0
+#   [wifi]
+#   connect_timeout = 20
+CONFIG_FILE = os.environ.get("LSMY_CONFIG", "/etc/lsmy/lsmy.toml")
+CONFIG_POLL_INTERVAL = float(os.environ.get("LSMY_CONFIG_POLL", "5"))  # Seconds between file change checks
+
+RELOADS = {
+    result: METRICS.counter("lsmy_config_reloads_total", "Configuration reloads", {"result": result})
+    for result in ("applied", "unchanged", "rejected")
+}
+GENERATION = METRICS.gauge("lsmy_config_generation", "Configuration changes applied since start")
+
+
+class ConfigError(ValueError):
+    """
+    Configuration file unreadable or not matching the schema.
+
+    :param problems: One message per offending setting
+    """
+
+    def __init__(self, problems: list):
+        self.problems = list(problems)
+        super().__init__("; ".join(self.problems))
+
+
+class Field:
+    """
+    One setting of the schema.
+
+    :param kind: bool, int, float or str
+    :param default: Value when neither the file nor `env` set it
+    :param env: Environment variable that overrides the file
+    :param min: Smallest allowed value (numbers)
+    :param max: Largest allowed value (numbers)
+    :param choices: Allowed values
+    :param restart: Only read at startup; a reload keeps the running value
+    """
+
+    __slots__ = ("kind", "default", "env", "min", "max", "choices", "restart")
+
+    def __init__(self, kind: type, default, env: str = None, min=None, max=None, choices=None,
+                 restart: bool = False):
+        self.kind = kind
+        self.default = default
+        self.env = env
+        self.min = min
+        self.max = max
+        self.choices = choices
+        self.restart = restart
+
+    def parse(self, text: str):
+        """
+        Value from an environment variable.
+        """
+        if self.kind is bool:
+            lowered = text.strip().lower()
+            if lowered not in ("1", "true", "yes", "on", "0", "false", "no", "off"):
+                raise ValueError(f"expected a boolean, got {text!r}")
+            return self.check(lowered in ("1", "true", "yes", "on"))
+        try:
+            value = self.kind(text)
+        except (TypeError, ValueError):
+            raise ValueError(f"expected {self.kind.__name__}, got {text!r}")
+        return self.check(value)
+
+    def check(self, value):
+        """
+        Value from the file (already typed by the parser).
+        """
+        if isinstance(value, bool) and self.kind is not bool:
+            raise ValueError(f"expected {self.kind.__name__}, got {value!r}")
+        if self.kind is float and isinstance(value, int):
+            value = float(value)
+        if not isinstance(value, self.kind):
+            raise ValueError(f"expected {self.kind.__name__}, got {value!r}")
+        if self.min is not None and value < self.min:
+            raise ValueError(f"must be >= {self.min}, got {value!r}")
+        if self.max is not None and value > self.max:
+            raise ValueError(f"must be <= {self.max}, got {value!r}")
+        if self.choices is not None and value not in self.choices:
+            raise ValueError(f"must be one of {', '.join(map(str, self.choices))}, got {value!r}")
+        return value
+
+
+# Section -> setting -> Field. Environment variables that configured the
+# same settings before the file existed keep working (and win over it).
+SCHEMA = {
+    "app": {
+        "main_loop_interval": Field(float, 5.0, env="LSMY_MAIN_LOOP_INTERVAL", min=0.1),
+        "wifi_scan_interval": Field(float, 60.0, min=1.0),
+        "model_poll_interval": Field(float, 30.0, min=1.0),
+        "main_loop_stall": Field(float, 180.0, env="LSMY_MAIN_LOOP_STALL", min=10.0, restart=True),
+        "executor_workers": Field(int, 3, min=1, max=32, restart=True),
+        "shutdown_timeout": Field(float, 15.0, min=1.0),
+        "metrics_port": Field(int, 0, env="LSMY_METRICS_PORT", min=0, max=65535, restart=True),   # 0 disables /metrics
+        "loop_lag_threshold": Field(float, 0.5, env="LSMY_LOOP_LAG_THRESHOLD", min=0.01, restart=True),
+    },
+    "ipc": {
+        "sock": Field(str, "/run/lsmy/provision.sock", env="LSMY_IPC_SOCK", restart=True),
+        "telemetry_history": Field(int, 3600, env="LSMY_TELEMETRY_HISTORY", min=1, restart=True),
+    },
+    "wifi": {
+        "connect_timeout": Field(float, 10.0, min=1.0),        # Association (wpa_state=COMPLETED)
+        "interface_timeout": Field(int, 10, min=1),            # wlan0 to reappear after stopping wpa_supplicant
+        "service_retries": Field(int, 5, min=1),               # hostapd / dnsmasq start attempts
+        "service_retry_delay": Field(float, 2.0, min=0.0),
+        "attempt_timeout": Field(float, 4.0, min=0.5),         # Per candidate association (connect())
+        "max_attempts": Field(int, 3, min=1),                  # Candidates tried before falling back to AP mode
+    },
+    "commands": {
+        "retries": Field(int, 3, min=1),                       # run_cmd_with_retry defaults
+        "retry_delay": Field(float, 2.0, min=0.0),
+    },
+    "buttons": {
+        "reset_pin": Field(int, 17, min=0, restart=True),
+        "reset_hold_seconds": Field(float, 3.0, min=0.1, restart=True),
+        "file": Field(str, "/etc/lsmy/buttons.json", env="LSMY_BUTTONS", restart=True),   # Button / gesture list, overrides reset_pin
+    },
+    "relays": {
+        "rules_file": Field(str, "/etc/lsmy/relay_rules.json", env="LSMY_RELAY_RULES", restart=True),
+    },
+    "models": {
+        "dir": Field(str, "/usr/share/lsmy/models", env="LSMY_MODEL_DIR", restart=True),
+        "inference_threads": Field(int, 0, env="LSMY_INFERENCE_THREADS", min=0, max=64, restart=True),  # Per session, 0: cores / workers
+    },
+    "web": {
+        "ws_port": Field(int, 8765, env="LSMY_WS_PORT", min=1, max=65535, restart=True),
+        "telemetry_interval": Field(float, 5.0, env="LSMY_TELEMETRY_INTERVAL", min=0.1),
+        "metrics_port": Field(int, 0, env="LSMY_BACKEND_METRICS_PORT", min=0, max=65535, restart=True),
+        "debug_sock": Field(str, "/run/lsmy/backend-debug.sock", env="LSMY_BACKEND_DEBUG_SOCK", restart=True),  # "" disables profiling IPC
+        "ws_max_clients": Field(int, 64, env="LSMY_WS_MAX_CLIENTS", min=1, restart=True),
+        "ws_ping_interval": Field(float, 20.0, env="LSMY_WS_PING_INTERVAL", min=0.0, restart=True),   # 0 disables
+        "ws_ping_timeout": Field(float, 20.0, env="LSMY_WS_PING_TIMEOUT", min=0.0, restart=True),
+        "ws_max_message": Field(int, 64 * 1024, env="LSMY_WS_MAX_MESSAGE", min=1024, restart=True),
+        "ws_max_queue": Field(int, 4, env="LSMY_WS_MAX_QUEUE", min=1, restart=True),
+        "ws_slow_buffer": Field(int, 64 * 1024, env="LSMY_WS_SLOW_BUFFER", min=0),  # Unsent bytes that skip a client
+        "ws_compression": Field(str, "deflate", env="LSMY_WS_COMPRESSION", choices=("deflate", "none"), restart=True),
+        "ws_deflate_window_bits": Field(int, 12, env="LSMY_WS_DEFLATE_WINDOW_BITS", min=9, max=15, restart=True),
+        "ws_deflate_mem_level": Field(int, 5, env="LSMY_WS_DEFLATE_MEM_LEVEL", min=1, max=9, restart=True),
+        "ws_deflate_no_context": Field(bool, False, env="LSMY_WS_DEFLATE_NO_CONTEXT", restart=True),
+    },
+    "gateway": {
+        "listen": Field(str, "", env="LSMY_GATEWAY_LISTEN", restart=True),       # "host:port": act as the site gateway
+        "upstream": Field(str, "", env="LSMY_GATEWAY_UPSTREAM", restart=True),   # "host:port": forward telemetry to a gateway
+        "node_id": Field(str, "", env="LSMY_NODE_ID", restart=True),             # "": host name
+        "site_id": Field(str, "lab", env="LSMY_SITE_ID", restart=True),
+        "max_nodes": Field(int, 64, env="LSMY_GATEWAY_MAX_NODES", min=1, restart=True),
+        "batch_interval": Field(float, 5.0, env="LSMY_GATEWAY_BATCH_INTERVAL", min=0.1, restart=True),
+    },
+    "tracker": {
+        "detect_every": Field(int, 3, env="LSMY_DETECT_EVERY", min=1, restart=True),     # Detector on every Nth frame
+        "count_line": Field(float, 0.5, env="LSMY_COUNT_LINE", min=0.0, max=1.0, restart=True),  # Fraction of the frame height
+    },
+    "fatigue": {
+        "detect_scale": Field(int, 4, env="LSMY_FATIGUE_DETECT_SCALE", min=1, restart=True),   # Face detector sees every Nth pixel
+        "detect_every": Field(int, 5, env="LSMY_FATIGUE_DETECT_EVERY", min=1, restart=True),
+    },
+    "duty_cycle": {
+        "sensor_period": Field(float, 5.0, min=0.1),           # Baseline sensor polling
+        "sensor_period_alert": Field(float, 1.0, min=0.1),     # A channel is heading for its alarm threshold
+        "inference_period": Field(float, 1.0, min=0.05),       # Room occupied (or unknown)
+        "inference_period_idle": Field(float, 10.0, min=0.05), # Room empty
+        "camera_fps": Field(float, 10.0, min=0.1),
+        "camera_fps_idle": Field(float, 1.0, min=0.1),
+        "cpu_budget": Field(float, 0.25, env="LSMY_CPU_BUDGET", min=0.01, max=4.0),  # Fraction of one core
+    },
+}
+
+
+class Section:
+    """
+    Compiled settings of one section: read-only attributes in slots, so
+    a hot path pays one attribute lookup per setting.
+    """
+
+    __slots__ = ()
+    NAME = ""
+    FIELDS = {}
+
+    def __init__(self, values: dict):
+        for key in self.FIELDS:
+            object.__setattr__(self, key, values[key])
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"Configuration section {self.NAME} is read-only")
+
+    def __delattr__(self, key):
+        raise AttributeError(f"Configuration section {self.NAME} is read-only")
+
+    def __eq__(self, other):
+        return type(other) is type(self) and self.as_dict() == other.as_dict()
+
+    def __hash__(self):
+        return hash(tuple(self.as_dict().items()))
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{k}={v!r}' for k, v in self.as_dict().items())})"
+
+    def as_dict(self) -> dict:
+        return {key: getattr(self, key) for key in self.FIELDS}
+
+    def replace(self, **values) -> "Section":
+        return type(self)(dict(self.as_dict(), **values))
+
+
+# One slotted class per section: AppConfig, IpcConfig, ...
+SECTION_TYPES = {
+    name: type(
+        "".join(part.title() for part in name.split("_")) + "Config",
+        (Section,),
+        {"__slots__": tuple(fields), "NAME": name, "FIELDS": fields},
+    )
+    for name, fields in SCHEMA.items()
+}
+
+
+def compile_config(raw: dict, environ=os.environ) -> dict:
+    """
+    Validate parsed file contents against SCHEMA and build the sections.
+    Every problem is collected, so one error lists all offending settings.
+
+    :param raw: Section -> {setting: value} as parsed from the file
+    :return: Section name -> Section
+    :raises ConfigError: Unknown sections / settings, wrong types, out of range
+    """
+    problems = []
+    if not isinstance(raw, dict):
+        raise ConfigError([f"expected sections at the top level, got {type(raw).__name__}"])
+    problems += [f"{name}: unknown section" for name in raw if name not in SCHEMA]
+
+    sections = {}
+    for name, fields in SCHEMA.items():
+        given = raw.get(name) or {}
+        if not isinstance(given, dict):
+            problems.append(f"{name}: expected a table of settings")
+            given = {}
+        problems += [f"{name}.{key}: unknown setting" for key in given if key not in fields]
+
+        values = {}
+        for key, field in fields.items():
+            try:
+                if field.env and environ.get(field.env):
+                    values[key] = field.parse(environ[field.env])
+                elif key in given:
+                    values[key] = field.check(given[key])
+                else:
+                    values[key] = field.default
+            except ValueError as e:
+                source = f" ({field.env})" if field.env and environ.get(field.env) else ""
+                problems.append(f"{name}.{key}{source}: {e}")
+                values[key] = field.default
+        sections[name] = SECTION_TYPES[name](values)
+
+    if problems:
+        raise ConfigError(problems)
+    return sections
+
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _identity(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def parse_file(path: str) -> dict:
+    """
+    :return: Parsed file contents ({} if the file does not exist)
+    :raises ConfigError: Unreadable file or unsupported format
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return {}
+    except OSError as e:
+        raise ConfigError([f"{path}: {e}"])
+
+    suffix = Path(path).suffix
+    try:
+        if suffix == ".toml":
+            if tomllib is None:
+                raise ConfigError([f"{path}: TOML needs Python 3.11 or later"])
+            return tomllib.loads(data.decode())
+        if suffix in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise ConfigError([f"{path}: PyYAML is not installed"])
+            return yaml.safe_load(data) or {}
+    except ConfigError:
+        raise
+    except Exception as e:
+        raise ConfigError([f"{path}: {e}"])
+    raise ConfigError([f"{path}: unsupported format {suffix!r} (.toml, .yaml, .yml)"])
+
+
+class RuntimeConfig:
+    """
+    Process configuration, one attribute per section:
+
+        CONFIG.app.main_loop_interval
+
+    Built from defaults, the file and the environment when the module is
+    imported. reload() compiles the file again and swaps in only the
+    sections that changed; subscribers of those sections are told, the
+    rest of the process does not notice. Readers that need several
+    settings of a section to agree keep a reference to the section
+    instead of going through CONFIG twice.
+
+    A file that does not validate is rejected as a whole and the running
+    configuration stays. Settings marked restart in SCHEMA (sockets,
+    ports, GPIO lines, thread pools) keep their startup value until the
+    process restarts.
+
+    reload() may run on any thread (SIGHUP handler, file watcher, IPC, a
+    worker); listeners that touch loop objects subscribe with their loop
+    and are called on it.
+
+    :param path: TOML / YAML file
+    """
+
+    def __init__(self, path: str = CONFIG_FILE, environ=os.environ):
+        self.path = path
+        self._environ = environ
+        self._lock = threading.Lock()
+        self._listeners = {name: [] for name in SCHEMA}
+        self._identity = None
+        self.pending_restart = {}       # "section.setting" -> file value not applied
+        self.generation = 0
+        self.loaded_at = None
+
+        # Always usable, even when the file is rejected
+        try:
+            self.__dict__.update(compile_config({}, environ))
+        except ConfigError as e:
+            log.error("Configuration environment rejected, using defaults: %s", e)
+            self.__dict__.update(compile_config({}, {}))
+        try:
+            self.load()
+        except ConfigError as e:
+            log.error("Configuration %s rejected, using defaults: %s", path, e)
+
+    def load(self):
+        """
+        Read the whole file and apply every section (startup).
+        """
+        with self._lock:
+            self._identity = _identity(self.path)
+            sections = compile_config(parse_file(self.path), self._environ)
+            self.__dict__.update(sections)
+            self.loaded_at = time.time()
+        if self._identity is None:
+            log.info("No configuration file at %s, using defaults", self.path)
+        else:
+            log.info("Configuration loaded from %s", self.path)
+
+    def reload(self) -> list:
+        """
+        Compile the file again and apply the sections that changed.
+
+        :return: Names of the sections that changed
+        :raises ConfigError: The file was rejected (nothing changed)
+        """
+        with self._lock:
+            self._identity = _identity(self.path)
+            try:
+                sections = compile_config(parse_file(self.path), self._environ)
+            except ConfigError:
+                RELOADS["rejected"].inc()
+                raise
+
+            changed, pending = [], {}
+            for name, section in sections.items():
+                old = getattr(self, name)
+                held = {}
+                for key, field in section.FIELDS.items():
+                    if field.restart and getattr(section, key) != getattr(old, key):
+                        held[key] = getattr(old, key)
+                        pending[f"{name}.{key}"] = getattr(section, key)
+                if held:
+                    section = section.replace(**held)
+                if section != old:
+                    setattr(self, name, section)
+                    changed.append((name, old, section))
+
+            new_pending = {k: v for k, v in pending.items() if self.pending_restart.get(k) != v}
+            self.pending_restart = pending
+            if changed:
+                self.generation += 1
+                self.loaded_at = time.time()
+
+        for key, value in new_pending.items():
+            log.warning("Configuration %s = %r takes effect after a restart", key, value)
+        if not changed:
+            RELOADS["unchanged"].inc()
+            return []
+
+        RELOADS["applied"].inc()
+        GENERATION.set(self.generation)
+        log.info("Configuration reloaded from %s: %s", self.path, ", ".join(
+            f"{name}.{key} {getattr(old, key)!r} -> {getattr(new, key)!r}"
+            for name, old, new in changed for key in new.FIELDS if getattr(old, key) != getattr(new, key)
+        ))
+        for name, old, new in changed:
+            for callback, loop in self._listeners[name]:
+                if loop is None or _running_loop() is loop:
+                    self._notify(name, callback, old, new)
+                    continue
+                try:
+                    loop.call_soon_threadsafe(self._notify, name, callback, old, new)
+                except RuntimeError:
+                    log.warning("Configuration listener for %s skipped: its loop is closed", name)
+        return [name for name, _, _ in changed]
+
+    @staticmethod
+    def _notify(name: str, callback, old, new):
+        try:
+            callback(old, new)
+        except Exception:
+            log.exception("Configuration listener for %s failed", name)
+
+    def request_reload(self, reason: str):
+        """
+        reload() that logs a rejected file instead of raising (SIGHUP
+        handler, file watcher).
+        """
+        log.info("Reloading configuration (%s)", reason)
+        try:
+            self.reload()
+        except ConfigError as e:
+            log.error("Configuration %s rejected, keeping the running one: %s", self.path, e)
+
+    def subscribe(self, section: str, callback, loop=None):
+        """
+        Call callback(old, new) after `section` changed on reload.
+
+        :param loop: Event loop the callback runs on (scheduled with
+                     call_soon_threadsafe when reload() runs elsewhere);
+                     None: the thread that called reload()
+        """
+        if section not in self._listeners:
+            raise ValueError(f"Unknown configuration section: {section}")
+        self._listeners[section].append((callback, loop))
+
+    def changed_on_disk(self) -> bool:
+        return _identity(self.path) != self._identity
+
+    async def watch(self, interval: float = CONFIG_POLL_INTERVAL):
+        """
+        Reload when the file is written, replaced, created or removed.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            if self.changed_on_disk():
+                self.request_reload("file changed")
+
+    def snapshot(self) -> dict:
+        return {
+            "path": self.path,
+            "generation": self.generation,
+            "loaded_at": self.loaded_at,
+            "sections": {name: getattr(self, name).as_dict() for name in SCHEMA},
+            "pending_restart": dict(self.pending_restart),
+        }
+
+    async def handle(self, req: dict) -> dict:
+        """
+        IPC commands: get_config, reload_config.
+        """
+        if req.get("cmd") == "reload_config":
+            try:
+                changed = self.reload()
+            except ConfigError as e:
+                return {"status": "error", "error": str(e), "problems": e.problems}
+            return {"status": "ok", "data": dict(self.snapshot(), changed=changed)}
+        return {"status": "ok", "data": self.snapshot()}
+
+
+CONFIG = RuntimeConfig()
@@ -0,0 +1,255 @@
+import time
+import logging
+from collections import deque
+
+# ====== METRICS LIBRARY ======
+from lsmy_python_lib.metrics import METRICS
+
+# ====== TELEMETRY PIPELINE LIBRARY ======
+from lsmy_python_lib.telemetry_pipeline import DEFAULT_CHANNELS
+
+# ====== CONFIG LIBRARY ======
+from lsmy_python_lib.config import CONFIG
+
+log = logging.getLogger("duty-cycle")
+
+# Periods (seconds between runs) per activity level and the CPU budget
+# are the [duty_cycle] configuration section, read on every re-plan
+
+TREND_WINDOW = 12               # Samples per channel used for the trend
+TREND_HORIZON = 600.0           # Alert when the trend reaches an alarm threshold within this many seconds
+CALM_HOLD = 60.0                # Seconds without alert before returning to the baseline
+EMPTY_HOLD = 60.0               # Seconds of zero people before the room counts as empty
+
+# Cost per run (CPU seconds, millijoules) until measured; camera cost is per frame
+DEFAULT_COSTS = {
+    "sensors": (0.005, 2.0),
+    "inference": (0.15, 400.0),
+    "publish": (0.01, 20.0),
+    "camera": (0.004, 30.0),
+}
+COST_SMOOTHING = 0.2            # EWMA weight of a new CPU measurement
+COST_REPLAN_CHANGE = 0.1        # Relative cost change since the last plan that re-plans
+
+TASKS = ("sensors", "inference", "publish")
+
+
+def _slope(points) -> float:
+    """
+    Least-squares slope (value per second) of [(ts, value)].
+    """
+    n = len(points)
+    mean_t = sum(t for t, _ in points) / n
+    mean_v = sum(v for _, v in points) / n
+    var = sum((t - mean_t) ** 2 for t, _ in points)
+    if var == 0:
+        return 0.0
+    return sum((t - mean_t) * (v - mean_v) for t, v in points) / var
+
+
+class DutyCycleScheduler:
+    """
+    Chooses how often sensing, inference and publishing run, from what
+    is already flowing through the system:
+
+    - telemetry samples: a channel whose recent trend reaches its alarm
+      threshold (pipeline ChannelConfig) within TREND_HORIZON switches
+      sensor polling to sensor_period_alert, until CALM_HOLD without alert
+    - people counting: EMPTY_HOLD of zero counts lowers camera FPS and
+      inference frequency; anyone detected restores them at once
+
+    When the estimated CPU load exceeds the budget, camera and inference
+    are slowed further (never below their idle rates); sensor polling is
+    never throttled.
+
+    :param channels: Channel name -> ChannelConfig (alarm thresholds)
+    :param cpu_budget: Fraction of one core (default: duty_cycle.cpu_budget)
+    :param on_change: Called with no arguments when the periods change
+    """
+
+    def __init__(self, channels: dict = None, cpu_budget: float = None, on_change=None, clock=time.monotonic):
+        self.channels = channels or DEFAULT_CHANNELS
+        self.cpu_budget = cpu_budget
+        self.on_change = on_change
+        self._clock = clock
+
+        self._history = {name: deque(maxlen=TREND_WINDOW) for name in self.channels}
+        self._alerts = {}               # channel -> reason
+        self._alert_until = None
+        self._occupancy = None
+        self._last_person = None
+        self._empty = False
+        self._cpu_cost = {task: cost for task, (cost, _) in DEFAULT_COSTS.items()}
+        self._energy_cost = {task: energy for task, (_, energy) in DEFAULT_COSTS.items()}
+        self._next_run = {task: 0.0 for task in TASKS}
+        self._planned_cost = dict(self._cpu_cost)
+        self._periods = self._compute()
+
+        self._rate = {
+            task: METRICS.gauge("lsmy_duty_rate_hz", "Scheduled activity rate", {"task": task})
+            for task in TASKS + ("camera",)
+        }
+        self._cpu_gauge = METRICS.gauge("lsmy_duty_cpu_estimate", "Estimated CPU load (cores)")
+        self._energy_gauge = METRICS.gauge("lsmy_duty_energy_mw", "Estimated sensing + inference power")
+        self._publish_metrics()
+
+    # -------- Inputs --------
+    def observe_sample(self, sample, now: float = None):
+        """
+        :param sample: TelemetrySample (or channel -> value mapping)
+        """
+        now = self._clock() if now is None else now
+        alerts = {}
+        for name, config in self.channels.items():
+            value = sample.get(name)
+            if value is None:
+                continue
+            history = self._history[name]
+            history.append((now, value))
+            reason = self._channel_alert(config, history, value)
+            if reason:
+                alerts[name] = reason
+
+        if alerts:
+            if not self._alerts:
+                log.info("Raising sensor rate: %s", ", ".join(f"{k} {v}" for k, v in alerts.items()))
+            self._alert_until = now + CALM_HOLD
+        self._alerts = alerts or self._alerts
+        if not alerts and self._alert_until is not None and now >= self._alert_until:
+            log.info("Telemetry steady for %.0fs, back to baseline sensor rate", CALM_HOLD)
+            self._alerts = {}
+            self._alert_until = None
+        self._update()
+
+    @staticmethod
+    def _channel_alert(config, history, value: float):
+        if config.is_alarm(value):
+            return "in alarm"
+        if len(history) < 3:
+            return None
+        slope = _slope(history)
+        if slope > 0 and config.alarm_high is not None and (config.alarm_high - value) / slope <= TREND_HORIZON:
+            return f"rising to {config.alarm_high}"
+        if slope < 0 and config.alarm_low is not None and (value - config.alarm_low) / -slope <= TREND_HORIZON:
+            return f"falling to {config.alarm_low}"
+        return None
+
+    def observe_occupancy(self, count: int, now: float = None):
+        """
+        People counting result for the room.
+        """
+        now = self._clock() if now is None else now
+        self._occupancy = count
+        if count > 0:
+            self._last_person = now
+            if self._empty:
+                log.info("Room occupied (%d), restoring camera and inference rates", count)
+            self._empty = False
+        else:
+            if self._last_person is None:
+                self._last_person = now
+            if not self._empty and now - self._last_person >= EMPTY_HOLD:
+                log.info("Room empty for %.0fs, lowering camera and inference rates", now - self._last_person)
+                self._empty = True
+        self._update()
+
+    def record_cost(self, task: str, cpu_seconds: float):
+        """
+        Measured CPU time of one run of `task` ("camera": one frame).
+        Only record runs that did work: idle runs would drag the average
+        to zero. A cost that moved by more than COST_REPLAN_CHANGE since
+        the last plan re-plans the schedule.
+        """
+        previous = self._cpu_cost.get(task, cpu_seconds)
+        cost = self._cpu_cost[task] = previous + COST_SMOOTHING * (cpu_seconds - previous)
+        planned = self._planned_cost.get(task)
+        if planned is None or abs(cost - planned) > COST_REPLAN_CHANGE * planned:
+            self._update()
+
+    # -------- Schedule --------
+    @property
+    def budget_fraction(self) -> float:
+        return CONFIG.duty_cycle.cpu_budget if self.cpu_budget is None else self.cpu_budget
+
+    def reconfigure(self):
+        """
+        Re-plan with the current [duty_cycle] configuration (after a reload).
+        """
+        self._update()
+
+    def _compute(self) -> dict:
+        rates = CONFIG.duty_cycle
+        budget = self.budget_fraction
+        sensors = rates.sensor_period_alert if self._alerts else rates.sensor_period
+        periods = {
+            "sensors": sensors,
+            "publish": sensors,
+            "inference": rates.inference_period_idle if self._empty else rates.inference_period,
+            "camera_fps": rates.camera_fps_idle if self._empty else rates.camera_fps,
+        }
+
+        # Over budget: scale the flexible part (camera + inference) down
+        fixed = sum(self._cpu_cost[t] / periods[t] for t in ("sensors", "publish"))
+        flexible = self._cpu_cost["inference"] / periods["inference"] + self._cpu_cost["camera"] * periods["camera_fps"]
+        if fixed + flexible > budget and flexible > 0:
+            factor = max(0.0, budget - fixed) / flexible
+            periods["inference"] = min(rates.inference_period_idle, periods["inference"] / max(factor, 1e-3))
+            periods["camera_fps"] = max(rates.camera_fps_idle, periods["camera_fps"] * factor)
+        return periods
+
+    def _update(self):
+        self._planned_cost = dict(self._cpu_cost)
+        periods = self._compute()
+        if periods == self._periods:
+            return
+        # A shorter period takes effect now instead of after the old one
+        now = self._clock()
+        for task in TASKS:
+            self._next_run[task] = min(self._next_run[task], now + periods[task])
+        self._periods = periods
+        self._publish_metrics()
+        if self.on_change is not None:
+            self.on_change()
+
+    def due(self, now: float = None) -> list:
+        """
+        Tasks to run now; they are scheduled again one period later.
+        """
+        now = self._clock() if now is None else now
+        tasks = [task for task in TASKS if now >= self._next_run[task]]
+        for task in tasks:
+            self._next_run[task] = now + self._periods[task]
+        return tasks
+
+    def next_due(self, now: float = None) -> float:
+        now = self._clock() if now is None else now
+        return max(0.0, min(self._next_run.values()) - now)
+
+    # -------- Reporting --------
+    def budget(self) -> dict:
+        p = self._periods
+        cpu = sum(self._cpu_cost[t] / p[t] for t in TASKS) + self._cpu_cost["camera"] * p["camera_fps"]
+        energy = sum(self._energy_cost[t] / p[t] for t in TASKS) + self._energy_cost["camera"] * p["camera_fps"]
+        return {
+            "cpu_estimate": round(cpu, 4),
+            "cpu_budget": self.budget_fraction,
+            "energy_mw_estimate": round(energy, 1),
+            "over_budget": cpu > self.budget_fraction,
+        }
+
+    def _publish_metrics(self):
+        for task in TASKS:
+            self._rate[task].set(1.0 / self._periods[task])
+        self._rate["camera"].set(self._periods["camera_fps"])
+        budget = self.budget()
+        self._cpu_gauge.set(budget["cpu_estimate"])
+        self._energy_gauge.set(budget["energy_mw_estimate"])
+
+    def snapshot(self) -> dict:
+        return {
+            "periods": dict(self._periods),
+            "alerts": dict(self._alerts),
+            "occupancy": self._occupancy,
+            "room_empty": self._empty,
+            "budget": self.budget(),
+        }
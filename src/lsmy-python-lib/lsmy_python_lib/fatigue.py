@@ -0,0 +1,297 @@
+import time
+import logging
+from collections import deque
+
+import numpy as np
+
+# ====== METRICS LIBRARY ======
+from lsmy_python_lib.metrics import METRICS
+
+# ====== CONFIG LIBRARY ======
+from lsmy_python_lib.config import CONFIG
+
+# ====== TRACKER LIBRARY ======
+from lsmy_python_lib.tracker import MultiObjectTracker
+
+log = logging.getLogger("fatigue")
+
+DETECT_SCALE = CONFIG.fatigue.detect_scale    # Face detector sees every Nth pixel per axis
+DETECT_EVERY = CONFIG.fatigue.detect_every    # Frames between face detector runs
+
+ROI_PADDING = 0.15          # Crop margin around a face box, fraction of its size
+THUMB_SIZE = 16             # Side of the face thumbnail kept per ROI to notice changes
+THUMB_BLOCK = 4             # Thumbnail change is measured per THUMB_BLOCK x THUMB_BLOCK cell
+CHANGE_THRESHOLD = 0.1      # Mean absolute change (0..1) of any cell that invalidates a cached result
+MAX_REUSE = 15              # Frames a cached result is reused even if the ROI looks unchanged
+
+EYES_CLOSED_ALERT = 1.5     # Seconds of continuous eye closure -> fatigue
+PERCLOS_WINDOW = 60.0       # Seconds over which the eye closure fraction is kept
+PERCLOS_ALERT = 0.3         # Fraction of PERCLOS_WINDOW with eyes closed -> fatigue
+HEAD_AWAY_YAW = 30.0        # Degrees of head yaw counted as looking away
+HEAD_AWAY_ALERT = 3.0       # Seconds looking away -> inattention
+
+STAGE_SECONDS = {
+    stage: METRICS.histogram("lsmy_fatigue_stage_seconds", "Fatigue pipeline time per call", {"stage": stage},
+                             buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25))
+    for stage in ("detect", "model")
+}
+ROI_RESULTS = {
+    source: METRICS.counter("lsmy_fatigue_roi_total", "Face ROI results per frame", {"source": source})
+    for source in ("model", "cached")
+}
+ALERTS = {
+    kind: METRICS.gauge("lsmy_fatigue_alerts", "People currently flagged", {"kind": kind})
+    for kind in ("fatigue", "inattention")
+}
+
+
+def _thumbnail(frame: np.ndarray, box: np.ndarray) -> np.ndarray:
+    """
+    THUMB_SIZE x THUMB_SIZE grey levels in 0..1 of the face box (without
+    the crop padding, so background does not count), sampled rather
+    than averaged so it costs the same for any face size.
+    """
+    height, width = frame.shape[:2]
+    ys = np.linspace(box[1] * height, box[3] * height - 1, THUMB_SIZE).clip(0, height - 1).astype(np.intp)
+    xs = np.linspace(box[0] * width, box[2] * width - 1, THUMB_SIZE).clip(0, width - 1).astype(np.intp)
+    thumb = frame[np.ix_(ys, xs)].astype(np.float32)
+    if thumb.ndim == 3:
+        thumb = thumb.mean(axis=2)
+    return thumb * (1.0 / 255.0)
+
+
+def _change(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Largest mean absolute difference of any thumbnail cell: the eyes
+    closing changes a small area, which a whole-face mean would dilute.
+    """
+    cells = THUMB_SIZE // THUMB_BLOCK
+    diff = np.abs(a - b).reshape(cells, THUMB_BLOCK, cells, THUMB_BLOCK)
+    return float(diff.mean(axis=(1, 3)).max())
+
+
+class PersonState:
+    """
+    Fatigue indicators of one tracked person, updated with each
+    observation instead of recomputed from history: the current eye
+    closure and head-away streaks, and PERCLOS (fraction of time with
+    eyes closed) as running sums over a sliding window.
+    """
+
+    def __init__(self):
+        self.closed_since = None
+        self.away_since = None
+        self.last = None                # (ts, eyes closed)
+        self.window = deque()           # (ts, seconds, closed)
+        self.window_seconds = 0.0
+        self.closed_seconds = 0.0
+        self.fatigue = False
+        self.inattentive = False
+
+    def observe(self, ts: float, eyes_closed: bool, yaw: float = 0.0):
+        if self.last is not None:
+            last_ts, last_closed = self.last
+            seconds = ts - last_ts
+            self.window.append((ts, seconds, last_closed))
+            self.window_seconds += seconds
+            if last_closed:
+                self.closed_seconds += seconds
+            while self.window and self.window[0][0] <= ts - PERCLOS_WINDOW:
+                _, seconds, closed = self.window.popleft()
+                self.window_seconds -= seconds
+                if closed:
+                    self.closed_seconds -= seconds
+        self.last = (ts, eyes_closed)
+
+        if not eyes_closed:
+            self.closed_since = None
+        elif self.closed_since is None:
+            self.closed_since = ts
+        if abs(yaw) < HEAD_AWAY_YAW:
+            self.away_since = None
+        elif self.away_since is None:
+            self.away_since = ts
+
+        self.fatigue = (
+            self.closed_for(ts) >= EYES_CLOSED_ALERT
+            or (self.window_seconds >= PERCLOS_WINDOW / 2 and self.perclos >= PERCLOS_ALERT)
+        )
+        self.inattentive = self.away_for(ts) >= HEAD_AWAY_ALERT
+
+    @property
+    def perclos(self) -> float:
+        return self.closed_seconds / self.window_seconds if self.window_seconds > 0 else 0.0
+
+    def closed_for(self, ts: float) -> float:
+        return ts - self.closed_since if self.closed_since is not None else 0.0
+
+    def away_for(self, ts: float) -> float:
+        return ts - self.away_since if self.away_since is not None else 0.0
+
+
+class _RoiCache:
+    __slots__ = ("thumb", "result", "age")
+
+    def __init__(self, thumb, result):
+        self.thumb = thumb
+        self.result = result
+        self.age = 0
+
+
+class FatigueMonitor:
+    """
+    Cascade for fatigue / inattention detection on camera frames:
+
+    1. a cheap face detector on a DETECT_SCALE-downscaled frame, every
+       DETECT_EVERY frames
+    2. the tracker keeps face ROIs between detector runs
+    3. the landmark / eye-state model on the full-resolution crop of
+       each confirmed ROI, only when the crop changed since the model
+       last saw it (thumbnail difference) or its result got too old
+
+    Everything is counted in model-input pixels, so snapshot() can
+    report the compute saved against running the model on every full
+    frame.
+
+    :param face_detector: downscaled frame -> (N, 4) boxes x1, y1, x2, y2
+                          in frame fractions
+    :param landmark_model: face crop -> {"eyes_closed": bool or
+                           probability, "yaw": degrees}
+    """
+
+    def __init__(self, face_detector, landmark_model, detect_every: int = DETECT_EVERY,
+                 detect_scale: int = DETECT_SCALE, clock=time.monotonic):
+        self.face_detector = face_detector
+        self.landmark_model = landmark_model
+        self.detect_every = max(1, detect_every)
+        self.detect_scale = max(1, detect_scale)
+        self._clock = clock
+        self.tracker = MultiObjectTracker(line=None)
+
+        self._cache = {}        # track id -> _RoiCache
+        self.people = {}        # track id -> PersonState
+        self.frames = 0
+        self.stats = {
+            "detector_runs": 0,
+            "model_runs": 0,
+            "cached_results": 0,
+            "detector_pixels": 0,
+            "model_pixels": 0,
+            "full_frame_pixels": 0,
+            "model_seconds": 0.0,
+        }
+
+    def process(self, frame: np.ndarray, ts: float = None) -> dict:
+        """
+        :param frame: (H, W) or (H, W, C) image
+        :return: Track id -> PersonState of the people in view
+        """
+        ts = self._clock() if ts is None else ts
+        height, width = frame.shape[:2]
+        self.stats["full_frame_pixels"] += height * width
+
+        detections = None
+        if self.frames % self.detect_every == 0:
+            small = frame[::self.detect_scale, ::self.detect_scale]
+            with STAGE_SECONDS["detect"].time():
+                detections = self.face_detector(small)
+            self.stats["detector_runs"] += 1
+            self.stats["detector_pixels"] += small.shape[0] * small.shape[1]
+        self.frames += 1
+        self.tracker.update(detections)
+
+        in_view = {}
+        confirmed = self.tracker.confirmed
+        for track_id, box in zip(self.tracker.ids[confirmed].tolist(), self.tracker.boxes[confirmed]):
+            crop = self._crop(frame, box)
+            if crop is None:
+                continue
+            result = self._roi_result(track_id, crop, _thumbnail(frame, box))
+            person = self.people.get(track_id)
+            if person is None:
+                person = self.people[track_id] = PersonState()
+            was_fatigued, was_inattentive = person.fatigue, person.inattentive
+            person.observe(ts, float(result.get("eyes_closed", 0.0)) >= 0.5, float(result.get("yaw", 0.0)))
+            if person.fatigue and not was_fatigued:
+                log.warning("Person %d: fatigue (eyes closed %.1fs, PERCLOS %.0f%%)",
+                            track_id, person.closed_for(ts), person.perclos * 100)
+            if person.inattentive and not was_inattentive:
+                log.warning("Person %d: inattentive (looking away %.1fs)", track_id, person.away_for(ts))
+            in_view[track_id] = person
+
+        # Forget people the tracker dropped
+        alive = set(self.tracker.ids.tolist())
+        for track_id in [t for t in self.people if t not in alive]:
+            del self.people[track_id]
+            self._cache.pop(track_id, None)
+
+        ALERTS["fatigue"].set(sum(p.fatigue for p in in_view.values()))
+        ALERTS["inattention"].set(sum(p.inattentive for p in in_view.values()))
+        return in_view
+
+    def _crop(self, frame: np.ndarray, box: np.ndarray):
+        height, width = frame.shape[:2]
+        pad_x = (box[2] - box[0]) * ROI_PADDING
+        pad_y = (box[3] - box[1]) * ROI_PADDING
+        x1 = max(0, int((box[0] - pad_x) * width))
+        y1 = max(0, int((box[1] - pad_y) * height))
+        x2 = min(width, int((box[2] + pad_x) * width))
+        y2 = min(height, int((box[3] + pad_y) * height))
+        if x2 - x1 < 2 or y2 - y1 < 2:
+            return None
+        return frame[y1:y2, x1:x2]
+
+    def _roi_result(self, track_id: int, crop: np.ndarray, thumb: np.ndarray) -> dict:
+        cached = self._cache.get(track_id)
+        if cached is not None and cached.age < MAX_REUSE and _change(thumb, cached.thumb) < CHANGE_THRESHOLD:
+            cached.age += 1
+            self.stats["cached_results"] += 1
+            ROI_RESULTS["cached"].inc()
+            return cached.result
+
+        start = time.perf_counter()
+        result = self.landmark_model(crop)
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS["model"].observe(seconds)
+        self.stats["model_runs"] += 1
+        self.stats["model_pixels"] += crop.shape[0] * crop.shape[1]
+        self.stats["model_seconds"] += seconds
+        ROI_RESULTS["model"].inc()
+        self._cache[track_id] = _RoiCache(thumb, result)
+        return result
+
+    def compute_saved(self) -> dict:
+        """
+        Pixels through detector + model against the model on every full
+        frame; seconds extrapolated from the model's measured time per pixel.
+        """
+        stats = self.stats
+        processed = stats["detector_pixels"] + stats["model_pixels"]
+        full = stats["full_frame_pixels"]
+        per_pixel = stats["model_seconds"] / stats["model_pixels"] if stats["model_pixels"] else 0.0
+        return {
+            "pixels_processed": processed,
+            "full_frame_pixels": full,
+            "pixels_saved": round(1.0 - processed / full, 4) if full else 0.0,
+            "model_seconds": round(stats["model_seconds"], 4),
+            "full_frame_model_seconds_estimate": round(per_pixel * full, 4),
+        }
+
+    def snapshot(self) -> dict:
+        now = self._clock()
+        return {
+            "frames": self.frames,
+            "stats": dict(self.stats),
+            "compute": self.compute_saved(),
+            "people": {
+                str(track_id): {
+                    "fatigue": person.fatigue,
+                    "inattentive": person.inattentive,
+                    "eyes_closed_seconds": round(person.closed_for(now), 2),
+                    "looking_away_seconds": round(person.away_for(now), 2),
+                    "perclos": round(person.perclos, 3),
+                }
+                # Copy: process() may be adding people on a worker thread
+                for track_id, person in list(self.people.items())
+            },
+        }
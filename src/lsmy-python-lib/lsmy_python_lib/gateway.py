@@ -0,0 +1,538 @@
+import os
+import sys
+import json
+import time
+import socket
+import random
+import asyncio
+import logging
+import argparse
+from collections import deque, OrderedDict
+from itertools import islice
+
+# ====== METRICS LIBRARY ======
+from lsmy_python_lib.metrics import METRICS
+
+# ====== TELEMETRY SAMPLE LIBRARY ======
+from lsmy_python_lib.telemetry_sample import TelemetrySample
+
+# ====== CONFIG LIBRARY ======
+from lsmy_python_lib.config import CONFIG
+
+log = logging.getLogger("gateway")
+
+DEFAULT_PORT = 7600
+NODE_ID = CONFIG.gateway.node_id or socket.gethostname()
+SITE_ID = CONFIG.gateway.site_id
+
+MAX_NODES = CONFIG.gateway.max_nodes
+NODE_QUEUE = 256            # Samples held per node; when full its connection is not read
+BATCH_INTERVAL = CONFIG.gateway.batch_interval
+BATCH_MAX = 1000            # Pending samples (all nodes) that trigger an early batch
+UPLINK_BACKLOG = 256        # Unacked site batches; when full the batcher waits for the uplink consumer
+HELLO_TIMEOUT = 5
+
+NODE_BUFFER = 4096          # Unacked samples a node keeps across gateway outages
+CONNECT_TIMEOUT = 5
+RECONNECT_MIN = 0.5
+RECONNECT_MAX = 30
+
+ACK_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 30)
+
+
+def parse_address(value: str, default_port: int = DEFAULT_PORT) -> tuple:
+    """
+    "host:port" / "host" -> (host, port)
+    """
+    host, _, port = value.rpartition(":") if ":" in value else (value, "", "")
+    return host or "0.0.0.0", int(port) if port else default_port
+
+
+def _line(obj: dict) -> bytes:
+    return (json.dumps(obj) + "\n").encode()
+
+
+class NodeState:
+    """
+    Gateway side view of one peer node.
+
+    `last_seq` is the highest sequence number accepted in the current
+    epoch (node boot); None until the first sample, so a node that was
+    sending before the gateway started is not reported as lossy.
+    """
+
+    def __init__(self, node_id: str, queue_size: int):
+        self.node_id = node_id
+        self.queue_size = queue_size
+        self.epoch = None
+        self.last_seq = None
+        self.pending = deque()
+        self.space = asyncio.Event()
+        self.space.set()
+        self.writer = None
+        self.ack_scheduled = False
+        self.last_seen = None
+
+        labels = {"node": node_id}
+        self.received = METRICS.counter("lsmy_gateway_samples_total", "Samples accepted from nodes", labels)
+        self.lost = METRICS.counter("lsmy_gateway_samples_lost_total", "Gaps in node sequence numbers", labels)
+        self.duplicates = METRICS.counter("lsmy_gateway_duplicates_total", "Resent samples dropped", labels)
+
+    def snapshot(self) -> dict:
+        return {
+            "connected": self.writer is not None,
+            "epoch": self.epoch,
+            "last_seq": self.last_seq,
+            "pending": len(self.pending),
+            "paused": not self.space.is_set(),
+            "received": self.received.value,
+            "lost": self.lost.value,
+            "duplicates": self.duplicates.value,
+            "last_seen": self.last_seen,
+        }
+
+
+class Gateway:
+    """
+    Site gateway: accepts telemetry from peer nodes over TCP, merges the
+    streams and hands one batch per BATCH_INTERVAL to the uplink.
+
+    Protocol (newline delimited JSON, like the IPC socket, but one
+    long-lived connection per node):
+
+        node -> {"cmd": "node_hello", "node": "room-101", "epoch": "..."}
+        gw   -> {"status": "ok", "last_seq": 41}
+        node -> {"cmd": "node_telemetry", "seq": 42, "ts": ..., "temperature": ...}
+        gw   -> {"ack": 42}                     (cumulative, coalesced)
+
+    Sequence numbers make resends after a reconnect idempotent
+    (duplicates are dropped) and gaps visible as lost samples. A node
+    whose queue is full is not read until the batcher drains it, so a
+    slow uplink pushes back through TCP to the nodes, which buffer.
+
+    :param publish: Coroutine function publish(batch: str); by default
+                    batches are kept in `uplink` until the consumer acks
+                    them (take_batches() / ack_batches()), and the
+                    batcher waits while UPLINK_BACKLOG are unacked
+    """
+
+    def __init__(self, site: str = SITE_ID, max_nodes: int = MAX_NODES, node_queue: int = NODE_QUEUE,
+                 batch_interval: float = BATCH_INTERVAL, batch_max: int = BATCH_MAX, publish=None):
+        self.site = site
+        self.max_nodes = max_nodes
+        self.node_queue = node_queue
+        self.batch_interval = batch_interval
+        self.batch_max = batch_max
+        self.nodes = {}
+        self.uplink = OrderedDict()     # batch id -> encoded batch, until acked
+        self._uplink_space = asyncio.Event()
+        self._publish = publish or self._store
+        self._batch_ready = asyncio.Event()
+        self._pending_total = 0
+        self._batches = 0
+
+        self._connected = METRICS.gauge("lsmy_gateway_nodes_connected", "Peer nodes connected")
+        self._batches_total = METRICS.counter("lsmy_gateway_batches_total", "Site batches published")
+        self._uplink_stalls = METRICS.counter("lsmy_gateway_uplink_stalls_total",
+                                              "Times the batcher waited for the uplink consumer to ack")
+
+    # -------- Node state --------
+    def _node(self, node_id: str):
+        node = self.nodes.get(node_id)
+        if node is None:
+            if len(self.nodes) >= self.max_nodes:
+                return None
+            node = self.nodes[node_id] = NodeState(node_id, self.node_queue)
+        return node
+
+    def _accept(self, node: NodeState, seq, sample: TelemetrySample):
+        if seq is not None:
+            if node.last_seq is not None:
+                if seq <= node.last_seq:
+                    node.duplicates.inc()
+                    return
+                if seq > node.last_seq + 1:
+                    node.lost.inc(seq - node.last_seq - 1)
+                    log.warning("Node %s: %d samples lost before seq %d", node.node_id, seq - node.last_seq - 1, seq,
+                                extra={"rate_limit": 60})
+            node.last_seq = seq
+
+        node.pending.append(sample)
+        node.received.inc()
+        node.last_seen = time.time()
+        self._pending_total += 1
+        if len(node.pending) >= node.queue_size:
+            node.space.clear()
+        if self._pending_total >= self.batch_max:
+            self._batch_ready.set()
+
+    def submit_local(self, sample: TelemetrySample):
+        """
+        Add this device's own sample (no sequence, never paused: the
+        oldest pending sample is dropped when the queue is full).
+        """
+        node = self._node(NODE_ID)
+        if node is None:
+            return
+        if len(node.pending) >= node.queue_size:
+            node.pending.popleft()
+            node.lost.inc()
+            self._pending_total -= 1
+        self._accept(node, None, sample)
+
+    # -------- Node connections --------
+    def _schedule_ack(self, node: NodeState):
+        # One ack per loop iteration covers every line read in it
+        if not node.ack_scheduled:
+            node.ack_scheduled = True
+            asyncio.get_running_loop().call_soon(self._send_ack, node)
+
+    def _send_ack(self, node: NodeState):
+        node.ack_scheduled = False
+        if node.writer is not None and not node.writer.is_closing():
+            node.writer.write(f'{{"ack":{node.last_seq}}}\n'.encode())
+
+    def _attach(self, hello: dict, writer):
+        node = self._node(str(hello["node"]))
+        if node is None:
+            return None
+
+        epoch = hello.get("epoch")
+        if epoch != node.epoch:
+            if node.epoch is not None:
+                log.info("Node %s restarted (epoch %s)", node.node_id, epoch)
+            node.epoch = epoch
+            node.last_seq = None
+
+        if node.writer is not None:
+            # Reconnect while the old connection is still half-open
+            node.writer.close()
+        else:
+            self._connected.inc()
+        node.writer = writer
+        return node
+
+    def _detach(self, node: NodeState, writer):
+        if node.writer is writer:
+            node.writer = None
+            self._connected.dec()
+
+    async def _handle_node(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        node = None
+        try:
+            line = await asyncio.wait_for(reader.readline(), HELLO_TIMEOUT)
+            hello = json.loads(line) if line else {}
+            if hello.get("cmd") != "node_hello" or not hello.get("node"):
+                writer.write(_line({"status": "error", "error": "Expected node_hello"}))
+                return
+
+            node = self._attach(hello, writer)
+            if node is None:
+                log.warning("Rejected node %s from %s: %d nodes already", hello["node"], peer, self.max_nodes)
+                writer.write(_line({"status": "error", "error": "Too many nodes"}))
+                return
+
+            log.info("Node %s connected from %s", node.node_id, peer)
+            writer.write(_line({"status": "ok", "last_seq": node.last_seq or 0}))
+            await writer.drain()
+
+            while node.writer is writer:
+                # Backpressure: stop reading this node until its queue drains
+                await node.space.wait()
+                line = await reader.readline()
+                if not line:
+                    break
+                req = json.loads(line)
+                if req.get("cmd") != "node_telemetry":
+                    continue
+                self._accept(node, int(req["seq"]), TelemetrySample.from_mapping(req))
+                self._schedule_ack(node)
+        except (ConnectionError, asyncio.TimeoutError, ValueError, KeyError, TypeError) as e:
+            log.warning("Node connection %s failed: %s", peer, e, extra={"rate_limit": 60})
+        finally:
+            if node is not None:
+                self._detach(node, writer)
+                log.info("Node %s disconnected", node.node_id)
+            writer.close()
+
+    async def serve(self, host: str = "0.0.0.0", port: int = DEFAULT_PORT):
+        server = await asyncio.start_server(self._handle_node, host, port)
+        log.info("Gateway %s listening on %s:%d (max %d nodes)", self.site, host, port, self.max_nodes)
+        async with server:
+            await server.serve_forever()
+
+    # -------- Uplink batches --------
+    def _take_batch(self):
+        parts = []
+        count = 0
+        for node in self.nodes.values():
+            if not node.pending:
+                continue
+            samples, node.pending = node.pending, deque()
+            node.space.set()
+            count += len(samples)
+            parts.append(json.dumps(node.node_id) + ":[" + ",".join(s.to_json() for s in samples) + "]")
+        self._pending_total = 0
+        if not parts:
+            return None
+
+        self._batches += 1
+        return (
+            f'{{"site":{json.dumps(self.site)},"batch":{self._batches},"ts":{time.time():.3f},'
+            f'"samples":{count},"nodes":{{' + ",".join(parts) + "}}"
+        )
+
+    async def run_batcher(self):
+        """
+        Publish pending samples every batch_interval, earlier when
+        batch_max samples are waiting.
+        """
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.batch_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+
+            batch = self._take_batch()
+            if batch is not None:
+                # A slow publisher keeps node queues full, pausing the nodes
+                await self._publish(batch)
+                self._batches_total.inc()
+
+    async def _store(self, batch: str):
+        # run_batcher awaits each publish, so _batches is this batch's id
+        batch_id = self._batches
+        if len(self.uplink) >= UPLINK_BACKLOG:
+            # Backlog full: stall the batcher, node queues fill and the
+            # nodes are no longer read
+            self._uplink_stalls.inc()
+            log.warning("Uplink backlog full (%d batches unacked), pausing batches", len(self.uplink),
+                        extra={"rate_limit": 60})
+            while len(self.uplink) >= UPLINK_BACKLOG:
+                self._uplink_space.clear()
+                await self._uplink_space.wait()
+        self.uplink[batch_id] = batch
+
+    def take_batches(self, limit: int = None) -> list:
+        """
+        Oldest stored batches, left in place until ack_batches() (a
+        consumer that fails before acking gets them again).
+
+        :return: [(batch id, encoded JSON)]
+        """
+        count = len(self.uplink) if limit is None else min(int(limit), len(self.uplink))
+        return list(islice(self.uplink.items(), count))
+
+    def ack_batches(self, ids) -> int:
+        """
+        Delete batches the consumer has stored upstream.
+
+        :return: Number of batches removed (unknown ids are ignored)
+        """
+        removed = 0
+        for batch_id in ids:
+            if self.uplink.pop(int(batch_id), None) is not None:
+                removed += 1
+        if len(self.uplink) < UPLINK_BACKLOG:
+            self._uplink_space.set()
+        return removed
+
+    def snapshot(self) -> dict:
+        return {
+            "site": self.site,
+            "nodes": {node_id: node.snapshot() for node_id, node in self.nodes.items()},
+            "pending": self._pending_total,
+            "batches": self._batches,
+            "uplink_backlog": len(self.uplink),
+        }
+
+
+class NodeForwarder:
+    """
+    Node side: forwards this device's samples to the site gateway.
+
+    submit() never blocks. Samples stay buffered until the gateway acks
+    them and are resent after a reconnect; when the buffer is full the
+    oldest sample is dropped, which the gateway sees as a sequence gap.
+
+    :param host: Gateway address
+    :param port: Gateway port
+    :param node_id: Name of this node at the gateway
+    """
+
+    def __init__(self, host: str, port: int = DEFAULT_PORT, node_id: str = NODE_ID, buffer_size: int = NODE_BUFFER):
+        self.host = host
+        self.port = port
+        self.node_id = node_id
+        self.buffer_size = buffer_size
+        # New sequence space per process start
+        self.epoch = f"{int(time.time())}-{os.getpid()}"
+        self.seq = 0
+        self.acked = 0
+        self.unacked = deque()      # (seq, submitted monotonic, encoded line)
+        self._new = asyncio.Event()
+        self._writer = None
+
+        self._dropped = METRICS.counter("lsmy_node_forward_dropped_total", "Samples dropped, gateway buffer full")
+        self._ack_seconds = METRICS.histogram("lsmy_node_forward_ack_seconds", "Sample submit to gateway ack",
+                                              buckets=ACK_BUCKETS)
+
+    def submit(self, sample: TelemetrySample):
+        self.seq += 1
+        if len(self.unacked) >= self.buffer_size:
+            self.unacked.popleft()
+            self._dropped.inc()
+        line = sample.to_json(cmd="node_telemetry", seq=self.seq) + "\n"
+        self.unacked.append((self.seq, time.monotonic(), line.encode()))
+        self._new.set()
+
+    def _trim(self, seq: int):
+        now = time.monotonic()
+        while self.unacked and self.unacked[0][0] <= seq:
+            _, submitted, _ = self.unacked.popleft()
+            self._ack_seconds.observe(now - submitted)
+        self.acked = max(self.acked, seq)
+
+    async def _read_acks(self, reader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            msg = json.loads(line)
+            if "ack" in msg and msg["ack"] is not None:
+                self._trim(int(msg["ack"]))
+
+    async def _session(self):
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), CONNECT_TIMEOUT)
+        acks = None
+        try:
+            writer.write(_line({"cmd": "node_hello", "node": self.node_id, "epoch": self.epoch}))
+            await writer.drain()
+            resp = json.loads(await asyncio.wait_for(reader.readline(), HELLO_TIMEOUT) or b"{}")
+            if resp.get("status") != "ok":
+                raise ConnectionError(resp.get("error", "Gateway closed the connection"))
+
+            self._trim(int(resp.get("last_seq") or 0))
+            self._writer = writer
+            log.info("Forwarding to gateway %s:%d as %s (%d buffered)", self.host, self.port, self.node_id,
+                     len(self.unacked))
+
+            acks = asyncio.create_task(self._read_acks(reader))
+            sent = self.acked
+            while not acks.done():
+                self._new.clear()
+                if self.unacked and self.unacked[-1][0] > sent:
+                    start = max(0, sent - self.unacked[0][0] + 1)
+                    lines = [line for _, _, line in islice(self.unacked, start, None)]
+                    sent = self.unacked[-1][0]
+                    writer.writelines(lines)
+                    # Blocks while the gateway is not reading this node
+                    await writer.drain()
+                    continue
+
+                waiter = asyncio.ensure_future(self._new.wait())
+                try:
+                    await asyncio.wait({waiter, acks}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    waiter.cancel()
+            acks.result()
+            raise ConnectionError("Gateway closed the connection")
+        finally:
+            self._writer = None
+            if acks is not None:
+                acks.cancel()
+            writer.close()
+
+    async def run(self):
+        """
+        Keep a gateway session up, reconnecting with backoff.
+        """
+        backoff = RECONNECT_MIN
+        while True:
+            started = time.monotonic()
+            try:
+                await self._session()
+            except (OSError, asyncio.TimeoutError, ValueError) as e:
+                log.warning("Gateway %s:%d: %s, retrying in %.1fs", self.host, self.port, e, backoff,
+                            extra={"rate_limit": 60})
+            # A session that lasted a while was healthy, start over
+            if time.monotonic() - started > RECONNECT_MAX:
+                backoff = RECONNECT_MIN
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, RECONNECT_MAX)
+
+    def disconnect(self):
+        """
+        Drop the current session (it is re-established by run()).
+        """
+        if self._writer is not None:
+            self._writer.close()
+
+    def stats(self) -> dict:
+        return {
+            "node": self.node_id,
+            "gateway": f"{self.host}:{self.port}",
+            "connected": self._writer is not None,
+            "seq": self.seq,
+            "acked": self.acked,
+            "unacked": len(self.unacked),
+            "dropped": self._dropped.value,
+            "ack_p50": self._ack_seconds.quantile(0.5),
+            "ack_p99": self._ack_seconds.quantile(0.99),
+        }
+
+
+async def _simulate_node(args) -> dict:
+    host, port = parse_address(args.gateway)
+    forwarder = NodeForwarder(host, port, args.node)
+    task = asyncio.create_task(forwarder.run())
+    rng = random.Random(args.node)
+    try:
+        for i in range(args.count):
+            forwarder.submit(TelemetrySample(
+                time.time(),
+                round(rng.uniform(20.0, 35.0), 2),
+                round(rng.uniform(40.0, 80.0), 2),
+                round(rng.uniform(0.0, 0.5), 4),
+                round(rng.uniform(10.0, 50.0), 1),
+                round(rng.uniform(5.0, 25.0), 1),
+            ))
+            if args.flap_after and i + 1 == args.flap_after:
+                forwarder.disconnect()
+            await asyncio.sleep(1.0 / args.rate)
+
+        deadline = time.monotonic() + args.drain_timeout
+        while forwarder.unacked and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        return forwarder.stats()
+    finally:
+        task.cancel()
+
+
+def main() -> int:
+    """
+    Simulated peer node, sending synthetic telemetry to a gateway:
+
+    python3 -m lsmy_python_lib.gateway node --gateway 127.0.0.1:7600 --node room-101 --rate 5 --count 100
+    """
+    parser = argparse.ArgumentParser(description="LSMY gateway tools")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    node = sub.add_parser("node", help="Run a simulated node")
+    node.add_argument("--gateway", required=True, help="host:port of the gateway")
+    node.add_argument("--node", default=NODE_ID)
+    node.add_argument("--rate", type=float, default=1.0, help="Samples per second")
+    node.add_argument("--count", type=int, default=60)
+    node.add_argument("--flap-after", type=int, default=0, help="Drop the connection once after N samples")
+    node.add_argument("--drain-timeout", type=float, default=10.0, help="Seconds to wait for the final acks")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    stats = asyncio.run(_simulate_node(args))
+    print(json.dumps(stats))
+    return 0 if stats["unacked"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
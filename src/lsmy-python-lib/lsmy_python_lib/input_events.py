@@ -0,0 +1,258 @@
+from periphery import GPIO, CdevGPIO
+import os
+import time
+import select
+import asyncio
+import inspect
+import logging
+
+# ====== RECORDER LIBRARY ======
+from lsmy_python_lib.recorder import capture_gpio
+
+log = logging.getLogger("input-events")
+
+INPUT_CHIP = "/dev/gpiochip0"
+
+GESTURE_SHORT = "short"
+GESTURE_LONG = "long"
+GESTURE_DOUBLE = "double"
+GESTURES = (GESTURE_SHORT, GESTURE_LONG, GESTURE_DOUBLE)
+
+
+class ButtonConfig:
+    """
+    One push button.
+
+    :param line: GPIO line on the chip
+    :param name: Label used in logs
+    :param active_low: Pressed reads 0 (button to ground with pull-up)
+    :param debounce: Seconds the level must be stable to count as an edge
+    :param long_press: Hold time that triggers the long gesture
+    :param double_window: Max gap between two short presses of a double press
+    """
+
+    def __init__(self, line: int, name: str = None, active_low: bool = True, debounce: float = 0.03,
+                 long_press: float = 3.0, double_window: float = 0.4):
+        self.line = int(line)
+        self.name = name or f"GPIO {self.line}"
+        self.active_low = active_low
+        self.debounce = debounce
+        self.long_press = long_press
+        self.double_window = double_window
+
+
+class _Button:
+    """
+    Per button runtime state: debounced level and gesture tracking.
+    Timestamps are nanoseconds on one monotonic clock (kernel line event
+    timestamps for cdev, time.monotonic_ns for sysfs).
+    """
+
+    def __init__(self, config: ButtonConfig, gpio, actions: dict):
+        self.config = config
+        self.gpio = gpio
+        self.actions = actions
+        self.pressed = False
+        self.last_edge_ns = None
+        self.press_ns = None
+        self.long_fired = False
+        self.long_timer = None
+        self.single_timer = None
+        self.settle_timer = None
+
+
+class InputEventManager:
+    """
+    Reads every button from one epoll set registered on the running event
+    loop (loop.add_reader on the epoll fd), so no thread waits on GPIO.
+
+    Lines are requested as character device line events when the gpiochip
+    exists (edge timestamps come from the kernel, so press durations are
+    immune to wall clock jumps such as the first NTP sync) and through
+    sysfs otherwise.
+
+    Gestures:
+        short   press shorter than long_press (delayed by double_window
+                only when the button also has a double action)
+        double  two short presses within double_window
+        long    fires while still held once long_press is reached
+
+    Actions are coroutine functions or plain callables; plain callables
+    run through `run_blocking` so they never stall the loop.
+    """
+
+    def __init__(self, chip: str = INPUT_CHIP, run_blocking=None):
+        self.chip = chip
+        self.run_blocking = run_blocking
+        self._configs = []
+        self._buttons = {}
+        self._poller = None
+        self._loop = None
+        self._tasks = set()
+
+    def add_button(self, config: ButtonConfig, **actions):
+        """
+        :param actions: gesture name -> action, e.g. long=execute_reset
+        """
+        for gesture in actions:
+            if gesture not in GESTURES:
+                raise ValueError(f"Unknown gesture: {gesture}")
+        self._configs.append((config, actions))
+
+    def _open(self, config: ButtonConfig):
+        if os.path.exists(self.chip):
+            gpio = GPIO(self.chip, config.line, "in")
+        else:
+            gpio = GPIO(config.line, "in")
+        gpio.edge = "both"
+        return gpio
+
+    async def run(self):
+        """
+        Serve button events until cancelled.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._poller = select.epoll()
+
+        try:
+            for config, actions in self._configs:
+                gpio = self._open(config)
+                button = _Button(config, gpio, actions)
+                button.pressed = self._is_pressed(button, gpio.read())
+                self._buttons[gpio.fd] = button
+                self._poller.register(gpio.fd, select.EPOLLIN | select.EPOLLPRI)
+                log.info("Input %s active on GPIO %d (%s)", config.name, config.line, ", ".join(actions) or "no actions")
+
+            self._loop.add_reader(self._poller.fileno(), self._on_ready)
+            await asyncio.Future()
+        finally:
+            if self._poller is not None:
+                self._loop.remove_reader(self._poller.fileno())
+                self._poller.close()
+                self._poller = None
+            for button in self._buttons.values():
+                for timer in (button.long_timer, button.single_timer, button.settle_timer):
+                    if timer is not None:
+                        timer.cancel()
+                button.gpio.close()
+            self._buttons = {}
+
+    def inject_edge(self, line: int, level: bool):
+        """
+        Handle an edge on `line` as if read from the hardware (replay of
+        a recording). Gesture timing follows the loop clock, so replay
+        at real-time speed for press durations to match.
+        """
+        if self._poller is None:
+            return
+        for button in self._buttons.values():
+            if button.config.line == line:
+                self._on_edge(button, level, time.monotonic_ns())
+
+    # -------- Edge handling --------
+    def _is_pressed(self, button: _Button, level: bool) -> bool:
+        return (not level) if button.config.active_low else bool(level)
+
+    def _on_ready(self):
+        for fd, _ in self._poller.poll(0):
+            button = self._buttons.get(fd)
+            if button is None:
+                continue
+            gpio = button.gpio
+            if isinstance(gpio, CdevGPIO):
+                # Drain every queued line event; each re-arms the fd
+                while gpio.poll(0):
+                    event = gpio.read_event()
+                    self._on_edge(button, event.edge == "rising", event.timestamp)
+            else:
+                # sysfs: re-reading the value file re-arms EPOLLPRI
+                self._on_edge(button, gpio.read(), time.monotonic_ns())
+
+    def _on_edge(self, button: _Button, level: bool, ts_ns: int):
+        capture_gpio(button.config.line, level, ts_ns)
+        pressed = self._is_pressed(button, level)
+        debounce_ns = int(button.config.debounce * 1e9)
+
+        if button.last_edge_ns is not None and ts_ns - button.last_edge_ns < debounce_ns:
+            # Bounce: look at the line again once it had time to settle
+            if button.settle_timer is None:
+                button.settle_timer = self._loop.call_later(button.config.debounce, self._settle, button)
+            return
+
+        button.last_edge_ns = ts_ns
+        if pressed != button.pressed:
+            self._transition(button, pressed, ts_ns)
+
+    def _settle(self, button: _Button):
+        button.settle_timer = None
+        pressed = self._is_pressed(button, button.gpio.read())
+        if pressed != button.pressed:
+            # cdev event timestamps are CLOCK_MONOTONIC too (kernel >= 5.7)
+            now = time.monotonic_ns()
+            button.last_edge_ns = now
+            self._transition(button, pressed, now)
+
+    # -------- Gestures --------
+    def _transition(self, button: _Button, pressed: bool, ts_ns: int):
+        config = button.config
+        button.pressed = pressed
+
+        if pressed:
+            button.press_ns = ts_ns
+            button.long_fired = False
+            if GESTURE_LONG in button.actions:
+                button.long_timer = self._loop.call_later(config.long_press, self._long_press, button)
+            return
+
+        if button.long_timer is not None:
+            button.long_timer.cancel()
+            button.long_timer = None
+        if button.long_fired or button.press_ns is None:
+            return
+
+        held = (ts_ns - button.press_ns) / 1e9
+        button.press_ns = None
+        if held >= config.long_press:
+            # Long press without a long action: nothing to do
+            return
+
+        if GESTURE_DOUBLE not in button.actions:
+            self._fire(button, GESTURE_SHORT)
+        elif button.single_timer is not None:
+            button.single_timer.cancel()
+            button.single_timer = None
+            self._fire(button, GESTURE_DOUBLE)
+        else:
+            button.single_timer = self._loop.call_later(config.double_window, self._single_press, button)
+
+    def _long_press(self, button: _Button):
+        button.long_timer = None
+        if button.pressed:
+            button.long_fired = True
+            self._fire(button, GESTURE_LONG)
+
+    def _single_press(self, button: _Button):
+        button.single_timer = None
+        self._fire(button, GESTURE_SHORT)
+
+    def _fire(self, button: _Button, gesture: str):
+        action = button.actions.get(gesture)
+        log.info("Input %s: %s press", button.config.name, gesture)
+        if action is None:
+            return
+
+        if inspect.iscoroutinefunction(action):
+            coro = action()
+        elif self.run_blocking is not None:
+            coro = self.run_blocking(action)
+        else:
+            coro = asyncio.to_thread(action)
+
+        task = self._loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._action_done)
+
+    def _action_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.error("Input action failed", exc_info=task.exception())
@@ -1,58 +1,270 @@
 import os
 import json
+import time
 import asyncio
 import logging
 import random
 
 from lsmy_python_lib.wifi_config_manager import update_wifi_connect_signal
 
-log = logging.getLogger("ipc")
+# ====== TELEMETRY PIPELINE LIBRARY ======
+from lsmy_python_lib.telemetry_pipeline import TelemetryPipeline, UplinkQueue
+
+# ====== RELAY CONTROLLER LIBRARY ======
+from lsmy_python_lib.relay_controller import RelayError
+
+# ====== STARTUP TIMELINE LIBRARY ======
+from lsmy_python_lib.startup_timeline import STARTUP_TIMELINE
+
+# ====== METRICS LIBRARY ======
+from lsmy_python_lib.metrics import METRICS
+
+# ====== LOG CONTROL LIBRARY ======
+from lsmy_python_lib.log_control import LazyJson
+
+# ====== PROFILER LIBRARY ======
+from lsmy_python_lib.profiler import Profiler
+
+# ====== TELEMETRY SAMPLE LIBRARY ======
+from lsmy_python_lib.telemetry_sample import TelemetrySample, SampleHistory
 
-SOCK = "/run/lsmy/provision.sock"
+# ====== RECORDER LIBRARY ======
+from lsmy_python_lib.recorder import capture_ipc
 
-LAST_TELEMETRY = {
-    "temperature": 0.0,
-    "humidity": 0.0,
-    "no2": 0.0,
-    "pm10": 0.0,
-    "pm25": 0.0,
+# ====== CONFIG LIBRARY ======
+from lsmy_python_lib.config import CONFIG
+
+log = logging.getLogger("ipc")
+
+SOCK = CONFIG.ipc.sock
+
+# Wall clock for sample timestamps (a replay substitutes the recorded one)
+CLOCK = time.time
+
+# Latest sample, updated in place
+LAST_TELEMETRY = TelemetrySample()
+
+# Recent samples, column-wise (28 bytes per sample)
+TELEMETRY_HISTORY_SIZE = CONFIG.ipc.telemetry_history
+TELEMETRY_HISTORY = SampleHistory(TelemetrySample, TELEMETRY_HISTORY_SIZE)
+
+# Relay rules / interlocks, installed by the application (set_relay_scheduler)
+RELAY_SCHEDULER = None
+
+# Device operation queue, installed by the application (set_operation_queue)
+OPERATION_QUEUE = None
+
+# Site gateway (gateway mode) and upstream forwarder (node mode), installed
+# by the application (set_gateway / set_forwarder)
+GATEWAY = None
+FORWARDER = None
+
+# Adaptive sensing / inference rates, installed by the application (set_duty_cycle)
+DUTY_CYCLE = None
+
+# Camera people counting (detector + tracker), installed by the application (set_people_counter)
+PEOPLE_COUNTER = None
+
+# Fatigue / inattention cascade, installed by the application (set_fatigue_monitor)
+FATIGUE_MONITOR = None
+
+# Loaded AI models, installed by the application (set_model_registry)
+MODEL_REGISTRY = None
+
+# On-demand stack profiles / allocation diffs of the application process
+PROFILER = Profiler("lsmy-app")
+
+# Compressed telemetry waiting for the uplink consumer (take_telemetry_batches
+# / ack_telemetry_batches)
+TELEMETRY_PIPELINE = TelemetryPipeline()
+UPLINK_QUEUE = UplinkQueue()
+
+IPC_COMMANDS = (
+    "send_telemetry",
+    "request_get_data",
+    "connect_wifi_signal",
+    "get_telemetry_stats",
+    "get_telemetry_history",
+    "get_telemetry_trend",
+    "take_telemetry_batches",
+    "ack_telemetry_batches",
+    "get_metrics",
+    "relay_command",
+    "get_relay_state",
+    "start_operation",
+    "get_operation",
+    "list_operations",
+    "cancel_operation",
+    "profile",
+    "memory",
+    "get_gateway_state",
+    "take_gateway_batches",
+    "ack_gateway_batches",
+    "report_occupancy",
+    "get_duty_cycle",
+    "get_people_count",
+    "get_fatigue_state",
+    "get_models",
+    "reload_model",
+    "get_config",
+    "reload_config",
+)
+
+# Per-command latency, preallocated so the handler never touches the registry
+IPC_LATENCY = {
+    cmd: METRICS.histogram("lsmy_ipc_request_seconds", "IPC request handling time", {"cmd": cmd})
+    for cmd in IPC_COMMANDS + ("unknown",)
 }
+IPC_ERRORS = METRICS.counter("lsmy_ipc_errors_total", "IPC requests that raised")
 
 async def handle_client(reader, writer):
+    cmd = "unknown"
     try:
         data = await reader.readline()
         if not data:
             return
 
+        start = time.perf_counter()
+        capture_ipc(data)
         req = json.loads(data.decode())
-        log.info("IPC RX: %s", req)
+        if req.get("cmd") in IPC_LATENCY:
+            cmd = req["cmd"]
+        log.debug("IPC RX: %s", req, extra={"kv": {"cmd": cmd}})
 
         if req.get("cmd") == "send_telemetry":
-            telemetry = {
-                "temperature": float(req.get("temperature", 0)),
-                "humidity": float(req.get("humidity", 0)),
-                "no2": float(req.get("no2", 0)),
-                "pm10": float(req.get("pm10", 0)),
-                "pm25": float(req.get("pm25", 0)),
-            }
+            telemetry = TelemetrySample.from_mapping(req, ts=CLOCK())
 
-            log.info("Telemetry received: %s", telemetry)
+            log.debug("Telemetry received: %s", telemetry)
 
-            LAST_TELEMETRY.update(telemetry)
+            LAST_TELEMETRY.copy_from(telemetry)
+            TELEMETRY_HISTORY.append(telemetry)
+            STARTUP_TIMELINE.mark("first telemetry")
 
-            resp = {"status": "ok"}
-        elif req.get("cmd") == "request_get_data":
-            log.info("Data requested")
+            # Rules are evaluated right here, on sample arrival
+            if RELAY_SCHEDULER is not None:
+                RELAY_SCHEDULER.submit(telemetry)
+
+            points = TELEMETRY_PIPELINE.process(telemetry, ts=telemetry.ts, size=len(data))
+            if points:
+                UPLINK_QUEUE.put(points, telemetry.ts)
+                log.info(
+                    "Telemetry queued for uplink: %s", LazyJson(points),
+                    extra={"rate_limit": 60, "kv": {"channels": len(points), "queued": len(UPLINK_QUEUE)}},
+                )
 
-            data = {
-                "temperature": round(random.uniform(20.0, 35.0), 2),
-                "humidity":    round(random.uniform(40.0, 80.0), 2),
-                "no2":         round(random.uniform(0.0, 0.5), 4),
-                "pm10":        round(random.uniform(10.0, 50.0), 1),
-                "pm25":        round(random.uniform(5.0, 25.0), 1),
-            }
+            if DUTY_CYCLE is not None:
+                DUTY_CYCLE.observe_sample(telemetry)
 
-            resp = {"status": "ok", "data": data}
+            if GATEWAY is not None:
+                GATEWAY.submit_local(telemetry)
+            if FORWARDER is not None:
+                FORWARDER.submit(telemetry)
+
+            resp = {"status": "ok"}
+        elif req.get("cmd") == "get_telemetry_stats":
+            resp = {"status": "ok", "data": dict(TELEMETRY_PIPELINE.stats(), uplink=UPLINK_QUEUE.stats())}
+        elif req.get("cmd") == "get_telemetry_trend":
+            try:
+                window = int(req.get("window", 60))
+                resp = {"status": "ok", "data": {
+                    "window": window,
+                    "channels": TELEMETRY_HISTORY.rolling(window, req.get("limit")),
+                }}
+            except (TypeError, ValueError) as e:
+                resp = {"status": "error", "error": str(e)}
+        elif req.get("cmd") == "take_telemetry_batches":
+            # Left queued until ack_telemetry_batches names their ids
+            resp = {"status": "ok", "data": UPLINK_QUEUE.take(req.get("limit"))}
+        elif req.get("cmd") == "ack_telemetry_batches":
+            removed = UPLINK_QUEUE.ack(req.get("ids") or [])
+            resp = {"status": "ok", "data": {"removed": removed, "backlog": len(UPLINK_QUEUE)}}
+        elif req.get("cmd") == "get_telemetry_history":
+            # Encoded straight from the history columns
+            resp = '{"status":"ok","data":' + TELEMETRY_HISTORY.to_json(req.get("limit")) + '}'
+        elif req.get("cmd") == "get_metrics":
+            if req.get("format") == "prometheus":
+                resp = {"status": "ok", "data": METRICS.render_prometheus()}
+            else:
+                resp = {"status": "ok", "data": METRICS.snapshot()}
+        elif req.get("cmd") == "relay_command":
+            if RELAY_SCHEDULER is None:
+                resp = {"status": "error", "error": "Relay control unavailable"}
+            else:
+                try:
+                    states = await RELAY_SCHEDULER.manual(
+                        [(item["gpio"], item["on"]) for item in req.get("relays", [])],
+                        source=req.get("role", "ipc"),
+                    )
+                    resp = {"status": "ok", "data": {"relays": states}}
+                except (RelayError, KeyError, TypeError, ValueError) as e:
+                    resp = {"status": "error", "error": str(e)}
+        elif req.get("cmd") == "get_relay_state":
+            if RELAY_SCHEDULER is None:
+                resp = {"status": "error", "error": "Relay control unavailable"}
+            else:
+                resp = {"status": "ok", "data": RELAY_SCHEDULER.snapshot()}
+        elif req.get("cmd") in ("start_operation", "get_operation", "list_operations", "cancel_operation"):
+            resp = handle_operation_request(req)
+        elif req.get("cmd") in ("report_occupancy", "get_duty_cycle"):
+            if DUTY_CYCLE is None:
+                resp = {"status": "error", "error": "Duty cycling unavailable"}
+            else:
+                if req.get("cmd") == "report_occupancy":
+                    # People counting result from the AI pipeline
+                    DUTY_CYCLE.observe_occupancy(int(req.get("count", 0)))
+                resp = {"status": "ok", "data": DUTY_CYCLE.snapshot()}
+        elif req.get("cmd") == "get_people_count":
+            if PEOPLE_COUNTER is None:
+                resp = {"status": "error", "error": "People counting unavailable"}
+            else:
+                resp = {"status": "ok", "data": PEOPLE_COUNTER.snapshot()}
+        elif req.get("cmd") == "get_fatigue_state":
+            if FATIGUE_MONITOR is None:
+                resp = {"status": "error", "error": "Fatigue detection unavailable"}
+            else:
+                resp = {"status": "ok", "data": FATIGUE_MONITOR.snapshot()}
+        elif req.get("cmd") in ("get_models", "reload_model"):
+            if MODEL_REGISTRY is None:
+                resp = {"status": "error", "error": "No model registry"}
+            else:
+                resp = await MODEL_REGISTRY.handle(req)
+        elif req.get("cmd") in ("get_config", "reload_config"):
+            resp = await CONFIG.handle(req)
+        elif req.get("cmd") == "get_gateway_state":
+            resp = {"status": "ok", "data": {
+                "gateway": GATEWAY.snapshot() if GATEWAY is not None else None,
+                "forwarder": FORWARDER.stats() if FORWARDER is not None else None,
+            }}
+        elif req.get("cmd") == "take_gateway_batches":
+            if GATEWAY is None:
+                resp = {"status": "error", "error": "Gateway mode disabled"}
+            else:
+                # Batches are already encoded, splice them in; they stay
+                # stored until ack_gateway_batches names their ids
+                resp = '{"status":"ok","data":[' + ",".join(
+                    f'{{"id":{batch_id},"batch":{batch}}}' for batch_id, batch in GATEWAY.take_batches(req.get("limit"))
+                ) + ']}'
+        elif req.get("cmd") == "ack_gateway_batches":
+            if GATEWAY is None:
+                resp = {"status": "error", "error": "Gateway mode disabled"}
+            else:
+                removed = GATEWAY.ack_batches(req.get("ids") or [])
+                resp = {"status": "ok", "data": {"removed": removed, "backlog": len(GATEWAY.uplink)}}
+        elif req.get("cmd") in ("profile", "memory"):
+            resp = await PROFILER.handle(req)
+        elif req.get("cmd") == "request_get_data":
+            log.debug("Data requested")
+
+            sample = TelemetrySample(
+                CLOCK(),
+                round(random.uniform(20.0, 35.0), 2),     # temperature
+                round(random.uniform(40.0, 80.0), 2),     # humidity
+                round(random.uniform(0.0, 0.5), 4),       # no2
+                round(random.uniform(10.0, 50.0), 1),     # pm10
+                round(random.uniform(5.0, 25.0), 1),      # pm25
+            )
+
+            resp = '{"status":"ok","data":' + sample.to_json() + '}'
         elif req.get("cmd") == "connect_wifi_signal":
             role = req.get("role", "hardware")
             status = req.get("status", False)
@@ -65,74 +277,135 @@ async def handle_client(reader, writer):
         else:
             resp = {"status": "error", "error": "Unknown command"}
 
-        writer.write((json.dumps(resp) + "\n").encode())
+        # Pre-encoded responses (str) skip the dict round trip
+        writer.write(((resp if isinstance(resp, str) else json.dumps(resp)) + "\n").encode())
         await writer.drain()
 
+        IPC_LATENCY[cmd].observe(time.perf_counter() - start)
+
     except Exception:
+        IPC_ERRORS.inc()
         log.exception("IPC handler error")
     finally:
         writer.close()
 
-async def send_telemetry_ipc(data: dict, timeout=3):
+def handle_operation_request(req: dict) -> dict:
+    if OPERATION_QUEUE is None:
+        return {"status": "error", "error": "Operations unavailable"}
+
+    cmd = req.get("cmd")
+    if cmd == "list_operations":
+        return {"status": "ok", "data": OPERATION_QUEUE.snapshot()}
+
+    if cmd == "start_operation":
+        try:
+            op = OPERATION_QUEUE.submit(req.get("kind"), **req.get("params", {}))
+        except (ValueError, TypeError) as e:
+            return {"status": "error", "error": str(e)}
+    elif cmd == "cancel_operation":
+        op = OPERATION_QUEUE.cancel(req.get("id"))
+    else:
+        op = OPERATION_QUEUE.get(req.get("id"))
+
+    if op is None:
+        return {"status": "error", "error": "Unknown operation"}
+    return {"status": "ok", "data": op.to_dict()}
+
+async def _ipc_request(msg: dict, timeout=3, sock: str = None):
     reader, writer = await asyncio.wait_for(
-        asyncio.open_unix_connection(SOCK),
+        asyncio.open_unix_connection(sock or SOCK),
         timeout=timeout
     )
+    try:
+        writer.write((json.dumps(msg) + "\n").encode())
+        await writer.drain()
+        resp = await reader.readline()
+    finally:
+        writer.close()
+
+    return json.loads(resp.decode())
 
-    msg = {
+async def send_telemetry_ipc(data: dict, timeout=3):
+    return await _ipc_request({
         "cmd": "send_telemetry",
         "temperature": data.get("temperature", 0),
         "humidity": data.get("humidity", 0),
         "no2": data.get("no2", 0),
         "pm10": data.get("pm10", 0),
         "pm25": data.get("pm25", 0),
-    }
+    }, timeout)
+
+async def send_request_get_data_ipc(timeout=3):
+    return await _ipc_request({"cmd": "request_get_data"}, timeout)
 
-    writer.write((json.dumps(msg) + "\n").encode())
-    await writer.drain()
+async def send_connect_wifi_signal_ipc(data: dict, timeout=3):
+    return await _ipc_request({
+        "cmd": "connect_wifi_signal",
+        "role": data.get("role", "hardware"),
+        "status": data.get("status", False),
+    }, timeout)
 
-    resp = await reader.readline()
-    writer.close()
+async def send_get_metrics_ipc(fmt: str = "json", timeout=3):
+    return await _ipc_request({"cmd": "get_metrics", "format": fmt}, timeout)
 
-    return json.loads(resp.decode())
+async def send_relay_command_ipc(relays: list, role: str = "backend", timeout=3):
+    """
+    :param relays: [{"gpio": 18, "on": True}, ...]
+    """
+    return await _ipc_request({"cmd": "relay_command", "role": role, "relays": relays}, timeout)
 
-async def send_request_get_data_ipc(timeout=3):
-    reader, writer = await asyncio.wait_for(
-        asyncio.open_unix_connection(SOCK),
-        timeout=timeout
-    )
+async def send_get_relay_state_ipc(timeout=3):
+    return await _ipc_request({"cmd": "get_relay_state"}, timeout)
 
-    msg = {
-        "cmd": "request_get_data",
-    }
+async def send_start_operation_ipc(kind: str, params: dict = None, timeout=3):
+    return await _ipc_request({"cmd": "start_operation", "kind": kind, "params": params or {}}, timeout)
 
-    writer.write((json.dumps(msg) + "\n").encode())
-    await writer.drain()
+async def send_get_operation_ipc(op_id: int, timeout=3):
+    return await _ipc_request({"cmd": "get_operation", "id": op_id}, timeout)
 
-    resp = await reader.readline()
-    writer.close()
+async def send_cancel_operation_ipc(op_id: int, timeout=3):
+    return await _ipc_request({"cmd": "cancel_operation", "id": op_id}, timeout)
 
-    return json.loads(resp.decode())
+async def send_profile_ipc(seconds: float, interval: float = 0.01, sock: str = None):
+    # The reply comes after the profile, allow for writing it out
+    msg = {"cmd": "profile", "seconds": seconds, "interval": interval}
+    return await asyncio.wait_for(_ipc_request(msg, 3, sock), timeout=seconds + 10)
 
-async def send_connect_wifi_signal_ipc(data: dict, timeout=3):
-    reader, writer = await asyncio.wait_for(
-        asyncio.open_unix_connection(SOCK),
-        timeout=timeout
-    )
+async def send_memory_ipc(action: str = "diff", limit: int = 20, frames: int = 1, sock: str = None):
+    msg = {"cmd": "memory", "action": action, "limit": limit, "frames": frames}
+    return await asyncio.wait_for(_ipc_request(msg, 3, sock), timeout=30)
 
-    msg = {
-        "cmd": "connect_wifi_signal",
-        "role": data.get("role", "hardware"),
-        "status": data.get("status", False),
-    }
+def set_operation_queue(queue):
+    global OPERATION_QUEUE
+    OPERATION_QUEUE = queue
 
-    writer.write((json.dumps(msg) + "\n").encode())
-    await writer.drain()
+def set_duty_cycle(scheduler):
+    global DUTY_CYCLE
+    DUTY_CYCLE = scheduler
 
-    resp = await reader.readline()
-    writer.close()
+def set_people_counter(counter):
+    global PEOPLE_COUNTER
+    PEOPLE_COUNTER = counter
 
-    return json.loads(resp.decode())
+def set_fatigue_monitor(monitor):
+    global FATIGUE_MONITOR
+    FATIGUE_MONITOR = monitor
+
+def set_model_registry(registry):
+    global MODEL_REGISTRY
+    MODEL_REGISTRY = registry
+
+def set_gateway(gateway):
+    global GATEWAY
+    GATEWAY = gateway
+
+def set_forwarder(forwarder):
+    global FORWARDER
+    FORWARDER = forwarder
+
+def set_relay_scheduler(scheduler):
+    global RELAY_SCHEDULER
+    RELAY_SCHEDULER = scheduler
 
 
 async def ipc_server_task():
@@ -150,3 +423,34 @@ async def ipc_server_task():
     async with server:
         await server.serve_forever()
 
+
+async def debug_server_task(path: str, profiler: Profiler):
+    """
+    Profiling-only IPC endpoint for processes without an IPC server of
+    their own (the web backend). Same line protocol as ipc_server_task.
+    """
+    async def handle(reader, writer):
+        try:
+            data = await reader.readline()
+            if not data:
+                return
+            req = json.loads(data.decode())
+            if req.get("cmd") in ("profile", "memory"):
+                resp = await profiler.handle(req)
+            else:
+                resp = {"status": "error", "error": "Unknown command"}
+            writer.write((json.dumps(resp) + "\n").encode())
+            await writer.drain()
+        except Exception:
+            log.exception("Debug IPC handler error")
+        finally:
+            writer.close()
+
+    if os.path.exists(path):
+        os.unlink(path)
+    server = await asyncio.start_unix_server(handle, path=path)
+    os.chmod(path, 0o660)
+
+    log.info("Debug IPC listening on %s", path)
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,80 @@
+import ctypes
+import logging
+import importlib
+import threading
+
+# ====== STARTUP TIMELINE LIBRARY ======
+from lsmy_python_lib.startup_timeline import STARTUP_TIMELINE
+
+log = logging.getLogger("lazy-loader")
+
+
+class LazyModule:
+    """
+    Module proxy that imports the real module on first attribute access.
+
+    Usage:
+        wifi_mode_manager = LazyModule("lsmy_python_lib.wifi_mode_manager")
+        ...
+        manager = wifi_mode_manager.WiFiModeManager()   # import happens here
+    """
+
+    def __init__(self, name: str):
+        self._lazy_name = name
+        self._lazy_module = None
+        self._lazy_lock = threading.Lock()
+
+    def _load(self):
+        if self._lazy_module is None:
+            with self._lazy_lock:
+                if self._lazy_module is None:
+                    with STARTUP_TIMELINE.phase(self._lazy_name, kind="import"):
+                        self._lazy_module = importlib.import_module(self._lazy_name)
+        return self._lazy_module
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._lazy_module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self.is_loaded else "not loaded"
+        return f"<LazyModule {self._lazy_name} ({state})>"
+
+
+class NativeLibrary:
+    """
+    ctypes shared library that is opened on first symbol access.
+
+    :param path: Shared object path (e.g. /usr/lib/liblsmy_hello.so.1)
+    :param prototypes: Symbol name -> (restype, argtypes), applied on load
+    """
+
+    def __init__(self, path: str, prototypes: dict = None):
+        self.path = path
+        self._prototypes = prototypes or {}
+        self._lib = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._lib is None:
+            with self._lock:
+                if self._lib is None:
+                    with STARTUP_TIMELINE.phase(self.path, kind="native"):
+                        lib = ctypes.CDLL(self.path)
+                        for symbol, (restype, argtypes) in self._prototypes.items():
+                            func = getattr(lib, symbol)
+                            func.restype = restype
+                            func.argtypes = argtypes
+                    self._lib = lib
+                    log.info("Loaded native library %s", self.path)
+        return self._lib
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._lib is not None
+
+    def __getattr__(self, symbol):
+        return getattr(self._load(), symbol)
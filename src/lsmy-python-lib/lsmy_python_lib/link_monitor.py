@@ -0,0 +1,103 @@
+import socket
+import struct
+import asyncio
+import logging
+
+log = logging.getLogger("link-monitor")
+
+RTMGRP_LINK = 0x1
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+IFLA_IFNAME = 3
+IFF_LOWER_UP = 0x10000      # carrier; for a WiFi STA: associated
+
+NLMSGHDR = struct.Struct("=LHHLL")
+IFINFOMSG = struct.Struct("=BxHiII")
+RTATTR = struct.Struct("=HH")
+
+
+def _align(length: int) -> int:
+    return (length + 3) & ~3
+
+
+def parse_link_messages(data: bytes):
+    """
+    Decode rtnetlink link messages.
+
+    :return: [(ifname, carrier)] for every RTM_NEWLINK / RTM_DELLINK
+    """
+    links = []
+    offset = 0
+    while offset + NLMSGHDR.size <= len(data):
+        length, msg_type, _, _, _ = NLMSGHDR.unpack_from(data, offset)
+        if length < NLMSGHDR.size:
+            break
+
+        if msg_type in (RTM_NEWLINK, RTM_DELLINK):
+            body = offset + NLMSGHDR.size
+            _, _, _, flags, _ = IFINFOMSG.unpack_from(data, body)
+            ifname = None
+            attr = body + IFINFOMSG.size
+            while attr + RTATTR.size <= offset + length:
+                attr_len, attr_type = RTATTR.unpack_from(data, attr)
+                if attr_len < RTATTR.size:
+                    break
+                if attr_type == IFLA_IFNAME:
+                    ifname = data[attr + RTATTR.size:attr + attr_len].split(b"\0", 1)[0].decode()
+                    break
+                attr += _align(attr_len)
+            carrier = msg_type == RTM_NEWLINK and bool(flags & IFF_LOWER_UP)
+            links.append((ifname, carrier))
+
+        offset += _align(length)
+    return links
+
+
+class LinkMonitor:
+    """
+    Reports carrier changes of one interface as they happen, from the
+    kernel's rtnetlink link multicast group (no polling, no subprocess).
+
+    :param iface: Interface to watch
+    :param on_change: Callable on_change(carrier: bool), called on the
+                      event loop on every up/down transition
+    """
+
+    def __init__(self, iface: str, on_change):
+        self.iface = iface
+        self.on_change = on_change
+        self.carrier = None
+
+    def _on_readable(self, sock):
+        try:
+            data = sock.recv(65536)
+        except BlockingIOError:
+            return
+
+        for ifname, carrier in parse_link_messages(data):
+            if ifname != self.iface or carrier == self.carrier:
+                continue
+            self.carrier = carrier
+            log.info("%s link %s", self.iface, "up" if carrier else "down")
+            self.on_change(carrier)
+
+    async def run(self):
+        """
+        Watch link events until cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW | socket.SOCK_NONBLOCK, socket.NETLINK_ROUTE)
+        except (OSError, AttributeError) as e:
+            log.warning("rtnetlink unavailable (%s), link changes are seen by polling only", e)
+            return
+
+        try:
+            sock.bind((0, RTMGRP_LINK))
+            loop.add_reader(sock.fileno(), self._on_readable, sock)
+            try:
+                await asyncio.Future()
+            finally:
+                loop.remove_reader(sock.fileno())
+        finally:
+            sock.close()
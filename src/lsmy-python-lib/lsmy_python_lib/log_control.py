@@ -0,0 +1,241 @@
+import sys
+import json
+import time
+import queue
+import random
+import atexit
+import logging
+import threading
+import logging.handlers
+
+log = logging.getLogger("log-control")
+
+DEFAULT_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+
+# Per call site token bucket applied to records below WARNING
+DEFAULT_SITE_RATE = 2.0       # records per second
+DEFAULT_SITE_BURST = 20       # records allowed back to back
+DEFAULT_QUEUE_SIZE = 4096     # records buffered before dropping
+
+
+class LazyJson:
+    """
+    Defer json.dumps until the record is actually formatted:
+        log.debug("TX: %s", LazyJson(payload))
+    """
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self):
+        return json.dumps(self.obj, separators=(",", ":"), default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Per call site (file, line) rate limiting and sampling.
+
+    Records at WARNING and above always pass. Below that, each call site
+    gets a token bucket; a call can also pass its own policy through
+    `extra`:
+        extra={"rate_limit": 60}   # at most one record per 60 s
+        extra={"rate_limit": 0}    # never limited (reports, audit trails)
+        extra={"sample": 0.01}     # keep 1 % of records
+    The number of records dropped since the last emitted one is attached
+    to the next record from the same site as `record.suppressed`.
+    """
+
+    def __init__(self, rate: float = DEFAULT_SITE_RATE, burst: int = DEFAULT_SITE_BURST):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._sites = {}
+
+    def filter(self, record) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        sample = getattr(record, "sample", None)
+        if sample is not None and random.random() >= sample:
+            return self._drop(record)
+
+        now = time.monotonic()
+        key = (record.pathname, record.lineno)
+        interval = getattr(record, "rate_limit", None)
+
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None:
+                # [tokens, last refill, suppressed, last emit]
+                site = [float(self.burst), now, 0, -float("inf")]
+                self._sites[key] = site
+
+            if interval is not None:
+                allowed = now - site[3] >= interval
+            else:
+                site[0] = min(self.burst, site[0] + (now - site[1]) * self.rate)
+                site[1] = now
+                allowed = site[0] >= 1.0
+                if allowed:
+                    site[0] -= 1.0
+
+            if not allowed:
+                site[2] += 1
+                return False
+
+            if site[2]:
+                record.suppressed = site[2]
+                site[2] = 0
+            site[3] = now
+
+        return True
+
+    def _drop(self, record):
+        with self._lock:
+            site = self._sites.setdefault(
+                (record.pathname, record.lineno),
+                [float(self.burst), time.monotonic(), 0, -float("inf")],
+            )
+            site[2] += 1
+        return False
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    key=value output:
+        ts=2024-01-01T12:00:00.123 level=INFO logger=ipc msg="IPC RX" cmd=send_telemetry
+    Extra fields come from extra={"kv": {...}}.
+    """
+
+    def format(self, record) -> str:
+        fields = [
+            ("ts", self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}"),
+            ("level", record.levelname),
+            ("logger", record.name),
+            ("msg", record.getMessage()),
+        ]
+        fields.extend(getattr(record, "kv", {}).items())
+
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            fields.append(("suppressed", suppressed))
+
+        line = " ".join(f"{key}={_kv_value(value)}" for key, value in fields)
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class TextFormatter(logging.Formatter):
+    """
+    Classic text format; key/value extras and suppression counts are
+    appended to the message.
+    """
+
+    def format(self, record) -> str:
+        line = super().format(record)
+        kv = getattr(record, "kv", None)
+        if kv:
+            line += " " + " ".join(f"{key}={_kv_value(value)}" for key, value in kv.items())
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            line += f" (suppressed {suppressed} similar)"
+        return line
+
+
+def _kv_value(value) -> str:
+    text = str(value)
+    if not text or any(c in text for c in ' "=\n'):
+        return json.dumps(text)
+    return text
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks the caller and never formats in the
+    caller's thread: the record (with its unformatted args) is handed to
+    the listener thread as is. A full queue drops the record and counts it.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener = None
+
+
+def setup_logging(level=logging.INFO, structured: bool = False, stream=None,
+                  rate: float = DEFAULT_SITE_RATE, burst: int = DEFAULT_SITE_BURST,
+                  queue_size: int = DEFAULT_QUEUE_SIZE):
+    """
+    Configure the root logger for a LSMY process.
+
+    Records pass the rate limit filter in the calling thread, then go
+    through a bounded queue to a listener thread that formats and writes
+    them, so asyncio loops and the main loop never wait on stdout/journald.
+
+    :param level: Root log level
+    :param structured: key=value output instead of the classic text format
+    :param stream: Output stream (default: stdout)
+    :return: The queue handler (exposes the `dropped` counter)
+    """
+    global _listener
+
+    sink = logging.StreamHandler(stream or sys.stdout)
+    sink.setFormatter(StructuredFormatter() if structured else TextFormatter(DEFAULT_FORMAT))
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(RateLimitFilter(rate, burst))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    if _listener is not None:
+        _listener.stop()
+    else:
+        atexit.register(stop_logging)
+    _listener = logging.handlers.QueueListener(handler.queue, sink, respect_handler_level=True)
+    _listener.start()
+
+    return handler
+
+
+def stop_logging(timeout: float = None):
+    """
+    Flush queued records and stop the listener thread.
+
+    :param timeout: Seconds to wait for the listener to write out the
+                    queue (None: until it is done); a forced exit passes
+                    one so a hung sink cannot hold it
+    """
+    global _listener
+    listener, _listener = _listener, None
+    if listener is None:
+        return
+    if timeout is None:
+        listener.stop()
+        return
+
+    deadline = time.monotonic() + timeout
+    try:
+        # Records queued before the sentinel are written first
+        listener.queue.put(listener._sentinel, timeout=timeout)
+    except queue.Full:
+        return
+    listener._thread.join(max(0.0, deadline - time.monotonic()))
@@ -0,0 +1,187 @@
+import os
+import sys
+import time
+import socket
+import asyncio
+import logging
+import threading
+import traceback
+
+# ====== METRICS LIBRARY ======
+from lsmy_python_lib.metrics import METRICS
+
+# ====== CONFIG LIBRARY ======
+from lsmy_python_lib.config import CONFIG
+
+log = logging.getLogger("loop-health")
+
+LAG_INTERVAL = 0.1              # Seconds between event loop lag probes
+LAG_THRESHOLD = CONFIG.app.loop_lag_threshold    # Stall: capture the loop thread's stack
+CHECK_INTERVAL = 0.1            # Watcher thread period
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5)
+
+
+def sd_notify(message: str) -> bool:
+    """
+    Send a state line to systemd (READY=1, WATCHDOG=1, STOPPING=1, ...).
+    No-op outside a Type=notify unit.
+    """
+    address = os.environ.get("NOTIFY_SOCKET")
+    if not address:
+        return False
+    if address.startswith("@"):
+        address = "\0" + address[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.sendto(message.encode(), address)
+        return True
+    except OSError as e:
+        log.warning("sd_notify failed: %s", e, extra={"rate_limit": 60})
+        return False
+
+
+def watchdog_interval():
+    """
+    Ping interval for WatchdogSec= (half the timeout), None when disabled.
+    """
+    usec = os.environ.get("WATCHDOG_USEC")
+    pid = os.environ.get("WATCHDOG_PID")
+    if not usec or (pid and int(pid) != os.getpid()):
+        return None
+    return int(usec) / 1e6 / 2
+
+
+class _Source:
+    def __init__(self, name: str, max_age: float, thread_id: int = None):
+        self.name = name
+        self.max_age = max_age
+        self.thread_id = thread_id
+        self.last = time.monotonic()
+        self.stalled = False
+        self.stalled_since = None
+
+
+class LoopHealth:
+    """
+    Progress tracking for everything that must keep moving: event loops
+    (beating from monitor_event_loop) and control loops (calling beat()
+    once per cycle).
+
+    A watcher thread checks the sources every CHECK_INTERVAL. When an
+    event loop has not run for LAG_THRESHOLD it logs the stack of the loop
+    thread, i.e. of the code blocking it, once per stall. It sends
+    WATCHDOG=1 to systemd only while no source is stalled, so a hung
+    process is restarted instead of freezing silently.
+    """
+
+    def __init__(self):
+        self._sources = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stalls = {}
+
+    def register(self, name: str, max_age: float, thread_id: int = None):
+        """
+        :param max_age: Seconds without beat() after which the source is stalled
+        :param thread_id: Thread to capture the stack of when stalled
+        """
+        with self._lock:
+            self._sources[name] = _Source(name, max_age, thread_id)
+        self._stalls[name] = METRICS.counter("lsmy_loop_stalls_total", "Stalled loops detected", {"loop": name})
+
+    def unregister(self, name: str):
+        with self._lock:
+            self._sources.pop(name, None)
+
+    def beat(self, name: str):
+        source = self._sources.get(name)
+        if source is not None:
+            source.last = time.monotonic()
+
+    def stalled(self) -> list:
+        now = time.monotonic()
+        with self._lock:
+            return [s.name for s in self._sources.values() if now - s.last > s.max_age]
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                s.name: {"age": round(now - s.last, 3), "max_age": s.max_age, "stalled": now - s.last > s.max_age}
+                for s in self._sources.values()
+            }
+
+    # -------- Watcher thread --------
+    def start(self):
+        """
+        Start the watcher thread (idempotent).
+        """
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._watch, name="loop-health", daemon=True)
+        self._thread.start()
+
+    def _watch(self):
+        ping_every = watchdog_interval()
+        if ping_every:
+            log.info("systemd watchdog enabled, pinging every %.1fs while healthy", ping_every)
+        last_ping = 0.0
+
+        while True:
+            time.sleep(CHECK_INTERVAL)
+            now = time.monotonic()
+            healthy = True
+
+            with self._lock:
+                sources = list(self._sources.values())
+            for source in sources:
+                age = now - source.last
+                if age <= source.max_age:
+                    if source.stalled:
+                        log.warning("%s recovered, stalled for %.2fs", source.name, source.last - source.stalled_since)
+                    source.stalled = False
+                    continue
+
+                healthy = False
+                if not source.stalled:
+                    source.stalled = True
+                    source.stalled_since = source.last
+                    self._stalls[source.name].inc()
+                    self._report_stall(source, age)
+
+            if ping_every and healthy and now - last_ping >= ping_every:
+                sd_notify("WATCHDOG=1")
+                last_ping = now
+
+    def _report_stall(self, source: _Source, age: float):
+        frame = sys._current_frames().get(source.thread_id) if source.thread_id else None
+        if frame is None:
+            log.error("%s made no progress for %.2fs", source.name, age)
+            return
+        stack = "".join(traceback.format_stack(frame))
+        log.error("%s blocked for %.2fs, loop thread stack:\n%s", source.name, age, stack)
+
+
+HEALTH = LoopHealth()
+
+
+async def monitor_event_loop(name: str, interval: float = LAG_INTERVAL, health: LoopHealth = HEALTH):
+    """
+    Probe the running event loop: schedule a wake-up every `interval`,
+    record how late it runs as lsmy_loop_lag_seconds and beat `name` in
+    `health`. Starts the watcher thread.
+    """
+    lag = METRICS.histogram("lsmy_loop_lag_seconds", "Event loop scheduling lag", {"loop": name}, buckets=LAG_BUCKETS)
+    health.register(name, interval + LAG_THRESHOLD, threading.get_ident())
+    health.start()
+
+    try:
+        while True:
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            lag.observe(max(0.0, now - expected))
+            health.beat(name)
+    finally:
+        health.unregister(name)
@@ -0,0 +1,272 @@
+import time
+import asyncio
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+log = logging.getLogger("metrics")
+
+# Latency buckets in seconds (upper bounds), +Inf is implicit
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _escape(text, quote: bool = True) -> str:
+    # Text format escapes: backslash and newline everywhere, double
+    # quotes in label values (SSIDs, operation kinds come from users)
+    text = str(text).replace("\\", "\\\\").replace("\n", "\\n")
+    return text.replace('"', '\\"') if quote else text
+
+
+def _format_labels(key: tuple) -> str:
+    if not key:
+        return ""
+    inner = ",".join(f'{k}="{_escape(v)}"' for k, v in key)
+    return "{" + inner + "}"
+
+
+class Counter:
+    """
+    Monotonic counter. The lock only guards a single addition.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str = "", labels: tuple = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def samples(self):
+        yield self.name, self.labels, self._value
+
+
+class Gauge:
+    """
+    Value that can go up and down. set() is a single attribute store.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str = "", labels: tuple = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._value = 0
+
+    def set(self, value):
+        self._value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    @property
+    def value(self):
+        return self._value
+
+    def samples(self):
+        yield self.name, self.labels, self._value
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. Bucket counters are preallocated, observe()
+    is one bisect plus three additions under a short lock.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str = "", labels: tuple = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+
+        cumulative = []
+        running = 0
+        for upper, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            running += bucket_count
+            cumulative.append((upper, running))
+
+        return {"count": count, "sum": total, "buckets": cumulative}
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound of the bucket that contains the q-quantile.
+        """
+        snap = self.snapshot()
+        if snap["count"] == 0:
+            return 0.0
+        target = q * snap["count"]
+        for upper, cumulative in snap["buckets"]:
+            if cumulative >= target:
+                return upper
+        return float("inf")
+
+    def samples(self):
+        snap = self.snapshot()
+        for upper, cumulative in snap["buckets"]:
+            le = "+Inf" if upper == float("inf") else repr(upper)
+            yield self.name + "_bucket", self.labels + (("le", le),), cumulative
+        yield self.name + "_sum", self.labels, snap["sum"]
+        yield self.name + "_count", self.labels, snap["count"]
+
+
+class MetricsRegistry:
+    """
+    Process-wide registry. Metrics are created once (at import time of
+    the instrumented module) and then updated without registry lookups.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get_or_create(self, cls, name, description, labels, **kwargs):
+        key = (name, _label_key(labels))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = cls(name, description, key[1], **kwargs)
+                self._metrics[key] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name: str, description: str = "", labels: dict = None) -> Counter:
+        return self._get_or_create(Counter, name, description, labels)
+
+    def gauge(self, name: str, description: str = "", labels: dict = None) -> Gauge:
+        return self._get_or_create(Gauge, name, description, labels)
+
+    def histogram(self, name: str, description: str = "", labels: dict = None, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, description, labels, buckets=buckets)
+
+    def _sorted_metrics(self):
+        with self._lock:
+            return sorted(self._metrics.values(), key=lambda m: (m.name, m.labels))
+
+    def snapshot(self) -> dict:
+        """
+        JSON-friendly view of every metric (used by the IPC command).
+        """
+        out = {}
+        for metric in self._sorted_metrics():
+            entry = out.setdefault(metric.name, {"type": metric.kind, "values": []})
+            if isinstance(metric, Histogram):
+                snap = metric.snapshot()
+                value = {
+                    "count": snap["count"],
+                    "sum": snap["sum"],
+                    "p50": metric.quantile(0.5),
+                    "p99": metric.quantile(0.99),
+                }
+            else:
+                value = metric.value
+            entry["values"].append({"labels": dict(metric.labels), "value": value})
+        return out
+
+    def render_prometheus(self) -> str:
+        """
+        Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        seen = set()
+        for metric in self._sorted_metrics():
+            if metric.name not in seen:
+                seen.add(metric.name)
+                if metric.description:
+                    lines.append(f"# HELP {metric.name} {_escape(metric.description, quote=False)}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Global instance
+METRICS = MetricsRegistry()
+
+
+async def metrics_http_server_task(host: str = "0.0.0.0", port: int = 9100, registry: MetricsRegistry = METRICS):
+    """
+    Minimal HTTP endpoint serving GET /metrics in Prometheus text format.
+    Optional: only started when a port is configured.
+    """
+
+    async def handle(reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Drain headers
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=5)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+
+            parts = request_line.decode(errors="replace").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                body = registry.render_prometheus().encode()
+                status = "200 OK"
+                content_type = "text/plain; version=0.0.4"
+            else:
+                body = b"not found\n"
+                status = "404 Not Found"
+                content_type = "text/plain"
+
+            writer.write(
+                f"HTTP/1.0 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    log.info("Metrics endpoint listening on http://%s:%d/metrics", host, port)
+
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,216 @@
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+
+# ====== METRICS LIBRARY ======
+from lsmy_python_lib.metrics import METRICS
+
+log = logging.getLogger("operation-queue")
+
+STATE_QUEUED = "queued"
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+STATE_CANCELLED = "cancelled"
+FINAL_STATES = (STATE_DONE, STATE_FAILED, STATE_CANCELLED)
+
+HISTORY_SIZE = 50    # finished operations kept for status queries
+
+
+class OperationCancelled(Exception):
+    pass
+
+
+class Operation:
+    """
+    One long-running device operation (reset, configure, mode switch).
+
+    The operation function runs on a worker thread and receives this
+    object: it calls report() to publish progress and check_cancelled()
+    between steps, which is where a cancel request takes effect.
+    """
+
+    def __init__(self, op_id: int, kind: str, params: dict):
+        self.id = op_id
+        self.kind = kind
+        self.params = params
+        self.state = STATE_QUEUED
+        self.progress = 0.0
+        self.message = "Queued"
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+
+    def report(self, progress: float, message: str = None):
+        self.progress = max(0.0, min(1.0, progress))
+        if message is not None:
+            self.message = message
+            log.info("Operation %d (%s): %s", self.id, self.kind, message)
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise OperationCancelled()
+
+    def to_dict(self) -> dict:
+        # Secrets stay on the device
+        params = {k: v for k, v in self.params.items() if k != "password"}
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": params,
+            "state": self.state,
+            "progress": round(self.progress, 3),
+            "message": self.message,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class OperationQueue:
+    """
+    Serializes device operations and runs them off the event loop.
+
+    Operations run one at a time, in submission order, on `run_blocking`
+    (the application's worker pool). An identical operation that is still
+    queued is reused instead of queued twice. `lock` is held while an
+    operation runs so other writers of the same device state (the WiFi
+    main loop) never interleave with it.
+    """
+
+    def __init__(self, run_blocking=None, lock: threading.Lock = None):
+        self.run_blocking = run_blocking
+        self.lock = lock or threading.Lock()
+        self._handlers = {}
+        self._durations = {}
+        self._operations = OrderedDict()
+        self._queue = None
+        self._next_id = 1
+        self._current = None
+
+    def register(self, kind: str, func):
+        """
+        :param func: Blocking callable func(operation, **params)
+        """
+        self._handlers[kind] = func
+        self._durations[kind] = METRICS.histogram(
+            "lsmy_operation_seconds", "Device operation run time", {"kind": kind},
+            buckets=(0.1, 0.5, 1, 2, 5, 10, 20, 30, 60, 120),
+        )
+
+    @property
+    def kinds(self) -> tuple:
+        return tuple(self._handlers)
+
+    @property
+    def busy(self) -> bool:
+        return self._current is not None or (self._queue is not None and not self._queue.empty())
+
+    def submit(self, kind: str, **params) -> Operation:
+        """
+        Queue an operation (call from the event loop).
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown operation: {kind}")
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+
+        for op in self._operations.values():
+            if op.state == STATE_QUEUED and op.kind == kind and op.params == params and not op.cancel_requested:
+                return op
+
+        op = Operation(self._next_id, kind, params)
+        self._next_id += 1
+        self._operations[op.id] = op
+        self._trim()
+        self._queue.put_nowait(op)
+        log.info("Operation %d (%s) queued", op.id, kind)
+        return op
+
+    def cancel(self, op_id: int):
+        """
+        Cancel a queued operation, or ask a running one to stop at its
+        next check_cancelled().
+        """
+        op = self._operations.get(op_id)
+        if op is None or op.state in FINAL_STATES:
+            return op
+        op._cancel.set()
+        if op.state == STATE_QUEUED:
+            self._finish(op, STATE_CANCELLED, "Cancelled")
+        else:
+            op.message = "Cancelling"
+        return op
+
+    def get(self, op_id: int):
+        return self._operations.get(op_id)
+
+    def snapshot(self) -> list:
+        return [op.to_dict() for op in self._operations.values()]
+
+    def _trim(self):
+        finished = [op_id for op_id, op in self._operations.items() if op.state in FINAL_STATES]
+        for op_id in finished[:max(0, len(finished) - HISTORY_SIZE)]:
+            del self._operations[op_id]
+
+    def _finish(self, op: Operation, state: str, message: str, error: str = None):
+        op.state = state
+        op.message = message
+        op.error = error
+        op.finished = time.time()
+
+    def _execute(self, op: Operation):
+        # Worker thread
+        with self.lock:
+            op.check_cancelled()
+            op.state = STATE_RUNNING
+            op.started = time.time()
+            op.report(0.0, "Running")
+            self._handlers[op.kind](op, **op.params)
+
+    async def run(self):
+        """
+        Worker: execute queued operations one by one until cancelled.
+        """
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+
+        while True:
+            op = await self._queue.get()
+            if op.state != STATE_QUEUED:
+                continue
+
+            self._current = op
+            start = time.perf_counter()
+            try:
+                if self.run_blocking is not None:
+                    await self.run_blocking(self._execute, op)
+                else:
+                    await asyncio.to_thread(self._execute, op)
+                op.report(1.0)
+                self._finish(op, STATE_DONE, op.message if op.message != "Running" else "Done")
+            except OperationCancelled:
+                self._finish(op, STATE_CANCELLED, "Cancelled")
+            except Exception as e:
+                log.exception("Operation %d (%s) failed", op.id, op.kind)
+                self._finish(op, STATE_FAILED, "Failed", str(e))
+            finally:
+                if op.state not in FINAL_STATES:
+                    # Worker cancelled mid-run (shutdown): the thread stops
+                    # at its next check_cancelled(), the operation ends here
+                    op._cancel.set()
+                    self._finish(op, STATE_CANCELLED, "Cancelled", "Operation queue stopped")
+                    log.warning("Operation %d (%s) cancelled while running", op.id, op.kind)
+                self._current = None
+                self._durations[op.kind].observe(time.perf_counter() - start)
+
+            log.info("Operation %d (%s) %s", op.id, op.kind, op.state)
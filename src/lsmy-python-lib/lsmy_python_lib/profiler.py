@@ -0,0 +1,232 @@
+import os
+import sys
+import time
+import json
+import asyncio
+import logging
+import argparse
+import threading
+import tracemalloc
+from collections import Counter
+
+log = logging.getLogger("profiler")
+
+PROFILE_DIR = os.environ.get("LSMY_PROFILE_DIR", "/tmp/lsmy-profiles")
+
+DEFAULT_INTERVAL = 0.01     # 100 Hz
+MIN_INTERVAL = 0.001
+MAX_SECONDS = 120           # Upper bound of one profiling run
+MAX_STACK_DEPTH = 64
+MAX_TRACE_FRAMES = 25       # tracemalloc traceback depth limit
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Statistical profiler for every thread of the process.
+
+    A timer thread wakes every `interval`, reads all thread stacks with
+    sys._current_frames() and counts them as collapsed stacks
+    ("thread;outer;...;inner"), the input format of flamegraph.pl /
+    speedscope. Nothing runs while no profile is active; while sampling,
+    the cost is one stack walk per thread per tick and is reported as
+    `overhead` (sampling time / wall time).
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        self.interval = max(MIN_INTERVAL, interval)
+        self.stacks = Counter()
+        self.samples = 0
+        self.busy_seconds = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+        self._thread_names = {}
+
+    def start(self):
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="lsmy-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> dict:
+        self._stop.set()
+        self._thread.join()
+        wall = time.monotonic() - self._started
+        return {
+            "samples": self.samples,
+            "seconds": round(wall, 3),
+            "interval": self.interval,
+            "overhead": round(self.busy_seconds / wall, 4) if wall else 0.0,
+        }
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        # Stacks are counted as tuples of code objects and named once at the end
+        while not self._stop.wait(self.interval):
+            start = time.perf_counter()
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                self.stacks[(ident, tuple(stack))] += 1
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+            self.samples += 1
+            self.busy_seconds += time.perf_counter() - start
+        self._thread_names = names
+
+    def collapsed_stacks(self) -> Counter:
+        names = self._thread_names
+        collapsed = Counter()
+        for (ident, codes), count in self.stacks.items():
+            frames = [names.get(ident, f"thread-{ident}")] + [_frame_name(code) for code in reversed(codes)]
+            collapsed[";".join(frames)] += count
+        return collapsed
+
+
+class Profiler:
+    """
+    IPC facing profiling state of one process: at most one stack profile
+    at a time, and tracemalloc snapshots diffed against the previous one.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._sampler = None
+        self._baseline = None
+
+    async def profile(self, seconds: float, interval: float = DEFAULT_INTERVAL) -> dict:
+        if self._sampler is not None:
+            raise RuntimeError("A profile is already running")
+        seconds = min(max(float(seconds), 0.1), MAX_SECONDS)
+
+        self._sampler = StackSampler(float(interval))
+        self._sampler.start()
+        log.info("Profiling %s for %.1fs", self.name, seconds)
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            sampler, self._sampler = self._sampler, None
+            result = sampler.stop()
+
+        stacks = sampler.collapsed_stacks()
+        content = "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        path = os.path.join(PROFILE_DIR, f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}.collapsed")
+        await asyncio.get_running_loop().run_in_executor(None, self._write, path, content)
+        result["path"] = path
+        result["top"] = self._top_functions(stacks)
+        log.info("Profile written to %s (%d samples, overhead %.2f%%)",
+                 path, result["samples"], result["overhead"] * 100)
+        return result
+
+    @staticmethod
+    def _write(path: str, content: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    @staticmethod
+    def _top_functions(stacks: Counter, limit: int = 10) -> list:
+        # Self time: innermost frame of each stack
+        leaves = Counter()
+        for stack, count in stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return [{"frame": frame, "samples": count} for frame, count in leaves.most_common(limit)]
+
+    def memory(self, action: str, limit: int = 20, frames: int = 1) -> dict:
+        """
+        start   begin tracing allocations (`frames` deep)
+        diff    snapshot, compare with the previous snapshot (or the start)
+        stop    stop tracing and drop the snapshots
+        """
+        if action == "start":
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(min(max(int(frames), 1), MAX_TRACE_FRAMES))
+            self._baseline = tracemalloc.take_snapshot()
+            return {"tracing": True}
+
+        if action == "stop":
+            tracemalloc.stop()
+            self._baseline = None
+            return {"tracing": False}
+
+        if action != "diff":
+            raise ValueError(f"Unknown memory action: {action}")
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("Memory tracing is not started")
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        stats = snapshot.compare_to(self._baseline, "traceback" if tracemalloc.get_traceback_limit() > 1 else "lineno")
+        self._baseline = snapshot
+
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "top": [
+                {
+                    "where": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+                    "size_diff": stat.size_diff,
+                    "size": stat.size,
+                    "count_diff": stat.count_diff,
+                }
+                for stat in stats[:int(limit)]
+            ],
+        }
+
+    async def handle(self, req: dict) -> dict:
+        """
+        IPC commands "profile" and "memory".
+        """
+        try:
+            if req.get("cmd") == "profile":
+                data = await self.profile(req.get("seconds", 10), req.get("interval", DEFAULT_INTERVAL))
+            else:
+                # Snapshots walk every traced block, keep that off the loop
+                data = await asyncio.get_running_loop().run_in_executor(
+                    None, self.memory, req.get("action", "diff"), req.get("limit", 20), req.get("frames", 1),
+                )
+            return {"status": "ok", "data": data}
+        except (RuntimeError, ValueError, TypeError, OSError) as e:
+            return {"status": "error", "error": str(e)}
+
+
+def main() -> int:
+    """
+    python3 -m lsmy_python_lib.profiler [--sock PATH] profile 10
+    python3 -m lsmy_python_lib.profiler --sock /run/lsmy/backend-debug.sock memory diff
+    """
+    from lsmy_python_lib import ipc
+
+    parser = argparse.ArgumentParser(description="Profile a running LSMY process over IPC")
+    parser.add_argument("--sock", default=ipc.SOCK, help="IPC socket of the target process")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    prof = sub.add_parser("profile")
+    prof.add_argument("seconds", type=float)
+    prof.add_argument("--interval", type=float, default=DEFAULT_INTERVAL)
+    mem = sub.add_parser("memory")
+    mem.add_argument("action", choices=("start", "diff", "stop"))
+    mem.add_argument("--limit", type=int, default=20)
+    mem.add_argument("--frames", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.cmd == "profile":
+        resp = asyncio.run(ipc.send_profile_ipc(args.seconds, args.interval, sock=args.sock))
+    else:
+        resp = asyncio.run(ipc.send_memory_ipc(args.action, args.limit, args.frames, sock=args.sock))
+    print(json.dumps(resp, indent=2))
+    return 0 if resp.get("status") == "ok" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
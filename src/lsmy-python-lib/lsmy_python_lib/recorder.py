@@ -0,0 +1,393 @@
+import os
+import sys
+import gzip
+import json
+import time
+import struct
+import asyncio
+import inspect
+import logging
+import argparse
+import threading
+from collections import Counter
+
+# ====== METRICS LIBRARY ======
+from lsmy_python_lib.metrics import METRICS
+
+log = logging.getLogger("recorder")
+
+RECORD_FILE = os.environ.get("LSMY_RECORD", "")        # Record this process' inputs (".gz" = compressed)
+FLUSH_INTERVAL = 5.0                                    # Seconds between file flushes
+
+# File layout: MAGIC, HEADER, then RECORD + payload per event
+MAGIC = b"LSMYREC1"
+HEADER = struct.Struct("<dq")           # wall clock (s) and monotonic (ns) at start
+RECORD = struct.Struct("<QBH")          # ns since start, kind, payload length
+GPIO_EDGE = struct.Struct("<H?")        # line, level
+
+KIND_IPC = 1        # Raw IPC request line
+KIND_GPIO = 2       # Input line edge
+KIND_MODE = 3       # WiFi mode switch ("ap", "sta", "cleanup")
+KIND_LINK = 4       # wlan0 carrier change
+KIND_NAMES = {KIND_IPC: "ipc", KIND_GPIO: "gpio", KIND_MODE: "mode", KIND_LINK: "link"}
+
+RECORDED = METRICS.counter("lsmy_recorder_events_total", "Events written to the recording")
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, compresslevel=6)
+    return open(path, mode, buffering=65536)
+
+
+class Recorder:
+    """
+    Appends input events to a compact binary file: an 11 byte header per
+    event (monotonic ns offset, kind, length) followed by the raw payload
+    (the IPC request line as received, packed GPIO edges). Safe to call
+    from any thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.events = 0
+        self._lock = threading.Lock()
+        self._start_ns = time.monotonic_ns()
+        self._last_flush = time.monotonic()
+        self._file = _open(path, "wb")
+        self._file.write(MAGIC + HEADER.pack(time.time(), self._start_ns))
+
+    def record(self, kind: int, payload: bytes, ts_ns: int = None):
+        if len(payload) > 0xFFFF:
+            log.warning("Event of %d bytes not recorded", len(payload), extra={"rate_limit": 60})
+            return
+        offset = max(0, (time.monotonic_ns() if ts_ns is None else ts_ns) - self._start_ns)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(RECORD.pack(offset, kind, len(payload)) + payload)
+            self.events += 1
+            now = time.monotonic()
+            if now - self._last_flush >= FLUSH_INTERVAL:
+                self._file.flush()
+                self._last_flush = now
+        RECORDED.inc()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        log.info("Recording %s closed (%d events)", self.path, self.events)
+
+
+# Process wide recorder, None while not recording
+ACTIVE = None
+
+
+def start_recording(path: str) -> Recorder:
+    global ACTIVE
+    stop_recording()
+    ACTIVE = Recorder(path)
+    log.info("Recording inputs to %s", path)
+    return ACTIVE
+
+
+def stop_recording():
+    global ACTIVE
+    recorder, ACTIVE = ACTIVE, None
+    if recorder is not None:
+        recorder.close()
+
+
+def capture_ipc(line: bytes):
+    recorder = ACTIVE
+    if recorder is not None:
+        recorder.record(KIND_IPC, line.rstrip(b"\n"))
+
+
+def capture_gpio(line: int, level: bool, ts_ns: int = None):
+    recorder = ACTIVE
+    if recorder is not None:
+        recorder.record(KIND_GPIO, GPIO_EDGE.pack(line, bool(level)), ts_ns)
+
+
+def capture_mode(mode: str):
+    recorder = ACTIVE
+    if recorder is not None:
+        recorder.record(KIND_MODE, mode.encode())
+
+
+def capture_link(carrier: bool):
+    recorder = ACTIVE
+    if recorder is not None:
+        recorder.record(KIND_LINK, b"\x01" if carrier else b"\x00")
+
+
+class Recording:
+    """
+    Reader for a recording; iterating yields (offset_ns, kind, payload).
+    A truncated last event (process killed mid-write) ends the iteration.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with _open(path, "rb") as f:
+            head = f.read(len(MAGIC) + HEADER.size)
+        if len(head) < len(MAGIC) + HEADER.size or not head.startswith(MAGIC):
+            raise ValueError(f"{path} is not an LSMY recording")
+        self.wall_start, self.mono_start_ns = HEADER.unpack_from(head, len(MAGIC))
+
+    def __iter__(self):
+        with _open(self.path, "rb") as f:
+            f.read(len(MAGIC) + HEADER.size)
+            while True:
+                head = f.read(RECORD.size)
+                if len(head) < RECORD.size:
+                    return
+                offset, kind, length = RECORD.unpack(head)
+                payload = f.read(length)
+                if len(payload) < length:
+                    return
+                yield offset, kind, payload
+
+    def summary(self) -> dict:
+        kinds = Counter()
+        commands = Counter()
+        last = 0
+        for offset, kind, payload in self:
+            kinds[KIND_NAMES.get(kind, str(kind))] += 1
+            if kind == KIND_IPC:
+                try:
+                    commands[json.loads(payload).get("cmd")] += 1
+                except ValueError:
+                    commands["invalid"] += 1
+            last = max(last, offset)
+        return {
+            "path": self.path,
+            "started": self.wall_start,
+            "seconds": round(last / 1e9, 3),
+            "events": dict(kinds),
+            "commands": dict(commands),
+        }
+
+
+def decode_gpio(payload: bytes) -> tuple:
+    """
+    :return: (line, level)
+    """
+    return GPIO_EDGE.unpack(payload)
+
+
+class Replayer:
+    """
+    Feeds a recording to handlers at the recorded pace scaled by
+    `speed` (1 = real time, 60 = one hour per minute, 0 = as fast as
+    possible).
+
+    While an event is handled, time() / monotonic() return the recorded
+    clocks, so code given them as its clock (ipc.CLOCK, duty cycle,
+    pipeline buckets) sees the original timeline even at speed 0.
+
+    :param handlers: kind -> handler(payload, offset_ns); coroutine
+                     functions are awaited before the next event
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, handlers: dict = None):
+        self.recording = Recording(path)
+        self.speed = speed
+        self.handlers = dict(handlers or {})
+        self.offset_ns = 0
+
+    def time(self) -> float:
+        return self.recording.wall_start + self.offset_ns / 1e9
+
+    def monotonic(self) -> float:
+        return (self.recording.mono_start_ns + self.offset_ns) / 1e9
+
+    async def run(self) -> dict:
+        counts = Counter()
+        started = time.monotonic()
+        for offset, kind, payload in self.recording:
+            if self.speed > 0:
+                delay = started + offset / 1e9 / self.speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif sum(counts.values()) % 256 == 0:
+                # Let tasks started by the handlers (relay actuation, ...) run
+                await asyncio.sleep(0)
+
+            self.offset_ns = max(self.offset_ns, offset)
+            handler = self.handlers.get(kind)
+            if handler is not None:
+                result = handler(payload, offset)
+                if inspect.isawaitable(result):
+                    await result
+            counts[KIND_NAMES.get(kind, str(kind))] += 1
+
+        elapsed = time.monotonic() - started
+        recorded = self.offset_ns / 1e9
+        return {
+            "events": dict(counts),
+            "recorded_seconds": round(recorded, 3),
+            "replay_seconds": round(elapsed, 3),
+            "speedup": round(recorded / elapsed, 1) if elapsed else None,
+        }
+
+
+class _ReplayWriter:
+    """
+    Stands in for the StreamWriter of an IPC connection.
+    """
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data: bytes):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class IpcReplay:
+    """
+    IPC event handler: runs each recorded request through
+    ipc.handle_client in this process and tallies the replies.
+    """
+
+    def __init__(self):
+        self.replies = Counter()
+        self.seconds = Counter()
+
+    async def __call__(self, payload: bytes, offset_ns: int):
+        from lsmy_python_lib import ipc
+
+        reader = asyncio.StreamReader()
+        reader.feed_data(payload + b"\n")
+        reader.feed_eof()
+        writer = _ReplayWriter()
+
+        start = time.perf_counter()
+        await ipc.handle_client(reader, writer)
+        try:
+            cmd = json.loads(payload).get("cmd")
+            status = json.loads(bytes(writer.data)).get("status") if writer.data else "no reply"
+        except ValueError:
+            cmd, status = "invalid", "error"
+        self.replies[f"{cmd}:{status}"] += 1
+        self.seconds[cmd] += time.perf_counter() - start
+
+
+class SocketReplay:
+    """
+    IPC event handler: sends each recorded request to a running process.
+    """
+
+    def __init__(self, sock: str, timeout: float = 3):
+        self.sock = sock
+        self.timeout = timeout
+        self.replies = Counter()
+
+    async def __call__(self, payload: bytes, offset_ns: int):
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_unix_connection(self.sock), self.timeout)
+            try:
+                writer.write(payload + b"\n")
+                await writer.drain()
+                resp = json.loads(await asyncio.wait_for(reader.readline(), self.timeout) or b"{}")
+            finally:
+                writer.close()
+            self.replies[resp.get("status", "no reply")] += 1
+        except (OSError, asyncio.TimeoutError, ValueError):
+            self.replies["failed"] += 1
+
+
+class DryRunRelays:
+    """
+    RelayController stand-in that only counts switching (replay of relay
+    rules without hardware).
+    """
+
+    def __init__(self):
+        self.switches = Counter()
+        self._state = {}
+
+    def apply(self, commands) -> dict:
+        for line, on in commands:
+            if self._state.get(line) != on:
+                self.switches[f"{line}:{'on' if on else 'off'}"] += 1
+            self._state[line] = bool(on)
+        return {line: self._state[line] for line, _ in commands}
+
+    def set(self, line: int, on: bool) -> bool:
+        return self.apply([(line, on)])[line]
+
+    def state(self) -> dict:
+        return {line: {"on": on, "changed": None} for line, on in self._state.items()}
+
+    def close(self):
+        pass
+
+
+async def _replay_in_process(args) -> dict:
+    from lsmy_python_lib import ipc
+    from lsmy_python_lib.duty_cycle import DutyCycleScheduler
+
+    ipc_handler = IpcReplay()
+    replayer = Replayer(args.file, args.speed, {KIND_IPC: ipc_handler})
+    ipc.CLOCK = replayer.time
+    ipc.set_duty_cycle(DutyCycleScheduler(clock=replayer.monotonic))
+    relays = None
+    if args.relay_rules:
+        from lsmy_python_lib.relay_rules import load_relay_rules
+        relays = DryRunRelays()
+        ipc.set_relay_scheduler(load_relay_rules(args.relay_rules, relays))
+
+    result = await replayer.run()
+    await asyncio.sleep(0.1)     # pending relay actuations
+    result["replies"] = dict(ipc_handler.replies)
+    result["handler_seconds"] = {cmd: round(s, 4) for cmd, s in ipc_handler.seconds.items()}
+    result["telemetry"] = ipc.TELEMETRY_PIPELINE.stats()
+    result["duty_cycle"] = ipc.DUTY_CYCLE.snapshot()
+    if relays is not None:
+        result["relay_switches"] = dict(relays.switches)
+    return result
+
+
+def main() -> int:
+    """
+    python3 -m lsmy_python_lib.recorder info /data/field.rec.gz
+    python3 -m lsmy_python_lib.recorder replay /data/field.rec.gz --speed 0 [--relay-rules rules.json]
+    python3 -m lsmy_python_lib.recorder replay /data/field.rec.gz --speed 1 --sock /run/lsmy/provision.sock
+    """
+    parser = argparse.ArgumentParser(description="Inspect and replay LSMY input recordings")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    info = sub.add_parser("info")
+    info.add_argument("file")
+    replay = sub.add_parser("replay")
+    replay.add_argument("file")
+    replay.add_argument("--speed", type=float, default=0.0, help="1 = real time, 0 = as fast as possible")
+    replay.add_argument("--sock", help="Send IPC requests to this running process instead of in-process")
+    replay.add_argument("--relay-rules", help="In-process: evaluate these relay rules against dry-run relays")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+
+    if args.cmd == "info":
+        result = Recording(args.file).summary()
+    elif args.sock:
+        handler = SocketReplay(args.sock)
+        result = asyncio.run(Replayer(args.file, args.speed, {KIND_IPC: handler}).run())
+        result["replies"] = dict(handler.replies)
+    else:
+        result = asyncio.run(_replay_in_process(args))
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
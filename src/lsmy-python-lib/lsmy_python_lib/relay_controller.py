@@ -0,0 +1,170 @@
+from periphery import GPIO
+import os
+import time
+import logging
+import threading
+
+# ====== METRICS LIBRARY ======
+from lsmy_python_lib.metrics import METRICS
+
+log = logging.getLogger("relay-controller")
+
+RELAY_CHIP = "/dev/gpiochip0"
+
+RELAY_WRITE_SECONDS = METRICS.histogram("lsmy_relay_write_seconds", "Relay command time (write + read back)")
+RELAY_ERRORS = METRICS.counter("lsmy_relay_errors_total", "Relay commands that failed")
+
+
+class RelayError(Exception):
+    pass
+
+
+class RelayController:
+    """
+    Owns the relay GPIO lines for the lifetime of the process.
+
+    Each line is requested once and the handle is kept in a pool, so a
+    command is a single write instead of export / direction / unexport.
+    Commands on the same line are serialized; commands on different lines
+    run in parallel. The last read-back state is cached for the UI.
+    """
+
+    def __init__(self, chip: str = RELAY_CHIP):
+        self.chip = chip
+        self._handles = {}
+        self._locks = {}
+        self._state = {}
+        self._changed = {}
+        self._pool_lock = threading.Lock()
+
+    def _lock_for(self, line: int) -> threading.Lock:
+        with self._pool_lock:
+            lock = self._locks.get(line)
+            if lock is None:
+                lock = self._locks[line] = threading.Lock()
+            return lock
+
+    def _handle(self, line: int, initial: bool):
+        # Caller holds the line lock
+        gpio = self._handles.get(line)
+        if gpio is None:
+            # Request the line already driven to the wanted level:
+            # "out" would pulse it low first
+            direction = "high" if initial else "low"
+            if os.path.exists(self.chip):
+                gpio = GPIO(self.chip, line, direction)
+            else:
+                gpio = GPIO(line, direction)
+            self._handles[line] = gpio
+            log.info("GPIO %d requested", line)
+        return gpio
+
+    def _write_locked(self, line: int, on: bool) -> bool:
+        start = time.perf_counter()
+        try:
+            gpio = self._handle(line, on)
+            gpio.write(on)
+            actual = bool(gpio.read())
+        except Exception as e:
+            RELAY_ERRORS.inc()
+            self._drop_handle(line)
+            raise RelayError(f"GPIO {line} control failed: {e}") from e
+
+        if actual != on:
+            RELAY_ERRORS.inc()
+            log.error("GPIO %d read back %s after writing %s", line, actual, on)
+
+        if self._state.get(line) != actual:
+            self._changed[line] = time.time()
+        self._state[line] = actual
+        RELAY_WRITE_SECONDS.observe(time.perf_counter() - start)
+        return actual
+
+    def _drop_handle(self, line: int):
+        gpio = self._handles.pop(line, None)
+        if gpio is not None:
+            try:
+                gpio.close()
+            except Exception:
+                pass
+
+    def set(self, line: int, on: bool) -> bool:
+        """
+        Drive one relay.
+
+        :return: State read back from the line
+        """
+        line = _validate_line(line)
+        with self._lock_for(line):
+            return self._write_locked(line, bool(on))
+
+    def apply(self, commands) -> dict:
+        """
+        Apply several relay commands in one pass.
+
+        All involved lines are locked (in line order, so concurrent batches
+        cannot deadlock) before the first write, so no other command can
+        interleave with the batch. A later command for the same line wins.
+        Every OFF is written before any ON, so interlocked relays swapped
+        in one batch are never on together, whatever the command order.
+
+        :param commands: Iterable of (line, on)
+        :return: {line: state read back}
+        """
+        wanted = {}
+        for line, on in commands:
+            wanted[_validate_line(line)] = bool(on)
+
+        locks = [self._lock_for(line) for line in sorted(wanted)]
+        for lock in locks:
+            lock.acquire()
+        try:
+            return {line: self._write_locked(line, on) for line, on in sorted(wanted.items(), key=lambda c: c[1])}
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def read_back(self, line: int) -> bool:
+        """
+        Read the real line level (touches hardware, refreshes the cache).
+        """
+        line = _validate_line(line)
+        with self._lock_for(line):
+            gpio = self._handles.get(line)
+            if gpio is None:
+                return self._state.get(line, False)
+            actual = bool(gpio.read())
+            self._state[line] = actual
+            return actual
+
+    def state(self) -> dict:
+        """
+        Cached relay states, served without touching hardware.
+
+        :return: {line: {"on": bool, "changed": unix time}}
+        """
+        with self._pool_lock:
+            return {
+                line: {"on": on, "changed": self._changed.get(line)}
+                for line, on in self._state.items()
+            }
+
+    def close(self):
+        """
+        Release every line (the relays keep their last level).
+        """
+        with self._pool_lock:
+            lines = list(self._handles)
+        for line in lines:
+            with self._lock_for(line):
+                self._drop_handle(line)
+
+
+def _validate_line(line) -> int:
+    try:
+        line = int(line)
+    except (TypeError, ValueError):
+        raise RelayError(f"Invalid GPIO line: {line!r}")
+    if line < 0:
+        raise RelayError(f"Invalid GPIO line: {line}")
+    return line
@@ -0,0 +1,344 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+
+# ====== RELAY CONTROLLER LIBRARY ======
+from lsmy_python_lib.relay_controller import RelayController, RelayError
+
+# ====== METRICS LIBRARY ======
+from lsmy_python_lib.metrics import METRICS
+
+# ====== CONFIG LIBRARY ======
+from lsmy_python_lib.config import CONFIG
+
+log = logging.getLogger("relay-rules")
+
+RELAY_RULES_FILE = CONFIG.relays.rules_file
+
+ACTUATION_BUDGET = 0.1       # seconds from sample arrival to relay written
+DEFAULT_MANUAL_HOLD = 300    # seconds rules leave a manually switched relay alone
+AUDIT_SIZE = 500
+
+RELAY_ACTUATION_SECONDS = METRICS.histogram(
+    "lsmy_relay_actuation_seconds", "Telemetry sample to relay actuation",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+RELAY_BLOCKED = METRICS.counter("lsmy_relay_interlock_blocks_total", "Relay switch-ons refused by an interlock")
+
+
+class RelayConfig:
+    """
+    Per relay settings.
+
+    :param line: GPIO line
+    :param name: Label used in logs and the audit trail
+    :param min_on: Minimum seconds a relay stays on before rules may turn it off
+    :param min_off: Minimum seconds a relay stays off before rules may turn it on
+    """
+
+    def __init__(self, line: int, name: str = None, min_on: float = 0.0, min_off: float = 0.0):
+        self.line = int(line)
+        self.name = name or f"GPIO {self.line}"
+        self.min_on = float(min_on)
+        self.min_off = float(min_off)
+
+
+class RelayRule:
+    """
+    Threshold rule with hysteresis on one telemetry channel.
+
+    With on > off the rule activates at value >= on and releases at
+    value <= off (e.g. ventilation on pm25). With on < off it is inverted
+    (activates at value <= on, releases at value >= off, e.g. a heater).
+
+    :param relay: GPIO line driven by the rule
+    :param channel: Telemetry channel (temperature, humidity, no2, pm10, pm25)
+    :param on: Activation threshold
+    :param off: Release threshold
+    """
+
+    def __init__(self, relay: int, channel: str, on: float, off: float, name: str = None):
+        if on == off:
+            raise ValueError(f"Rule on {channel}: on and off thresholds must differ (hysteresis)")
+        self.relay = int(relay)
+        self.channel = channel
+        self.on = float(on)
+        self.off = float(off)
+        self.name = name or f"{channel}"
+        self.active = False
+
+    def update(self, value: float) -> bool:
+        if self.on > self.off:
+            if not self.active and value >= self.on:
+                self.active = True
+            elif self.active and value <= self.off:
+                self.active = False
+        else:
+            if not self.active and value <= self.on:
+                self.active = True
+            elif self.active and value >= self.off:
+                self.active = False
+        return self.active
+
+
+class RelayScheduler:
+    """
+    Evaluates relay rules on every telemetry sample and drives the relays.
+
+    submit() runs on the event loop when a sample arrives: rule evaluation
+    is pure Python and synchronous, and only the resulting GPIO writes go
+    to a worker thread. Actuations are serialized (FIFO) so a later
+    decision can never be overtaken by an earlier one.
+
+    Min on/off times and manual holds only defer automatic switching; the
+    deferred change is applied by the first sample after they expire.
+    Interlocks apply to both automatic and manual commands.
+
+    :param run_blocking: Runs the GPIO writes (the application's worker
+                         pool); default: the loop's default executor
+    """
+
+    def __init__(self, controller: RelayController, relays=(), rules=(), interlocks=(),
+                 manual_hold: float = DEFAULT_MANUAL_HOLD, run_blocking=None):
+        self.controller = controller
+        self.run_blocking = run_blocking
+        self.relays = {cfg.line: cfg for cfg in relays}
+        self.rules = list(rules)
+        self.manual_hold = manual_hold
+
+        self._rules_by_relay = {}
+        for rule in self.rules:
+            self._rules_by_relay.setdefault(rule.relay, []).append(rule)
+            self.relays.setdefault(rule.relay, RelayConfig(rule.relay))
+
+        self._interlocks = {}
+        for a, b in interlocks:
+            self._interlocks.setdefault(int(a), set()).add(int(b))
+            self._interlocks.setdefault(int(b), set()).add(int(a))
+
+        self._commanded = {}
+        self._changed_at = {}
+        self._hold_until = {}
+        self._manual = set()            # lines with a manual write in flight
+        self._blocked = set()
+        self._audit = deque(maxlen=AUDIT_SIZE)
+        self._lock = None
+        self._pending = set()
+
+    # -------- Decisions --------
+    def _conflicts(self, line: int, batch: dict) -> list:
+        conflicts = []
+        for other in self._interlocks.get(line, ()):
+            on = batch[other][0] if other in batch else self._commanded.get(other, False)
+            if on:
+                conflicts.append(other)
+        return conflicts
+
+    def evaluate(self, sample: dict, now: float = None) -> dict:
+        """
+        Update rule states from a sample and decide relay changes.
+
+        :return: {line: (on, reason)} for relays that must switch
+        """
+        now = time.monotonic() if now is None else now
+
+        for rule in self.rules:
+            value = sample.get(rule.channel)
+            if value is not None:
+                rule.update(value)
+
+        changes = {}
+        for line, rules in self._rules_by_relay.items():
+            if now < self._hold_until.get(line, 0) or line in self._manual:
+                continue
+
+            active = [rule for rule in rules if rule.active]
+            want = bool(active)
+            current = self._commanded.get(line, False)
+            if want == current:
+                self._blocked.discard(line)
+                continue
+
+            cfg = self.relays[line]
+            elapsed = now - self._changed_at.get(line, float("-inf"))
+            if elapsed < (cfg.min_on if current else cfg.min_off):
+                continue
+
+            if want:
+                conflicts = self._conflicts(line, changes)
+                if conflicts:
+                    if line not in self._blocked:
+                        self._blocked.add(line)
+                        RELAY_BLOCKED.inc()
+                        self._record(line, True, "interlock", f"blocked by GPIO {conflicts}", applied=False)
+                    continue
+
+            self._blocked.discard(line)
+            rules_text = active if want else rules
+            reason = ", ".join(f"{r.channel}={sample.get(r.channel)}" for r in rules_text)
+            changes[line] = (want, reason)
+            self._commanded[line] = want
+            self._changed_at[line] = now
+
+        return changes
+
+    # -------- Actuation --------
+    def submit(self, sample: dict) -> dict:
+        """
+        Feed a telemetry sample (call from the event loop).
+        """
+        received = time.perf_counter()
+        changes = self.evaluate(sample)
+        if changes:
+            task = asyncio.get_running_loop().create_task(self._actuate(changes, "rule", received))
+            self._pending.add(task)
+            task.add_done_callback(self._task_done)
+        return changes
+
+    def _task_done(self, task):
+        self._pending.discard(task)
+        # Failures are logged and audited by _actuate already
+        if not task.cancelled():
+            task.exception()
+
+    async def _actuate(self, changes: dict, source: str, received: float) -> dict:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        commands = [(line, on) for line, (on, _) in changes.items()]
+        async with self._lock:
+            try:
+                if self.run_blocking is not None:
+                    states = await self.run_blocking(self.controller.apply, commands)
+                else:
+                    states = await asyncio.get_running_loop().run_in_executor(None, self.controller.apply, commands)
+            except RelayError as e:
+                log.error("Relay actuation failed: %s", e)
+                known = self.controller.state()
+                for line, (on, reason) in changes.items():
+                    # Fall back to the last confirmed level
+                    self._commanded[line] = known.get(line, {}).get("on", False)
+                    self._record(line, on, source, f"{reason} (failed: {e})", applied=False)
+                raise
+
+        elapsed = time.perf_counter() - received
+        RELAY_ACTUATION_SECONDS.observe(elapsed)
+        if elapsed > ACTUATION_BUDGET:
+            log.warning("Relay actuation took %.0f ms", elapsed * 1000, extra={"rate_limit": 60})
+
+        for line, (on, reason) in changes.items():
+            self._record(line, states[line], source, reason)
+        return states
+
+    async def manual(self, commands, source: str = "manual") -> dict:
+        """
+        Apply manual relay commands.
+
+        Interlocks are enforced (RelayError on conflict); once the relays
+        are written, rules leave them alone for `manual_hold` seconds.
+
+        :param commands: Iterable of (line, on)
+        :return: {line: state read back}
+        """
+        received = time.perf_counter()
+        now = time.monotonic()
+
+        batch = {}
+        for line, on in commands:
+            batch[int(line)] = (bool(on), source)
+        for line, (on, _) in batch.items():
+            if on:
+                conflicts = self._conflicts(line, batch)
+                if conflicts:
+                    RELAY_BLOCKED.inc()
+                    self._record(line, True, source, f"blocked by GPIO {conflicts}", applied=False)
+                    raise RelayError(f"GPIO {line} is interlocked with GPIO {conflicts}")
+
+        for line, (on, _) in batch.items():
+            self._commanded[line] = on
+
+        # Rules keep off the lines while the write is in flight; only a
+        # successful write holds them off afterwards
+        self._manual.update(batch)
+        try:
+            states = await self._actuate(batch, "manual", received)
+        finally:
+            self._manual.difference_update(batch)
+        for line in batch:
+            self._changed_at[line] = now
+            self._hold_until[line] = now + self.manual_hold
+        return states
+
+    # -------- Audit / state --------
+    def _record(self, line: int, on: bool, source: str, reason: str, applied: bool = True):
+        entry = {
+            "ts": round(time.time(), 3),
+            "gpio": line,
+            "name": self.relays[line].name if line in self.relays else f"GPIO {line}",
+            "on": on,
+            "source": source,
+            "reason": reason,
+            "applied": applied,
+        }
+        self._audit.append(entry)
+        # Audit trail: never rate limited
+        log.info(
+            "Relay %s -> %s (%s: %s)%s", entry["name"], "ON" if on else "OFF", source, reason,
+            "" if applied else " NOT APPLIED", extra={"rate_limit": 0},
+        )
+
+    def audit(self, limit: int = 50) -> list:
+        return list(self._audit)[-limit:]
+
+    def snapshot(self) -> dict:
+        """
+        Cached relay state plus the recent audit trail (no hardware access).
+        """
+        now = time.monotonic()
+        relays = self.controller.state()
+        for line, cfg in self.relays.items():
+            entry = relays.setdefault(line, {"on": False, "changed": None})
+            entry["name"] = cfg.name
+            entry["auto"] = line in self._rules_by_relay
+            entry["hold"] = max(0.0, round(self._hold_until.get(line, 0) - now, 1))
+        return {"relays": relays, "audit": self.audit()}
+
+    def close(self):
+        self.controller.close()
+
+
+def load_relay_rules(path: str = None, controller: RelayController = None, run_blocking=None) -> RelayScheduler:
+    """
+    Build a scheduler from a JSON rules file. A missing file gives a
+    scheduler without rules (manual control only).
+
+        {
+          "relays": {"18": {"name": "ventilation", "min_on": 60, "min_off": 30}},
+          "rules": [{"relay": 18, "channel": "pm25", "on": 35, "off": 25},
+                    {"relay": 18, "channel": "no2", "on": 0.1, "off": 0.06}],
+          "interlocks": [[18, 23]],
+          "manual_hold": 300
+        }
+    """
+    path = path or RELAY_RULES_FILE
+    controller = controller or RelayController()
+
+    if not os.path.exists(path):
+        log.info("No relay rules at %s, manual relay control only", path)
+        return RelayScheduler(controller, run_blocking=run_blocking)
+
+    with open(path, "r") as f:
+        config = json.load(f)
+
+    relays = [RelayConfig(line, **settings) for line, settings in config.get("relays", {}).items()]
+    rules = [RelayRule(**rule) for rule in config.get("rules", [])]
+    interlocks = [tuple(pair) for pair in config.get("interlocks", [])]
+
+    log.info("Loaded %d relay rules, %d interlocks from %s", len(rules), len(interlocks), path)
+    return RelayScheduler(
+        controller, relays, rules, interlocks,
+        manual_hold=config.get("manual_hold", DEFAULT_MANUAL_HOLD), run_blocking=run_blocking,
+    )
@@ -0,0 +1,109 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+log = logging.getLogger("startup-timeline")
+
+
+def _process_age() -> float:
+    """
+    Seconds since the kernel started this process (includes interpreter
+    start-up, which happens before any Python code can measure it).
+    """
+    try:
+        with open("/proc/self/stat", "r") as f:
+            # comm may contain spaces, fields after it are fixed
+            fields = f.read().rsplit(")", 1)[1].split()
+        start_ticks = int(fields[19])
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+class StartupTimeline:
+    """
+    Records import and initialization phases relative to process start,
+    so the start-up cost of each subsystem can be read from the log.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._origin = time.monotonic() - _process_age()
+        self._entries = []
+        self._marks = {}
+
+    def now(self) -> float:
+        """
+        Seconds since process start.
+        """
+        return time.monotonic() - self._origin
+
+    @contextmanager
+    def phase(self, name: str, kind: str = "init"):
+        """
+        Time a start-up phase.
+
+        :param name: Phase name shown in the report
+        :param kind: Phase category (import, native, init, ...)
+        """
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.record(name, start, self.now() - start, kind)
+
+    def record(self, name: str, start: float, duration: float, kind: str = "init"):
+        with self._lock:
+            self._entries.append((start, duration, kind, name, threading.current_thread().name))
+
+    def mark(self, name: str, once: bool = True):
+        """
+        Record a milestone (e.g. first telemetry) at the current time.
+        """
+        with self._lock:
+            if once and name in self._marks:
+                return
+            self._marks[name] = self.now()
+        log.info("Startup milestone '%s' reached at %.1f ms", name, self._marks[name] * 1000)
+
+    def get_mark(self, name: str):
+        with self._lock:
+            return self._marks.get(name)
+
+    def entries(self) -> list:
+        with self._lock:
+            return [
+                {"start": start, "duration": duration, "kind": kind, "name": name, "thread": thread}
+                for start, duration, kind, name, thread in sorted(self._entries)
+            ]
+
+    def report(self, logger: logging.Logger = log):
+        """
+        Write the timeline, ordered by start time, to the given logger.
+        Every line is written: the per call site rate limit does not apply.
+        """
+        whole = {"rate_limit": 0}
+        logger.info("========== STARTUP TIMELINE ==========", extra=whole)
+        for entry in self.entries():
+            logger.info(
+                "+%8.1f ms  %8.1f ms  %-7s %s [%s]",
+                entry["start"] * 1000,
+                entry["duration"] * 1000,
+                entry["kind"],
+                entry["name"],
+                entry["thread"],
+                extra=whole,
+            )
+        with self._lock:
+            marks = sorted(self._marks.items(), key=lambda item: item[1])
+        for name, at in marks:
+            logger.info("+%8.1f ms  milestone %s", at * 1000, name, extra=whole)
+        logger.info("======================================", extra=whole)
+
+
+# Global instance
+STARTUP_TIMELINE = StartupTimeline()
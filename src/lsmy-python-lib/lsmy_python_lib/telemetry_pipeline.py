@@ -0,0 +1,439 @@
+import json
+import math
+import time
+import logging
+import threading
+from collections import OrderedDict
+from itertools import islice
+
+# ====== METRICS LIBRARY ======
+from lsmy_python_lib.metrics import METRICS
+
+log = logging.getLogger("telemetry-pipeline")
+
+TELEMETRY_CHANNELS = ("temperature", "humidity", "no2", "pm10", "pm25")
+
+MODE_RAW = "raw"
+MODE_DEADBAND = "deadband"
+MODE_SWINGING_DOOR = "swinging_door"
+MODE_BUCKET = "bucket"
+
+BUCKET_STATS = ("mean", "min", "max", "last")
+
+UPLINK_QUEUE_SIZE = 1024    # Unacked compressed batches; when full the oldest is dropped (counted)
+
+
+class ChannelConfig:
+    """
+    Compression settings for one telemetry channel.
+
+    :param mode: raw | deadband | swinging_door | bucket
+    :param deadband: Minimum change to emit a point (deadband mode)
+    :param deviation: Allowed compression error (swinging_door mode)
+    :param bucket_seconds: Aggregation window (bucket mode)
+    :param stats: Aggregates emitted per bucket (bucket mode)
+    :param max_interval: Force a point after this many seconds of silence
+    :param alarm_low: Values at or below this always pass through
+    :param alarm_high: Values at or above this always pass through
+    """
+
+    def __init__(self, mode: str = MODE_RAW, deadband: float = 0.0, deviation: float = 0.0,
+                 bucket_seconds: float = 60.0, stats=BUCKET_STATS, max_interval: float = None,
+                 alarm_low: float = None, alarm_high: float = None):
+        if mode not in (MODE_RAW, MODE_DEADBAND, MODE_SWINGING_DOOR, MODE_BUCKET):
+            raise ValueError(f"Unknown compression mode: {mode}")
+        for stat in stats:
+            if stat not in BUCKET_STATS:
+                raise ValueError(f"Unknown bucket statistic: {stat}")
+
+        self.mode = mode
+        self.deadband = deadband
+        self.deviation = deviation
+        self.bucket_seconds = bucket_seconds
+        self.stats = tuple(stats)
+        self.max_interval = max_interval
+        self.alarm_low = alarm_low
+        self.alarm_high = alarm_high
+
+    def is_alarm(self, value: float) -> bool:
+        if self.alarm_high is not None and value >= self.alarm_high:
+            return True
+        if self.alarm_low is not None and value <= self.alarm_low:
+            return True
+        return False
+
+
+# Default per-channel settings for the lab sensor set
+DEFAULT_CHANNELS = {
+    "temperature": ChannelConfig(MODE_DEADBAND, deadband=0.2, max_interval=300, alarm_high=40.0),
+    "humidity":    ChannelConfig(MODE_DEADBAND, deadband=1.0, max_interval=300, alarm_high=85.0),
+    "no2":         ChannelConfig(MODE_SWINGING_DOOR, deviation=0.005, max_interval=300, alarm_high=0.1),
+    "pm10":        ChannelConfig(MODE_BUCKET, bucket_seconds=60, alarm_high=45.0),
+    "pm25":        ChannelConfig(MODE_SWINGING_DOOR, deviation=1.0, max_interval=300, alarm_high=35.0),
+}
+
+
+class RawFilter:
+    def process(self, ts, value):
+        return [{"ts": ts, "value": value}]
+
+    def flush(self):
+        return []
+
+
+class DeadbandFilter:
+    """
+    Emit a point only when it moves more than `deadband` away from the
+    last emitted value, or when `max_interval` has elapsed since then.
+    """
+
+    def __init__(self, deadband: float, max_interval: float = None):
+        self.deadband = deadband
+        self.max_interval = max_interval
+        self._last_ts = None
+        self._last_value = None
+
+    def process(self, ts, value):
+        if (
+            self._last_value is not None
+            and abs(value - self._last_value) <= self.deadband
+            and (self.max_interval is None or ts - self._last_ts < self.max_interval)
+        ):
+            return []
+
+        self._last_ts = ts
+        self._last_value = value
+        return [{"ts": ts, "value": value}]
+
+    def flush(self):
+        return []
+
+
+class SwingingDoorFilter:
+    """
+    Swinging-door trending compression.
+
+    Keeps every point needed to reconstruct the signal by linear
+    interpolation with an error of at most `deviation`. Peaks larger than
+    the deviation always survive because they close the door.
+
+    The door holds the range of slopes from the archived point that keep
+    every point since within +/- deviation. A new point whose slope falls
+    outside that range closes it: the previous point (whose own slope was
+    still inside) is emitted and becomes the new archive.
+    """
+
+    def __init__(self, deviation: float, max_interval: float = None):
+        self.deviation = deviation
+        self.max_interval = max_interval
+        self._archive = None        # (ts, value) of last emitted point
+        self._last = None           # (ts, value) of last received point
+        self._slope_upper = -math.inf
+        self._slope_lower = math.inf
+
+    def _open_door(self, ts, value):
+        self._archive = (ts, value)
+        self._last = None
+        self._slope_upper = -math.inf
+        self._slope_lower = math.inf
+
+    def _update_slopes(self, ts, value):
+        arch_ts, arch_value = self._archive
+        dt = ts - arch_ts
+        if dt <= 0:
+            return
+        self._slope_upper = max(self._slope_upper, (value - arch_value - self.deviation) / dt)
+        self._slope_lower = min(self._slope_lower, (value - arch_value + self.deviation) / dt)
+
+    def _inside(self, ts, value) -> bool:
+        arch_ts, arch_value = self._archive
+        dt = ts - arch_ts
+        if dt <= 0:
+            return True
+        return self._slope_upper <= (value - arch_value) / dt <= self._slope_lower
+
+    def process(self, ts, value):
+        if self._archive is None:
+            self._open_door(ts, value)
+            return [{"ts": ts, "value": value}]
+
+        points = []
+        if self._last is not None and not self._inside(ts, value):
+            # Door closed: the previous point becomes the new pivot
+            last_ts, last_value = self._last
+            self._open_door(last_ts, last_value)
+            points.append({"ts": last_ts, "value": last_value})
+
+        if self.max_interval is not None and ts - self._archive[0] >= self.max_interval:
+            self._open_door(ts, value)
+            points.append({"ts": ts, "value": value})
+            return points
+
+        self._update_slopes(ts, value)
+        self._last = (ts, value)
+        return points
+
+    def flush(self):
+        if self._last is None:
+            return []
+        last_ts, last_value = self._last
+        self._open_door(last_ts, last_value)
+        return [{"ts": last_ts, "value": last_value}]
+
+
+class BucketAggregator:
+    """
+    Aggregate points into fixed time buckets and emit one record per
+    bucket with the configured statistics (mean/min/max/last).
+    """
+
+    def __init__(self, bucket_seconds: float, stats=BUCKET_STATS):
+        self.bucket_seconds = bucket_seconds
+        self.stats = stats
+        self._bucket = None
+        self._reset()
+
+    def _reset(self):
+        self._count = 0
+        self._sum = 0.0
+        self._min = math.inf
+        self._max = -math.inf
+        self._last_value = None
+
+    def _emit(self):
+        if self._count == 0:
+            return []
+
+        values = {
+            "mean": self._sum / self._count,
+            "min": self._min,
+            "max": self._max,
+            "last": self._last_value,
+        }
+        record = {"ts": self._bucket * self.bucket_seconds, "count": self._count}
+        for stat in self.stats:
+            record[stat] = values[stat]
+
+        self._reset()
+        return [record]
+
+    def process(self, ts, value):
+        bucket = math.floor(ts / self.bucket_seconds)
+        out = []
+
+        if self._bucket is not None and bucket != self._bucket:
+            out = self._emit()
+        self._bucket = bucket
+
+        self._count += 1
+        self._sum += value
+        if value < self._min:
+            self._min = value
+        if value > self._max:
+            self._max = value
+        self._last_value = value
+
+        return out
+
+    def flush(self):
+        return self._emit()
+
+
+def _build_filter(config: ChannelConfig):
+    if config.mode == MODE_DEADBAND:
+        return DeadbandFilter(config.deadband, config.max_interval)
+    if config.mode == MODE_SWINGING_DOOR:
+        return SwingingDoorFilter(config.deviation, config.max_interval)
+    if config.mode == MODE_BUCKET:
+        return BucketAggregator(config.bucket_seconds, config.stats)
+    return RawFilter()
+
+
+class TelemetryPipeline:
+    """
+    Compression stage between sensor acquisition and consumers
+    (uplink, storage). Each channel has its own filter; values inside an
+    alarm band bypass compression so peaks are never lost.
+    """
+
+    def __init__(self, channels: dict = None):
+        self._lock = threading.Lock()
+        self.configure(channels or DEFAULT_CHANNELS)
+        log.info("TelemetryPipeline initialized with %d channels", len(self._channels))
+
+    def configure(self, channels: dict):
+        with self._lock:
+            self._channels = dict(channels)
+            self._filters = {name: _build_filter(cfg) for name, cfg in self._channels.items()}
+            self._points_in = {name: 0 for name in self._channels}
+            self._points_out = {name: 0 for name in self._channels}
+            self._bytes_in = 0
+            self._bytes_out = 0
+
+    def process(self, sample: dict, ts: float = None, size: int = None) -> dict:
+        """
+        Feed one sample through the pipeline.
+
+        :param sample: Channel name -> value (dict or TelemetrySample)
+        :param ts: Sample timestamp (seconds), defaults to now
+        :param size: Encoded size of the raw sample in bytes, if known
+        :return: Channel name -> list of emitted records (empty channels omitted)
+        """
+        if ts is None:
+            ts = time.time()
+
+        out = {}
+        with self._lock:
+            for name, value in sample.items():
+                config = self._channels.get(name)
+                if config is None:
+                    continue
+
+                self._points_in[name] += 1
+                records = self._filters[name].process(ts, value)
+
+                if config.is_alarm(value) and not any(r["ts"] == ts for r in records):
+                    records.append({"ts": ts, "value": value, "alarm": True})
+
+                if records:
+                    self._points_out[name] += len(records)
+                    out[name] = records
+
+            self._account(sample if size is None else size, out)
+
+        return out
+
+    def flush(self) -> dict:
+        """
+        Emit everything still held back by the filters (e.g. on shutdown).
+        """
+        out = {}
+        with self._lock:
+            for name, flt in self._filters.items():
+                records = flt.flush()
+                if records:
+                    self._points_out[name] += len(records)
+                    out[name] = records
+            self._account(0, out)
+        return out
+
+    def _account(self, raw, out):
+        if isinstance(raw, int):
+            self._bytes_in += raw
+        elif hasattr(raw, "to_json"):
+            self._bytes_in += len(raw.to_json())
+        else:
+            self._bytes_in += len(json.dumps(raw, separators=(",", ":")))
+        if out:
+            self._bytes_out += len(json.dumps(out, separators=(",", ":")))
+
+    def stats(self) -> dict:
+        """
+        Compression statistics since the pipeline was configured.
+        """
+        with self._lock:
+            points_in = sum(self._points_in.values())
+            points_out = sum(self._points_out.values())
+            channels = {
+                name: {
+                    "mode": self._channels[name].mode,
+                    "points_in": self._points_in[name],
+                    "points_out": self._points_out[name],
+                    "ratio": _ratio(self._points_in[name], self._points_out[name]),
+                }
+                for name in self._channels
+            }
+
+            return {
+                "points_in": points_in,
+                "points_out": points_out,
+                "bytes_in": self._bytes_in,
+                "bytes_out": self._bytes_out,
+                "compression_ratio": _ratio(points_in, points_out),
+                "bytes_ratio": _ratio(self._bytes_in, self._bytes_out),
+                "channels": channels,
+            }
+
+
+class UplinkQueue:
+    """
+    Compressed telemetry waiting for the uplink consumer.
+
+    Same contract as the gateway uplink: take() leaves batches in place
+    until ack() names them, so a consumer that fails before storing them
+    upstream gets them again. The producer (the IPC telemetry handler)
+    never waits: with `size` batches unacked the oldest one is dropped,
+    counted and logged.
+
+    :param size: Unacked batches kept
+    """
+
+    def __init__(self, size: int = UPLINK_QUEUE_SIZE):
+        self.size = size
+        self.batches = OrderedDict()    # batch id -> {"id", "ts", "points"}, until acked
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+        self._queued = METRICS.counter("lsmy_telemetry_uplink_batches_total", "Compressed batches queued for uplink")
+        self._dropped = METRICS.counter("lsmy_telemetry_uplink_dropped_total",
+                                        "Compressed batches dropped, uplink queue full")
+        self._backlog = METRICS.gauge("lsmy_telemetry_uplink_backlog", "Compressed batches waiting for an ack")
+
+    def __len__(self) -> int:
+        return len(self.batches)
+
+    def put(self, points: dict, ts: float = None) -> int:
+        """
+        :param points: Output of TelemetryPipeline.process() / flush()
+        :return: Batch id
+        """
+        with self._lock:
+            batch_id = self._next_id
+            self._next_id += 1
+            if len(self.batches) >= self.size:
+                self.batches.popitem(last=False)
+                self._dropped.inc()
+                log.warning("Uplink queue full (%d batches unacked), dropping the oldest", len(self.batches) + 1,
+                            extra={"rate_limit": 60})
+            self.batches[batch_id] = {"id": batch_id, "ts": time.time() if ts is None else ts, "points": points}
+            self._queued.inc()
+            self._backlog.set(len(self.batches))
+        return batch_id
+
+    def take(self, limit: int = None) -> list:
+        """
+        Oldest batches, left in place until ack().
+
+        :return: [{"id", "ts", "points"}]
+        """
+        with self._lock:
+            count = len(self.batches) if limit is None else min(int(limit), len(self.batches))
+            return list(islice(self.batches.values(), count))
+
+    def ack(self, ids) -> int:
+        """
+        Delete batches the consumer has stored upstream.
+
+        :return: Number of batches removed (unknown ids are ignored)
+        """
+        removed = 0
+        with self._lock:
+            for batch_id in ids:
+                if self.batches.pop(int(batch_id), None) is not None:
+                    removed += 1
+            self._backlog.set(len(self.batches))
+        return removed
+
+    def stats(self) -> dict:
+        return {
+            "backlog": len(self.batches),
+            "queued": self._queued.value,
+            "dropped": self._dropped.value,
+        }
+
+
+def _ratio(before, after):
+    # Nothing emitted yet: no ratio to report
+    if after == 0:
+        return None
+    return round(before / after, 2)
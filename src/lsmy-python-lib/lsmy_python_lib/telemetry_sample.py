@@ -0,0 +1,235 @@
+import json
+import math
+import struct
+from array import array
+
+# ====== TELEMETRY PIPELINE LIBRARY ======
+from lsmy_python_lib.telemetry_pipeline import TELEMETRY_CHANNELS
+
+# ====== ACCEL LIBRARY ======
+from lsmy_python_lib.accel import rolling_stats
+
+
+class SampleSchema:
+    """
+    Channel layout shared by the sample type, history buffers and the
+    binary codec.
+
+    :param channels: Channel names, in wire order
+    :param value_code: array / struct type code of the values ("f" = float32)
+    """
+
+    def __init__(self, channels, value_code: str = "f"):
+        self.channels = tuple(channels)
+        self.value_code = value_code
+        # Little-endian: float64 timestamp followed by one value per channel
+        self.struct = struct.Struct("<d" + value_code * len(self.channels))
+
+    @property
+    def record_size(self) -> int:
+        return self.struct.size
+
+
+TELEMETRY_SCHEMA = SampleSchema(TELEMETRY_CHANNELS)
+
+
+def _json_number(value: float, fmt: str = None) -> str:
+    # Same output as json.dumps for finite floats; NaN/inf are not JSON
+    if not math.isfinite(value):
+        return "null"
+    return repr(value if fmt is None else float(format(value, fmt)))
+
+
+# Shortest text that round-trips a float32 column value (25.3, not 25.299999237060547)
+FLOAT32_FORMAT = ".7g"
+
+
+class Sample:
+    """
+    Fixed-layout sample: one slot per schema channel plus `ts`, no
+    per-instance dict. Subclasses set SCHEMA and the matching __slots__.
+
+    Encodes to JSON and to packed binary records directly from the slots,
+    and offers the read-only mapping methods (get / items / keys) the
+    relay rules and the compression pipeline use.
+    """
+
+    __slots__ = ()
+    SCHEMA = None
+
+    def __init__(self, ts: float = 0.0, *values):
+        self.ts = ts
+        channels = self.SCHEMA.channels
+        for i, name in enumerate(channels):
+            setattr(self, name, float(values[i]) if i < len(values) else 0.0)
+
+    @classmethod
+    def from_mapping(cls, mapping, ts: float = None):
+        """
+        Read the schema channels from a dict-like object (e.g. a decoded
+        IPC request); missing channels are 0.0.
+        """
+        sample = cls.__new__(cls)
+        sample.ts = float(mapping.get("ts", 0.0)) if ts is None else ts
+        for name in cls.SCHEMA.channels:
+            setattr(sample, name, float(mapping.get(name, 0.0)))
+        return sample
+
+    @classmethod
+    def from_json(cls, text, ts: float = None):
+        return cls.from_mapping(json.loads(text), ts)
+
+    @classmethod
+    def unpack(cls, buffer, offset: int = 0):
+        values = cls.SCHEMA.struct.unpack_from(buffer, offset)
+        sample = cls.__new__(cls)
+        sample.ts = values[0]
+        for name, value in zip(cls.SCHEMA.channels, values[1:]):
+            setattr(sample, name, value)
+        return sample
+
+    def pack(self) -> bytes:
+        return self.SCHEMA.struct.pack(self.ts, *[getattr(self, name) for name in self.SCHEMA.channels])
+
+    def pack_into(self, buffer, offset: int = 0):
+        self.SCHEMA.struct.pack_into(buffer, offset, self.ts, *[getattr(self, name) for name in self.SCHEMA.channels])
+
+    def to_json(self, **extra) -> str:
+        """
+        :param extra: Additional leading fields (JSON encodable), e.g. clients=3
+        """
+        parts = [f"{json.dumps(key)}:{json.dumps(value)}" for key, value in extra.items()]
+        parts.append(f'"ts":{_json_number(self.ts)}')
+        parts += [f'"{name}":{_json_number(getattr(self, name))}' for name in self.SCHEMA.channels]
+        return "{" + ",".join(parts) + "}"
+
+    def copy_from(self, other: "Sample"):
+        self.ts = other.ts
+        for name in self.SCHEMA.channels:
+            setattr(self, name, getattr(other, name))
+
+    # -------- Read-only mapping interface --------
+    def get(self, name: str, default=None):
+        if name in self.SCHEMA.channels:
+            return getattr(self, name)
+        return default
+
+    def keys(self):
+        return self.SCHEMA.channels
+
+    def items(self):
+        return ((name, getattr(self, name)) for name in self.SCHEMA.channels)
+
+    def __getitem__(self, name: str):
+        if name not in self.SCHEMA.channels:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def as_dict(self) -> dict:
+        return dict(self.items(), ts=self.ts)
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.SCHEMA.channels)
+        return f"{type(self).__name__}(ts={self.ts!r}, {values})"
+
+
+class TelemetrySample(Sample):
+    """
+    One reading of the lab sensor set (temperature, humidity, no2, pm10, pm25).
+    """
+
+    __slots__ = ("ts",) + TELEMETRY_SCHEMA.channels
+    SCHEMA = TELEMETRY_SCHEMA
+
+
+class SampleHistory:
+    """
+    Ring buffer of the last `capacity` samples stored column-wise in
+    typed arrays: record_size bytes per sample (28 for the telemetry
+    schema) regardless of how many samples are kept, and no Python
+    object per sample.
+
+    :param sample_type: Sample subclass the history holds
+    :param capacity: Number of samples kept
+    """
+
+    def __init__(self, sample_type=TelemetrySample, capacity: int = 1024):
+        self.sample_type = sample_type
+        self.schema = sample_type.SCHEMA
+        self.capacity = capacity
+        self._ts = array("d", bytes(8 * capacity))
+        self._columns = {
+            name: array(self.schema.value_code, bytes(array(self.schema.value_code).itemsize * capacity))
+            for name in self.schema.channels
+        }
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        return sum(col.itemsize * len(col) for col in self._columns.values()) + self._ts.itemsize * len(self._ts)
+
+    def append(self, sample: Sample):
+        i = self._next
+        self._ts[i] = sample.ts
+        for name, column in self._columns.items():
+            column[i] = getattr(sample, name)
+        self._next = (i + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def _indexes(self, limit: int = None):
+        count = self._count if limit is None else min(limit, self._count)
+        start = (self._next - count) % self.capacity
+        return [(start + k) % self.capacity for k in range(count)]
+
+    def samples(self, limit: int = None) -> list:
+        """
+        Oldest first; `limit` keeps only the newest entries.
+        """
+        out = []
+        for i in self._indexes(limit):
+            sample = self.sample_type.__new__(self.sample_type)
+            sample.ts = self._ts[i]
+            for name, column in self._columns.items():
+                setattr(sample, name, column[i])
+            out.append(sample)
+        return out
+
+    def to_json(self, limit: int = None) -> str:
+        channels = self.schema.channels
+        value_format = FLOAT32_FORMAT if self.schema.value_code == "f" else None
+        rows = []
+        for i in self._indexes(limit):
+            fields = [f'"ts":{_json_number(self._ts[i])}']
+            fields += [f'"{name}":{_json_number(self._columns[name][i], value_format)}' for name in channels]
+            rows.append("{" + ",".join(fields) + "}")
+        return "[" + ",".join(rows) + "]"
+
+    def rolling(self, window: int, limit: int = None) -> dict:
+        """
+        Rolling-window mean / min / max of every channel (liblsmy_accel,
+        Python fallback without it), oldest window first.
+
+        :param window: Window length in samples
+        :param limit: Only the newest `limit` samples
+        :return: Channel -> {"mean": [...], "min": [...], "max": [...]}
+        """
+        indexes = self._indexes(limit)
+        out = {}
+        for name, column in self._columns.items():
+            means, mins, maxs = rolling_stats(array("d", [column[i] for i in indexes]), window)
+            out[name] = {"mean": means.tolist(), "min": mins.tolist(), "max": maxs.tolist()}
+        return out
+
+    def pack(self, limit: int = None) -> bytes:
+        """
+        Consecutive binary records (schema.struct), oldest first.
+        """
+        fmt = self.schema.struct
+        out = bytearray(fmt.size * (self._count if limit is None else min(limit, self._count)))
+        for k, i in enumerate(self._indexes(limit)):
+            fmt.pack_into(out, k * fmt.size, self._ts[i], *[self._columns[name][i] for name in self.schema.channels])
+        return bytes(out)
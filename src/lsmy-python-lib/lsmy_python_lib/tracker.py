@@ -0,0 +1,300 @@
+import logging
+import threading
+
+import numpy as np
+
+# ====== METRICS LIBRARY ======
+from lsmy_python_lib.metrics import METRICS
+
+# ====== CONFIG LIBRARY ======
+from lsmy_python_lib.config import CONFIG
+
+log = logging.getLogger("tracker")
+
+DETECT_EVERY = CONFIG.tracker.detect_every    # Run the detector on every Nth frame
+COUNT_LINE = CONFIG.tracker.count_line        # Counting line, fraction of the frame height
+LINE_HYSTERESIS = 0.02      # Dead band around the line: a centre inside it keeps its side
+
+IOU_THRESHOLD = 0.3         # Minimum IoU between a predicted track box and a detection
+MIN_HITS = 2                # Detections before a track is confirmed (shown and counted)
+MAX_MISSES = 3              # Detector frames without a match before a track is dropped
+VELOCITY_SMOOTHING = 0.5    # Weight of the newest velocity measurement
+
+# Boxes are (N, 4) float arrays of x1, y1, x2, y2 in frame fractions
+NO_DETECTIONS = np.zeros((0, 4))
+
+STAGE_SECONDS = {
+    stage: METRICS.histogram("lsmy_people_frame_seconds", "People counting time per frame", {"stage": stage},
+                             buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25))
+    for stage in ("detect", "track")
+}
+IN_VIEW = METRICS.gauge("lsmy_people_in_view", "Confirmed tracks in the camera view")
+CROSSINGS = {
+    direction: METRICS.counter("lsmy_people_crossings_total", "Counting line crossings", {"direction": direction})
+    for direction in ("in", "out")
+}
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise IoU of (N, 4) and (M, 4) boxes -> (N, M).
+    """
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0.0, None) * np.clip(y2 - y1, 0.0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-12)
+
+
+def greedy_assign(iou: np.ndarray, threshold: float = IOU_THRESHOLD) -> tuple:
+    """
+    Highest-IoU-first matching of rows to columns.
+
+    Candidate pairs are sorted once; each round accepts every pair that
+    is the best remaining one for both its row and its column (nothing
+    ranked above it can take them), then drops the rows and columns it
+    used. A handful of vectorized rounds replaces the per-pair loop.
+
+    :return: (row indices, column indices)
+    """
+    rows, cols = np.nonzero(iou >= threshold)
+    order = np.argsort(-iou[rows, cols], kind="stable")
+    rows, cols = rows[order], cols[order]
+
+    n_rows, n_cols = iou.shape
+    matched_rows, matched_cols = [], []
+    while rows.size:
+        rank = np.arange(rows.size)
+        first_row = np.full(n_rows, rows.size)
+        first_col = np.full(n_cols, rows.size)
+        np.minimum.at(first_row, rows, rank)
+        np.minimum.at(first_col, cols, rank)
+        best = (first_row[rows] == rank) & (first_col[cols] == rank)
+        matched_rows.append(rows[best])
+        matched_cols.append(cols[best])
+
+        row_used = np.zeros(n_rows, dtype=bool)
+        col_used = np.zeros(n_cols, dtype=bool)
+        row_used[rows[best]] = True
+        col_used[cols[best]] = True
+        free = ~(row_used[rows] | col_used[cols])
+        rows, cols = rows[free], cols[free]
+
+    if not matched_rows:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    return np.concatenate(matched_rows), np.concatenate(matched_cols)
+
+
+class MultiObjectTracker:
+    """
+    IoU tracker with constant-velocity prediction and line-crossing
+    counts. Track state is held column-wise (one array per field), so
+    prediction, association and counting cost a few NumPy calls per
+    frame whatever the number of people.
+
+    update(detections) on detector frames, update(None) in between: the
+    tracks coast on their velocity and can still cross the line.
+
+    A confirmed track whose box centre moves from above the counting
+    line to below it counts as "in", the other way as "out". A centre
+    must leave the `hysteresis` band around the line to change sides, so
+    box jitter on the line is not counted as crossings.
+
+    update() and tracks() may run on different threads (inference worker,
+    IPC on the event loop).
+
+    :param line: Counting line, fraction of the frame height (None: no counting)
+    :param hysteresis: Half width of the dead band, fraction of the frame height
+    """
+
+    def __init__(self, line: float = COUNT_LINE, iou_threshold: float = IOU_THRESHOLD,
+                 min_hits: int = MIN_HITS, max_misses: int = MAX_MISSES, hysteresis: float = LINE_HYSTERESIS):
+        self.line = line
+        self.hysteresis = hysteresis
+        self.iou_threshold = iou_threshold
+        self.min_hits = min_hits
+        self.max_misses = max_misses
+
+        self.boxes = np.zeros((0, 4))           # Current (predicted) box
+        self.velocity = np.zeros((0, 4))        # Box change per frame
+        self.anchor = np.zeros((0, 4))          # Box of the last matched detection
+        self.since = np.zeros(0, dtype=np.int32)    # Frames since the last match
+        self.hits = np.zeros(0, dtype=np.int32)
+        self.misses = np.zeros(0, dtype=np.int32)
+        self.side = np.zeros(0, dtype=np.int8)      # -1 above the line, 1 below
+        self.ids = np.zeros(0, dtype=np.int64)
+
+        self.next_id = 1
+        self.entered = 0
+        self.exited = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def confirmed(self) -> np.ndarray:
+        return self.hits >= self.min_hits
+
+    @property
+    def count(self) -> int:
+        """
+        Confirmed tracks in view.
+        """
+        return int(np.count_nonzero(self.confirmed))
+
+    def update(self, detections: np.ndarray = None) -> int:
+        """
+        Advance one frame.
+
+        :param detections: (M, 4) boxes from the detector, None on frames
+                           the detector skipped
+        :return: Confirmed tracks in view
+        """
+        with self._lock:
+            return self._update(detections)
+
+    def _update(self, detections) -> int:
+        self.boxes += self.velocity
+        self.since += 1
+
+        if detections is not None:
+            detections = np.asarray(detections, dtype=np.float64)
+            self._associate(detections[:, :4] if detections.size else NO_DETECTIONS)
+
+        if self.line is not None:
+            self._count_crossings()
+
+        # Coasted out of the frame
+        gone = (self.boxes[:, 2] <= 0.0) | (self.boxes[:, 0] >= 1.0) | (self.boxes[:, 3] <= 0.0) | (self.boxes[:, 1] >= 1.0)
+        if gone.any():
+            self._keep(~gone)
+        return self.count
+
+    def _associate(self, detections: np.ndarray):
+        tracks, dets = greedy_assign(iou_matrix(self.boxes, detections), self.iou_threshold)
+
+        # Matched: velocity from the displacement since the previous match
+        measured = (detections[dets] - self.anchor[tracks]) / self.since[tracks, None]
+        fresh = self.hits[tracks] == 1
+        weight = np.where(fresh, 1.0, VELOCITY_SMOOTHING)[:, None]
+        self.velocity[tracks] += weight * (measured - self.velocity[tracks])
+        self.boxes[tracks] = detections[dets]
+        self.anchor[tracks] = detections[dets]
+        self.since[tracks] = 0
+        self.hits[tracks] += 1
+
+        matched = np.zeros(len(self.ids), dtype=bool)
+        matched[tracks] = True
+        self.misses[matched] = 0
+        self.misses[~matched] += 1
+        keep = self.misses <= self.max_misses
+        if not keep.all():
+            self._keep(keep)
+
+        new = np.ones(len(detections), dtype=bool)
+        new[dets] = False
+        if new.any():
+            self._add(detections[new])
+
+    def _add(self, boxes: np.ndarray):
+        n = len(boxes)
+        self.boxes = np.concatenate([self.boxes, boxes])
+        self.velocity = np.concatenate([self.velocity, np.zeros((n, 4))])
+        self.anchor = np.concatenate([self.anchor, boxes])
+        self.since = np.concatenate([self.since, np.zeros(n, dtype=np.int32)])
+        self.hits = np.concatenate([self.hits, np.ones(n, dtype=np.int32)])
+        self.misses = np.concatenate([self.misses, np.zeros(n, dtype=np.int32)])
+        self.side = np.concatenate([self.side, self._side(boxes)])
+        self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + n)])
+        self.next_id += n
+
+    def _keep(self, mask: np.ndarray):
+        self.boxes = self.boxes[mask]
+        self.velocity = self.velocity[mask]
+        self.anchor = self.anchor[mask]
+        self.since = self.since[mask]
+        self.hits = self.hits[mask]
+        self.misses = self.misses[mask]
+        self.side = self.side[mask]
+        self.ids = self.ids[mask]
+
+    def _side(self, boxes: np.ndarray, previous: np.ndarray = None) -> np.ndarray:
+        if self.line is None:
+            return np.zeros(len(boxes), dtype=np.int8)
+        centre = (boxes[:, 1] + boxes[:, 3]) * 0.5
+        side = np.where(centre < self.line, -1, 1).astype(np.int8)
+        if previous is not None:
+            # Inside the dead band a track keeps the side it was on
+            side = np.where(np.abs(centre - self.line) <= self.hysteresis, previous, side).astype(np.int8)
+        return side
+
+    def _count_crossings(self):
+        # Tentative tracks keep the side they appeared on, a crossing
+        # before confirmation is counted when they are confirmed
+        side = np.where(self.confirmed, self._side(self.boxes, self.side), self.side)
+        crossed = side != self.side
+        if crossed.any():
+            entered = int(np.count_nonzero(side[crossed] > 0))
+            exited = int(np.count_nonzero(crossed)) - entered
+            self.entered += entered
+            self.exited += exited
+            CROSSINGS["in"].inc(entered)
+            CROSSINGS["out"].inc(exited)
+        self.side = side
+
+    def tracks(self) -> list:
+        with self._lock:
+            confirmed = self.confirmed
+            ids, boxes = self.ids[confirmed], self.boxes[confirmed]
+        return [
+            {"id": int(track_id), "box": [round(float(v), 4) for v in box]}
+            for track_id, box in zip(ids, boxes)
+        ]
+
+
+class PeopleCounter:
+    """
+    Person detector followed by the tracker. The detector only runs on
+    every `detect_every`th frame; the tracker predicts the frames in
+    between, so the count stays stable and crossings are still seen at
+    the full frame rate.
+
+    :param detector: frame -> (M, 4+) array of x1, y1, x2, y2 boxes in
+                     frame fractions (extra columns such as scores are ignored)
+    :param detect_every: Detector frame interval
+    """
+
+    def __init__(self, detector, detect_every: int = DETECT_EVERY, tracker: MultiObjectTracker = None):
+        self.detector = detector
+        self.detect_every = max(1, detect_every)
+        self.tracker = tracker or MultiObjectTracker()
+        self.frames = 0
+
+    def process(self, frame) -> int:
+        """
+        :return: People in view
+        """
+        detections = None
+        if self.frames % self.detect_every == 0:
+            with STAGE_SECONDS["detect"].time():
+                detections = self.detector(frame)
+        self.frames += 1
+
+        with STAGE_SECONDS["track"].time():
+            count = self.tracker.update(detections)
+        IN_VIEW.set(count)
+        return count
+
+    def snapshot(self) -> dict:
+        return {
+            "in_view": self.tracker.count,
+            "entered": self.tracker.entered,
+            "exited": self.tracker.exited,
+            "frames": self.frames,
+            "detect_every": self.detect_every,
+            "tracks": self.tracker.tracks(),
+        }
@@ -1,13 +1,18 @@
 import os
 import re
+import json
 import logging
 import subprocess
 import time
 from typing import List, Dict
 
+# ====== CONFIG LIBRARY ======
+from lsmy_python_lib.config import CONFIG
+
 log = logging.getLogger("wifi-config")
 
-WPA_CONF = "/etc/wpa_supplicant.conf"
+WPA_CONF = os.environ.get("LSMY_WPA_CONF", "/etc/wpa_supplicant.conf")
+DHCP_LEASES = os.environ.get("LSMY_DHCP_LEASES", "/var/lib/lsmy/dhcp_leases.json")
 
 HEADER_LINES = [
     "ctrl_interface=/var/run/wpa_supplicant",
@@ -27,10 +32,11 @@ class WiFiConfigManager:
         return IS_HAVE_WIFI_CONNECT_SIGNAL
 
     # Load WiFi configurations function
-    def load_wifi_configs(self, config_path: str = WPA_CONF) -> List[Dict]:
+    def load_wifi_configs(self, config_path: str = None) -> List[Dict]:
         """
         Load all WiFi network blocks from wpa_supplicant.conf
         """
+        config_path = config_path or WPA_CONF
         if not os.path.exists(config_path):
             return []
 
@@ -56,12 +62,13 @@ class WiFiConfigManager:
         return results
 
     # Check if WiFi config exists function
-    def has_any_wifi_config(self, config_path: str = WPA_CONF) -> bool:
+    def has_any_wifi_config(self, config_path: str = None) -> bool:
         configs = self.load_wifi_configs(config_path)
         return len(configs) > 0
 
     # Wait for WiFi connection
-    def is_wait_for_wifi(self, interface="wlan0", timeout=10) -> bool:
+    def is_wait_for_wifi(self, interface="wlan0", timeout=None) -> bool:
+        timeout = CONFIG.wifi.connect_timeout if timeout is None else timeout
         start_time = time.time()
 
         while time.time() - start_time < timeout:
@@ -82,9 +89,38 @@ class WiFiConfigManager:
         log.error("WiFi connection timeout!")
         return False
     
-    def request_ip(self, interface="wlan0"):
+    def request_ip(self, interface="wlan0", ssid=None) -> bool:
+        """
+        Get an address with udhcpc. When the last lease on this SSID is
+        still valid the previous address is requested first (-r) with
+        short retry timings, like a DHCP INIT-REBOOT; a full discovery
+        follows only if that fails.
+        """
+        lease = _load_leases().get(ssid) if ssid else None
+        if lease and lease["expires"] > time.time():
+            log.info("Requesting previous address %s for %s...", lease["ip"], interface)
+            if self._udhcpc(interface, ssid, ["-r", lease["ip"], "-t", "2", "-T", "1"]):
+                return True
+
         log.info("Requesting IP address for %s...", interface)
-        subprocess.run(["udhcpc", "-i", interface, "-n", "-q"], check=False)
+        return self._udhcpc(interface, ssid, [])
+
+    def _udhcpc(self, interface, ssid, extra) -> bool:
+        result = subprocess.run(
+            ["udhcpc", "-i", interface, "-n", "-q", *extra],
+            capture_output=True, text=True,
+        )
+        # busybox: "udhcpc: lease of 192.168.1.50 obtained[ from ...], lease time 86400"
+        match = re.search(r"lease of (\d+\.\d+\.\d+\.\d+) obtained.*?(?:lease time (\d+))?$",
+                          result.stdout + result.stderr, re.MULTILINE)
+        if result.returncode != 0 or not match:
+            log.warning("DHCP failed on %s: %s", interface, (result.stderr or result.stdout).strip())
+            return False
+
+        if ssid:
+            lease_time = int(match.group(2) or 3600)
+            _save_lease(ssid, match.group(1), lease_time)
+        return True
 
     def get_wifi_status_iw(self, iface="wlan0"):
         info = {"connected": False, "ssid": None, "ip": None, "signal": None}
@@ -114,6 +150,26 @@ class WiFiConfigManager:
             log.error(f"Fault using iw: {e}")
             return None
 
+# DHCP lease cache, one entry per SSID
+def _load_leases() -> dict:
+    try:
+        with open(DHCP_LEASES, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_lease(ssid, ip, lease_time):
+    leases = _load_leases()
+    leases[ssid] = {"ip": ip, "expires": time.time() + lease_time}
+    try:
+        os.makedirs(os.path.dirname(DHCP_LEASES), exist_ok=True)
+        tmp = DHCP_LEASES + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(leases, f)
+        os.replace(tmp, DHCP_LEASES)
+    except OSError as e:
+        log.warning("Could not save DHCP lease: %s", e)
+
 # Update is_have_wifi_connect signal
 def update_wifi_connect_signal(value: bool):
     global IS_HAVE_WIFI_CONNECT_SIGNAL
@@ -173,6 +229,9 @@ def reset_wifi_config():
     try:
         with open(WPA_CONF, "w") as f:
             f.write(default_content)
+
+        if os.path.exists(DHCP_LEASES):
+            os.remove(DHCP_LEASES)
         
         log.info("WiFi configuration has been reset successfully.")
         
@@ -0,0 +1,355 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+import subprocess
+
+# ====== WIFI CONFIG LIBRARY ======
+from lsmy_python_lib.wifi_config_manager import WiFiConfigManager
+
+# ====== METRICS LIBRARY ======
+from lsmy_python_lib.metrics import METRICS
+
+# ====== CONFIG LIBRARY ======
+from lsmy_python_lib.config import CONFIG
+
+log = logging.getLogger("wifi-connection")
+
+HISTORY_FILE = os.environ.get("LSMY_WIFI_HISTORY", "/var/lib/lsmy/wifi_history.json")
+
+SCAN_TTL = 120              # Seconds a scan table is trusted for ranking
+STATUS_POLL = 0.2           # wpa_cli status polling interval while associating
+SUCCESS_WEIGHT = 20.0       # dB a 100 % success rate is worth against a 0 % one
+UNSEEN_SIGNAL = -100        # Signal assumed for known networks missing from the scan
+ROAM_THRESHOLD = -75        # Only look for a better AP below this signal (dBm)
+ROAM_MARGIN = 8             # Required improvement to roam (dB)
+ROAM_INTERVAL = 300         # Minimum seconds between roams
+
+CONNECT_SECONDS = METRICS.histogram(
+    "lsmy_wifi_connect_seconds", "Time from connect() to an associated STA",
+    buckets=(0.5, 1, 2, 3, 5, 8, 12, 20, 30),
+)
+CONNECT_ATTEMPTS = METRICS.counter("lsmy_wifi_connect_attempts_total", "Per SSID association attempts")
+ROAMS = METRICS.counter("lsmy_wifi_roams_total", "Signal driven roams to another AP")
+
+
+class ScanCache:
+    """
+    BSS table from the last scan. wpa_supplicant's own scan results are
+    used when it is running (no radio time); `iw dev <iface> scan` is the
+    fallback.
+    """
+
+    def __init__(self, iface: str = "wlan0", ttl: float = SCAN_TTL):
+        self.iface = iface
+        self.ttl = ttl
+        self.entries = []
+        self.updated = None
+        self._lock = threading.Lock()
+
+    @property
+    def age(self) -> float:
+        return float("inf") if self.updated is None else time.monotonic() - self.updated
+
+    @property
+    def fresh(self) -> bool:
+        return bool(self.entries) and self.age < self.ttl
+
+    def refresh(self, trigger: bool = False) -> list:
+        """
+        :param trigger: Also request a new scan from wpa_supplicant; its
+                        results are picked up by the next refresh
+        """
+        entries = self._scan_wpa_cli()
+        if not entries:
+            # wpa_supplicant not running or has not scanned yet
+            entries = self._scan_iw() or entries
+        if entries is None:
+            return self.entries
+
+        with self._lock:
+            self.entries = entries
+            self.updated = time.monotonic()
+        log.debug("Scan table refreshed: %d BSS", len(entries))
+
+        if trigger:
+            subprocess.run(["wpa_cli", "-i", self.iface, "scan"], capture_output=True, text=True)
+        return entries
+
+    def _scan_wpa_cli(self):
+        result = subprocess.run(
+            ["wpa_cli", "-i", self.iface, "scan_results"],
+            capture_output=True, text=True,
+        )
+        if result.returncode != 0 or "bssid / frequency" not in result.stdout:
+            return None
+
+        entries = []
+        for line in result.stdout.splitlines()[1:]:
+            fields = line.split("\t")
+            if len(fields) >= 5 and fields[4]:
+                entries.append({"bssid": fields[0], "freq": int(fields[1]), "signal": int(fields[2]), "ssid": fields[4]})
+        return entries
+
+    def _scan_iw(self):
+        result = subprocess.run(
+            ["iw", "dev", self.iface, "scan"],
+            capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            log.debug("iw scan failed: %s", result.stderr.strip())
+            return None
+
+        entries = []
+        for block in re.split(r"^BSS ", result.stdout, flags=re.MULTILINE)[1:]:
+            bssid = re.match(r"([0-9a-f:]{17})", block)
+            ssid = re.search(r"SSID: (.*)", block)
+            signal = re.search(r"signal: (-?\d+(?:\.\d+)?) dBm", block)
+            freq = re.search(r"freq: (\d+)", block)
+            if bssid and ssid and signal and ssid.group(1).strip():
+                entries.append({
+                    "bssid": bssid.group(1),
+                    "ssid": ssid.group(1).strip(),
+                    "signal": int(float(signal.group(1))),
+                    "freq": int(freq.group(1)) if freq else 0,
+                })
+        return entries
+
+    def best_by_ssid(self) -> dict:
+        with self._lock:
+            best = {}
+            for entry in self.entries:
+                if entry["ssid"] not in best or entry["signal"] > best[entry["ssid"]]["signal"]:
+                    best[entry["ssid"]] = entry
+            return best
+
+
+class ConnectionHistory:
+    """
+    Per SSID connection outcomes, persisted across reboots.
+    """
+
+    def __init__(self, path: str = HISTORY_FILE):
+        self.path = path
+        self.data = {}
+        try:
+            with open(path, "r") as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def success_rate(self, ssid: str) -> float:
+        entry = self.data.get(ssid, {})
+        # Laplace smoothing: an unknown network starts at 0.5
+        return (entry.get("successes", 0) + 1) / (entry.get("attempts", 0) + 2)
+
+    def record(self, ssid: str, success: bool, seconds: float):
+        entry = self.data.setdefault(ssid, {"attempts": 0, "successes": 0})
+        entry["attempts"] += 1
+        if success:
+            entry["successes"] += 1
+            entry["last_success"] = time.time()
+            entry["connect_seconds"] = round(seconds, 2)
+        self._save()
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.data, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            log.warning("Could not save WiFi history: %s", e)
+
+
+class WiFiConnectionManager:
+    """
+    Chooses between the stored networks instead of leaving it to a single
+    10 s wait: known SSIDs are ranked by scan signal plus past success
+    rate and tried in order with a short per-attempt timeout
+    (`wpa_cli select_network`), then every network is re-enabled so
+    wpa_supplicant can still recover on its own later.
+
+    Attempt timeout and count default to wifi.attempt_timeout /
+    wifi.max_attempts, read on every connect().
+    """
+
+    def __init__(self, config_manager: WiFiConfigManager = None, iface: str = "wlan0",
+                 attempt_timeout: float = None, max_attempts: int = None):
+        self.config_manager = config_manager or WiFiConfigManager()
+        self.iface = iface
+        self.attempt_timeout = attempt_timeout
+        self.max_attempts = max_attempts
+        self.scan = ScanCache(iface)
+        self.history = ConnectionHistory()
+        self._last_roam = 0.0
+
+    def _wpa_cli(self, *args) -> subprocess.CompletedProcess:
+        return subprocess.run(["wpa_cli", "-i", self.iface, *args], capture_output=True, text=True)
+
+    def _network_ids(self) -> dict:
+        result = self._wpa_cli("list_networks")
+        ids = {}
+        if result.returncode != 0:
+            return ids
+        for line in result.stdout.splitlines()[1:]:
+            fields = line.split("\t")
+            if len(fields) >= 2 and fields[0].isdigit():
+                ids.setdefault(fields[1], fields[0])
+        return ids
+
+    def _status(self) -> dict:
+        result = self._wpa_cli("status")
+        status = {}
+        for line in result.stdout.splitlines():
+            key, _, value = line.partition("=")
+            status[key] = value
+        return status
+
+    def rank_candidates(self, ssids: list) -> list:
+        """
+        Order known SSIDs by signal + SUCCESS_WEIGHT * success rate. Known
+        networks missing from a fresh scan go last (they may be hidden).
+
+        :return: [(ssid, score, signal)]
+        """
+        seen = self.scan.best_by_ssid()
+        ranked = []
+        for ssid in ssids:
+            signal = seen[ssid]["signal"] if ssid in seen else UNSEEN_SIGNAL
+            score = signal + SUCCESS_WEIGHT * self.history.success_rate(ssid)
+            ranked.append((ssid, score, signal))
+        ranked.sort(key=lambda item: (item[0] not in seen, -item[1]))
+        return ranked
+
+    def _wait_associated(self, ssid: str, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = self._status()
+            if status.get("wpa_state") == "COMPLETED" and status.get("ssid") == ssid:
+                return True
+            time.sleep(STATUS_POLL)
+        return False
+
+    def connect(self):
+        """
+        Associate with the best reachable known network (blocking).
+
+        :return: Connected SSID, or None if every candidate failed
+        """
+        start = time.monotonic()
+        wifi = CONFIG.wifi
+        attempt_timeout = self.attempt_timeout or wifi.attempt_timeout
+        max_attempts = self.max_attempts or wifi.max_attempts
+        known = [cfg["ssid"] for cfg in self.config_manager.load_wifi_configs()]
+        if not known:
+            return None
+
+        if not self.scan.fresh:
+            self.scan.refresh()
+
+        ids = self._network_ids()
+        if not ids:
+            # No control interface: let wpa_supplicant pick on its own
+            log.warning("wpa_cli list_networks unavailable, waiting for automatic association")
+            status_ok = self.config_manager.is_wait_for_wifi(self.iface)
+            return self._status().get("ssid") if status_ok else None
+
+        candidates = [c for c in self.rank_candidates(known) if c[0] in ids][:max_attempts]
+        log.info("WiFi candidates: %s", ", ".join(f"{s} ({sig} dBm)" for s, _, sig in candidates))
+
+        connected = None
+        try:
+            for ssid, _, signal in candidates:
+                attempt_start = time.monotonic()
+                CONNECT_ATTEMPTS.inc()
+                log.info("Trying WiFi '%s' (%d dBm)", ssid, signal)
+
+                self._wpa_cli("select_network", ids[ssid])
+                ok = self._wait_associated(ssid, attempt_timeout)
+                self.history.record(ssid, ok, time.monotonic() - attempt_start)
+                if ok:
+                    connected = ssid
+                    break
+                log.warning("WiFi '%s' did not associate within %.1fs", ssid, attempt_timeout)
+        finally:
+            # select_network disabled the others; give them back to wpa_supplicant
+            self._wpa_cli("enable_network", "all")
+
+        if connected:
+            CONNECT_SECONDS.observe(time.monotonic() - start)
+            log.info("WiFi connected to '%s' in %.1fs", connected, time.monotonic() - start)
+        return connected
+
+    def refresh_if_idle(self, lock: threading.Lock):
+        """
+        Background scan refresh and roaming check. Skipped when `lock` is
+        busy (a connection attempt, mode switch or device operation).
+        """
+        if not lock.acquire(blocking=False):
+            return
+        try:
+            self.scan.refresh(trigger=True)
+            self._maybe_roam()
+        finally:
+            lock.release()
+
+    def _maybe_roam(self):
+        status = self._status()
+        if status.get("wpa_state") != "COMPLETED":
+            return
+        if time.monotonic() - self._last_roam < ROAM_INTERVAL:
+            return
+
+        current_ssid = status.get("ssid")
+        current = next((e for e in self.scan.entries if e["bssid"] == status.get("bssid")), None)
+        if current is None or current["signal"] >= ROAM_THRESHOLD:
+            return
+
+        known = {cfg["ssid"] for cfg in self.config_manager.load_wifi_configs()}
+        best = max(
+            (e for e in self.scan.entries if e["ssid"] in known),
+            key=lambda e: e["signal"], default=None,
+        )
+        if best is None or best["signal"] < current["signal"] + ROAM_MARGIN:
+            return
+
+        self._last_roam = time.monotonic()
+        ROAMS.inc()
+        log.info(
+            "Roaming from %s (%d dBm) to %s/%s (%d dBm)",
+            current_ssid, current["signal"], best["ssid"], best["bssid"], best["signal"],
+        )
+        if best["ssid"] == current_ssid:
+            # Same network: the address stays valid
+            self._wpa_cli("roam", best["bssid"])
+            return
+
+        ids = self._network_ids()
+        if best["ssid"] not in ids:
+            return
+        # Another network needs its own address; back to the previous
+        # one when association or DHCP fails
+        timeout = self.attempt_timeout or CONFIG.wifi.attempt_timeout
+        try:
+            if self._switch_network(best["ssid"], ids, timeout):
+                return
+            log.warning("Roam to '%s' failed, returning to '%s'", best["ssid"], current_ssid)
+            if current_ssid not in ids or not self._switch_network(current_ssid, ids, timeout):
+                log.warning("Could not return to '%s', leaving recovery to the main loop", current_ssid)
+        finally:
+            # select_network disabled the others; give them back to wpa_supplicant
+            self._wpa_cli("enable_network", "all")
+
+    def _switch_network(self, ssid: str, ids: dict, timeout: float) -> bool:
+        """
+        Select `ssid`, wait for association and request an address.
+        """
+        start = time.monotonic()
+        self._wpa_cli("select_network", ids[ssid])
+        ok = self._wait_associated(ssid, timeout)
+        self.history.record(ssid, ok, time.monotonic() - start)
+        return ok and self.config_manager.request_ip(interface=self.iface, ssid=ssid)
@@ -1,4 +1,8 @@
+import os
+import re
 import time
+import socket
+import struct
 import subprocess
 import logging
 from enum import Enum
@@ -9,11 +13,31 @@ from lsmy_python_lib.command_runner import run_cmd, run_cmd_with_retry
 # ====== GLOBAL STORE LIBRARY ======
 from lsmy_python_lib.global_store import Global_Store
 
+# ====== METRICS LIBRARY ======
+from lsmy_python_lib.metrics import METRICS
+
+# ====== RECORDER LIBRARY ======
+from lsmy_python_lib.recorder import capture_mode
+
+# ====== CONFIG LIBRARY ======
+from lsmy_python_lib.config import CONFIG
+
 log = logging.getLogger("wifi-mode")
 
-SYSTEMD_NETWORK_FILE = "/etc/systemd/network/10-wlan0.network"
-AP_NETWORK_FILE = "/etc/systemd/network/wlan0-ap.network"
-STA_NETWORK_FILE = "/etc/systemd/network/wlan0-sta.network"
+NETWORKD_DIR = os.environ.get("LSMY_NETWORKD_DIR", "/etc/systemd/network")
+SYSTEMD_NETWORK_FILE = os.path.join(NETWORKD_DIR, "10-wlan0.network")
+AP_NETWORK_FILE = os.path.join(NETWORKD_DIR, "wlan0-ap.network")
+STA_NETWORK_FILE = os.path.join(NETWORKD_DIR, "wlan0-sta.network")
+PROC_NET = os.environ.get("LSMY_PROC_NET", "/proc/net")
+
+GATEWAY_PROBE_TIMEOUT = 1      # Seconds to wait for the gateway's ARP (or ping) reply
+
+MODE_SWITCH_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60)
+MODE_SWITCH_SECONDS = {
+    mode: METRICS.histogram("lsmy_wifi_mode_switch_seconds", "WiFi mode switch duration",
+                            {"mode": mode}, buckets=MODE_SWITCH_BUCKETS)
+    for mode in ("ap", "sta", "cleanup")
+}
 
 
 class WiFiMode(Enum):
@@ -34,7 +58,8 @@ class WiFiModeManager:
     def _restart_networkd(self):
         run_cmd(["systemctl", "restart", "systemd-networkd"])
 
-    def _wait_for_interface(self, iface: str, timeout: int = 10):
+    def _wait_for_interface(self, iface: str, timeout: int = None):
+        timeout = CONFIG.wifi.interface_timeout if timeout is None else timeout
         log.info("Waiting for interface %s...", iface)
 
         for _ in range(timeout):
@@ -53,6 +78,11 @@ class WiFiModeManager:
 
 
     def switch_to_ap(self):
+        capture_mode("ap")
+        with MODE_SWITCH_SECONDS["ap"].time():
+            self._switch_to_ap()
+
+    def _switch_to_ap(self):
         log.info("========== SWITCH TO AP MODE ==========")
         self.mode = WiFiMode.AP
 
@@ -60,9 +90,10 @@ class WiFiModeManager:
         self._restart_networkd()
 
         run_cmd(["systemctl", "stop", "wpa_supplicant"])
-        self._wait_for_interface("wlan0", timeout=10)
-        run_cmd_with_retry(["systemctl", "start", "hostapd"], retries=5, delay=2)
-        run_cmd_with_retry(["systemctl", "start", "dnsmasq"], retries=5, delay=2)
+        wifi = CONFIG.wifi
+        self._wait_for_interface("wlan0")
+        run_cmd_with_retry(["systemctl", "start", "hostapd"], retries=wifi.service_retries, delay=wifi.service_retry_delay)
+        run_cmd_with_retry(["systemctl", "start", "dnsmasq"], retries=wifi.service_retries, delay=wifi.service_retry_delay)
 
         log.info("AP mode enabled")
 
@@ -71,6 +102,11 @@ class WiFiModeManager:
         Global_Store.set("is_sta_mode", False)
 
     def switch_to_sta(self):
+        capture_mode("sta")
+        with MODE_SWITCH_SECONDS["sta"].time():
+            self._switch_to_sta()
+
+    def _switch_to_sta(self):
         log.info("========== SWITCH TO STA MODE ==========")
         self.mode = WiFiMode.STA
 
@@ -93,6 +129,11 @@ class WiFiModeManager:
 
     # Cleanup function to reset WiFi state
     def cleanup_wifi(self):
+        capture_mode("cleanup")
+        with MODE_SWITCH_SECONDS["cleanup"].time():
+            self._cleanup_wifi()
+
+    def _cleanup_wifi(self):
         log.info("========== CLEANUP WIFI STATE ==========")
 
         # Stop AP-related services
@@ -156,23 +197,57 @@ class WiFiModeManager:
 
     # Check if interface has default route
     def has_default_route(self, iface: str = "wlan0") -> bool:
-        # Check if default route exists on interface
-        result = subprocess.run(
-            ["ip", "route", "show", "default"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
+        return self.default_gateway(iface) is not None
+
+    def default_gateway(self, iface: str = "wlan0"):
+        """
+        Gateway of the default route on `iface`, read from the kernel
+        routing table (no `ip route` process).
+        """
+        try:
+            with open(os.path.join(PROC_NET, "route"), "r") as f:
+                lines = f.readlines()[1:]
+        except OSError:
+            return None
+
+        for line in lines:
+            fields = line.split()
+            # Iface Destination Gateway Flags ... Mask
+            if len(fields) >= 8 and fields[0] == iface and fields[1] == "00000000" and fields[7] == "00000000":
+                return socket.inet_ntoa(struct.pack("<L", int(fields[2], 16)))
+        return None
+
+    def gateway_reachable(self, gateway: str, iface: str = "wlan0") -> bool:
+        """
+        The gateway answers an ARP request on `iface` within
+        GATEWAY_PROBE_TIMEOUT. The neighbour table is not enough: an
+        entry keeps its complete flag while STALE, long after the gateway
+        went away. Without arping, one ping is sent instead.
+        """
+        probes = (
+            ["arping", "-q", "-c", "1", "-w", str(GATEWAY_PROBE_TIMEOUT), "-I", iface, gateway],
+            ["ping", "-q", "-c", "1", "-W", str(GATEWAY_PROBE_TIMEOUT), "-I", iface, gateway],
         )
-
-        if result.returncode != 0:
-            return False
-
-        return iface in result.stdout
-
-    # Check is wifi is connected
-    def is_wifi_connected(self, iface: str = "wlan0") -> bool:
-        # STA mode + has IP + Iw dev has default route => WiFi usable
-        iw_dev_result = False
+        for cmd in probes:
+            try:
+                result = subprocess.run(
+                    cmd,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=GATEWAY_PROBE_TIMEOUT + 2,
+                )
+            except FileNotFoundError:
+                log.warning("%s not installed, gateway check falls back", cmd[0], extra={"rate_limit": 3600})
+                continue
+            except subprocess.TimeoutExpired:
+                return False
+            return result.returncode == 0
+        return False
+
+    def associated_ssid(self, iface: str = "wlan0"):
+        """
+        SSID the STA is associated with, None when not associated.
+        """
         result = subprocess.run(
                 ["iw", "dev", iface, "link"],
                 stdout=subprocess.PIPE,
@@ -180,16 +255,18 @@ class WiFiModeManager:
                 text=True,
                 timeout=2
             )
-        
-        if "Connected to" in result.stdout:
-            iw_dev_result = True
-        else: 
-            iw_dev_result = False
-
-        return (
-            self.get_wifi_role() == "STA"
-            and self.has_ip("wlan0")
-            and self.has_default_route("wlan0")
-            and iw_dev_result
-        )
+        if "Connected to" not in result.stdout:
+            return None
+        match = re.search(r"SSID:\s+(.*)", result.stdout)
+        return match.group(1).strip() if match else ""
+
+    # Check is wifi is connected
+    def is_wifi_connected(self, iface: str = "wlan0") -> bool:
+        # Associated (only a STA has a link) + default route + gateway
+        # answering ARP => WiFi usable. Two processes per check (iw,
+        # arping); the route comes straight from the kernel.
+        if self.associated_ssid(iface) is None:
+            return False
 
+        gateway = self.default_gateway(iface)
+        return gateway is not None and self.gateway_reachable(gateway, iface)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# lsmy_python_lib is used from the source tree, as on the device
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,64 @@
+import random
+import struct
+from array import array
+
+import pytest
+
+from lsmy_python_lib import accel
+from lsmy_python_lib.telemetry_sample import SampleHistory, TelemetrySample
+
+native = pytest.mark.skipif(not accel.native_available(), reason="liblsmy_accel not found (set LSMY_ACCEL_LIB)")
+
+
+def _series(n, seed=1):
+    rng = random.Random(seed)
+    # Repeated values exercise ties in the min / max scan
+    return array("d", (round(rng.gauss(25.0, 3.0), 1) for _ in range(n)))
+
+
+def _naive_rolling(values, window):
+    windows = [values[i:i + window] for i in range(len(values) - window + 1)]
+    return [min(w) for w in windows], [max(w) for w in windows]
+
+
+def test_rolling_fallback_matches_naive_scan():
+    values = _series(500)
+    for window in (1, 2, 7, 60, 500):
+        _, mins, maxs = accel.rolling_stats_py(values, window)
+        assert (list(mins), list(maxs)) == _naive_rolling(list(values), window)
+    assert accel.rolling_stats_py(values, 501) == (array("d"), array("d"), array("d"))
+
+
+@native
+def test_rolling_native_matches_python():
+    values = _series(4096)
+    for window in (1, 60, 4096):
+        assert accel.rolling_stats(values, window) == accel.rolling_stats_py(values, window)
+
+
+@native
+def test_crc16_native_matches_python():
+    rng = random.Random(2)
+    for size in (0, 1, 8, 256):
+        frame = bytes(rng.randrange(256) for _ in range(size))
+        assert accel.crc16_modbus(frame) == accel.crc16_modbus_py(frame)
+
+
+@native
+def test_decode_native_matches_python():
+    registers = struct.pack(">250f", *_series(250))
+    for word_swap in (False, True):
+        native_values = accel.decode_float_block_native(registers, word_swap)
+        assert native_values.tobytes() == accel.decode_float_block(registers, word_swap).tobytes()
+
+
+def test_history_rolling_is_oldest_first():
+    history = SampleHistory(TelemetrySample, capacity=4)
+    for ts in range(6):
+        history.append(TelemetrySample(ts, 20.0 + ts, 50.0, 0.1, 12.0, 8.0))
+
+    # Ring wrapped: samples 2..5
+    trend = history.rolling(2)["temperature"]
+    assert trend["min"] == [22.0, 23.0, 24.0]
+    assert trend["max"] == [23.0, 24.0, 25.0]
+    assert trend["mean"] == [22.5, 23.5, 24.5]
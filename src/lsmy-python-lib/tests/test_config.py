@@ -0,0 +1,82 @@
+import asyncio
+import threading
+
+import pytest
+
+from lsmy_python_lib.config import ConfigError, RuntimeConfig, compile_config
+
+
+def test_every_problem_is_reported():
+    with pytest.raises(ConfigError) as e:
+        compile_config({
+            "app": {"main_loop_interval": "fast", "executor_workers": 0, "bogus": 1},
+            "nosuch": {},
+            "web": {"ws_compression": "brotli"},
+        }, {})
+    problems = e.value.problems
+    assert "nosuch: unknown section" in problems
+    assert "app.bogus: unknown setting" in problems
+    assert any(p.startswith("app.main_loop_interval: expected float") for p in problems)
+    assert any(p.startswith("app.executor_workers: must be >= 1") for p in problems)
+    assert any(p.startswith("web.ws_compression: must be one of") for p in problems)
+
+
+def test_environment_wins_and_is_validated():
+    sections = compile_config({"models": {"inference_threads": 2}}, {"LSMY_INFERENCE_THREADS": "4"})
+    assert sections["models"].inference_threads == 4
+    assert compile_config({}, {"LSMY_WS_DEFLATE_NO_CONTEXT": "yes"})["web"].ws_deflate_no_context is True
+
+    with pytest.raises(ConfigError) as e:
+        compile_config({}, {"LSMY_INFERENCE_THREADS": "-1"})
+    assert e.value.problems == ["models.inference_threads (LSMY_INFERENCE_THREADS): must be >= 0, got -1"]
+
+
+def test_reload_holds_restart_settings(tmp_path):
+    path = tmp_path / "lsmy.toml"
+    path.write_text('[app]\nmain_loop_interval = 2.0\nexecutor_workers = 3\n')
+    config = RuntimeConfig(str(path), environ={})
+
+    path.write_text('[app]\nmain_loop_interval = 1.0\nexecutor_workers = 8\n')
+    assert config.reload() == ["app"]
+    assert config.app.main_loop_interval == 1.0
+    assert config.app.executor_workers == 3
+    assert config.pending_restart == {"app.executor_workers": 8}
+
+    # Only the held setting differs: nothing to apply
+    path.write_text('[app]\nmain_loop_interval = 1.0\nexecutor_workers = 8\n')
+    assert config.reload() == []
+
+
+def test_rejected_reload_keeps_running_config(tmp_path):
+    path = tmp_path / "lsmy.toml"
+    path.write_text('[wifi]\nconnect_timeout = 20\n')
+    config = RuntimeConfig(str(path), environ={})
+
+    path.write_text('[wifi]\nconnect_timeout = 0\n')
+    with pytest.raises(ConfigError):
+        config.reload()
+    assert config.wifi.connect_timeout == 20.0
+
+
+def test_listener_runs_on_its_loop(tmp_path):
+    path = tmp_path / "lsmy.toml"
+    path.write_text('[app]\nmain_loop_interval = 2.0\n')
+    config = RuntimeConfig(str(path), environ={})
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        called = asyncio.Event()
+        threads = []
+
+        def listener(old, new):
+            threads.append(threading.current_thread())
+            called.set()
+
+        config.subscribe("app", listener, loop=loop)
+        path.write_text('[app]\nmain_loop_interval = 1.0\n')
+        # Reload from a worker thread, as the file-poll / IPC paths may
+        await loop.run_in_executor(None, config.reload)
+        await asyncio.wait_for(called.wait(), 1)
+        assert threads == [threading.main_thread()]
+
+    asyncio.run(scenario())
@@ -0,0 +1,31 @@
+from lsmy_python_lib.duty_cycle import DutyCycleScheduler
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_measured_cost_replans_inference():
+    changes = []
+    duty = DutyCycleScheduler(cpu_budget=0.25, on_change=lambda: changes.append(1), clock=Clock())
+    before = duty.snapshot()["periods"]["inference"]
+
+    # Inference far more expensive than assumed: slowed to fit the budget
+    for _ in range(20):
+        duty.record_cost("inference", 1.0)
+
+    after = duty.snapshot()["periods"]["inference"]
+    assert after > before
+    assert changes
+
+
+def test_small_cost_drift_keeps_plan():
+    changes = []
+    duty = DutyCycleScheduler(on_change=lambda: changes.append(1), clock=Clock())
+    planned = duty._planned_cost["sensors"]
+    duty.record_cost("sensors", planned * 1.05)
+    assert duty._planned_cost["sensors"] == planned
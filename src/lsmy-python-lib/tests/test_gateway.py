@@ -0,0 +1,58 @@
+import asyncio
+import json
+
+from lsmy_python_lib import gateway
+from lsmy_python_lib.gateway import Gateway
+from lsmy_python_lib.telemetry_sample import TelemetrySample
+
+
+def _sample(ts):
+    return TelemetrySample(ts, 21.0, 50.0, 0.1, 12.0)
+
+
+def test_take_leaves_batches_until_acked():
+    async def scenario():
+        gw = Gateway(site="test")
+        for ts in range(3):
+            gw.submit_local(_sample(ts))
+            await gw._store(gw._take_batch())
+
+        first = gw.take_batches(limit=2)
+        assert [batch_id for batch_id, _ in first] == [1, 2]
+        assert json.loads(first[0][1])["batch"] == 1
+        # Not acked: handed out again
+        assert gw.take_batches(limit=2) == first
+
+        assert gw.ack_batches([1, 2, 99]) == 2
+        assert [batch_id for batch_id, _ in gw.take_batches()] == [3]
+
+    asyncio.run(scenario())
+
+
+def test_full_backlog_stalls_batcher_until_ack(monkeypatch):
+    monkeypatch.setattr(gateway, "UPLINK_BACKLOG", 2)
+
+    async def scenario():
+        gw = Gateway(site="test", batch_interval=0.01)
+        batcher = asyncio.create_task(gw.run_batcher())
+        try:
+            for ts in range(4):
+                gw.submit_local(_sample(ts))
+                await asyncio.sleep(0.05)
+
+            # Nothing dropped: two batches stored, the third waits and
+            # the fourth sample stays pending
+            assert len(gw.uplink) == 2
+            assert gw._batches == 3
+            assert gw._pending_total == 1
+
+            gw.ack_batches([batch_id for batch_id, _ in gw.take_batches()])
+            await asyncio.sleep(0.05)
+            stored = gw.take_batches()
+            assert [batch_id for batch_id, _ in stored] == [3, 4]
+            samples = sum(json.loads(batch)["samples"] for _, batch in stored)
+            assert samples == 2
+        finally:
+            batcher.cancel()
+
+    asyncio.run(scenario())
@@ -0,0 +1,46 @@
+import io
+import logging
+
+from lsmy_python_lib.log_control import RateLimitFilter, setup_logging, stop_logging
+from lsmy_python_lib.startup_timeline import StartupTimeline
+
+
+def _logger(name):
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.addFilter(RateLimitFilter(rate=2.0, burst=20))
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger, stream
+
+
+def test_call_site_burst_is_limited():
+    logger, stream = _logger("test-burst")
+    for i in range(50):
+        logger.info("line %d", i)
+    assert len(stream.getvalue().splitlines()) == 20
+
+
+def test_report_is_never_truncated():
+    logger, stream = _logger("test-report")
+    timeline = StartupTimeline()
+    for i in range(60):
+        timeline.record(f"step {i}", i * 0.001, 0.001)
+    timeline.report(logger)
+    assert len(stream.getvalue().splitlines()) == 62
+
+
+def test_stop_logging_writes_out_queued_records():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    stream = io.StringIO()
+    try:
+        setup_logging(stream=stream)
+        logging.getLogger("test-exit").error("Shutdown timed out, exiting anyway")
+        stop_logging(timeout=2)
+    finally:
+        root.handlers = handlers
+        root.setLevel(level)
+    assert "exiting anyway" in stream.getvalue()
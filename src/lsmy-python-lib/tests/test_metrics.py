@@ -0,0 +1,13 @@
+from lsmy_python_lib.metrics import MetricsRegistry
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter("lsmy_test_total", "Line one\nline two", {"ssid": 'lab "5G"\\guest\nnet'}).inc()
+
+    lines = registry.render_prometheus().splitlines()
+    assert lines == [
+        "# HELP lsmy_test_total Line one\\nline two",
+        "# TYPE lsmy_test_total counter",
+        'lsmy_test_total{ssid="lab \\"5G\\"\\\\guest\\nnet"} 1',
+    ]
@@ -0,0 +1,55 @@
+import asyncio
+import threading
+
+from lsmy_python_lib.operation_queue import OperationQueue, STATE_CANCELLED, STATE_DONE
+
+
+def test_operation_runs_to_done():
+    async def scenario():
+        queue = OperationQueue()
+        queue.register("noop", lambda op: op.report(0.5, "Half way"))
+        worker = asyncio.create_task(queue.run())
+        op = queue.submit("noop")
+        for _ in range(100):
+            if op.state == STATE_DONE:
+                break
+            await asyncio.sleep(0.01)
+        worker.cancel()
+        return op
+
+    op = asyncio.run(scenario())
+    assert op.state == STATE_DONE
+    assert op.finished is not None
+
+
+def test_cancelled_worker_finishes_running_operation():
+    started = threading.Event()
+    stopped = threading.Event()
+
+    def slow(op):
+        started.set()
+        while True:
+            op.check_cancelled()
+            if stopped.wait(0.01):
+                return
+
+    async def scenario():
+        queue = OperationQueue()
+        queue.register("slow", slow)
+        worker = asyncio.create_task(queue.run())
+        op = queue.submit("slow")
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+
+        worker.cancel()
+        try:
+            await worker
+        except asyncio.CancelledError:
+            pass
+        return queue, op
+
+    queue, op = asyncio.run(scenario())
+    stopped.set()
+    assert op.state == STATE_CANCELLED
+    assert op.cancel_requested
+    assert not queue.busy
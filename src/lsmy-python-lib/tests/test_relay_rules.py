@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from lsmy_python_lib.relay_controller import RelayController, RelayError
+from lsmy_python_lib.relay_rules import RelayScheduler
+
+
+class FakeLine:
+    def __init__(self, line, writes, fail=False):
+        self.line = line
+        self.writes = writes
+        self.fail = fail
+        self.level = False
+
+    def write(self, on):
+        if self.fail:
+            raise OSError("line busy")
+        self.level = on
+        self.writes.append((self.line, on))
+
+    def read(self):
+        return self.level
+
+    def close(self):
+        pass
+
+
+class FakeController(RelayController):
+    """
+    RelayController on in-memory lines, recording every write in order.
+    """
+
+    def __init__(self, failing=()):
+        super().__init__(chip="/nonexistent")
+        self.writes = []
+        self.failing = set(failing)
+
+    def _handle(self, line, initial):
+        gpio = self._handles.get(line)
+        if gpio is None:
+            gpio = self._handles[line] = FakeLine(line, self.writes, line in self.failing)
+        return gpio
+
+
+def test_apply_writes_off_before_on():
+    controller = FakeController()
+    controller.apply([(18, True)])
+    controller.writes.clear()
+
+    states = controller.apply([(23, True), (18, False)])
+
+    assert controller.writes == [(18, False), (23, True)]
+    assert states == {18: False, 23: True}
+
+
+def test_interlocked_swap_never_overlaps():
+    controller = FakeController()
+    scheduler = RelayScheduler(controller, interlocks=[(18, 23)])
+
+    async def swap():
+        await scheduler.manual([(18, True)])
+        controller.writes.clear()
+        await scheduler.manual([(23, True), (18, False)])
+
+    asyncio.run(swap())
+
+    on = set()
+    for line, level in controller.writes:
+        (on.add if level else on.discard)(line)
+        assert not {18, 23} <= on
+    assert on == {23}
+
+
+def test_failed_manual_write_does_not_hold_rules():
+    controller = FakeController(failing=[18])
+    scheduler = RelayScheduler(controller)
+
+    with pytest.raises(RelayError):
+        asyncio.run(scheduler.manual([(18, True)]))
+
+    assert 18 not in scheduler._hold_until
+    assert not scheduler._manual
@@ -0,0 +1,89 @@
+import math
+import random
+
+import pytest
+
+from lsmy_python_lib.telemetry_pipeline import SwingingDoorFilter, TelemetryPipeline, UplinkQueue, _ratio
+
+
+def _compress(values, deviation, max_interval=None):
+    door = SwingingDoorFilter(deviation, max_interval)
+    kept = []
+    for ts, value in enumerate(values):
+        kept += door.process(float(ts), value)
+    kept += door.flush()
+    return kept
+
+
+def _max_error(values, kept):
+    """
+    Largest distance between each input point and the line through the
+    kept points around it.
+    """
+    times = [p["ts"] for p in kept]
+    assert times == sorted(times) and times[0] == 0.0 and times[-1] == len(values) - 1
+    worst, segment = 0.0, 0
+    for ts, value in enumerate(values):
+        while times[segment + 1] < ts:
+            segment += 1
+        (t0, v0), (t1, v1) = ((p["ts"], p["value"]) for p in kept[segment:segment + 2])
+        estimate = v0 + (v1 - v0) * (ts - t0) / (t1 - t0)
+        worst = max(worst, abs(value - estimate))
+    return worst
+
+
+rng = random.Random(1234)
+WAVEFORMS = {
+    "sine": [10 * math.sin(i / 15) for i in range(1000)],
+    "steps": [float((i // 50) % 3) * 4 for i in range(1000)],
+    "noisy_ramp": [i * 0.05 + rng.gauss(0, 0.4) for i in range(1000)],
+    "sawtooth": [float(i % 37) for i in range(1000)],
+    "spikes": [20.0 if i % 97 == 0 else 1.0 + 0.01 * (i % 5) for i in range(1000)],
+}
+
+
+@pytest.mark.parametrize("name", sorted(WAVEFORMS))
+@pytest.mark.parametrize("deviation", [0.05, 0.5, 2.0])
+def test_swinging_door_error_within_deviation(name, deviation):
+    values = WAVEFORMS[name]
+    kept = _compress(values, deviation)
+    assert _max_error(values, kept) <= deviation + 1e-9
+    assert len(kept) < len(values)
+
+
+def test_swinging_door_max_interval_keeps_bound():
+    values = WAVEFORMS["sine"]
+    kept = _compress(values, 0.5, max_interval=40)
+    assert _max_error(values, kept) <= 0.5 + 1e-9
+    gaps = [b["ts"] - a["ts"] for a, b in zip(kept, kept[1:])]
+    assert max(gaps) <= 40
+
+
+def test_ratio_without_output_is_none():
+    assert _ratio(10, 0) is None
+    assert _ratio(10, 4) == 2.5
+    assert TelemetryPipeline().stats()["compression_ratio"] is None
+
+
+def test_uplink_queue_keeps_batches_until_acked():
+    queue = UplinkQueue(size=4)
+    for ts in range(3):
+        queue.put({"temperature": [{"ts": ts, "value": 21.0}]}, ts)
+
+    first = queue.take(limit=2)
+    assert [b["id"] for b in first] == [1, 2]
+    # Not acked: handed out again
+    assert queue.take(limit=2) == first
+
+    assert queue.ack([1, 2, 99]) == 2
+    assert [b["id"] for b in queue.take()] == [3]
+
+
+def test_uplink_queue_counts_overflow_drops():
+    queue = UplinkQueue(size=2)
+    dropped = queue.stats()["dropped"]
+    for ts in range(3):
+        queue.put({"temperature": [{"ts": ts, "value": 21.0}]}, ts)
+
+    assert [b["id"] for b in queue.take()] == [2, 3]
+    assert queue.stats()["dropped"] == dropped + 1
@@ -0,0 +1,29 @@
+import numpy as np
+
+from lsmy_python_lib.tracker import MultiObjectTracker
+
+
+def _box(centre_y):
+    return np.array([[0.4, centre_y - 0.1, 0.6, centre_y + 0.1]])
+
+
+def _run(centres, **kwargs):
+    tracker = MultiObjectTracker(line=0.5, **kwargs)
+    for y in centres:
+        tracker.update(_box(y))
+    return tracker
+
+
+def test_jitter_on_the_line_is_not_counted():
+    tracker = _run([0.45, 0.49, 0.51, 0.49, 0.51, 0.495, 0.505, 0.49], hysteresis=0.02)
+    assert (tracker.entered, tracker.exited) == (0, 0)
+
+
+def test_crossing_through_the_band_counts_once():
+    tracker = _run([0.40, 0.45, 0.49, 0.51, 0.49, 0.53, 0.58, 0.62], hysteresis=0.02)
+    assert (tracker.entered, tracker.exited) == (1, 0)
+
+
+def test_without_dead_band_jitter_counts():
+    tracker = _run([0.45, 0.49, 0.51, 0.49, 0.51], hysteresis=0.0)
+    assert tracker.entered + tracker.exited > 0
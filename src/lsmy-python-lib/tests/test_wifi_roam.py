@@ -0,0 +1,83 @@
+import subprocess
+
+from lsmy_python_lib import wifi_connection_manager
+from lsmy_python_lib.wifi_connection_manager import WiFiConnectionManager, ConnectionHistory
+
+
+class FakeConfig:
+    def __init__(self, dhcp_ok=True):
+        self.dhcp_ok = dhcp_ok
+        self.requests = []
+
+    def load_wifi_configs(self):
+        return [{"ssid": "near"}, {"ssid": "far"}]
+
+    def request_ip(self, interface="wlan0", ssid=None):
+        self.requests.append(ssid)
+        return self.dhcp_ok
+
+
+class FakeManager(WiFiConnectionManager):
+    """
+    wpa_supplicant stand-in: select_network associates with the chosen
+    network unless it is in `unreachable`.
+    """
+
+    def __init__(self, config, tmp_path, unreachable=()):
+        super().__init__(config, attempt_timeout=0.5)
+        self.history = ConnectionHistory(str(tmp_path / "history.json"))
+        self.unreachable = set(unreachable)
+        self.commands = []
+        self.ssid = "far"
+        self.scan.entries = [
+            {"ssid": "far", "bssid": "02:00:00:00:00:01", "signal": -82},
+            {"ssid": "near", "bssid": "02:00:00:00:00:02", "signal": -50},
+        ]
+        self._last_roam = -wifi_connection_manager.ROAM_INTERVAL * 2
+
+    def _wpa_cli(self, *args):
+        self.commands.append(args)
+        if args[0] == "list_networks":
+            out = "network id / ssid / bssid / flags\n0\tfar\tany\t\n1\tnear\tany\t\n"
+            return subprocess.CompletedProcess(args, 0, out, "")
+        if args[0] == "select_network":
+            self.ssid = {"0": "far", "1": "near"}[args[1]]
+        return subprocess.CompletedProcess(args, 0, "OK\n", "")
+
+    def _status(self):
+        if self.ssid in self.unreachable:
+            return {"wpa_state": "SCANNING"}
+        bssid = next(e["bssid"] for e in self.scan.entries if e["ssid"] == self.ssid)
+        return {"wpa_state": "COMPLETED", "ssid": self.ssid, "bssid": bssid}
+
+
+def test_cross_ssid_roam_requests_address(tmp_path, monkeypatch):
+    monkeypatch.setattr(wifi_connection_manager, "STATUS_POLL", 0.01)
+    config = FakeConfig()
+    manager = FakeManager(config, tmp_path)
+    manager._maybe_roam()
+
+    assert manager.ssid == "near"
+    assert config.requests == ["near"]
+    assert manager.commands[-1] == ("enable_network", "all")
+
+
+def test_failed_roam_returns_to_previous_network(tmp_path, monkeypatch):
+    monkeypatch.setattr(wifi_connection_manager, "STATUS_POLL", 0.01)
+    config = FakeConfig()
+    manager = FakeManager(config, tmp_path, unreachable={"near"})
+    manager._maybe_roam()
+
+    assert manager.ssid == "far"
+    assert config.requests == ["far"]
+    assert manager.commands[-1] == ("enable_network", "all")
+
+
+def test_roam_without_address_returns_to_previous_network(tmp_path, monkeypatch):
+    monkeypatch.setattr(wifi_connection_manager, "STATUS_POLL", 0.01)
+    config = FakeConfig(dhcp_ok=False)
+    manager = FakeManager(config, tmp_path)
+    manager._maybe_roam()
+
+    assert manager.ssid == "far"
+    assert config.requests == ["near", "far"]
@@ -4,37 +4,130 @@ import re
 import sys
 import asyncio
 import json
+import time
+import signal
 import subprocess
 import logging
 import websockets
-from periphery import GPIO
+from http import HTTPStatus
+from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
 
 # ====== IPC LIBRARY ======
-from lsmy_python_lib.ipc import send_connect_wifi_signal_ipc, send_request_get_data_ipc, LAST_TELEMETRY
+from lsmy_python_lib.ipc import (
+    send_connect_wifi_signal_ipc, send_request_get_data_ipc, send_relay_command_ipc,
+    send_get_relay_state_ipc, send_start_operation_ipc, send_get_operation_ipc,
+    send_cancel_operation_ipc, debug_server_task, LAST_TELEMETRY,
+)
 
-# ====== WIFI CONFIG LIBRARY ======
-from lsmy_python_lib.wifi_config_manager import configure_wifi
+# ====== PROFILER LIBRARY ======
+from lsmy_python_lib.profiler import Profiler
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
+# ====== TELEMETRY SAMPLE LIBRARY ======
+from lsmy_python_lib.telemetry_sample import TelemetrySample
+
+# ====== RELAY CONTROLLER LIBRARY ======
+from lsmy_python_lib.relay_controller import RelayError
+
+# ====== METRICS LIBRARY ======
+from lsmy_python_lib.metrics import METRICS, metrics_http_server_task
+
+# ====== LOOP HEALTH LIBRARY ======
+from lsmy_python_lib.loop_health import HEALTH, monitor_event_loop, sd_notify
+
+# ====== LOG CONTROL LIBRARY ======
+from lsmy_python_lib.log_control import setup_logging
+
+# ====== CONFIG LIBRARY ======
+from lsmy_python_lib.config import CONFIG
+
+setup_logging(
+    level=os.environ.get("LSMY_LOG_LEVEL", "INFO"),
+    structured=os.environ.get("LSMY_LOG_FORMAT") == "kv",
 )
 log = logging.getLogger("provision-webserver-backend")
 
 clients = set()
-WS_PORT = 8765
+background_tasks = set()
+WS_PORT = CONFIG.web.ws_port
+METRICS_HTTP_PORT = CONFIG.web.metrics_port   # 0 disables /metrics
+DEBUG_SOCK = CONFIG.web.debug_sock            # "" disables profiling IPC
+
+# Connection capacity (lab dashboard: several tablets keep the page open)
+WS_MAX_CLIENTS = CONFIG.web.ws_max_clients
+WS_PING_INTERVAL = CONFIG.web.ws_ping_interval
+WS_PING_TIMEOUT = CONFIG.web.ws_ping_timeout
+WS_MAX_MESSAGE = CONFIG.web.ws_max_message    # UI messages are tiny
+WS_MAX_QUEUE = CONFIG.web.ws_max_queue
+
+# permessage-deflate: "deflate" or "none". Window bits / memLevel trade
+# compression ratio for per-connection memory; no_context_takeover drops
+# the compressor state between messages entirely.
+WS_COMPRESSION = CONFIG.web.ws_compression
+WS_DEFLATE_WINDOW_BITS = CONFIG.web.ws_deflate_window_bits
+WS_DEFLATE_MEM_LEVEL = CONFIG.web.ws_deflate_mem_level
+WS_DEFLATE_NO_CONTEXT = CONFIG.web.ws_deflate_no_context
+
+WS_CAPACITY_CLOSE_CODE = 1013   # "Try Again Later"
+
+OPERATION_POLL_INTERVAL = 0.25  # Seconds between operation progress checks
+
+WS_CLIENTS = METRICS.gauge("lsmy_ws_clients", "Connected WebSocket clients")
+WS_REJECTED = METRICS.counter("lsmy_ws_rejected_total", "WebSocket connections refused at capacity")
+WS_FANOUT = METRICS.histogram("lsmy_ws_fanout_seconds", "Telemetry broadcast time to all clients")
+WS_SKIPPED = METRICS.counter("lsmy_ws_skipped_total", "Telemetry frames not sent to a client with a full write buffer")
+
+def ws_serve_options() -> dict:
+    """
+    Keyword arguments for websockets.serve from the capacity settings.
+    """
+    options = {
+        "process_request": admit_client,
+        "ping_interval": WS_PING_INTERVAL or None,
+        "ping_timeout": WS_PING_TIMEOUT or None,
+        "max_size": WS_MAX_MESSAGE,
+        "max_queue": WS_MAX_QUEUE,
+        "compression": None,
+    }
+    if WS_COMPRESSION == "deflate":
+        options["extensions"] = [
+            ServerPerMessageDeflateFactory(
+                server_no_context_takeover=WS_DEFLATE_NO_CONTEXT,
+                client_no_context_takeover=WS_DEFLATE_NO_CONTEXT,
+                server_max_window_bits=WS_DEFLATE_WINDOW_BITS,
+                client_max_window_bits=WS_DEFLATE_WINDOW_BITS,
+                compress_settings={"memLevel": WS_DEFLATE_MEM_LEVEL},
+            )
+        ]
+    return options
+
+def admit_client(connection, request):
+    """
+    Admission control, before the upgrade: at capacity the request gets a
+    plain 503 instead of a handshake and permessage-deflate negotiation
+    that would be closed right away.
+    """
+    if len(clients) >= WS_MAX_CLIENTS:
+        WS_REJECTED.inc()
+        log.warning("Client refused, %d/%d connected", len(clients), WS_MAX_CLIENTS,
+                    extra={"rate_limit": 10})
+        return connection.respond(HTTPStatus.SERVICE_UNAVAILABLE, "Server at capacity\n")
+    return None
 
 # WebSocket handler
 async def handle(ws):
+    # Handshakes admitted together can still overshoot the limit
+    if len(clients) >= WS_MAX_CLIENTS:
+        WS_REJECTED.inc()
+        await ws.close(code=WS_CAPACITY_CLOSE_CODE, reason="Server at capacity")
+        return
+
     clients.add(ws)
+    WS_CLIENTS.set(len(clients))
     log.info("Client connected (%d)", len(clients))
 
     try:
         async for msg in ws:
-            log.info("RX: %s", msg)
+            log.debug("RX: %s", msg)
             data = json.loads(msg)
 
             # ================= SETTINGS =================
@@ -52,52 +145,106 @@ async def handle(ws):
                         "msg": "SSID is required"
                     }))
                 else:
-                    if action == "connectBtn":
-                        # Update the wifi config signal
-                        data = {
-                            "role": "backend",
-                            "status": True 
-                        }
-                        await send_connect_wifi_signal_ipc(data)
-                        await ws.send(json.dumps({
-                        "status": "ok",
-                        "msg": "WiFi connect signal successfully"
-                        }))
-                    elif action == "saveBtn":
-                        # Configure WiFi
-                        data = {
-                            "role": "backend",
-                            "status": False 
-                        }
-                        await send_connect_wifi_signal_ipc(data)
-                        configure_wifi(clean_ssid, clean_pw)
+                    # IPC to the device process can fail (restarting,
+                    # timeout): answer the client instead of dropping it
+                    try:
+                        if action == "connectBtn":
+                            # Update the wifi config signal
+                            data = {
+                                "role": "backend",
+                                "status": True 
+                            }
+                            await send_connect_wifi_signal_ipc(data)
+                            await ws.send(json.dumps({
+                            "status": "ok",
+                            "msg": "WiFi connect signal successfully"
+                            }))
+                        elif action == "saveBtn":
+                            # Configure WiFi
+                            data = {
+                                "role": "backend",
+                                "status": False 
+                            }
+                            await send_connect_wifi_signal_ipc(data)
 
+                            # Saved by the device's operation queue, progress is
+                            # pushed to this client while the loop keeps serving
+                            resq = await send_start_operation_ipc(
+                                "configure_wifi", {"ssid": clean_ssid, "password": clean_pw}
+                            )
+                            if resq.get("status") == "ok":
+                                spawn_background(follow_operation(ws, resq["data"], "WiFi configured successfully"))
+                            else:
+                                await ws.send(json.dumps({
+                                "status": "error",
+                                "msg": resq.get("error", "WiFi configuration failed")
+                                }))
+                    except Exception as e:
+                        log.error("WiFi configuration request failed: %s", e)
                         await ws.send(json.dumps({
-                        "status": "ok",
-                        "msg": "WiFi configured successfully"
+                            "status": "error",
+                            "msg": f"WiFi configuration failed: {e}"
                         }))
+            # ================= OPERATIONS =================
+            elif data.get("page") == "operation":
+                op_id = data.get("value", {}).get("id")
+                try:
+                    if data.get("action") == "cancel":
+                        resq = await send_cancel_operation_ipc(op_id)
+                    else:
+                        resq = await send_get_operation_ipc(op_id)
+                except Exception as e:
+                    log.error("Operation request failed: %s", e)
+                    resq = {"status": "error", "error": str(e)}
+
+                if resq.get("status") == "ok":
+                    await ws.send(json.dumps({"page": "operation", **resq["data"]}))
+                else:
+                    await ws.send(json.dumps({"status": "error", "msg": resq.get("error")}))
             # ================= DEVICE / RELAY =================
             elif data.get("page") == "device":
-                log.info("Relay command: %s", data["value"])
+                log.info("Relay command: %s", data.get("value"))
 
                 value = data.get("value", {})
                 # Here is relay control logic
                 try:
-                    gpio = int(value.get("gpio"))
-                    status = value.get("status")
-                    name = value.get("name", "Unknown")
+                    # The relays belong to the device process (rules and
+                    # interlocks live there), commands go through IPC
+                    if data.get("action") == "state":
+                        # Cached state and audit trail, no hardware access
+                        resq = await send_get_relay_state_ipc()
+                        if resq.get("status") != "ok":
+                            raise RelayError(resq.get("error", "Relay state unavailable"))
+                        await ws.send(json.dumps({"status": "ok", **resq["data"]}))
+                    else:
+                        commands = parse_relay_commands(value)
+                        resq = await send_relay_command_ipc(
+                            [{"gpio": gpio, "on": on} for gpio, on, _ in commands]
+                        )
+                        if resq.get("status") != "ok":
+                            raise RelayError(resq.get("error", "Relay command failed"))
 
-                    if status not in ("ON", "OFF"):
-                        raise ValueError("Invalid relay status")
+                        # JSON object keys come back as strings
+                        states = resq["data"]["relays"]
+                        results = [
+                            {"gpio": gpio, "name": name, "state": "ON" if states[str(gpio)] else "OFF"}
+                            for gpio, _, name in commands
+                        ]
 
-                    set_gpio(gpio, status == "ON")
-
-                    await ws.send(json.dumps({
-                        "status": "ok",
-                        "msg": f"Relay executed {name} turned {status}",
-                        "gpio": gpio,
-                        "state": status
-                    }))
+                        if "relays" in value:
+                            await ws.send(json.dumps({
+                                "status": "ok",
+                                "msg": f"Relay batch executed ({len(results)} relays)",
+                                "relays": results
+                            }))
+                        else:
+                            result = results[0]
+                            await ws.send(json.dumps({
+                                "status": "ok",
+                                "msg": f"Relay executed {result['name']} turned {result['state']}",
+                                "gpio": result["gpio"],
+                                "state": result["state"]
+                            }))
 
                 except Exception as e:
                     log.error("Relay control failed: %s", e)
@@ -111,48 +258,95 @@ async def handle(ws):
         pass
     finally:
         clients.remove(ws)
+        WS_CLIENTS.set(len(clients))
         log.info("Client disconnected (%d)", len(clients))
 
+def spawn_background(coro):
+    task = asyncio.ensure_future(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+# Relay a device operation's progress to one client until it finishes
+async def follow_operation(ws, op: dict, success_msg: str):
+    last = None
+    try:
+        while True:
+            update = (op["state"], op["progress"], op["message"])
+            if update != last:
+                last = update
+                await ws.send(json.dumps({"page": "operation", **op}))
+
+            if op["state"] in ("done", "failed", "cancelled"):
+                break
+
+            await asyncio.sleep(OPERATION_POLL_INTERVAL)
+            resq = await send_get_operation_ipc(op["id"])
+            if resq.get("status") != "ok":
+                raise RuntimeError(resq.get("error", "Operation status unavailable"))
+            op = resq["data"]
+
+        if op["state"] == "done":
+            await ws.send(json.dumps({"status": "ok", "msg": success_msg}))
+        else:
+            await ws.send(json.dumps({"status": "error", "msg": op.get("error") or op["message"]}))
+    except websockets.exceptions.ConnectionClosed:
+        pass
+    except Exception as e:
+        log.error("Following operation %s failed: %s", op.get("id"), e)
+
 # WebSocket server task
 async def ws_server_task():
-    async with websockets.serve(handle, "0.0.0.0", WS_PORT):
-        log.info("WiFi provision WS running on %d", WS_PORT)
+    async with websockets.serve(handle, "0.0.0.0", WS_PORT, **ws_serve_options()):
+        log.info("WiFi provision WS running on %d (max %d clients, compression=%s)",
+                 WS_PORT, WS_MAX_CLIENTS, WS_COMPRESSION)
         await asyncio.Future()
 
 # Telemetry broadcast task            
 async def telemetry_task():
+    # read_sensors() is bounded by its IPC timeout, so a cycle never takes long
+    register_telemetry_health(CONFIG.web)
     while True:
-        if clients:
-            sensor = await read_sensors()
-            payload = {
-                "clients": len(clients),
-                **sensor
-            }
-
-            msg = json.dumps(payload)
-
-            await asyncio.gather(
-                *[ws.send(msg) for ws in clients],
-                return_exceptions=True
-            )
+        HEALTH.beat("telemetry")
+        sensor = await read_sensors() if clients else None
+        if clients and sensor:
+            # Encoded once, straight from the sample slots
+            msg = sensor.to_json(clients=len(clients))
+
+            # broadcast() queues the frame on every connection without
+            # awaiting any of them, but it does not skip slow clients by
+            # itself: those whose write buffer still holds more than
+            # web.ws_slow_buffer (slow tablet, dead link) miss this frame
+            # instead of growing the buffer
+            start = time.perf_counter()
+            ready = _ready_clients(CONFIG.web.ws_slow_buffer)
+            if len(ready) < len(clients):
+                WS_SKIPPED.inc(len(clients) - len(ready))
+            websockets.broadcast(ready, msg)
+            WS_FANOUT.observe(time.perf_counter() - start)
 
-            log.info("TX telemetry: %s", msg)
+            log.debug("TX telemetry: %s", msg, extra={"kv": {"clients": len(clients), "bytes": len(msg)}})
 
-        await asyncio.sleep(5)  
+        await asyncio.sleep(CONFIG.web.telemetry_interval)
+
+def _ready_clients(limit: int) -> list:
+    ready = []
+    for ws in clients:
+        transport = getattr(ws, "transport", None)
+        if transport is None or transport.get_write_buffer_size() <= limit:
+            ready.append(ws)
+    return ready
+
+def register_telemetry_health(web):
+    # Stall deadline follows the (reloadable) interval
+    HEALTH.register("telemetry", max(60.0, web.telemetry_interval * 6))
     
 async def read_sensors():
     try:
         resq = await send_request_get_data_ipc()
         
         if resq.get("status") == "ok":
-            data = resq["data"]
-            return {
-                "temperature": data["temperature"],
-                "humidity":    data["humidity"],
-                "no2":         data["no2"],
-                "pm10":        data["pm10"],
-                "pm25":        data["pm25"],
-            }
+            return TelemetrySample.from_mapping(resq["data"], ts=round(time.time(), 3))
         else:
             log.error("IPC Server returned error: %s", resq.get("error"))
             return None
@@ -160,32 +354,51 @@ async def read_sensors():
         log.error("Failed to read sensors via IPC: %s", e)
         return None
 
-def set_gpio(gpio_num: int, on: bool):
-    value = True if on else False
+def parse_relay_commands(value: dict) -> list:
+    """
+    Relay command(s) from a "device" message: either a single
+    {gpio, status, name} or {"relays": [{gpio, status, name}, ...]}.
 
-    try:
-        gpio = GPIO(gpio_num, "out")
-        gpio.write(value)
-        gpio.close()
+    :return: List of (gpio, on, name)
+    """
+    items = value.get("relays") if "relays" in value else [value]
+    if not items:
+        raise RelayError("No relay commands")
 
-        log.info(
-            "GPIO %d set to %s",
-            gpio_num,
-            "ON" if on else "OFF"
-        )
-
-    except Exception as e:
-        log.error("GPIO %d control failed: %s", gpio_num, e)
-        raise
+    commands = []
+    for item in items:
+        status = item.get("status")
+        if status not in ("ON", "OFF"):
+            raise ValueError("Invalid relay status")
+        try:
+            gpio = int(item.get("gpio"))
+        except (TypeError, ValueError):
+            raise RelayError(f"Invalid GPIO line: {item.get('gpio')!r}")
+        commands.append((gpio, status == "ON", item.get("name", "Unknown")))
+    return commands
 
 def shutdown_provision():
     subprocess.run(["systemctl", "stop", "provision-web-backend"])
 
 
 async def main():
-    await asyncio.gather(
+    # Reload the [web] section in place: SIGHUP or the file changing
+    CONFIG.subscribe("web", lambda old, new: register_telemetry_health(new), loop=asyncio.get_running_loop())
+    asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, CONFIG.request_reload, "SIGHUP")
+
+    tasks = [
+        monitor_event_loop("backend"),
         ws_server_task(),
         telemetry_task(),
-    )
+        CONFIG.watch(),
+    ]
+    if METRICS_HTTP_PORT:
+        tasks.append(metrics_http_server_task(port=METRICS_HTTP_PORT))
+    if DEBUG_SOCK:
+        tasks.append(debug_server_task(DEBUG_SOCK, Profiler("provision-backend")))
+
+    sd_notify("READY=1")
+    await asyncio.gather(*tasks)
 
-asyncio.run(main())
\ No newline at end of file
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
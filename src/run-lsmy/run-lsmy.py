@@ -17,19 +17,18 @@
 #   - All logic must live inside lsmy-python-app package
 # =============================================================================
 
+import os
 import sys
-import ctypes
 import logging
 
 # -------------------------
 # Logging Configuration
 # -------------------------
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
+from lsmy_python_lib.log_control import setup_logging
+
+setup_logging(
+    level=os.environ.get("LSMY_LOG_LEVEL", "INFO"),
+    structured=os.environ.get("LSMY_LOG_FORMAT") == "kv",
 )
 
 log = logging.getLogger("run-lsmy")
@@ -39,7 +38,10 @@ log = logging.getLogger("run-lsmy")
 # - LSMY Application                       #
 # - All logic must live inside here        #
 ############################################
-from lsmy_app.app import LsmyApplication
+from lsmy_python_lib.startup_timeline import STARTUP_TIMELINE
+
+with STARTUP_TIMELINE.phase("lsmy_app.app", kind="import"):
+    from lsmy_app.app import LsmyApplication
 
 
 # -------------------------